@@ -0,0 +1,246 @@
+"""
+Массовый импорт активов из Excel
+
+Файл читается потоково (openpyxl read-only), и проверенные строки сразу
+записываются пакетами executemany внутри одной транзакции - в памяти
+держится один пакет, а не весь файл. Типы и местоположения сопоставляются
+по словарям в памяти, занятые серийные номера проверяются для каждого
+пакета. Импорт либо проходит целиком, либо (при отмене или ошибке БД) не
+оставляет в базе ничего.
+"""
+from openpyxl import load_workbook
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from database.normalize import name_key, serial_key
+
+
+class ImportCancelled(Exception):
+    """Импорт отменен пользователем"""
+
+
+class ImportReport:
+    """Результат импорта: сколько строк добавлено и ошибки по всем строкам файла"""
+
+    def __init__(self):
+        self.imported = 0
+        self.errors = []  # (номер строки, текст ошибки)
+        self.cancelled = False
+        self.failure = None  # ошибка, из-за которой импорт не записан
+
+    def summary(self):
+        """Краткий итог для сообщения пользователю"""
+        if self.cancelled:
+            return "Импорт отменен, данные не изменены"
+        if self.failure:
+            return f"❌ Импорт не выполнен, данные не изменены:\n{self.failure}"
+        message = f"✅ Успешно импортировано активов: {self.imported}"
+        if self.errors:
+            message += f"\n⚠️ Строк с ошибками (пропущены): {len(self.errors)}"
+        return message
+
+    def error_text(self):
+        """Полный список ошибок, по строке на ошибку"""
+        return "\n".join(f"Строка {row}: {message}" for row, message in self.errors)
+
+
+class AssetImporter:
+    """
+    Импорт активов из .xlsx: название, тип, модель, серийный номер,
+    местоположение, количество (первая строка - заголовок)
+    """
+
+    BATCH_SIZE = 1000
+    # Как часто сообщать о прогрессе и проверять отмену (строк)
+    PROGRESS_STEP = 500
+    # Ключей в одном запросе проверки серийных номеров (лимит параметров старых SQLite - 999)
+    SERIAL_CHECK_SIZE = 500
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def run(self, file_path, progress=None, is_cancelled=None):
+        """
+        Выполнить импорт
+
+        Args:
+            file_path: путь к .xlsx
+            progress: progress(обработано строк файла, всего или 0, если неизвестно)
+            is_cancelled: функция без аргументов; True - прервать импорт
+
+        Returns:
+            ImportReport
+        """
+        report = ImportReport()
+        progress = progress or (lambda done, total: None)
+        is_cancelled = is_cancelled or (lambda: False)
+
+        try:
+            with self.pool.transaction():
+                self._import_rows(file_path, report, progress, is_cancelled)
+        except ImportCancelled:
+            report.cancelled = True
+            report.imported = 0
+        except Exception as e:
+            report.failure = str(e)
+            report.imported = 0
+        report.errors.sort()
+        return report
+
+    def _import_rows(self, file_path, report, progress, is_cancelled):
+        """Потоковое чтение и проверка строк файла, запись пакетами по BATCH_SIZE (в транзакции run)"""
+        writer = self.pool.writer
+        # Справочники по нормализованному ключу: «Склад №1» и «склад № 1» - одна запись
+        types = self._lookup(writer, "SELECT type_key, type_id FROM Asset_Types")
+        locations = self._lookup(writer, "SELECT location_key, location_id FROM Locations")
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.active
+            # В read-only режиме размер берется из файла и может отсутствовать (0 - неизвестно)
+            total = max((worksheet.max_row or 1) - 1, 0)
+
+            batch = []  # (номер строки, проверенная строка)
+            serials = {}  # ключ серийного номера -> строка файла
+            width = 0
+            row_idx = 1
+            for row_idx, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                if row_idx == 1:
+                    # Ширина таблицы - по заголовку
+                    width = len(row)
+                    continue
+                if row_idx % self.PROGRESS_STEP == 0:
+                    if is_cancelled():
+                        raise ImportCancelled()
+                    progress(row_idx - 1, total)
+
+                # Пустые строки в конце листа не считаем ошибками
+                if not any(value is not None and str(value).strip() for value in row):
+                    continue
+                # read-only режим отбрасывает пустые ячейки в конце строки
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+
+                parsed = self._parse_row(row)
+                if isinstance(parsed, str):
+                    report.errors.append((row_idx, parsed))
+                    continue
+                key = serial_key(parsed[3])
+                if key is not None:
+                    if key in serials:
+                        report.errors.append((row_idx, f"серийный номер повторяется (строка {serials[key]})"))
+                        continue
+                    serials[key] = row_idx
+                batch.append((row_idx, parsed))
+
+                if len(batch) >= self.BATCH_SIZE:
+                    self._write_batch(writer, batch, types, locations, report, is_cancelled)
+                    batch = []
+                    progress(row_idx - 1, total)
+            if batch:
+                self._write_batch(writer, batch, types, locations, report, is_cancelled)
+            progress(row_idx - 1, max(total, row_idx - 1))
+        finally:
+            workbook.close()
+        print(f" Импорт активов: добавлено {report.imported}, ошибок {len(report.errors)}")
+
+    @staticmethod
+    def _parse_row(row):
+        """Кортеж (название, тип, модель, серийный номер, местоположение, количество) или текст ошибки"""
+        # Распаковываем данные: название, тип, модель, серийный номер, местоположение, количество
+        if len(row) < 6:
+            return "недостаточно данных"
+
+        name = str(row[0]).strip() if row[0] else None
+        type_name = str(row[1]).strip() if row[1] else None
+        model = str(row[2]).strip() if row[2] else ""
+        serial_number = str(row[3]).strip() if row[3] else ""
+        location_name = str(row[4]).strip() if row[4] else None
+        quantity = int(row[5]) if row[5] and str(row[5]).isdigit() else 1
+
+        # Проверяем обязательные поля
+        if not name:
+            return "отсутствует название актива"
+        if not type_name:
+            return "отсутствует тип актива"
+        if not location_name:
+            return "отсутствует местоположение"
+        return name, type_name, model, serial_number, location_name, quantity
+
+    def _write_batch(self, writer, batch, types, locations, report, is_cancelled):
+        """
+        Записать пакет проверенных строк [(номер строки, строка)]
+
+        Строки с серийными номерами, уже занятыми в базе, - ошибки пакета;
+        недостающие типы и местоположения добавляются и попадают в словари
+        types/locations для следующих пакетов.
+        """
+        if is_cancelled():
+            # Исключение откатывает всю транзакцию
+            raise ImportCancelled()
+
+        # Серийные номера, которые уже есть в базе (idx_assets_serial_key), - ошибки строк
+        keys = {serial_key(row[3]): row_idx for row_idx, row in batch}
+        keys.pop(None, None)
+        taken = self._taken_serials(writer, list(keys))
+        if taken:
+            for key in taken:
+                report.errors.append((keys[key], "серийный номер уже есть в базе"))
+            batch = [(row_idx, row) for row_idx, row in batch if serial_key(row[3]) not in taken]
+
+        # Недостающие справочники - одним пакетом каждый (одно написание на ключ)
+        new_types = self._missing({row[1] for _, row in batch}, types)
+        if new_types:
+            writer.executemany("INSERT INTO Asset_Types (type_name) VALUES (?)", new_types)
+            types.update(self._lookup(writer, "SELECT type_key, type_id FROM Asset_Types"))
+        new_locations = self._missing({row[4] for _, row in batch}, locations)
+        if new_locations:
+            writer.executemany("INSERT INTO Locations (location_name) VALUES (?)", new_locations)
+            locations.update(self._lookup(writer, "SELECT location_key, location_id FROM Locations"))
+
+        writer.executemany("""
+            INSERT INTO Assets (name, type_id, model, serial_number, location_id, current_status, quantity)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (name, types[name_key(type_name)], model, serial_number, locations[name_key(location_name)],
+             "Доступен", quantity)
+            for _, (name, type_name, model, serial_number, location_name, quantity) in batch
+        ])
+        report.imported += len(batch)
+
+    @classmethod
+    def _taken_serials(cls, connection, keys):
+        """Ключи из keys, которые уже заняты в Assets (запросы по SERIAL_CHECK_SIZE ключей)"""
+        taken = set()
+        for start in range(0, len(keys), cls.SERIAL_CHECK_SIZE):
+            chunk = keys[start:start + cls.SERIAL_CHECK_SIZE]
+            taken.update(key for key, in connection.execute(
+                f"SELECT serial_key FROM Assets WHERE serial_key IN ({','.join('?' * len(chunk))})", chunk))
+        return taken
+
+    @staticmethod
+    def _lookup(connection, query):
+        return dict(connection.execute(query).fetchall())
+
+    @staticmethod
+    def _missing(names, known):
+        """Названия для вставки: по одному (первому по алфавиту) на каждый ключ, которого нет в known"""
+        missing = {}
+        for name in sorted(names):
+            missing.setdefault(name_key(name), name)
+        return [(name,) for key, name in missing.items() if key not in known]
+
+
+class AssetImportWorker(QThread):
+    """Импорт в отдельном потоке; прерывается через requestInterruption()"""
+
+    progress = pyqtSignal(int, int)     # обработано строк, всего (0 - неизвестно)
+    report_ready = pyqtSignal(object)   # ImportReport
+
+    def __init__(self, pool, file_path, parent=None):
+        super().__init__(parent)
+        self.importer = AssetImporter(pool)
+        self.file_path = file_path
+
+    def run(self):
+        report = self.importer.run(self.file_path, self.progress.emit, self.isInterruptionRequested)
+        self.report_ready.emit(report)
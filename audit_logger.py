@@ -1,22 +1,64 @@
 """
 Модуль логирования действий пользователей для аудита
-Сохраняет логи в JSON файл
+Сохраняет логи в таблицу Audit_Log базы данных (только добавление)
+
+log_action не пишет в БД сам: запись ставится в очередь, а фоновый поток
+забирает накопившиеся записи и добавляет их одной транзакцией (group commit).
+Записи не удаляются и не перезаписываются; чтение последних записей
+берет только хвост таблицы по первичному ключу и ждет очередь не дольше
+READ_WAIT, не сохраняя ее в файл. Если БД недоступна, пачка
+пишется повторно, а не теряется; записи, которые flush() так и не дождался,
+сохраняются в audit_log.json и переносятся в таблицу при следующем запуске.
 """
+import atexit
 import json
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
 
 class AuditLogger:
     """Класс для логирования действий пользователей"""
-    
-    _log_file = "audit_log.json"
-    
+
+    # Старый формат: весь журнал одним JSON-файлом (импортируется в Audit_Log один раз)
+    _legacy_file = "audit_log.json"
+
+    # Максимум записей в одной транзакции
+    BATCH_SIZE = 500
+    # Сколько ждать следующие записи, прежде чем коммитить пачку (с)
+    COMMIT_DELAY = 0.05
+    # Пауза перед повторной записью пачки, если БД занята (удваивается до максимума), с
+    RETRY_DELAY = 0.1
+    RETRY_MAX_DELAY = 5.0
+    # Сколько flush() после своего таймаута ждет сохранения записей в файл (с)
+    SPILL_TIMEOUT = 2.0
+    # Сколько чтение журнала ждет записи очереди, прежде чем читать закоммиченное (с)
+    READ_WAIT = 0.5
+
+    _pool = None
+    _queue = queue.Queue()
+    _thread = None
+    _lock = threading.Lock()
+    # flush() не дождался записи - поток записи сохраняет пачки в файл вместо повторов
+    _spill = threading.Event()
+
+    @classmethod
+    def configure(cls, pool):
+        """Писать журнал через пул pool (None - пул DatabaseManager)"""
+        cls.flush()
+        with cls._lock:
+            cls._pool = pool
+            if pool is not None:
+                cls._import_legacy_file()
+
     @staticmethod
     def log_action(user_id, username, action, details=None):
         """
-        Запись действия в лог
-        
+        Запись действия в лог (не блокирует: запись попадет в БД в фоне)
+
         Args:
             user_id: ID пользователя
             username: Имя пользователя
@@ -24,68 +66,303 @@ class AuditLogger:
             details: Дополнительные детали (словарь)
         """
         try:
-            # Подготовка записи лога
-            log_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "user_id": user_id,
-                "username": username,
-                "action": action,
-                "details": details or {}
-            }
-            
-            # Загрузка существующих логов
-            log_path = Path(AuditLogger._log_file)
-            logs = []
-            
-            if log_path.exists() and log_path.stat().st_size > 0:
-                try:
-                    with open(log_path, 'r', encoding='utf-8') as f:
-                        logs = json.load(f)
-                        if not isinstance(logs, list):
-                            logs = []
-                except (json.JSONDecodeError, Exception):
-                    logs = []
-            
-            # Добавление новой записи
-            logs.append(log_entry)
-            
-            # Сохранение логов (максимум 1000 записей)
-            if len(logs) > 1000:
-                logs = logs[-1000:]
-            
-            with open(log_path, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, ensure_ascii=False, indent=2)
-            
+            AuditLogger._ensure_writer()
+            AuditLogger._queue.put((
+                datetime.now().isoformat(),
+                user_id,
+                username,
+                action,
+                json.dumps(details or {}, ensure_ascii=False, default=str),
+            ))
             print(f"📝 Записано в аудит-лог: {action} пользователем {username}")
-            
         except Exception as e:
             print(f"❌ Ошибка записи в аудит-лог: {e}")
-    
+
+    @classmethod
+    def flush(cls, timeout=5.0):
+        """
+        Дождаться записи всех поставленных в очередь действий
+
+        Если за timeout записи так и не попали в БД (она недоступна), поток
+        записи перестает повторять попытки и сохраняет их в _legacy_file -
+        они перенесутся в Audit_Log при следующем подключении к БД.
+
+        Returns:
+            bool: все записи сохранены в БД
+        """
+        if cls._thread is None:
+            return True
+        # Поток записи ждет мьютекс, который держит открытая транзакция этого потока
+        if cls._pool is not None and cls._pool.in_transaction():
+            return False
+        if cls._wait_for_queue(timeout):
+            return True
+        cls._spill.set()
+        cls._wait_for_queue(cls.SPILL_TIMEOUT)
+        cls._spill.clear()
+        return False
+
+    @classmethod
+    def wait_written(cls, timeout=None):
+        """
+        Коротко подождать записи очереди перед чтением журнала
+
+        В отличие от flush() не сохраняет записи в файл: если БД занята,
+        чтение просто видит то, что уже закоммичено.
+
+        Args:
+            timeout: сколько ждать (по умолчанию READ_WAIT), с
+
+        Returns:
+            bool: вся очередь записана в БД
+        """
+        if cls._thread is None:
+            return True
+        if cls._pool is not None and cls._pool.in_transaction():
+            return False
+        return cls._wait_for_queue(cls.READ_WAIT if timeout is None else timeout)
+
+    @classmethod
+    def _wait_for_queue(cls, timeout):
+        deadline = time.monotonic() + timeout
+        with cls._queue.all_tasks_done:
+            while cls._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                cls._queue.all_tasks_done.wait(remaining)
+        return True
+
     @staticmethod
     def get_recent_logs(limit=50):
-        """Получить последние записи лога"""
+        """Получить последние записи лога (от старых к новым)"""
+        try:
+            AuditLogger.wait_written()
+            rows = AuditLogger._get_pool().execute_query("""
+                SELECT timestamp, user_id, username, action, details
+                FROM Audit_Log
+                ORDER BY log_id DESC
+                LIMIT ?
+            """, (limit,))
+            return [AuditLogger._entry(row) for row in reversed(rows)]
+
+        except Exception as e:
+            print(f"❌ Ошибка чтения аудит-лога: {e}")
+            return []
+
+    @staticmethod
+    def filter_conditions(date_from=None, date_to=None, user_id=None, action=None, asset_id=None):
+        """
+        Условия отбора записей журнала (для запросов к Audit_Log)
+
+        Args:
+            date_from, date_to: границы периода 'YYYY-MM-DD' включительно
+            user_id, action, asset_id: точные значения
+
+        Returns:
+            tuple: (строка вида " AND ...", параметры)
+        """
+        sql = ""
+        params = []
+        for column, value in (('user_id', user_id), ('action', action), ('asset_id', asset_id)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        # Без функций над timestamp - диапазон берется из индекса
+        if date_from:
+            sql += " AND timestamp >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += " AND timestamp < DATE(?, '+1 day')"
+            params.append(date_to)
+        return sql, params
+
+    @staticmethod
+    def query_logs(date_from=None, date_to=None, user_id=None, action=None, asset_id=None,
+                   after=None, limit=100):
+        """
+        Записи журнала по фильтрам, от новых к старым, постранично
+
+        Следующая страница запрашивается ключом последней записи предыдущей:
+        after=(entry['timestamp'], entry['log_id']) - без OFFSET, каждая
+        страница читается поиском по индексу.
+
+        Returns:
+            list: записи (словари как в get_recent_logs плюс log_id)
+        """
         try:
-            log_path = Path(AuditLogger._log_file)
-            
-            if not log_path.exists():
-                return []
-            
-            with open(log_path, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-            
-            return logs[-limit:] if logs else []
-            
+            AuditLogger.wait_written()
+            conditions, params = AuditLogger.filter_conditions(date_from, date_to, user_id, action, asset_id)
+            if after is not None:
+                conditions += " AND (timestamp, log_id) < (?, ?)"
+                params.extend(after)
+            rows = AuditLogger._get_pool().execute_query(f"""
+                SELECT log_id, timestamp, user_id, username, action, details
+                FROM Audit_Log
+                WHERE 1=1{conditions}
+                ORDER BY timestamp DESC, log_id DESC
+                LIMIT ?
+            """, tuple(params) + (limit,))
+            return [dict(AuditLogger._entry(row[1:]), log_id=row[0]) for row in rows]
+
+        except Exception as e:
+            print(f"❌ Ошибка чтения аудит-лога: {e}")
+            return []
+
+    @staticmethod
+    def list_actions():
+        """Различные действия в журнале (по индексу, без просмотра всех записей)"""
+        try:
+            rows = AuditLogger._get_pool().execute_query("""
+                WITH RECURSIVE actions(action) AS (
+                    SELECT MIN(action) FROM Audit_Log
+                    UNION ALL
+                    SELECT (SELECT MIN(action) FROM Audit_Log WHERE action > actions.action)
+                    FROM actions WHERE actions.action IS NOT NULL
+                )
+                SELECT action FROM actions WHERE action IS NOT NULL
+            """)
+            return [row[0] for row in rows]
+
         except Exception as e:
             print(f"❌ Ошибка чтения аудит-лога: {e}")
             return []
-    
+
     @staticmethod
     def clear_logs():
-        """Очистить лог-файл (для тестирования)"""
+        """Очистить журнал (для тестирования)"""
+        try:
+            AuditLogger.flush()
+            AuditLogger._get_pool().execute_update("DELETE FROM Audit_Log")
+            print("🗑️ Аудит-лог очищен")
+        except Exception as e:
+            print(f"❌ Ошибка очистки аудит-лога: {e}")
+
+    @staticmethod
+    def _entry(row):
+        timestamp, user_id, username, action, details = row
+        return {
+            "timestamp": timestamp,
+            "user_id": user_id,
+            "username": username,
+            "action": action,
+            "details": json.loads(details) if details else {},
+        }
+
+    @classmethod
+    def _get_pool(cls):
+        with cls._lock:
+            if cls._pool is None:
+                from database.db_manager import DatabaseManager
+                cls._pool = DatabaseManager().pool
+                cls._import_legacy_file()
+            return cls._pool
+
+    @classmethod
+    def _ensure_writer(cls):
+        """Запустить фоновый поток записи при первом обращении"""
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        cls._get_pool()
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls._writer_loop, name="AuditLogWriter", daemon=True)
+                cls._thread.start()
+                # Записи из очереди не теряются при выходе из приложения
+                atexit.register(cls.flush)
+
+    @classmethod
+    def _writer_loop(cls):
+        while True:
+            batch = [cls._queue.get()]
+            # Собираем все, что накопилось за COMMIT_DELAY, - одна транзакция на пачку
+            deadline = time.monotonic() + cls.COMMIT_DELAY
+            while len(batch) < cls.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(cls._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                cls._write_batch(batch)
+            finally:
+                for _ in batch:
+                    cls._queue.task_done()
+
+    @classmethod
+    def _write_batch(cls, batch):
+        """Записать пачку; при ошибке - повторы с растущей паузой, пока flush() не попросит сохранить в файл"""
+        delay = cls.RETRY_DELAY
+        while True:
+            try:
+                pool = cls._pool
+                with pool.transaction():
+                    pool.writer.executemany("""
+                        INSERT INTO Audit_Log (timestamp, user_id, username, action, details)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, batch)
+                return
+            except Exception as e:
+                if cls._spill.is_set():
+                    print(f"❌ Ошибка записи в аудит-лог ({len(batch)} записей): {e}")
+                    cls._spill_to_file(batch)
+                    return
+                print(f"⚠️ Аудит-лог: БД недоступна ({e}), повтор через {delay:.1f} с")
+                cls._spill.wait(delay)
+                delay = min(delay * 2, cls.RETRY_MAX_DELAY)
+
+    @classmethod
+    def _spill_to_file(cls, batch):
+        """Дописать записи в _legacy_file - формат старого журнала, импортируется при подключении к БД"""
+        log_path = Path(cls._legacy_file)
+        try:
+            logs = []
+            if log_path.exists() and log_path.stat().st_size > 0:
+                with open(log_path, 'r', encoding='utf-8') as f:
+                    logs = json.load(f)
+            logs.extend(cls._entry(row) for row in batch)
+            temp_path = log_path.with_name(log_path.name + ".tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(logs, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, log_path)
+            print(f"💾 Аудит-лог: {len(batch)} записей сохранено в {log_path}")
+        except Exception as e:
+            print(f"❌ Записи аудит-лога потеряны ({len(batch)}): {e}")
+
+    @classmethod
+    def _import_legacy_file(cls):
+        """Перенести записи старого audit_log.json в Audit_Log (файл переименовывается с отметкой времени)"""
+        log_path = Path(cls._legacy_file)
+        if not log_path.exists():
+            return
         try:
-            log_path = Path(AuditLogger._log_file)
-            if log_path.exists():
-                log_path.unlink()
-                print("🗑️ Аудит-лог очищен")
+            if log_path.stat().st_size > 0:
+                with open(log_path, 'r', encoding='utf-8') as f:
+                    logs = json.load(f)
+            else:
+                logs = []
+            rows = [
+                (entry.get("timestamp") or datetime.now().isoformat(), entry.get("user_id"),
+                 entry.get("username"), entry.get("action") or "",
+                 json.dumps(entry.get("details") or {}, ensure_ascii=False, default=str))
+                for entry in (logs if isinstance(logs, list) else [])
+                if isinstance(entry, dict)
+            ]
+            with cls._pool.transaction():
+                cls._pool.writer.executemany("""
+                    INSERT INTO Audit_Log (timestamp, user_id, username, action, details)
+                    VALUES (?, ?, ?, ?, ?)
+                """, rows)
+            # Отметка времени в имени: файл, сохраненный после прошлого импорта, не затирает его копию
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            imported_path = log_path.with_name(f"{log_path.name}.imported-{stamp}")
+            number = 1
+            while imported_path.exists():
+                number += 1
+                imported_path = log_path.with_name(f"{log_path.name}.imported-{stamp}-{number}")
+            os.replace(log_path, imported_path)
+            print(f"📋 Аудит-лог перенесен в БД, записей: {len(rows)}")
         except Exception as e:
-            print(f"❌ Ошибка очистки аудит-лога: {e}")
\ No newline at end of file
+            print(f"❌ Ошибка переноса аудит-лога {log_path}: {e}")
@@ -1,6 +1,8 @@
 import sqlite3
 import os
 
+from database.normalize import connect
+
 
 def check_database():
     print("Проверка базы данных...")
@@ -10,7 +12,8 @@ def check_database():
         return False
 
     try:
-        conn = sqlite3.connect('inventory.db')
+        # Функции ключей нужны триггерам, если скрипт будет что-то исправлять
+        conn = connect('inventory.db')
         cursor = conn.cursor()
 
         # Проверяем существование таблиц
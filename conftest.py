@@ -0,0 +1,57 @@
+"""
+Общие фикстуры тестов: пул соединений на новой БД со схемой приложения
+
+Пул закрывается при завершении теста, даже если проверка упала раньше.
+Запуск тестов без pytest (блок __main__ модулей) использует open_pool напрямую.
+"""
+
+import os
+from contextlib import contextmanager
+
+import pytest
+
+from audit_logger import AuditLogger
+from database.connection_pool import ConnectionPool
+from database.migrations import apply_migrations
+
+
+@contextmanager
+def open_pool(directory, name='test.db'):
+    """Пул на новой БД в каталоге directory, закрывается при выходе из блока"""
+    pool = ConnectionPool(os.path.join(directory, name))
+    try:
+        apply_migrations(pool.writer)
+        yield pool
+    finally:
+        pool.close()
+
+
+@contextmanager
+def audit_logging(pool):
+    """Журнал аудита пишет через pool до выхода из блока"""
+    AuditLogger.configure(pool)
+    try:
+        yield pool
+    finally:
+        AuditLogger.configure(None)
+
+
+def seed_reference_data(pool):
+    """Тип 'Инструмент', местоположение 'Склад №1' и сотрудник Иванов Иван (все с ID 1)"""
+    pool.execute_update("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+    pool.execute_update("INSERT INTO Locations (location_name) VALUES ('Склад №1')")
+    pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES ('Иванов', 'Иван')")
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """Пул на новой БД во временном каталоге теста"""
+    with open_pool(tmp_path) as pool:
+        yield pool
+
+
+@pytest.fixture
+def audit_pool(pool):
+    """Пул, через который пишет журнал аудита (AuditLogger.configure)"""
+    with audit_logging(pool) as pool:
+        yield pool
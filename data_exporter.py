@@ -0,0 +1,274 @@
+"""
+Потоковая выгрузка данных в CSV и Excel
+
+Запросы выполняются на read-only соединении (в WAL - согласованный снимок),
+строки читаются пачками из курсора и сразу пишутся в файл: память не зависит
+от числа строк. Excel пишется write-only книгой openpyxl с именованными
+стилями; ширина колонок отчета считается по заголовку и первым строкам,
+так как write-only лист записывает размеры колонок до данных.
+"""
+import csv
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from PyQt6.QtCore import QObject, pyqtSignal
+
+# Строк за один fetchmany и между сообщениями о прогрессе
+FETCH_SIZE = 1000
+# Сколько первых строк учитывается при подборе ширины колонок Excel
+WIDTH_SAMPLE_ROWS = 1000
+MAX_COLUMN_WIDTH = 50
+
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+
+# Листы выгрузки всех данных: название, заголовки, запрос, ширина колонок
+ALL_DATA_SHEETS = (
+    ("Активы",
+     ["ID", "Название", "Тип", "Модель", "Серийный номер", "Статус", "Местоположение", "Количество"],
+     """
+     SELECT a.asset_id, a.name, at.type_name, a.model, a.serial_number,
+            a.current_status, l.location_name, a.quantity
+     FROM Assets a
+     JOIN Asset_Types at ON a.type_id = at.type_id
+     JOIN Locations l ON a.location_id = l.location_id
+     ORDER BY a.asset_id
+     """,
+     [20] * 8),
+    ("Сотрудники",
+     ["ID", "Фамилия", "Имя", "Отчество", "Должность", "Email", "Телефон"],
+     """
+     SELECT e.employee_id, e.last_name, e.first_name, e.patronymic,
+            COALESCE(p.position_name, ''), e.email, e.phone
+     FROM Employees e
+     LEFT JOIN Positions p ON e.position_id = p.position_id
+     ORDER BY e.employee_id
+     """,
+     [10, 15, 15, 15, 20, 25, 15]),
+    ("История операций",
+     ["ID", "Актив", "Сотрудник", "Тип операции", "Дата операции",
+      "Плановый возврат", "Фактический возврат", "Примечания"],
+     """
+     SELECT uh.history_id, a.name, e.last_name || ' ' || e.first_name,
+            uh.operation_type, uh.operation_date, uh.planned_return_date,
+            uh.actual_return_date, COALESCE(uh.notes, '')
+     FROM Usage_History uh
+     JOIN Assets a ON uh.asset_id = a.asset_id
+     JOIN Employees e ON uh.employee_id = e.employee_id
+     ORDER BY uh.history_id DESC
+     """,
+     [10, 25, 25, 15, 20, 20, 20, 40]),
+    ("Типы активов",
+     ["ID", "Название типа"],
+     "SELECT type_id, type_name FROM Asset_Types ORDER BY type_id",
+     [10, 30]),
+    ("Местоположения",
+     ["ID", "Название местоположения"],
+     "SELECT location_id, location_name FROM Locations ORDER BY location_id",
+     [10, 40]),
+)
+
+# Лист статистики: подписи и один запрос со всеми счетчиками
+STATISTICS_LABELS = (
+    "Всего активов:", "Доступно активов:", "Выдано активов:", "Списано активов:",
+    "Просроченные активы:", "Количество сотрудников:", "Всего операций:",
+)
+# После каких счетчиков (по индексу) идет пустая строка
+STATISTICS_GAPS = (4, 6)
+STATISTICS_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM Assets),
+        (SELECT COUNT(*) FROM Assets WHERE current_status = 'Доступен'),
+        (SELECT COUNT(*) FROM Active_Loans),
+        (SELECT COUNT(*) FROM Assets WHERE current_status = 'Списан'),
+        (SELECT COUNT(*) FROM Active_Loans WHERE planned_return_date < DATE('now', 'localtime')),
+        (SELECT COUNT(*) FROM Employees),
+        (SELECT COUNT(*) FROM Usage_History)
+"""
+
+
+class ExportProgress(QObject):
+    """Прогресс выгрузки: сигнал испускается в рабочем потоке, слоты GUI - в потоке GUI"""
+
+    rows_written = pyqtSignal(int)
+
+
+def _iter_rows(cursor, progress):
+    """Строки курсора пачками по FETCH_SIZE с сообщением о прогрессе после каждой"""
+    written = 0
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+        written += len(rows)
+        if progress:
+            progress(written)
+
+
+@contextmanager
+def _removed_on_failure(file_path):
+    """При ошибке или отмене - удалить недописанный файл"""
+    try:
+        yield
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+
+def _run_export(connection, query, params, file_path, write):
+    """Выполнить запрос и передать курсор в write"""
+    cursor = connection.cursor()
+    try:
+        with _removed_on_failure(file_path):
+            cursor.execute(query, params)
+            headers = [description[0] for description in cursor.description]
+            return write(cursor, headers)
+    finally:
+        cursor.close()
+
+
+def _add_styles(wb):
+    """Именованные стили книги: одна запись в styles.xml на стиль, а не на ячейку"""
+    wb.add_named_style(NamedStyle(
+        "header", font=Font(bold=True, color="FFFFFF"), fill=HEADER_FILL,
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True)))
+    wb.add_named_style(NamedStyle(
+        "title", font=Font(bold=True, size=14, color="FFFFFF"), fill=HEADER_FILL,
+        alignment=Alignment(horizontal="center", vertical="center")))
+    wb.add_named_style(NamedStyle("label", font=Font(bold=True)))
+
+
+def _styled(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+
+def _header_row(ws, headers):
+    return [_styled(ws, header, "header") for header in headers]
+
+
+def export_csv(connection, query, params, file_path, progress=None):
+    """
+    Выгрузить результат запроса в CSV (разделитель ';', UTF-8 с BOM для Excel)
+
+    Returns:
+        int: число выгруженных строк
+    """
+    def write(cursor, headers):
+        count = 0
+        with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.writer(csvfile, delimiter=';')
+            writer.writerow(headers)
+            for row in _iter_rows(cursor, progress):
+                writer.writerow(row)
+                count += 1
+        return count
+
+    return _run_export(connection, query, params, file_path, write)
+
+
+def export_xlsx(connection, query, params, file_path, progress=None, sheet_title="Отчет"):
+    """
+    Выгрузить результат запроса в .xlsx (write-only книга, заголовок с оформлением)
+
+    Returns:
+        int: число выгруженных строк
+    """
+    def write(cursor, headers):
+        wb = Workbook(write_only=True)
+        _add_styles(wb)
+        ws = wb.create_sheet(sheet_title)
+
+        # Первые строки держим в памяти, пока считаем по ним ширину колонок
+        rows = _iter_rows(cursor, progress)
+        widths = [len(str(header)) for header in headers]
+        sample = []
+        for row in rows:
+            sample.append(row)
+            for col, value in enumerate(row):
+                if value is not None and len(str(value)) > widths[col]:
+                    widths[col] = len(str(value))
+            if len(sample) >= WIDTH_SAMPLE_ROWS:
+                break
+
+        for col, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(col)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+        ws.append(_header_row(ws, headers))
+        for row in sample:
+            ws.append(row)
+        count = len(sample)
+        for row in rows:
+            ws.append(row)
+            count += 1
+        wb.save(file_path)
+        return count
+
+    return _run_export(connection, query, params, file_path, write)
+
+
+def export_all_data(connection, file_path, progress=None):
+    """
+    Выгрузить все данные системы в .xlsx: статистика и по листу на таблицу
+
+    Все листы читаются в одной транзакции чтения, поэтому статистика
+    совпадает с детальными листами, даже если данные меняются во время
+    выгрузки. Строки идут из курсора в write-only книгу пачками.
+
+    Args:
+        connection: read-only sqlite3-соединение (вне транзакции)
+        progress: progress(выгружено строк всего)
+
+    Returns:
+        int: число выгруженных строк детальных листов
+    """
+    wb = Workbook(write_only=True)
+    _add_styles(wb)
+    count = 0
+
+    with _removed_on_failure(file_path):
+        # Снимок фиксируется первым SELECT и держится до конца транзакции
+        connection.execute("BEGIN")
+        try:
+            ws = wb.create_sheet("Статистика")
+            ws.column_dimensions['A'].width = 30
+            ws.column_dimensions['B'].width = 20
+            ws.row_dimensions[1].height = 25
+            ws.row_dimensions[2].height = 5
+            ws.append([_styled(ws, "СТАТИСТИКА СИСТЕМЫ", "title")])
+            ws.merged_cells.add('A1:B1')
+            ws.append([])
+
+            stats = connection.execute(STATISTICS_QUERY).fetchone()
+            for index, (label, value) in enumerate(zip(STATISTICS_LABELS, stats)):
+                ws.append([_styled(ws, label, "label"), value])
+                if index in STATISTICS_GAPS:
+                    ws.append([])
+            ws.append([_styled(ws, "Дата экспорта:", "label"), datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+
+            for title, headers, query, widths in ALL_DATA_SHEETS:
+                ws = wb.create_sheet(title)
+                for col, width in enumerate(widths, start=1):
+                    ws.column_dimensions[get_column_letter(col)].width = width
+                ws.append(_header_row(ws, headers))
+
+                cursor = connection.execute(query)
+                try:
+                    offset = count
+                    for row in _iter_rows(cursor, progress and (lambda written: progress(offset + written))):
+                        ws.append(row)
+                        count += 1
+                finally:
+                    cursor.close()
+        finally:
+            connection.commit()
+
+        wb.save(file_path)
+    return count
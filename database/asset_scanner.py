@@ -0,0 +1,195 @@
+import re
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from database.normalize import serial_key
+
+# Отсканированный актив и действие с ним для выбранного сотрудника
+ScanItem = namedtuple('ScanItem', [
+    'asset_id', 'name', 'model', 'serial_number', 'operation_type', 'quantity',
+])
+
+# Инвентарный номер - ID актива: «123», «#123», «ИНВ-123», «INV 000123»
+INVENTORY_NUMBER_RE = re.compile(r"^\s*(?:#|инв|inv)?[\s.№-]*0*(\d+)\s*$", re.IGNORECASE)
+
+# Актив и сколько его сейчас выдано сотруднику (Active_Loans по idx_loans_asset)
+ASSET_STATE_QUERY = """
+    SELECT a.name, a.model, a.serial_number, a.quantity, a.current_status,
+           (SELECT COALESCE(SUM(al.quantity), 0) FROM Active_Loans al
+            WHERE al.asset_id = a.asset_id AND al.employee_id = ?)
+    FROM Assets a
+    WHERE a.asset_id = ?
+"""
+
+# Статус по открытым выдачам - как DatabaseManager.update_asset_status
+UPDATE_STATUS_SQL = """
+    UPDATE Assets SET current_status = CASE
+        WHEN EXISTS (SELECT 1 FROM Active_Loans WHERE asset_id = ?) THEN 'Выдан'
+        ELSE 'Доступен'
+    END
+    WHERE asset_id = ?
+"""
+
+
+class ScanError(Exception):
+    """Код не найден или с активом нельзя ничего сделать - текст для клерка"""
+
+
+class AssetScanner:
+    """
+    Быстрый режим сканирования штрихкодов: код -> актив -> выдача или возврат
+
+    Код сначала ищется в кэше (dict, LRU на CACHE_SIZE кодов), при промахе -
+    по уникальному индексу idx_assets_serial_key, затем как инвентарный номер
+    (ID актива, такие попадания не кэшируются). Кэш хранит только соответствие
+    серийного номера и asset_id, состояние актива читается при каждом
+    сканировании точечным запросом по ключу - поэтому его не нужно сбрасывать
+    при выдаче и возврате. Строки Assets,
+    изменения которых пришли из ChangeBus (invalidate), вычеркиваются из кэша.
+
+    Очередь сканов проводится commit() одной транзакцией.
+    """
+
+    CACHE_SIZE = 10000
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._codes = OrderedDict()  # ключ серийного номера -> asset_id
+        self._keys_by_asset = {}     # asset_id -> ключи кода в кэше
+
+    def resolve(self, code):
+        """
+        ID актива по серийному или инвентарному номеру
+
+        Returns:
+            int или None - код не найден
+        """
+        key = serial_key(code)
+        if key is None:
+            return None
+        asset_id = self._codes.get(key)
+        if asset_id is not None:
+            self._codes.move_to_end(key)
+            return asset_id
+
+        rows = self.pool.execute_query("SELECT asset_id FROM Assets WHERE serial_key = ?", (key,))
+        if rows:
+            asset_id = rows[0][0]
+            self._remember(key, asset_id)
+            return asset_id
+
+        # Инвентарный номер не кэшируется: у нового актива серийный номер может
+        # совпасть с ним по ключу («инв123» -> «123»), и тогда код - этот актив
+        match = INVENTORY_NUMBER_RE.match(code)
+        if match:
+            rows = self.pool.execute_query(
+                "SELECT asset_id FROM Assets WHERE asset_id = ?", (int(match.group(1)),))
+            if rows:
+                return rows[0][0]
+        return None
+
+    def _remember(self, key, asset_id):
+        self._codes[key] = asset_id
+        self._keys_by_asset.setdefault(asset_id, set()).add(key)
+        while len(self._codes) > self.CACHE_SIZE:
+            old_key, old_asset_id = self._codes.popitem(last=False)
+            keys = self._keys_by_asset.get(old_asset_id)
+            if keys:
+                keys.discard(old_key)
+                if not keys:
+                    del self._keys_by_asset[old_asset_id]
+
+    def invalidate(self, changes):
+        """Сбросить кэш по изменениям ChangeBus ({таблица: set(rowid)}; None - все)"""
+        if changes is None:
+            self._codes.clear()
+            self._keys_by_asset.clear()
+            return
+        for asset_id in changes.get('Assets', ()):
+            for key in self._keys_by_asset.pop(asset_id, ()):
+                self._codes.pop(key, None)
+
+    def scan(self, code, employee_id):
+        """
+        Что сделать с отсканированным активом для сотрудника
+
+        Выданный этому сотруднику актив возвращается (все открытые выдачи),
+        актив на складе выдается по одной штуке.
+
+        Returns:
+            ScanItem
+
+        Raises:
+            ScanError: код не найден, актив выдан другому или его нет на складе
+        """
+        asset_id = self.resolve(code)
+        if asset_id is None:
+            raise ScanError(f"Код «{code.strip()}» не найден")
+
+        rows = self.pool.execute_query(ASSET_STATE_QUERY, (employee_id, asset_id))
+        if not rows:
+            # Актив удален после того, как код попал в кэш
+            self.invalidate({'Assets': {asset_id}})
+            raise ScanError(f"Код «{code.strip()}» не найден")
+
+        name, model, serial_number, quantity, status, issued_to_employee = rows[0]
+        if issued_to_employee:
+            return ScanItem(asset_id, name, model, serial_number, 'возврат', issued_to_employee)
+        if status == 'Списан' or quantity <= 0:
+            raise ScanError(f"«{name}» нет на складе (статус: {status}, остаток: {quantity} шт.)")
+        return ScanItem(asset_id, name, model, serial_number, 'выдача', 1)
+
+    def commit(self, items, employee_id, planned_return_date):
+        """
+        Провести очередь сканов одной транзакцией (все или ничего)
+
+        Выдачи и возвраты записываются так же, как в IssueDialog/ReturnDialog.
+        Остатки и открытые выдачи перепроверяются внутри транзакции: если
+        после сканирования их изменили, поднимается ScanError и ничего
+        не записывается.
+
+        Args:
+            items: список ScanItem
+            employee_id: сотрудник
+            planned_return_date: плановая дата возврата для выдач ('ГГГГ-ММ-ДД')
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return_date = now[:10]
+        with self.pool.transaction():
+            for item in items:
+                if item.operation_type == 'выдача':
+                    self._issue(item, employee_id, planned_return_date, now)
+                else:
+                    self._return(item, employee_id, return_date, now)
+                self.pool.execute_update(UPDATE_STATUS_SQL, (item.asset_id, item.asset_id))
+
+    def _issue(self, item, employee_id, planned_return_date, now):
+        rows = self.pool.execute_query("SELECT quantity FROM Assets WHERE asset_id = ?", (item.asset_id,))
+        if not rows or rows[0][0] < item.quantity:
+            raise ScanError(f"«{item.name}»: на складе осталось {rows[0][0] if rows else 0} шт.")
+        self.pool.execute_update(
+            "UPDATE Assets SET quantity = quantity - ? WHERE asset_id = ?", (item.quantity, item.asset_id))
+        self.pool.execute_update("""
+            INSERT INTO Usage_History
+            (asset_id, employee_id, operation_type, operation_date, planned_return_date, quantity, notes)
+            VALUES (?, ?, 'выдача', ?, ?, ?, ?)
+        """, (item.asset_id, employee_id, now, planned_return_date, item.quantity,
+              f"Кол-во выданных: {item.quantity} шт."))
+
+    def _return(self, item, employee_id, return_date, now):
+        quantity = self.pool.execute_query(
+            "SELECT COALESCE(SUM(quantity), 0) FROM Active_Loans WHERE asset_id = ? AND employee_id = ?",
+            (item.asset_id, employee_id))[0][0]
+        if not quantity:
+            raise ScanError(f"«{item.name}» уже возвращен")
+        self.pool.execute_update(
+            "UPDATE Assets SET quantity = quantity + ? WHERE asset_id = ?", (quantity, item.asset_id))
+        self.pool.execute_update("""
+            UPDATE Usage_History SET actual_return_date = ?
+            WHERE asset_id = ? AND employee_id = ?
+              AND operation_type = 'выдача' AND actual_return_date IS NULL
+        """, (return_date, item.asset_id, employee_id))
+        self.pool.execute_update("""
+            INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, quantity, notes)
+            VALUES (?, ?, 'возврат', ?, ?, ?)
+        """, (item.asset_id, employee_id, now, quantity, f"Возврат актива (Кол-во: {quantity} шт.)"))
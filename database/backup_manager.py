@@ -0,0 +1,234 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from PyQt6.QtCore import QMutexLocker
+
+from database.migrations import apply_migrations
+
+
+class BackupError(Exception):
+    """Резервная копия не создана, повреждена или не может быть восстановлена"""
+
+
+class BackupCancelled(BackupError):
+    """Создание копии прервано (например, при закрытии окна)"""
+
+
+class BackupManager:
+    """
+    Резервные копии БД через sqlite3 backup API
+
+    Копия снимается постранично (PAGES_PER_STEP страниц за шаг) с read-only
+    соединения, которое держит транзакцию чтения: в WAL это фиксированный
+    снимок, поэтому запись в БД во время копирования не блокируется и не
+    заставляет копирование начинаться заново. Готовая копия проверяется
+    PRAGMA integrity_check, при необходимости сжимается gzip и
+    переименовывается в <каталог>/inventory_ГГГГММДД_ЧЧММСС.db[.gz];
+    хранятся последние keep копий.
+
+    Восстановление копирует страницы копии в соединение-писатель пула одним
+    шагом backup API под мьютексом записи - для остальных соединений база
+    меняется атомарно, как при обычном коммите.
+    """
+
+    PAGES_PER_STEP = 1024  # 4 МБ при странице 4 КБ
+    PREFIX = "inventory_"
+    TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+    def __init__(self, db_path, backup_dir=None, keep=10, compress=True):
+        self.db_path = os.path.abspath(db_path)
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(self.db_path), "backups")
+        self.keep = keep
+        self.compress = compress
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Прервать выполняющееся создание копии"""
+        self._cancelled.set()
+
+    def list_backups(self):
+        """Копии от новых к старым: [(путь, время создания)]"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        backups = []
+        for name in os.listdir(self.backup_dir):
+            if not name.startswith(self.PREFIX) or not name.endswith((".db", ".db.gz")):
+                continue
+            stamp = name[len(self.PREFIX):len(self.PREFIX) + 15]
+            try:
+                created = datetime.strptime(stamp, self.TIMESTAMP_FORMAT)
+            except ValueError:
+                continue
+            backups.append((os.path.join(self.backup_dir, name), created))
+        backups.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return backups
+
+    def last_backup_time(self):
+        """Время последней копии или None"""
+        backups = self.list_backups()
+        return backups[0][1] if backups else None
+
+    def is_due(self, interval_hours):
+        """Пора ли делать плановую копию"""
+        last = self.last_backup_time()
+        return last is None or (datetime.now() - last).total_seconds() >= interval_hours * 3600
+
+    def create_backup(self, source=None, progress=None, tag=None, rotate=True):
+        """
+        Создать копию БД
+
+        Args:
+            source: read-only sqlite3-соединение вне транзакции (по умолчанию - свое)
+            progress: progress(скопировано страниц, всего страниц)
+            tag: необязательная метка в имени файла (например, 'before_restore')
+            rotate: удалить копии сверх keep после создания
+
+        Returns:
+            str: путь к созданной копии
+        """
+        self._cancelled.clear()
+        os.makedirs(self.backup_dir, exist_ok=True)
+        path = self._new_backup_path(tag)
+        temp_path = path + ".tmp"
+
+        own_source = source is None
+        if own_source:
+            source = sqlite3.connect(Path(self.db_path).as_uri() + "?mode=ro", uri=True)
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                self._copy_snapshot(source, target, progress)
+                # Копия - один самодостаточный файл, без -wal/-shm при открытии
+                target.execute("PRAGMA journal_mode=DELETE")
+                self._check_integrity(target)
+            finally:
+                target.close()
+
+            if path.endswith(".gz"):
+                with open(temp_path, "rb") as raw, gzip.open(path + ".part", "wb", compresslevel=6) as packed:
+                    shutil.copyfileobj(raw, packed, 1024 * 1024)
+                os.replace(path + ".part", path)
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, path)
+        except BaseException:
+            for leftover in (temp_path, path + ".part"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        finally:
+            if own_source:
+                source.close()
+
+        print(f" Резервная копия создана: {path}")
+        if rotate:
+            self.rotate()
+        return path
+
+    def rotate(self):
+        """Удалить копии сверх keep самых новых"""
+        removed = []
+        for path, _ in self.list_backups()[self.keep:]:
+            os.remove(path)
+            removed.append(path)
+        return removed
+
+    def verify(self, path):
+        """Проверить копию (integrity_check); BackupError, если она повреждена"""
+        with self._unpacked(path) as db_file:
+            connection = sqlite3.connect(Path(db_file).as_uri() + "?mode=ro", uri=True)
+            try:
+                self._check_integrity(connection)
+            finally:
+                connection.close()
+
+    def restore(self, pool, path, progress=None):
+        """
+        Заменить содержимое БД копией path
+
+        Копия сначала проверяется, текущее состояние сохраняется отдельной
+        копией с меткой 'before_restore'. После замены применяются миграции
+        (копия может быть старее схемы).
+
+        Returns:
+            str: путь к копии состояния до восстановления
+        """
+        with self._unpacked(path) as db_file:
+            source = sqlite3.connect(Path(db_file).as_uri() + "?mode=ro", uri=True)
+            try:
+                self._check_integrity(source)
+                # Без ротации: иначе может удалиться восстанавливаемая копия
+                safety_copy = self.create_backup(progress=progress, tag="before_restore", rotate=False)
+                with QMutexLocker(pool.write_mutex):
+                    source.backup(pool.writer)
+                    apply_migrations(pool.writer)
+            except sqlite3.Error as e:
+                raise BackupError(f"Не удалось восстановить копию: {e}") from e
+            finally:
+                source.close()
+        print(f" БД восстановлена из копии: {path}")
+        return safety_copy
+
+    def _new_backup_path(self, tag):
+        stamp = datetime.now().strftime(self.TIMESTAMP_FORMAT)
+        suffix = f"_{tag}" if tag else ""
+        extension = ".db.gz" if self.compress else ".db"
+        path = os.path.join(self.backup_dir, f"{self.PREFIX}{stamp}{suffix}{extension}")
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.backup_dir, f"{self.PREFIX}{stamp}{suffix}_{counter}{extension}")
+            counter += 1
+        return path
+
+    def _copy_snapshot(self, source, target, progress):
+        """Постраничное копирование из снимка, зафиксированного транзакцией чтения"""
+        def on_step(status, remaining, total):
+            if self._cancelled.is_set():
+                raise BackupCancelled("Создание резервной копии прервано")
+            if progress:
+                progress(total - remaining, total)
+
+        source.execute("BEGIN")
+        try:
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            source.backup(target, pages=self.PAGES_PER_STEP, progress=on_step)
+        finally:
+            source.commit()
+
+    @staticmethod
+    def _check_integrity(connection):
+        try:
+            result = [row[0] for row in connection.execute("PRAGMA integrity_check").fetchall()]
+        except sqlite3.DatabaseError as e:
+            raise BackupError(f"Копия повреждена: {e}") from e
+        if result != ["ok"]:
+            raise BackupError("Копия повреждена: " + "; ".join(result[:5]))
+
+    @staticmethod
+    @contextmanager
+    def _unpacked(path):
+        """Путь к несжатому файлу копии (gz распаковывается во временный файл)"""
+        if not os.path.exists(path):
+            raise BackupError(f"Файл копии не найден: {path}")
+        if not path.endswith(".gz"):
+            yield path
+            return
+
+        temp_path = path[:-3] + ".restore.tmp"
+        try:
+            try:
+                with gzip.open(path, "rb") as packed, open(temp_path, "wb") as raw:
+                    shutil.copyfileobj(packed, raw, 1024 * 1024)
+            except (OSError, EOFError) as e:
+                raise BackupError(f"Не удалось распаковать копию: {e}") from e
+            yield temp_path
+        finally:
+            for leftover in (temp_path, temp_path + "-wal", temp_path + "-shm"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
@@ -0,0 +1,26 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+
+# Таблицы, изменения которых публикуются
+TRACKED_TABLES = (
+    'Positions', 'Employees', 'Asset_Types', 'Locations', 'Assets',
+    'Usage_History', 'Active_Loans', 'Users', 'Asset_Requests',
+)
+
+
+class ChangeBus(QObject):
+    """
+    Шина изменений данных внутри процесса
+
+    После каждого коммита писателя испускает changed({таблица: set(rowid)}) -
+    какие строки каких таблиц вставлены, изменены или удалены (журнал ведет
+    ConnectionPool.track_changes). Представления подписываются и обновляют
+    только затронутое. Сигнал может испускаться из рабочего потока;
+    слоты объектов потока GUI вызываются в потоке GUI.
+    """
+
+    changed = pyqtSignal(object)
+
+    def __init__(self, pool, tables=TRACKED_TABLES, parent=None):
+        super().__init__(parent)
+        pool.track_changes(tables)
+        pool.add_change_listener(self.changed.emit)
@@ -0,0 +1,234 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from PyQt6.QtCore import QMutexLocker, QRecursiveMutex, QThread, Qt
+
+from database.normalize import register_functions
+
+
+class ConnectionPool:
+    """
+    Пул соединений SQLite
+
+    Одно соединение на запись (все записи сериализуются мьютексом) и по
+    одному read-only соединению на каждый поток. В режиме WAL читатели
+    не блокируют друг друга и писателя, поэтому запросы из UI, таймера
+    уведомлений и фоновых задач выполняются параллельно. Соединение
+    потока закрывается, когда поток завершается (в том числе рабочий
+    поток QThreadPool после простоя).
+
+    Несколько записей объединяются в одну транзакцию через transaction():
+    внутри нее execute_update не коммитит, а execute_query читает через
+    писателя, чтобы видеть еще не закоммиченные изменения.
+
+    После track_changes() пул сообщает слушателям, какие строки каких
+    таблиц изменил каждый коммит (см. add_change_listener).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Рекурсивный: транзакция держит мьютекс, а execute_update внутри нее берет его повторно
+        self.write_mutex = QRecursiveMutex()
+
+        self.writer = sqlite3.connect(db_path, check_same_thread=False)
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("PRAGMA busy_timeout=5000")
+        # name_key() и serial_key() для триггеров нормализованных ключей
+        register_functions(self.writer)
+
+        # read-only URI: читатель физически не может ничего записать
+        self._reader_uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self._local = threading.local()
+        self._readers = {}  # идентификатор потока -> его read-only соединение
+        self._readers_lock = threading.Lock()
+
+        self._tracking_changes = False
+        self._change_listeners = []
+
+    def track_changes(self, tables):
+        """
+        Вести журнал изменений таблиц tables
+
+        Временные (TEMP) триггеры существуют только в соединении-писателе и
+        записывают rowid каждой вставленной, измененной или удаленной строки
+        в temp.Change_Log - в той же транзакции, что и само изменение
+        (включая строки, измененные триггерами БД). При коммите журнал
+        забирается и очищается, при откате исчезает вместе с транзакцией.
+        """
+        with QMutexLocker(self.write_mutex):
+            self.writer.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS Change_Log (
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    PRIMARY KEY (table_name, row_id)
+                ) WITHOUT ROWID
+            """)
+            for table in tables:
+                for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                    self.writer.execute(f"""
+                        CREATE TEMP TRIGGER IF NOT EXISTS change_log_{table}_{event.lower()}
+                        AFTER {event} ON main.{table}
+                        BEGIN
+                            INSERT OR IGNORE INTO Change_Log (table_name, row_id)
+                            VALUES ('{table}', {row}.rowid);
+                        END
+                    """)
+            self.writer.commit()
+            self._tracking_changes = True
+
+    def add_change_listener(self, callback):
+        """
+        Подписаться на изменения: callback({таблица: set(rowid)}) вызывается
+        после каждого коммита с изменениями, в потоке, который коммитил,
+        уже без блокировки записи
+        """
+        self._change_listeners.append(callback)
+
+    def _collect_changes(self):
+        """Забрать журнал изменений текущей транзакции (под мьютексом, до коммита)"""
+        if not self._tracking_changes:
+            return None
+        rows = self.writer.execute("SELECT table_name, row_id FROM temp.Change_Log").fetchall()
+        if not rows:
+            return None
+        self.writer.execute("DELETE FROM temp.Change_Log")
+        changes = {}
+        for table, row_id in rows:
+            changes.setdefault(table, set()).add(row_id)
+        return changes
+
+    def _publish_changes(self, changes):
+        if not changes:
+            return
+        for callback in self._change_listeners:
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f" Ошибка обработчика изменений БД: {e}")
+
+    def reader(self):
+        """Получить read-only соединение текущего потока (создается при первом обращении)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+
+        # Задачи QThreadPool теряют thread-local после каждого запуска -
+        # соединение ищется по потоку, чтобы не открывать новое на каждую задачу
+        ident = threading.get_ident()
+        with self._readers_lock:
+            connection = self._readers.get(ident)
+        if connection is None:
+            connection = sqlite3.connect(self._reader_uri, uri=True, check_same_thread=False)
+            connection.execute("PRAGMA busy_timeout=5000")
+            with self._readers_lock:
+                self._readers[ident] = connection
+            QThread.currentThread().finished.connect(
+                lambda: self._release_reader(ident), Qt.ConnectionType.DirectConnection)
+        self._local.connection = connection
+        return connection
+
+    def _release_reader(self, ident):
+        """Закрыть соединение завершившегося потока (вызывается в нем же)"""
+        with self._readers_lock:
+            connection = self._readers.pop(ident, None)
+        if connection is not None:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+    def in_transaction(self):
+        """Открыта ли транзакция в текущем потоке"""
+        return getattr(self._local, 'transaction_depth', 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Единица работы: все записи внутри блока - одна транзакция BEGIN IMMEDIATE … COMMIT
+
+        При исключении транзакция откатывается целиком. Вложенные блоки
+        присоединяются к внешней транзакции.
+
+        Пример:
+            with pool.transaction():
+                pool.execute_update(...)
+                pool.execute_update(...)
+        """
+        changes = None
+        with QMutexLocker(self.write_mutex):
+            if self.in_transaction():
+                self._local.transaction_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._local.transaction_depth -= 1
+                return
+
+            # Завершаем неявную транзакцию модуля sqlite3, если она осталась
+            if self.writer.in_transaction:
+                self.writer.commit()
+            self.writer.execute("BEGIN IMMEDIATE")
+            self._local.transaction_depth = 1
+            try:
+                yield self
+                changes = self._collect_changes()
+            except BaseException:
+                self.writer.rollback()
+                raise
+            else:
+                self.writer.commit()
+            finally:
+                self._local.transaction_depth = 0
+        # Слушатели вызываются после снятия блокировки - им можно писать в БД
+        self._publish_changes(changes)
+
+    def execute_query(self, query, params=()):
+        """Выполнение запроса на чтение через соединение текущего потока"""
+        if self.in_transaction():
+            # Внутри транзакции читаем через писателя (видны свои изменения)
+            cursor = self.writer.cursor()
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+        cursor = self.reader().cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def execute_update(self, query, params=()):
+        """Выполнение запроса на запись через единственное соединение-писатель"""
+        with QMutexLocker(self.write_mutex):
+            cursor = self.writer.cursor()
+            cursor.execute(query, params)
+            if self.in_transaction():
+                return cursor.lastrowid
+            changes = self._collect_changes()
+            self.writer.commit()
+            lastrowid = cursor.lastrowid
+        self._publish_changes(changes)
+        return lastrowid
+
+    def reader_count(self):
+        """Количество открытых read-only соединений"""
+        with self._readers_lock:
+            return len(self._readers)
+
+    def close(self):
+        """Закрыть все соединения пула"""
+        with self._readers_lock:
+            for connection in self._readers.values():
+                try:
+                    connection.close()
+                except sqlite3.Error:
+                    pass
+            self._readers.clear()
+        self._local = threading.local()
+
+        with QMutexLocker(self.write_mutex):
+            self.writer.close()
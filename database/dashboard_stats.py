@@ -0,0 +1,113 @@
+from collections import namedtuple
+from datetime import date
+
+DashboardSnapshot = namedtuple('DashboardSnapshot', [
+    'total_assets', 'available_assets', 'issued_assets',
+    'overdue_assets', 'total_employees', 'total_operations',
+])
+
+# Assets и Active_Loans читаются по одному разу, остальное - COUNT по индексам
+STATS_QUERY = """
+    SELECT
+        a.total_assets,
+        a.available_assets,
+        l.issued_assets,
+        l.overdue_assets,
+        (SELECT COUNT(*) FROM Employees),
+        (SELECT COUNT(*) FROM Usage_History {operations_filter})
+    FROM (
+        SELECT COUNT(*) AS total_assets,
+               COALESCE(SUM(current_status = 'Доступен'), 0) AS available_assets
+        FROM Assets
+    ) a, (
+        SELECT COUNT(*) AS issued_assets,
+               COALESCE(SUM(planned_return_date < DATE('now', 'localtime')), 0) AS overdue_assets
+        FROM Active_Loans {loans_filter}
+    ) l
+"""
+
+ADMIN_STATS_QUERY = STATS_QUERY.format(operations_filter="", loans_filter="")
+EMPLOYEE_STATS_QUERY = STATS_QUERY.format(
+    operations_filter="WHERE employee_id = :employee_id",
+    loans_filter="WHERE employee_id = :employee_id",
+)
+
+
+class DashboardStats:
+    """
+    Счетчики панели управления
+
+    Все счетчики (по всей системе для админа или по одному сотруднику)
+    считаются одним агрегатным запросом. Снимок кэшируется и пересчитывается,
+    только если изменились данные: версия - это PRAGMA data_version
+    read-only соединения потока GUI (меняется при любом коммите другого
+    соединения, в том числе из другого процесса) плюс текущая дата,
+    от которой зависят просрочки.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._snapshots = {}  # employee_id (None - админ) -> (версия, снимок)
+
+    def version(self):
+        """Версия данных для кэша (вызывать из потока GUI)"""
+        data_version = self.pool.reader().execute("PRAGMA data_version").fetchone()[0]
+        # Просрочки считаются по местной дате - DATE('now', 'localtime'), как у DeadlineScheduler
+        return data_version, date.today().isoformat()
+
+    def cached(self, employee_id=None):
+        """Снимок из кэша, если с момента расчета данные не менялись, иначе None"""
+        snapshot = self._snapshots.get(employee_id)
+        if snapshot and snapshot[0] == self.version():
+            return snapshot[1]
+        return None
+
+    def store(self, employee_id, version, snapshot):
+        """Запомнить снимок, посчитанный для версии version"""
+        self._snapshots[employee_id] = (version, snapshot)
+
+    def invalidate(self):
+        """Сбросить кэш"""
+        self._snapshots.clear()
+
+    @staticmethod
+    def compute(connection, employee_id=None):
+        """
+        Посчитать счетчики одним запросом (можно вызывать из любого потока)
+
+        Args:
+            connection: sqlite3-соединение
+            employee_id: сотрудник для персональной статистики; None - по всей системе
+
+        Returns:
+            DashboardSnapshot
+        """
+        if employee_id is None:
+            row = connection.execute(ADMIN_STATS_QUERY).fetchone()
+        else:
+            row = connection.execute(EMPLOYEE_STATS_QUERY, {'employee_id': employee_id}).fetchone()
+        return DashboardSnapshot(*row)
+
+    def load(self, query_service, employee_id, on_result, on_error=None):
+        """
+        Передать счетчики в on_result: сразу из кэша, если данные не менялись,
+        иначе после пересчета в фоне через QueryService
+
+        Returns:
+            bool: True, если снимок взят из кэша
+        """
+        snapshot = self.cached(employee_id)
+        if snapshot is not None:
+            on_result(snapshot)
+            return True
+
+        # Версию берем до расчета: изменения во время расчета дадут новую версию
+        version = self.version()
+
+        def apply(snapshot):
+            self.store(employee_id, version, snapshot)
+            on_result(snapshot)
+
+        query_service.submit('dashboard', lambda connection: self.compute(connection, employee_id),
+                             apply, on_error)
+        return False
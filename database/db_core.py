@@ -1,6 +1,8 @@
 import sqlite3
 import os
 from datetime import datetime
+from database.migrations import apply_migrations
+from database.normalize import connect, insert_missing, name_key, serial_key
 
 
 class Database:
@@ -10,116 +12,16 @@ class Database:
 
     def get_connection(self):
         """Создание соединения с базой данных"""
-        return sqlite3.connect(self.db_path)
+        # С name_key() и serial_key() для триггеров нормализованных ключей
+        return connect(self.db_path)
 
     def init_db(self):
         """Инициализация базы данных и создание таблиц"""
         conn = self.get_connection()
+        # Схема создается/обновляется версионированными миграциями
+        apply_migrations(conn)
         cursor = conn.cursor()
 
-        # Таблица должностей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Positions (
-                position_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                position_name VARCHAR(100) NOT NULL UNIQUE
-            )
-        ''')
-
-        # Таблица сотрудников
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Employees (
-                employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                last_name VARCHAR(100) NOT NULL,
-                first_name VARCHAR(100) NOT NULL,
-                patronymic VARCHAR(100),
-                position_id INTEGER,
-                phone VARCHAR(20),
-                email VARCHAR(100),
-                FOREIGN KEY (position_id) REFERENCES Positions(position_id)
-            )
-        ''')
-
-        # Таблица типов активов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Asset_Types (
-                type_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type_name VARCHAR(50) NOT NULL UNIQUE
-            )
-        ''')
-
-        # Таблица местоположений - ДОБАВИЛИ ПОЛЕ is_custom
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Locations (
-                location_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                location_name VARCHAR(100) NOT NULL UNIQUE,
-                is_custom BOOLEAN DEFAULT 0
-            )
-        ''')
-
-        # Таблица активов (инструменты и расходники)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Assets (
-                asset_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name VARCHAR(200) NOT NULL,
-                type_id INTEGER NOT NULL,
-                model VARCHAR(100) NOT NULL,
-                serial_number VARCHAR(100),
-                current_status VARCHAR(20) DEFAULT 'Доступен',
-                location_id INTEGER NOT NULL,
-                quantity INTEGER DEFAULT 1,
-                FOREIGN KEY (type_id) REFERENCES Asset_Types(type_id),
-                FOREIGN KEY (location_id) REFERENCES Locations(location_id)
-            )
-        ''')
-
-        # Таблица истории использования
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Usage_History (
-                history_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                asset_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                operation_type VARCHAR(20) NOT NULL,
-                operation_date DATETIME NOT NULL,
-                planned_return_date DATE,
-                actual_return_date DATE,
-                notes TEXT,
-                FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
-                FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
-            )
-        ''')
-
-        # Таблица учетных записей пользователей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Users (
-                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username VARCHAR(50) NOT NULL UNIQUE,
-                password VARCHAR(255) NOT NULL,
-                employee_id INTEGER,
-                role VARCHAR(20) DEFAULT 'user',
-                is_active BOOLEAN DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
-            )
-        ''')
-
-        # Таблица запросов на выдачу активов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Asset_Requests (
-                request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                asset_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                request_date DATETIME NOT NULL,
-                planned_return_date DATE,
-                notes TEXT,
-                status VARCHAR(20) DEFAULT 'pending',
-                approved_by INTEGER,
-                approved_at DATETIME,
-                FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
-                FOREIGN KEY (employee_id) REFERENCES Employees(employee_id),
-                FOREIGN KEY (approved_by) REFERENCES Users(user_id)
-            )
-        ''')
-
         # Наполняем справочники тестовыми данными
         self._populate_test_data(cursor)
         
@@ -148,7 +50,9 @@ class Database:
             ('Измерительный прибор',),
             ('Электроинструмент',)
         ]
-        cursor.executemany('INSERT OR IGNORE INTO Asset_Types (type_name) VALUES (?)', asset_types)
+        insert_missing(cursor, "SELECT 1 FROM Asset_Types WHERE type_key = ?",
+                             "INSERT INTO Asset_Types (type_name) VALUES (?)",
+                             asset_types, lambda row: (name_key(row[0]),))
 
         # Местоположения - стандартные без пометки custom
         locations = [
@@ -157,7 +61,9 @@ class Database:
             ('Лаборатория', 0),
             ('Мастерская', 0)
         ]
-        cursor.executemany('INSERT OR IGNORE INTO Locations (location_name, is_custom) VALUES (?, ?)', locations)
+        insert_missing(cursor, "SELECT 1 FROM Locations WHERE location_key = ?",
+                             "INSERT INTO Locations (location_name, is_custom) VALUES (?, ?)",
+                             locations, lambda row: (name_key(row[0]),))
 
         # Сотрудники
         employees = [
@@ -165,11 +71,11 @@ class Database:
             ('Петров', 'Петр', 'Петрович', 2, '+79990000002', 'petrov@company.ru'),
             ('Сидорова', 'Мария', 'Сергеевна', 3, '+79990000003', 'sidorova@company.ru'),
         ]
-        cursor.executemany('''
-            INSERT OR IGNORE INTO Employees 
-            (last_name, first_name, patronymic, position_id, phone, email) 
+        insert_missing(cursor, "SELECT 1 FROM Employees WHERE name_key = ?", '''
+            INSERT INTO Employees
+            (last_name, first_name, patronymic, position_id, phone, email)
             VALUES (?, ?, ?, ?, ?, ?)
-        ''', employees)
+        ''', employees, lambda row: (name_key(' '.join(row[:3])),))
 
         # Тестовые активы
         assets = [
@@ -178,11 +84,11 @@ class Database:
             ('Перчатки защитные', 2, 'Premium', None, 'Доступен', 1, 10),
             ('Молоток', 1, 'Профессиональный', None, 'Доступен', 1, 2),
         ]
-        cursor.executemany('''
-            INSERT OR IGNORE INTO Assets 
-            (name, type_id, model, serial_number, current_status, location_id, quantity) 
+        insert_missing(cursor, "SELECT 1 FROM Assets WHERE name_key = ? OR serial_key = ?", '''
+            INSERT INTO Assets
+            (name, type_id, model, serial_number, current_status, location_id, quantity)
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', assets)
+        ''', assets, lambda row: (name_key(row[0]), serial_key(row[3])))
 
     def add_custom_location(self, location_name):
         """Добавление пользовательского местоположения"""
@@ -202,8 +108,8 @@ class Database:
             conn.close()
             return location_id
         except sqlite3.IntegrityError:
-            # Если такое имя уже существует, вернем его ID
-            cursor.execute("SELECT location_id FROM Locations WHERE location_name = ?", (custom_name,))
+            # Если такое имя (в любом написании) уже существует, вернем его ID
+            cursor.execute("SELECT location_id FROM Locations WHERE location_key = ?", (name_key(custom_name),))
             result = cursor.fetchone()
             conn.close()
             return result[0] if result else None
\ No newline at end of file
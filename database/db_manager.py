@@ -1,7 +1,12 @@
-import sqlite3
 import os
 import sys
 from PyQt6.QtCore import QMutex, QMutexLocker
+from database.change_bus import ChangeBus
+from database import loans
+from database.connection_pool import ConnectionPool
+from database.lookup import ACCOUNT_QUERY, AVAILABLE_ASSET_QUERY, EMPLOYEE_QUERY, USER_QUERY, LookupSource
+from database.migrations import apply_migrations
+from database.normalize import insert_missing, name_key, serial_key
 
 
 class DatabaseManager:
@@ -56,8 +61,9 @@ class DatabaseManager:
         
         print(f"📁 Путь к БД: {db_path}")
 
-        self.connection = sqlite3.connect(db_path, check_same_thread=False)
-        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Писатель + read-only соединения по одному на поток (WAL)
+        self.pool = ConnectionPool(db_path)
+        self.connection = self.pool.writer
 
         self._create_tables()
 
@@ -73,114 +79,26 @@ class DatabaseManager:
         else:
             print(" Подключение к существующей базе данных")
 
-    def _create_tables(self):
-        """Создание таблиц (если они не существуют)"""
-        cursor = self.connection.cursor()
+        # Публикация изменений (какие строки каких таблиц изменил коммит)
+        self.change_bus = ChangeBus(self.pool)
+
+        # Поля выбора с поиском в диалогах - общие источники с кэшем ответов
+        self.employee_lookup = LookupSource(
+            self.pool, EMPLOYEE_QUERY, 'e.name_key', 'e.employee_id', ['Employees'])
+        self.account_lookup = LookupSource(
+            self.pool, ACCOUNT_QUERY, 'e.name_key', 'e.employee_id', ['Employees', 'Users'])
+        self.available_asset_lookup = LookupSource(
+            self.pool, AVAILABLE_ASSET_QUERY, 'a.name_key', 'a.asset_id', ['Assets'])
+        self.user_lookup = LookupSource(
+            self.pool, USER_QUERY, 'u.username_key', 'u.user_id', ['Users'])
+        self.lookups = (self.employee_lookup, self.account_lookup, self.available_asset_lookup, self.user_lookup)
+        for source in self.lookups:
+            self.change_bus.changed.connect(source.invalidate)
 
-        # Таблица должностей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Positions (
-                position_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                position_name VARCHAR(100) NOT NULL UNIQUE
-            )
-        ''')
-
-        # Таблица сотрудников
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Employees (
-                employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                last_name VARCHAR(100) NOT NULL,
-                first_name VARCHAR(100) NOT NULL,
-                patronymic VARCHAR(100),
-                position_id INTEGER,
-                phone VARCHAR(20),
-                email VARCHAR(100),
-                FOREIGN KEY (position_id) REFERENCES Positions(position_id)
-            )
-        ''')
-
-        # Таблица типов активов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Asset_Types (
-                type_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type_name VARCHAR(50) NOT NULL UNIQUE
-            )
-        ''')
-
-        # Таблица местоположений
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Locations (
-                location_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                location_name VARCHAR(100) NOT NULL UNIQUE,
-                is_custom BOOLEAN DEFAULT 0
-            )
-        ''')
-
-        # Таблица активов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Assets (
-                asset_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name VARCHAR(200) NOT NULL,
-                type_id INTEGER NOT NULL,
-                model VARCHAR(100) NOT NULL,
-                serial_number VARCHAR(100),
-                current_status VARCHAR(20) DEFAULT 'Доступен',
-                location_id INTEGER NOT NULL,
-                quantity INTEGER DEFAULT 1,
-                FOREIGN KEY (type_id) REFERENCES Asset_Types(type_id),
-                FOREIGN KEY (location_id) REFERENCES Locations(location_id)
-            )
-        ''')
-
-        # Таблица истории использования
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Usage_History (
-                history_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                asset_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                operation_type VARCHAR(20) NOT NULL,
-                operation_date DATETIME NOT NULL,
-                planned_return_date DATE,
-                actual_return_date DATE,
-                notes TEXT,
-                FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
-                FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
-            )
-        ''')
-
-        # Таблица учетных записей пользователей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Users (
-                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username VARCHAR(50) NOT NULL UNIQUE,
-                password VARCHAR(255) NOT NULL,
-                employee_id INTEGER,
-                role VARCHAR(20) DEFAULT 'user',
-                is_active BOOLEAN DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
-            )
-        ''')
-
-        # Таблица запросов на выдачу активов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Asset_Requests (
-                request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                asset_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                request_date DATETIME NOT NULL,
-                planned_return_date DATE,
-                notes TEXT,
-                status VARCHAR(20) DEFAULT 'pending',
-                approved_by INTEGER,
-                approved_at DATETIME,
-                FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
-                FOREIGN KEY (employee_id) REFERENCES Employees(employee_id),
-                FOREIGN KEY (approved_by) REFERENCES Users(user_id)
-            )
-        ''')
-
-        self.connection.commit()
+    def _create_tables(self):
+        """Создание/обновление схемы через версионированные миграции (PRAGMA user_version)"""
+        version = apply_migrations(self.connection)
+        print(f"Версия схемы БД: {version}")
 
     def _populate_test_data(self):
         """Заполнение тестовыми данными (только для новой базы)"""
@@ -194,7 +112,9 @@ class DatabaseManager:
 
             # Типы активов
             asset_types = [('Инструмент',), ('Расходник',), ('Измерительный прибор',), ('Электроинструмент',)]
-            cursor.executemany('INSERT OR IGNORE INTO Asset_Types (type_name) VALUES (?)', asset_types)
+            insert_missing(cursor, "SELECT 1 FROM Asset_Types WHERE type_key = ?",
+                           "INSERT INTO Asset_Types (type_name) VALUES (?)",
+                           asset_types, lambda row: (name_key(row[0]),))
 
             # Местоположения - стандартные без пометки custom
             locations = [
@@ -203,7 +123,9 @@ class DatabaseManager:
                 ('Лаборатория', 0),
                 ('Мастерская', 0)
             ]
-            cursor.executemany('INSERT OR IGNORE INTO Locations (location_name, is_custom) VALUES (?, ?)', locations)
+            insert_missing(cursor, "SELECT 1 FROM Locations WHERE location_key = ?",
+                           "INSERT INTO Locations (location_name, is_custom) VALUES (?, ?)",
+                           locations, lambda row: (name_key(row[0]),))
 
             # Сотрудники (только если их нет)
             cursor.execute("SELECT COUNT(*) FROM Employees")
@@ -242,20 +164,53 @@ class DatabaseManager:
             self.connection.rollback()
 
     def execute_query(self, query, params=()):
-        """Выполнение запроса с возвратом результата"""
-        with QMutexLocker(self._mutex):
-            cursor = self.connection.cursor()
-            cursor.execute(query, params)
-            result = cursor.fetchall()
-            return result
+        """Выполнение запроса с возвратом результата (read-only соединение потока, без блокировки)"""
+        return self.pool.execute_query(query, params)
 
     def execute_update(self, query, params=()):
-        """Выполнение запроса на обновление"""
-        with QMutexLocker(self._mutex):
-            cursor = self.connection.cursor()
-            cursor.execute(query, params)
-            self.connection.commit()
-            return cursor.lastrowid
+        """Выполнение запроса на обновление (сериализуется на соединении-писателе)"""
+        return self.pool.execute_update(query, params)
+
+    def transaction(self):
+        """
+        Единица работы для операций из нескольких запросов
+
+        Все execute_update внутри блока фиксируются одним COMMIT
+        (BEGIN IMMEDIATE … COMMIT), при ошибке откатываются целиком:
+
+            with db.transaction():
+                db.execute_update(...)
+                db.execute_update(...)
+        """
+        return self.pool.transaction()
+
+    def find_location(self, name):
+        """
+        Местоположение с тем же нормализованным названием (без учета регистра,
+        пробелов и знаков препинания) - (location_id, location_name) или None
+        """
+        rows = self.execute_query(
+            "SELECT location_id, location_name FROM Locations WHERE location_key = ?", (name_key(name),))
+        return rows[0] if rows else None
+
+    def find_asset_by_serial(self, serial_number, exclude_asset_id=None):
+        """
+        Актив с тем же серийным номером (без учета регистра, пробелов и
+        дефисов) - (asset_id, name) или None; exclude_asset_id - сам редактируемый актив
+        """
+        rows = self.execute_query(
+            "SELECT asset_id, name FROM Assets WHERE serial_key = ? AND asset_id IS NOT ?",
+            (serial_key(serial_number), exclude_asset_id))
+        return rows[0] if rows else None
+
+    def get_or_create_location(self, name):
+        """ID существующего местоположения name или нового, с отметкой * как пользовательского"""
+        # Внутри операции присоединяется к ее транзакции; чтение - через писателя
+        with self.transaction():
+            existing = self.find_location(name)
+            if existing:
+                return existing[0]
+            return self.execute_update("INSERT INTO Locations (location_name) VALUES (?)", (f"{name} *",))
 
     def get_table_row_count(self, table_name):
         """Получение количества строк в таблице"""
@@ -264,56 +219,20 @@ class DatabaseManager:
     
     def update_asset_status(self, asset_id):
         """
-        Обновить статус актива на основе активных выдач
-        
-        Логика:
-        - 'Выдан' - если есть хотя бы одна активная выдача (operation_type='выдача' AND actual_return_date IS NULL)
-        - 'Доступен' - если нет активных выдач И quantity > 0
-        
-        Args:
-            asset_id: ID актива для обновления статуса
+        Обновить статус актива на основе активных выдач:
+        'Выдан' при активной выдаче, иначе 'Доступен'
         """
-        with QMutexLocker(self._mutex):
-            cursor = self.connection.cursor()
-            
-            # Проверяем наличие активных выдач
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM Usage_History 
-                WHERE asset_id = ? 
-                  AND operation_type = 'выдача' 
-                  AND actual_return_date IS NULL
-            """, (asset_id,))
-            
-            active_issues = cursor.fetchone()[0]
-            
-            # Получаем текущее количество
-            cursor.execute("SELECT quantity FROM Assets WHERE asset_id = ?", (asset_id,))
-            result = cursor.fetchone()
-            
-            if not result:
-                return  # Актив не найден
-            
-            quantity = result[0]
-            
-            # Определяем правильный статус
-            if active_issues > 0:
-                new_status = 'Выдан'
-            elif quantity > 0:
-                new_status = 'Доступен'
-            else:
-                new_status = 'Доступен'  # Или можно оставить как есть
-            
-            # Обновляем статус
-            cursor.execute(
-                "UPDATE Assets SET current_status = ? WHERE asset_id = ?",
-                (new_status, asset_id)
-            )
-            self.connection.commit()
-            
-            print(f"Статус актива {asset_id} обновлен: {new_status} (активных выдач: {active_issues}, кол-во: {quantity})")
+        loans.update_asset_status(self.pool, asset_id)
+
+    def issue_asset(self, asset_id, employee_id, quantity, operation_date, planned_return):
+        """Выдача актива сотруднику одной транзакцией - остаток на складе после выдачи"""
+        return loans.issue_asset(self.pool, asset_id, employee_id, quantity, operation_date, planned_return)
+
+    def return_asset(self, asset_id, employee_id, operation_date, return_date, notes=None):
+        """Возврат открытых выдач актива одной транзакцией - (возвращено, остаток на складе)"""
+        return loans.return_asset(self.pool, asset_id, employee_id, operation_date, return_date, notes)
 
     def close(self):
         """Закрытие соединения с базой данных"""
-        if hasattr(self, 'connection') and self.connection:
-            self.connection.close()
\ No newline at end of file
+        if hasattr(self, 'pool') and self.pool:
+            self.pool.close()
\ No newline at end of file
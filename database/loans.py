@@ -0,0 +1,126 @@
+"""
+Операции выдачи и возврата актива
+
+Общий код IssueDialog/ReturnDialog: списание или возврат на склад, запись в
+Usage_History и пересчет статуса актива выполняются одной транзакцией пула.
+"""
+
+
+def update_asset_status(pool, asset_id):
+    """
+    Обновить статус актива на основе активных выдач
+
+    Логика:
+    - 'Выдан' - если есть хотя бы одна активная выдача (строка в Active_Loans)
+    - 'Доступен' - если нет активных выдач
+
+    Args:
+        pool: ConnectionPool
+        asset_id: ID актива для обновления статуса
+    """
+    # Внутри операции выдачи/возврата присоединяется к ее транзакции
+    with pool.transaction():
+        active_issues = pool.execute_query(
+            "SELECT COUNT(*) FROM Active_Loans WHERE asset_id = ?", (asset_id,)
+        )[0][0]
+
+        result = pool.execute_query("SELECT quantity FROM Assets WHERE asset_id = ?", (asset_id,))
+        if not result:
+            return  # Актив не найден
+        quantity = result[0][0]
+
+        new_status = 'Выдан' if active_issues > 0 else 'Доступен'
+        pool.execute_update(
+            "UPDATE Assets SET current_status = ? WHERE asset_id = ?",
+            (new_status, asset_id)
+        )
+
+        print(f"Статус актива {asset_id} обновлен: {new_status} (активных выдач: {active_issues}, кол-во: {quantity})")
+
+
+def issue_asset(pool, asset_id, employee_id, quantity, operation_date, planned_return):
+    """
+    Выдача актива сотруднику
+
+    Args:
+        operation_date: дата и время операции ('yyyy-MM-dd hh:mm:ss')
+        planned_return: плановая дата возврата ('yyyy-MM-dd')
+
+    Returns:
+        Остаток на складе после выдачи
+
+    Raises:
+        ValueError: на складе меньше quantity (остаток мог измениться после открытия диалога)
+    """
+    # Списание со склада, запись в историю и статус - одна транзакция
+    with pool.transaction():
+        current_qty = pool.execute_query(
+            "SELECT quantity FROM Assets WHERE asset_id = ?", (asset_id,))[0][0]
+        if quantity > current_qty:
+            raise ValueError(f"на складе осталось только {current_qty} шт.")
+
+        pool.execute_update(
+            "UPDATE Assets SET quantity = quantity - ? WHERE asset_id = ?",
+            (quantity, asset_id)
+        )
+
+        notes = f"Кол-во выданных: {quantity} шт."
+        pool.execute_update('''
+            INSERT INTO Usage_History
+            (asset_id, employee_id, operation_type, operation_date, planned_return_date, quantity, notes)
+            VALUES (?, ?, 'выдача', ?, ?, ?, ?)
+        ''', (asset_id, employee_id, operation_date, planned_return, quantity, notes))
+
+        update_asset_status(pool, asset_id)
+    return current_qty - quantity
+
+
+def return_asset(pool, asset_id, employee_id, operation_date, return_date, notes=None):
+    """
+    Возврат всех открытых выдач актива сотрудником
+
+    Args:
+        operation_date: дата и время операции ('yyyy-MM-dd hh:mm:ss')
+        return_date: дата фактического возврата ('yyyy-MM-dd')
+        notes: примечание к возврату или None
+
+    Returns:
+        (возвращенное количество, остаток на складе после возврата)
+    """
+    # Возврат на склад, закрытие выдачи и запись о возврате - одна транзакция
+    with pool.transaction():
+        asset_data = pool.execute_query(
+            "SELECT quantity FROM Assets WHERE asset_id = ?", (asset_id,))
+        current_quantity = asset_data[0][0] if asset_data else 0
+
+        # Возвращаются все открытые выдачи актива сотруднику - сколько всего выдано
+        quantity_issued = pool.execute_query('''
+            SELECT COALESCE(SUM(quantity), 0) FROM Active_Loans
+            WHERE asset_id = ? AND employee_id = ?
+        ''', (asset_id, employee_id))[0][0]
+
+        pool.execute_update(
+            "UPDATE Assets SET quantity = quantity + ? WHERE asset_id = ?",
+            (quantity_issued, asset_id)
+        )
+
+        # Отмечаем дату фактического возврата у открытых выдач
+        pool.execute_update('''
+            UPDATE Usage_History
+            SET actual_return_date = ?, notes = ?
+            WHERE asset_id = ?
+              AND employee_id = ?
+              AND operation_type = 'выдача'
+              AND actual_return_date IS NULL
+        ''', (return_date, notes, asset_id, employee_id))
+
+        update_asset_status(pool, asset_id)
+
+        # НОВАЯ запись операции возврата в историю
+        return_notes = f"Возврат актива (Кол-во: {quantity_issued} шт.){'. ' + notes if notes else ''}"
+        pool.execute_update('''
+            INSERT INTO Usage_History
+            (asset_id, employee_id, operation_type, operation_date, quantity, notes)
+            VALUES (?, ?, 'возврат', ?, ?, ?)
+        ''', (asset_id, employee_id, operation_date, quantity_issued, return_notes))
+    return quantity_issued, current_quantity + quantity_issued
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+
+from database.normalize import name_key
+
+# Верхняя граница диапазона префикса: ключ >= префикс AND ключ < префикс + PREFIX_END
+PREFIX_END = '\U0010ffff'
+
+# Запросы источников: {where} - условие поиска или выбора по ID,
+# возвращают (id, текст для списка)
+EMPLOYEE_QUERY = """
+    SELECT e.employee_id,
+           e.last_name || ' ' || e.first_name || COALESCE(' ' || e.patronymic, '')
+               || COALESCE(' (' || e.email || ')', '')
+    FROM Employees e
+    WHERE {where}
+    ORDER BY e.name_key
+    LIMIT :limit
+"""
+
+# Регистрация: у сотрудника, для которого уже есть аккаунт, показывается username
+ACCOUNT_QUERY = """
+    SELECT e.employee_id,
+           e.last_name || ' ' || e.first_name || COALESCE(' ' || e.patronymic, '')
+               || COALESCE(' (' || u.username || ')', '')
+    FROM Employees e
+    LEFT JOIN Users u ON u.employee_id = e.employee_id
+    WHERE {where}
+    ORDER BY e.name_key
+    LIMIT :limit
+"""
+
+# Учетные записи (фильтр журнала аудита)
+USER_QUERY = """
+    SELECT u.user_id, u.username
+    FROM Users u
+    WHERE {where}
+    ORDER BY u.username_key
+    LIMIT :limit
+"""
+
+# Выдача: только доступные активы, с остатком на складе
+AVAILABLE_ASSET_QUERY = """
+    SELECT a.asset_id, a.name || ' (' || a.model || ') - ' || a.quantity || ' шт.'
+    FROM Assets a
+    WHERE {where} AND a.current_status = 'Доступен'
+    ORDER BY a.name_key
+    LIMIT :limit
+"""
+
+
+class LookupSource:
+    """
+    Варианты для поля выбора с поиском (views/entity_picker.py)
+
+    Вместо загрузки всей таблицы - первые limit строк, нормализованный ключ
+    которых (name_key, миграции 10 и 12) начинается с введенного текста:
+    диапазон по индексу ключа, время не зависит от размера таблицы.
+    Последние CACHE_SIZE ответов держатся в памяти (повторный ввод, следующий
+    диалог); кэш сбрасывается изменением любой из таблиц tables (ChangeBus).
+    """
+
+    CACHE_SIZE = 32
+
+    def __init__(self, pool, query, key_column, id_column, tables):
+        """
+        Args:
+            pool: ConnectionPool
+            query: SELECT id, текст ... с {where} и параметром :limit
+            key_column: столбец нормализованного ключа (с индексом)
+            id_column: столбец ID для get()
+            tables: таблицы, от которых зависит текст вариантов
+        """
+        self.pool = pool
+        self.tables = frozenset(tables)
+        self._search_query = query.format(where=f"{key_column} >= :low AND {key_column} < :high")
+        self._get_query = query.format(where=f"{id_column} = :id")
+        self._cache = OrderedDict()
+
+    def find(self, text, limit):
+        """
+        Варианты, начинающиеся с text (без учета регистра, «ё» и знаков)
+
+        Returns:
+            list[(id, текст)]: не больше limit, по алфавиту; пустой text - первые по алфавиту
+        """
+        prefix = name_key(text) or ''
+        cache_key = (prefix, limit)
+        # Ссылка на словарь: invalidate() из другого потока подменяет его целиком
+        cache = self._cache
+        rows = cache.get(cache_key)
+        if rows is not None:
+            cache.move_to_end(cache_key)
+            return rows
+
+        rows = self.pool.execute_query(
+            self._search_query, {'low': prefix, 'high': prefix + PREFIX_END, 'limit': limit})
+        cache[cache_key] = rows
+        while len(cache) > self.CACHE_SIZE:
+            cache.popitem(last=False)
+        return rows
+
+    def get(self, entity_id):
+        """(id, текст) выбранной записи или None - для предвыбора без поиска"""
+        rows = self.pool.execute_query(self._get_query, {'id': entity_id, 'limit': 1})
+        return rows[0] if rows else None
+
+    def invalidate(self, changes):
+        """Сбросить кэш, если изменилась одна из таблиц источника ({таблица: set(rowid)}; None - все)"""
+        if changes is None or not self.tables.isdisjoint(changes):
+            self._cache = OrderedDict()
@@ -0,0 +1,653 @@
+"""
+Версионированные миграции схемы базы данных
+
+Текущая версия схемы хранится в PRAGMA user_version. При запуске
+применяются только миграции с номером больше текущего, каждая в своей
+транзакции вместе с обновлением user_version. Новые изменения схемы
+добавляются ТОЛЬКО новой миграцией в конец списка MIGRATIONS —
+уже выпущенные миграции не редактируются.
+"""
+import re
+
+from database.normalize import register_functions
+
+# Условие «открытой» выдачи - частичные индексы применяются планировщиком,
+# только если WHERE запроса содержит ровно эти же условия
+OPEN_ISSUE_CONDITION = "operation_type = 'выдача' AND actual_return_date IS NULL"
+
+
+BASE_SCHEMA = [
+    # Таблица должностей
+    '''
+    CREATE TABLE IF NOT EXISTS Positions (
+        position_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        position_name VARCHAR(100) NOT NULL UNIQUE
+    )
+    ''',
+    # Таблица сотрудников
+    '''
+    CREATE TABLE IF NOT EXISTS Employees (
+        employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        last_name VARCHAR(100) NOT NULL,
+        first_name VARCHAR(100) NOT NULL,
+        patronymic VARCHAR(100),
+        position_id INTEGER,
+        phone VARCHAR(20),
+        email VARCHAR(100),
+        FOREIGN KEY (position_id) REFERENCES Positions(position_id)
+    )
+    ''',
+    # Таблица типов активов
+    '''
+    CREATE TABLE IF NOT EXISTS Asset_Types (
+        type_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type_name VARCHAR(50) NOT NULL UNIQUE
+    )
+    ''',
+    # Таблица местоположений
+    '''
+    CREATE TABLE IF NOT EXISTS Locations (
+        location_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        location_name VARCHAR(100) NOT NULL UNIQUE,
+        is_custom BOOLEAN DEFAULT 0
+    )
+    ''',
+    # Таблица активов (инструменты и расходники)
+    '''
+    CREATE TABLE IF NOT EXISTS Assets (
+        asset_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(200) NOT NULL,
+        type_id INTEGER NOT NULL,
+        model VARCHAR(100) NOT NULL,
+        serial_number VARCHAR(100),
+        current_status VARCHAR(20) DEFAULT 'Доступен',
+        location_id INTEGER NOT NULL,
+        quantity INTEGER DEFAULT 1,
+        FOREIGN KEY (type_id) REFERENCES Asset_Types(type_id),
+        FOREIGN KEY (location_id) REFERENCES Locations(location_id)
+    )
+    ''',
+    # Таблица истории использования
+    '''
+    CREATE TABLE IF NOT EXISTS Usage_History (
+        history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        asset_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        operation_type VARCHAR(20) NOT NULL,
+        operation_date DATETIME NOT NULL,
+        planned_return_date DATE,
+        actual_return_date DATE,
+        notes TEXT,
+        FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
+        FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
+    )
+    ''',
+    # Таблица учетных записей пользователей
+    '''
+    CREATE TABLE IF NOT EXISTS Users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(50) NOT NULL UNIQUE,
+        password VARCHAR(255) NOT NULL,
+        employee_id INTEGER,
+        role VARCHAR(20) DEFAULT 'user',
+        is_active BOOLEAN DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
+    )
+    ''',
+    # Таблица запросов на выдачу активов
+    '''
+    CREATE TABLE IF NOT EXISTS Asset_Requests (
+        request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        asset_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        request_date DATETIME NOT NULL,
+        planned_return_date DATE,
+        notes TEXT,
+        status VARCHAR(20) DEFAULT 'pending',
+        approved_by INTEGER,
+        approved_at DATETIME,
+        FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
+        FOREIGN KEY (employee_id) REFERENCES Employees(employee_id),
+        FOREIGN KEY (approved_by) REFERENCES Users(user_id)
+    )
+    ''',
+]
+
+
+USAGE_INDEXES = [
+    # Открытые выдачи по активу: пересчет статуса, возврат
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_usage_open_asset
+    ON Usage_History(asset_id, employee_id)
+    WHERE {OPEN_ISSUE_CONDITION}
+    ''',
+    # Открытые выдачи сотрудника по сроку: диалог возврата, уведомления
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_usage_open_employee
+    ON Usage_History(employee_id, planned_return_date)
+    WHERE {OPEN_ISSUE_CONDITION}
+    ''',
+    # Открытые выдачи по сроку возврата: просрочки, дашборд
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_usage_open_due
+    ON Usage_History(planned_return_date)
+    WHERE {OPEN_ISSUE_CONDITION}
+    ''',
+    # История операций по дате (вкладка "Операции", последние операции)
+    '''
+    CREATE INDEX IF NOT EXISTS idx_usage_operation_date
+    ON Usage_History(operation_date)
+    ''',
+    # История конкретного сотрудника по дате
+    '''
+    CREATE INDEX IF NOT EXISTS idx_usage_employee_date
+    ON Usage_History(employee_id, operation_date)
+    ''',
+    # Запросы на выдачу по статусу
+    '''
+    CREATE INDEX IF NOT EXISTS idx_requests_status
+    ON Asset_Requests(status, request_date)
+    ''',
+]
+
+
+# До версии 4 количество хранилось только текстом в примечаниях
+# ("Кол-во выданных: N шт.", "Возврат актива (Кол-во: N шт.)", "Списано: N шт."),
+# по умолчанию - 1 шт.
+def note_quantity_sql(notes, marker):
+    """SQL-выражение числа после метки marker в столбце примечаний notes"""
+    return f"""
+        CASE WHEN INSTR({notes}, '{marker}') > 0
+             THEN COALESCE(NULLIF(CAST(TRIM(SUBSTR({notes}, INSTR({notes}, '{marker}') + {len(marker)})) AS INTEGER), 0), 1)
+             ELSE 1
+        END"""
+
+
+def issued_quantity_sql(notes):
+    """SQL-выражение количества выданных единиц по столбцу примечаний notes"""
+    return note_quantity_sql(notes, 'Кол-во выданных:')
+
+
+def _insert_active_loan(row):
+    return f"""
+        INSERT OR REPLACE INTO Active_Loans (history_id, asset_id, employee_id, quantity, planned_return_date)
+        SELECT {row}.history_id, {row}.asset_id, {row}.employee_id,
+               {issued_quantity_sql(row + '.notes')}, {row}.planned_return_date"""
+
+
+# Открытые выдачи отдельной таблицей: запросы просрочек, дашборда и возврата
+# работают с числом выданного сейчас, а не с объемом всей истории.
+# Таблицу ведут только триггеры Usage_History - напрямую в нее не пишем.
+ACTIVE_LOANS = [
+    '''
+    CREATE TABLE IF NOT EXISTS Active_Loans (
+        history_id INTEGER PRIMARY KEY,
+        asset_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 1,
+        planned_return_date DATE,
+        FOREIGN KEY (history_id) REFERENCES Usage_History(history_id),
+        FOREIGN KEY (asset_id) REFERENCES Assets(asset_id),
+        FOREIGN KEY (employee_id) REFERENCES Employees(employee_id)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_loans_asset
+    ON Active_Loans(asset_id, employee_id)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_loans_employee
+    ON Active_Loans(employee_id, planned_return_date)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_loans_due
+    ON Active_Loans(planned_return_date)
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_usage_loan_insert
+    AFTER INSERT ON Usage_History
+    WHEN NEW.operation_type = 'выдача' AND NEW.actual_return_date IS NULL
+    BEGIN
+        {_insert_active_loan('NEW')};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_usage_loan_update
+    AFTER UPDATE OF asset_id, employee_id, operation_type, planned_return_date,
+                    actual_return_date, notes ON Usage_History
+    BEGIN
+        DELETE FROM Active_Loans WHERE history_id = OLD.history_id;
+        {_insert_active_loan('NEW')}
+        WHERE NEW.operation_type = 'выдача' AND NEW.actual_return_date IS NULL;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_usage_loan_delete
+    AFTER DELETE ON Usage_History
+    BEGIN
+        DELETE FROM Active_Loans WHERE history_id = OLD.history_id;
+    END
+    ''',
+    # Заполнение по уже существующим открытым выдачам
+    f'''
+    INSERT OR REPLACE INTO Active_Loans (history_id, asset_id, employee_id, quantity, planned_return_date)
+    SELECT history_id, asset_id, employee_id, {issued_quantity_sql('notes')}, planned_return_date
+    FROM Usage_History
+    WHERE {OPEN_ISSUE_CONDITION}
+    ''',
+]
+
+
+# Количество операции - отдельным столбцом; Active_Loans берет его оттуда
+USAGE_QUANTITY = [
+    "ALTER TABLE Usage_History ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1",
+    f"""
+    UPDATE Usage_History SET quantity = {issued_quantity_sql('notes')}
+    WHERE operation_type = 'выдача'
+    """,
+    f"""
+    UPDATE Usage_History SET quantity = {note_quantity_sql('notes', 'Кол-во:')}
+    WHERE operation_type = 'возврат'
+    """,
+    f"""
+    UPDATE Usage_History SET quantity = {note_quantity_sql('notes', 'Списано:')}
+    WHERE operation_type = 'списание'
+    """,
+    "DROP TRIGGER IF EXISTS trg_usage_loan_insert",
+    "DROP TRIGGER IF EXISTS trg_usage_loan_update",
+    '''
+    CREATE TRIGGER trg_usage_loan_insert
+    AFTER INSERT ON Usage_History
+    WHEN NEW.operation_type = 'выдача' AND NEW.actual_return_date IS NULL
+    BEGIN
+        INSERT OR REPLACE INTO Active_Loans (history_id, asset_id, employee_id, quantity, planned_return_date)
+        VALUES (NEW.history_id, NEW.asset_id, NEW.employee_id, NEW.quantity, NEW.planned_return_date);
+    END
+    ''',
+    '''
+    CREATE TRIGGER trg_usage_loan_update
+    AFTER UPDATE OF asset_id, employee_id, operation_type, planned_return_date,
+                    actual_return_date, quantity ON Usage_History
+    BEGIN
+        DELETE FROM Active_Loans WHERE history_id = OLD.history_id;
+        INSERT OR REPLACE INTO Active_Loans (history_id, asset_id, employee_id, quantity, planned_return_date)
+        SELECT NEW.history_id, NEW.asset_id, NEW.employee_id, NEW.quantity, NEW.planned_return_date
+        WHERE NEW.operation_type = 'выдача' AND NEW.actual_return_date IS NULL;
+    END
+    ''',
+    '''
+    UPDATE Active_Loans SET quantity = (
+        SELECT uh.quantity FROM Usage_History uh WHERE uh.history_id = Active_Loans.history_id
+    )
+    ''',
+]
+
+
+# Журнал аудита: только добавление, пишется пачками фоновым потоком AuditLogger
+AUDIT_LOG = [
+    """
+    CREATE TABLE IF NOT EXISTS Audit_Log (
+        log_id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        user_id INTEGER,
+        username TEXT,
+        action TEXT NOT NULL,
+        details TEXT NOT NULL DEFAULT '{}'
+    )
+    """,
+]
+
+
+# Поиск по журналу аудита: время, пользователь, действие и актив из details.
+# Индексы оканчиваются на timestamp (и неявно log_id), поэтому фильтр по
+# равенству плюс диапазон дат и постраничный вывод по (timestamp, log_id)
+# читают только нужный участок индекса.
+AUDIT_LOG_INDEXES = [
+    """
+    ALTER TABLE Audit_Log ADD COLUMN asset_id INTEGER
+    GENERATED ALWAYS AS (CAST(json_extract(details, '$.asset_id') AS INTEGER)) VIRTUAL
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_audit_time ON Audit_Log(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_user ON Audit_Log(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_action ON Audit_Log(action, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_asset ON Audit_Log(asset_id, timestamp)",
+]
+
+
+# Исходящие письма: очередь и журнал отправки (EmailOutbox).
+# idempotency_key уникален - повторная постановка того же письма игнорируется.
+EMAIL_OUTBOX = [
+    """
+    CREATE TABLE IF NOT EXISTS Email_Outbox (
+        outbox_id INTEGER PRIMARY KEY,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        html_body TEXT NOT NULL,
+        plain_body TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TEXT NOT NULL,
+        last_error TEXT,
+        created_at TEXT NOT NULL,
+        sent_at TEXT
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_outbox_due
+    ON Email_Outbox(next_attempt_at) WHERE status = 'pending'
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_outbox_status ON Email_Outbox(status, outbox_id)",
+]
+
+
+# Отметки "[Просрочено: ГГГГ-ММ-ДД]", которые до версии 8 дописывались в примечания
+OVERDUE_NOTE_MARK = re.compile(r"\n?\[Просрочено: \d{4}-\d{2}-\d{2}\]")
+
+
+def _strip_overdue_notes(cursor):
+    """Убрать из примечаний автоматические отметки о просрочке (их заменил overdue_since)"""
+    rows = cursor.execute(
+        "SELECT history_id, notes FROM Usage_History WHERE notes LIKE '%[Просрочено: %'").fetchall()
+    cursor.executemany(
+        "UPDATE Usage_History SET notes = ? WHERE history_id = ?",
+        ((OVERDUE_NOTE_MARK.sub('', notes).strip() or None, history_id) for history_id, notes in rows))
+
+
+# Просрочка - столбцом: день, с которого выдача просрочена (срок + 1 день).
+# Ставится одним UPDATE при наступлении срока, а не переписыванием примечаний.
+OVERDUE_SINCE = [
+    "ALTER TABLE Usage_History ADD COLUMN overdue_since DATE",
+    """
+    UPDATE Usage_History SET overdue_since = DATE(planned_return_date, '+1 day')
+    WHERE operation_type = 'выдача'
+        AND planned_return_date < COALESCE(DATE(actual_return_date), DATE('now'))
+    """,
+    _strip_overdue_notes,
+]
+
+
+# Полнотекстовый поиск: rowid = id * 4 + вид записи, поэтому триггеры
+# находят запись индекса по rowid, а вид и id восстанавливаются из него
+SEARCH_ASSET, SEARCH_EMPLOYEE, SEARCH_HISTORY = 1, 2, 3
+
+
+def search_fold_sql(expr):
+    """SQL-выражение текста для индекса поиска: unicode61 не считает «ё» и «е» одной буквой"""
+    return f"REPLACE(REPLACE({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# Ключевой столбец и выражения (title, subtitle, code, notes) записи индекса по виду
+SEARCH_SOURCES = {
+    SEARCH_ASSET: ("asset_id", ("{row}.name", "{row}.model", "{row}.serial_number", None)),
+    SEARCH_EMPLOYEE: ("employee_id", (
+        "{row}.last_name || ' ' || {row}.first_name || COALESCE(' ' || {row}.patronymic, '')",
+        None, None, None)),
+    SEARCH_HISTORY: ("history_id", (None, None, None, "{row}.notes")),
+}
+
+
+def _search_rowid(kind, row):
+    """SQL-выражение rowid записи индекса для строки row"""
+    return f"{row}.{SEARCH_SOURCES[kind][0]} * 4 + {kind}"
+
+
+def _search_values(kind, row):
+    """SQL-выражения (rowid, title, subtitle, code, notes) записи индекса для строки row"""
+    values = [search_fold_sql(value.format(row=row)) if value else "NULL" for value in SEARCH_SOURCES[kind][1]]
+    return ", ".join([_search_rowid(kind, row)] + values)
+
+
+def _search_triggers(table, kind, columns, condition="1"):
+    """Триггеры, которые держат Search_Index в согласии с таблицей table, и заполнение"""
+    insert = "INSERT INTO Search_Index (rowid, title, subtitle, code, notes)"
+    new_condition = condition.format(row="NEW")
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_search_{table.lower()}_insert
+        AFTER INSERT ON {table}
+        WHEN {new_condition}
+        BEGIN
+            {insert} VALUES ({_search_values(kind, 'NEW')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_search_{table.lower()}_update
+        AFTER UPDATE OF {columns} ON {table}
+        BEGIN
+            DELETE FROM Search_Index WHERE rowid = {_search_rowid(kind, 'OLD')};
+            {insert} SELECT {_search_values(kind, 'NEW')} WHERE {new_condition};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_search_{table.lower()}_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM Search_Index WHERE rowid = {_search_rowid(kind, 'OLD')};
+        END
+        """,
+        # Заполнение по уже существующим строкам
+        f"{insert} SELECT {_search_values(kind, table)} FROM {table} WHERE {condition.format(row=table)}",
+    ]
+
+
+# Индекс FTS5 по названиям, моделям и серийным номерам активов, ФИО сотрудников
+# и примечаниям операций. unicode61 приводит к нижнему регистру и кириллицу
+# (в отличие от LIKE), prefix='2 3' ускоряет запросы по началу слова -
+# ими же покрываются русские окончания. Ведут индекс только триггеры.
+FULL_TEXT_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS Search_Index USING fts5(
+        title, subtitle, code, notes,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    *_search_triggers('Assets', SEARCH_ASSET, "name, model, serial_number"),
+    *_search_triggers('Employees', SEARCH_EMPLOYEE, "last_name, first_name, patronymic"),
+    *_search_triggers('Usage_History', SEARCH_HISTORY, "notes", "TRIM(COALESCE({row}.notes, '')) <> ''"),
+]
+
+
+# (таблица, первичный ключ, столбец ключа, выражение исходного текста)
+NAME_KEYS = [
+    ('Asset_Types', 'type_id', 'type_key', "{row}.type_name"),
+    ('Locations', 'location_id', 'location_key', "{row}.location_name"),
+    ('Employees', 'employee_id', 'name_key',
+     "{row}.last_name || ' ' || {row}.first_name || COALESCE(' ' || {row}.patronymic, '')"),
+    ('Users', 'user_id', 'username_key', "{row}.username"),
+]
+
+
+def _name_key_steps(table, primary_key, key_column, source):
+    """Столбец ключа, его заполнение и триггеры, которые ведут его при записи"""
+    columns = ", ".join(re.findall(r"\{row\}\.(\w+)", source))
+    update = (f"UPDATE {table} SET {key_column} = name_key({source.format(row='NEW')}) "
+              f"WHERE {primary_key} = NEW.{primary_key}")
+    return [
+        f"ALTER TABLE {table} ADD COLUMN {key_column} TEXT",
+        f"UPDATE {table} SET {key_column} = name_key({source.format(row=table)})",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_{key_column}_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            {update};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_{key_column}_update
+        AFTER UPDATE OF {columns} ON {table}
+        BEGIN
+            {update};
+        END
+        """,
+    ]
+
+
+def _merge_duplicates_sql(table, primary_key, key_column, referenced_by):
+    """Перевести ссылки на дубликаты (один ключ) на первую запись и удалить дубликаты"""
+    first = f"SELECT MIN({primary_key}) FROM {table} GROUP BY {key_column}"
+    return [
+        f"""
+        UPDATE {referencing} SET {column} = (
+            SELECT MIN(t.{primary_key}) FROM {table} t
+            WHERE t.{key_column} = (SELECT d.{key_column} FROM {table} d WHERE d.{primary_key} = {referencing}.{column})
+        )
+        WHERE {column} NOT IN ({first})
+        """
+        for referencing, column in referenced_by
+    ] + [f"DELETE FROM {table} WHERE {primary_key} NOT IN ({first})"]
+
+
+def _disambiguate_sql(table, primary_key, key_column):
+    """Сохранить существующих тезок: ключ дубликата дополняется его id"""
+    return f"""
+        UPDATE {table} SET {key_column} = {key_column} || ' #' || {primary_key}
+        WHERE {primary_key} NOT IN (SELECT MIN({primary_key}) FROM {table} GROUP BY {key_column})
+    """
+
+
+# Нормализованные ключи (database/normalize.py: casefold, «ё» -> «е», пробелы и
+# знаки препинания схлопнуты) для поиска по индексу и запрета дубликатов:
+# «Склад №1» и «склад № 1» - одно местоположение. Ключи ведут триггеры через
+# SQL-функцию name_key(), зарегистрированную на соединении. Уже существующие
+# дубликаты типов и местоположений сливаются в первую запись; сотрудники и
+# учетные записи не сливаются - ключ дубликата дополняется id.
+NORMALIZED_NAMES = [
+    *(step for spec in NAME_KEYS for step in _name_key_steps(*spec)),
+    *_merge_duplicates_sql('Asset_Types', 'type_id', 'type_key', [('Assets', 'type_id')]),
+    *_merge_duplicates_sql('Locations', 'location_id', 'location_key', [('Assets', 'location_id')]),
+    _disambiguate_sql('Employees', 'employee_id', 'name_key'),
+    _disambiguate_sql('Users', 'user_id', 'username_key'),
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_asset_types_key ON Asset_Types(type_key)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_locations_key ON Locations(location_key)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_employees_name_key ON Employees(name_key)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_key ON Users(username_key)",
+]
+
+
+def _report_duplicate_serials(cursor):
+    """Активы с повторяющимся серийным номером остаются без ключа сканирования"""
+    duplicates = cursor.execute("""
+        SELECT asset_id, serial_number FROM Assets
+        WHERE serial_key IS NOT NULL
+            AND asset_id NOT IN (SELECT MIN(asset_id) FROM Assets WHERE serial_key IS NOT NULL GROUP BY serial_key)
+    """).fetchall()
+    if not duplicates:
+        return
+    print(f"⚠️ Повторяющиеся серийные номера у {len(duplicates)} активов - они не находятся сканированием:")
+    for asset_id, serial_number in duplicates[:20]:
+        print(f"   ID {asset_id}: {serial_number}")
+    cursor.executemany("UPDATE Assets SET serial_key = NULL WHERE asset_id = ?",
+                       ((asset_id,) for asset_id, _ in duplicates))
+
+
+# Серийный номер для сканера штрихкодов: нормализованный ключ (database/normalize.py
+# serial_key: casefold без пробелов и знаков) с уникальным частичным индексом -
+# поиск по номеру O(log n), повторный номер при записи отклоняется.
+# Пустые номера (NULL) в индекс не попадают. Ключ ведут триггеры.
+SERIAL_KEYS = [
+    "ALTER TABLE Assets ADD COLUMN serial_key TEXT",
+    "UPDATE Assets SET serial_key = serial_key(serial_number)",
+    _report_duplicate_serials,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_assets_serial_key
+    ON Assets(serial_key) WHERE serial_key IS NOT NULL
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_assets_serial_key_insert
+    AFTER INSERT ON Assets
+    WHEN NEW.serial_number IS NOT NULL
+    BEGIN
+        UPDATE Assets SET serial_key = serial_key(NEW.serial_number) WHERE asset_id = NEW.asset_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_assets_serial_key_update
+    AFTER UPDATE OF serial_number ON Assets
+    BEGIN
+        UPDATE Assets SET serial_key = serial_key(NEW.serial_number) WHERE asset_id = NEW.asset_id;
+    END
+    """,
+]
+
+
+# Выпадающие списки с поиском ищут актив по началу названия: диапазон
+# name_key >= «дрел» AND name_key < «дрел\U0010ffff» по индексу, а не полная
+# загрузка таблицы. Названия активов не уникальны - индекс обычный.
+ASSET_NAME_KEYS = [
+    *_name_key_steps('Assets', 'asset_id', 'name_key', "{row}.name"),
+    "CREATE INDEX IF NOT EXISTS idx_assets_name_key ON Assets(name_key)",
+]
+
+
+# (версия, описание, шаги) - шаг это SQL-строка или функция f(cursor)
+MIGRATIONS = [
+    (1, "Базовая схема", BASE_SCHEMA),
+    (2, "Индексы Usage_History и Asset_Requests", USAGE_INDEXES),
+    (3, "Таблица открытых выдач Active_Loans", ACTIVE_LOANS),
+    (4, "Столбец quantity в Usage_History", USAGE_QUANTITY),
+    (5, "Журнал аудита Audit_Log", AUDIT_LOG),
+    (6, "Индексы журнала аудита", AUDIT_LOG_INDEXES),
+    (7, "Очередь исходящих писем Email_Outbox", EMAIL_OUTBOX),
+    (8, "Столбец overdue_since в Usage_History", OVERDUE_SINCE),
+    (9, "Полнотекстовый поиск Search_Index", FULL_TEXT_SEARCH),
+    (10, "Нормализованные ключи названий и имен", NORMALIZED_NAMES),
+    (11, "Уникальный ключ серийного номера Assets.serial_key", SERIAL_KEYS),
+    (12, "Ключ поиска по названию Assets.name_key", ASSET_NAME_KEYS),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection):
+    """Текущая версия схемы (PRAGMA user_version)"""
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(connection):
+    """
+    Применить недостающие миграции
+
+    Args:
+        connection: sqlite3-соединение с правом записи
+
+    Returns:
+        int: версия схемы после применения миграций
+    """
+    # Триггеры нормализованных ключей вызывают name_key() и serial_key()
+    register_functions(connection)
+
+    current_version = get_schema_version(connection)
+    if current_version >= LATEST_VERSION:
+        return current_version
+
+    # Незавершенная неявная транзакция помешала бы BEGIN
+    if connection.in_transaction:
+        connection.commit()
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        print(f"Миграция схемы БД до версии {version}: {description}")
+        cursor = connection.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            # user_version хранится в заголовке файла и меняется в той же транзакции
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            print(f"❌ Ошибка миграции схемы БД до версии {version}")
+            raise
+
+        current_version = version
+
+    return current_version
@@ -0,0 +1,67 @@
+import re
+import sqlite3
+import unicodedata
+
+# Пробелы, знаки препинания и символы вроде «№» - один разделитель
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def name_key(text):
+    """
+    Ключ сравнения названий и имен
+
+    casefold (в отличие от LOWER/NOCASE в SQLite работает и для кириллицы),
+    «ё» -> «е», пробелы и знаки препинания схлопнуты в один пробел:
+    «Склад №1», «склад № 1» и «СКЛАД-1» дают один ключ «склад 1».
+    """
+    if text is None:
+        return None
+    text = unicodedata.normalize('NFC', str(text)).casefold().replace('ё', 'е')
+    return _SEPARATORS.sub(' ', text).strip()
+
+
+def serial_key(text):
+    """
+    Ключ серийного (инвентарного) номера: casefold без пробелов и знаков
+
+    «SN-0042», «sn 0042» и «SN0042» - один номер. Пустой номер - None
+    (не участвует в уникальности).
+    """
+    if text is None:
+        return None
+    return _SEPARATORS.sub('', unicodedata.normalize('NFC', str(text)).casefold()) or None
+
+
+def register_functions(connection):
+    """
+    Зарегистрировать name_key() и serial_key() как SQL-функции соединения
+
+    Их вызывают триггеры, которые ведут столбцы *_key (миграции 10-12), поэтому
+    функции нужны каждому соединению, которое пишет в Asset_Types, Locations,
+    Employees, Users или Assets. Без них INSERT в эти таблицы и UPDATE
+    исходных столбцов (названия, ФИО, username, серийного номера) завершаются
+    ошибкой «no such function» - запись не проходит, а не остается без ключа.
+    Поэтому правки этих таблиц из консоли sqlite3 невозможны: скрипты
+    обслуживания открывают базу через connect().
+    """
+    connection.create_function('name_key', 1, name_key, deterministic=True)
+    connection.create_function('serial_key', 1, serial_key, deterministic=True)
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect() с зарегистрированными функциями ключей - для скриптов обслуживания"""
+    connection = sqlite3.connect(database, **kwargs)
+    register_functions(connection)
+    return connection
+
+
+def insert_missing(cursor, exists_query, insert_query, rows, key):
+    """
+    Вставить строки, которых еще нет в таблице (проверка по нормализованному ключу)
+
+    Не INSERT OR IGNORE: OR IGNORE действует и на UPDATE в триггере ключа,
+    и строка, совпавшая с существующей по ключу, осталась бы с ключом NULL.
+    """
+    for row in rows:
+        if cursor.execute(exists_query, key(row)).fetchone() is None:
+            cursor.execute(insert_query, row)
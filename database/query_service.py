@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+from PyQt6.QtCore import QObject, QThreadPool, pyqtSignal
+
+
+class _QueryTask:
+    """Задача пула потоков: выполняет функцию чтения на соединении своего потока"""
+
+    def __init__(self, service, key, generation, func):
+        self.service = service
+        self.key = key
+        self.generation = generation
+        self.func = func
+
+    def run(self):
+        # Вытеснена, пока ждала в очереди - даже не начинаем
+        if self.service.is_superseded(self.key, self.generation):
+            self.service._task_cancelled.emit(self)
+            return
+
+        connection = self.service.pool.reader()
+        # SQLite периодически вызывает обработчик; ненулевой ответ прерывает запрос
+        connection.set_progress_handler(self._should_interrupt, 10000)
+        try:
+            result = self.func(connection)
+        except sqlite3.OperationalError as e:
+            if self.service.is_superseded(self.key, self.generation):
+                self.service._task_cancelled.emit(self)
+            else:
+                self.service._task_failed.emit(self, str(e))
+            return
+        except Exception as e:
+            self.service._task_failed.emit(self, str(e))
+            return
+        finally:
+            connection.set_progress_handler(None, 0)
+        self.service._task_finished.emit(self, result)
+
+    def _should_interrupt(self):
+        return 1 if self.service.is_superseded(self.key, self.generation) else 0
+
+
+class QueryService(QObject):
+    """
+    Фоновое выполнение запросов на чтение (QThreadPool)
+
+    Каждая загрузка идет под ключом (например, 'history'). Новая загрузка
+    с тем же ключом вытесняет предыдущую: еще не начатая пропускается,
+    выполняющаяся прерывается через progress handler SQLite, а ее
+    результат отбрасывается. Колбэки вызываются в потоке GUI.
+    """
+
+    busy_changed = pyqtSignal(bool)
+    failed = pyqtSignal(str, str)  # ключ, текст ошибки
+
+    # Внутренние сигналы: испускаются в рабочем потоке, доставляются в поток GUI
+    _task_finished = pyqtSignal(object, object)
+    _task_failed = pyqtSignal(object, str)
+    _task_cancelled = pyqtSignal(object)
+
+    def __init__(self, pool, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.pool = pool
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(max_threads)
+
+        self._generations = {}
+        self._generations_lock = threading.Lock()
+        self._callbacks = {}  # задача -> (on_result, on_error)
+
+        self._task_finished.connect(self._on_task_finished)
+        self._task_failed.connect(self._on_task_failed)
+        self._task_cancelled.connect(self._on_task_done)
+
+    def is_superseded(self, key, generation):
+        """Вытеснена ли загрузка более новой с тем же ключом"""
+        with self._generations_lock:
+            return self._generations.get(key) != generation
+
+    def is_busy(self):
+        """Есть ли незавершенные загрузки"""
+        return bool(self._callbacks)
+
+    def is_loading(self, key):
+        """Есть ли незавершенная загрузка с ключом"""
+        return any(task.key == key for task in self._callbacks)
+
+    def submit(self, key, func, on_result, on_error=None):
+        """
+        Выполнить func(connection) в фоне
+
+        Args:
+            key: ключ загрузки (новая загрузка с тем же ключом отменяет старую)
+            func: функция чтения, получает read-only sqlite3-соединение потока
+            on_result: колбэк on_result(result) в потоке GUI
+            on_error: колбэк on_error(message) в потоке GUI (по умолчанию - сигнал failed)
+        """
+        with self._generations_lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+
+        was_busy = self.is_busy()
+        task = _QueryTask(self, key, generation, func)
+        self._callbacks[task] = (on_result, on_error)
+        self.thread_pool.start(task.run)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return generation
+
+    def submit_query(self, key, query, params, on_result, on_error=None):
+        """Выполнить SELECT в фоне; on_result(columns, rows)"""
+        def fetch(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query, params)
+                columns = [description[0] for description in cursor.description]
+                return columns, cursor.fetchall()
+            finally:
+                cursor.close()
+
+        return self.submit(key, fetch, lambda result: on_result(*result), on_error)
+
+    def cancel(self, key):
+        """Отменить загрузку с ключом"""
+        with self._generations_lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def shutdown(self, timeout_ms=3000):
+        """Отменить все загрузки и дождаться рабочих потоков (при закрытии окна)"""
+        with self._generations_lock:
+            keys = list(self._generations)
+        for key in keys:
+            self.cancel(key)
+        self.thread_pool.waitForDone(timeout_ms)
+
+    def _on_task_finished(self, task, result):
+        callbacks = self._on_task_done(task)
+        if callbacks and not self.is_superseded(task.key, task.generation):
+            callbacks[0](result)
+
+    def _on_task_failed(self, task, message):
+        callbacks = self._on_task_done(task)
+        if not callbacks or self.is_superseded(task.key, task.generation):
+            return
+        print(f" Ошибка фоновой загрузки '{task.key}': {message}")
+        if callbacks[1]:
+            callbacks[1](message)
+        else:
+            self.failed.emit(task.key, message)
+
+    def _on_task_done(self, task):
+        callbacks = self._callbacks.pop(task, None)
+        if callbacks and not self.is_busy():
+            self.busy_changed.emit(False)
+        return callbacks
@@ -0,0 +1,102 @@
+import re
+from collections import namedtuple
+
+from database.migrations import SEARCH_ASSET, SEARCH_EMPLOYEE, SEARCH_HISTORY
+
+SearchHit = namedtuple('SearchHit', [
+    'kind', 'entity_id', 'title', 'details', 'employee_id', 'operation_date',
+])
+
+# Слова запроса - как их режет токенизатор unicode61 (буквы и цифры)
+WORD_RE = re.compile(r"[^\W_]+")
+
+# Вес столбцов (title, subtitle, code, notes) в bm25: совпадение в названии
+# или серийном номере важнее совпадения в примечании
+RANK = "bm25(Search_Index, 10.0, 4.0, 8.0, 1.0)"
+
+# Лучшие совпадения берутся из индекса, потом к ним (не ко всем) присоединяются
+# операции, активы и сотрудники - показываются исходные значения, а не
+# нормализованный текст индекса
+SEARCH_QUERY = f"""
+    SELECT s.rowid % 4, s.rowid / 4, s.excerpt,
+           a.name, a.model, a.serial_number,
+           e.last_name || ' ' || e.first_name || COALESCE(' ' || e.patronymic, ''),
+           uh.employee_id, uh.operation_date
+    FROM (
+        SELECT rowid, snippet(Search_Index, 3, '«', '»', '…', 8) AS excerpt, {{rank}} AS score
+        FROM Search_Index
+        WHERE Search_Index MATCH :match {{own_filter}}
+        ORDER BY score
+        LIMIT :limit
+    ) s
+    LEFT JOIN Usage_History uh ON s.rowid % 4 = {SEARCH_HISTORY} AND uh.history_id = s.rowid / 4
+    LEFT JOIN Assets a ON a.asset_id = CASE s.rowid % 4 WHEN {SEARCH_ASSET} THEN s.rowid / 4 ELSE uh.asset_id END
+    LEFT JOIN Employees e
+        ON e.employee_id = CASE s.rowid % 4 WHEN {SEARCH_EMPLOYEE} THEN s.rowid / 4 ELSE uh.employee_id END
+    ORDER BY s.score
+"""
+
+ADMIN_SEARCH_QUERY = SEARCH_QUERY.format(rank=RANK, own_filter="")
+# Сотрудник видит каталог и примечания только своих операций
+EMPLOYEE_SEARCH_QUERY = SEARCH_QUERY.format(rank=RANK, own_filter=f"""
+    AND (rowid % 4 = {SEARCH_ASSET}
+         OR rowid % 4 = {SEARCH_HISTORY} AND rowid / 4 IN (
+             SELECT history_id FROM Usage_History WHERE employee_id = :employee_id))""")
+
+
+def fold(text):
+    """Текст запроса так же, как его хранит индекс («ё» -> «е»)"""
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def match_expression(text):
+    """
+    Выражение MATCH для текста из строки поиска
+
+    Каждое слово ищется по началу («дрел» найдет «дрели», «00» - «0042»),
+    все слова обязательны. Слова берутся в кавычки, поэтому операторы FTS5
+    (AND, OR, NEAR, кавычки, *) во вводе пользователя ничего не ломают.
+
+    Returns:
+        str: выражение или '' - в тексте нет ни одного слова
+    """
+    return " ".join(f'"{word}"*' for word in WORD_RE.findall(fold(text)))
+
+
+def search(connection, text, employee_id=None, limit=50):
+    """
+    Найти активы, сотрудников и операции по тексту (можно вызывать из любого потока)
+
+    Args:
+        connection: sqlite3-соединение
+        text: текст из строки поиска
+        employee_id: для сотрудника - только каталог и его операции; None - все (админ)
+        limit: сколько лучших совпадений вернуть
+
+    Returns:
+        list[SearchHit]: совпадения по убыванию релевантности
+    """
+    match = match_expression(text)
+    if not match:
+        return []
+
+    params = {'match': match, 'limit': limit}
+    if employee_id is None:
+        query = ADMIN_SEARCH_QUERY
+    else:
+        query = EMPLOYEE_SEARCH_QUERY
+        params['employee_id'] = employee_id
+
+    hits = []
+    for (kind, entity_id, excerpt, asset_name, model, serial_number,
+         employee_name, history_employee_id, operation_date) in connection.execute(query, params):
+        if kind == SEARCH_ASSET:
+            title = asset_name
+            details = " · ".join(value for value in (model, serial_number and f"S/N {serial_number}") if value)
+        elif kind == SEARCH_EMPLOYEE:
+            title, details = employee_name, "Сотрудник"
+        else:
+            title = asset_name or "Операция"
+            details = f"{operation_date or ''} {employee_name or ''}: {excerpt}".strip()
+        hits.append(SearchHit(kind, entity_id, title, details, history_employee_id, operation_date))
+    return hits
@@ -0,0 +1,209 @@
+"""
+Планировщик сроков возврата
+
+Вместо опроса всех открытых выдач раз в минуту хранит кучу (heapq) ближайших
+переходов каждой выдачи: "завтра срок" (начало дня перед сроком), "срок
+сегодня" (начало дня срока) и "просрочено" (начало следующего дня). Один
+QTimer взводится на самый ранний переход. Выдачи и возвраты приходят через
+ChangeBus (изменения Active_Loans) и обновляют только затронутые выдачи.
+Записи кучи не удаляются: устаревшие (выдача закрыта или срок перенесен)
+отбрасываются при извлечении.
+"""
+import heapq
+from datetime import date, datetime, timedelta
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# Переходы: (вид, смещение начала в днях от планового срока)
+TRANSITIONS = (('tomorrow', -1), ('today', 0), ('overdue', 1))
+
+
+def deadline_kind(planned_date, today):
+    """Состояние выдачи на дату today: 'tomorrow', 'today', 'overdue' или None (срок не близко)"""
+    days = (planned_date - today).days
+    if days < 0:
+        return 'overdue'
+    if days == 0:
+        return 'today'
+    if days == 1:
+        return 'tomorrow'
+    return None
+
+
+class DeadlineScheduler(QObject):
+    """Куча переходов сроков и один таймер на ближайший"""
+
+    # [(вид, history_id, актив, сотрудник, плановая дата)] - выдачи, перешедшие в новое состояние
+    deadlines_reached = pyqtSignal(list)
+
+    # QTimer принимает int мс; дальние сроки ждем частями
+    MAX_TIMER_INTERVAL = 6 * 3600 * 1000
+
+    LOANS_QUERY = """
+        SELECT al.history_id, al.planned_return_date, a.name,
+               e.last_name || ' ' || e.first_name as employee_name
+        FROM Active_Loans al
+        JOIN Assets a ON al.asset_id = a.asset_id
+        JOIN Employees e ON al.employee_id = e.employee_id
+        WHERE al.planned_return_date IS NOT NULL
+    """
+
+    # Уже отмеченные строки не переписываются (и не попадают в ChangeBus)
+    MARK_OVERDUE = """
+        UPDATE Usage_History SET overdue_since = DATE(planned_return_date, '+1 day')
+        WHERE overdue_since IS NOT DATE(planned_return_date, '+1 day')
+    """
+
+    def __init__(self, pool, change_bus=None, clock=datetime.now, parent=None):
+        """
+        Args:
+            pool: ConnectionPool
+            change_bus: ChangeBus - выдачи и возвраты обновляют кучу (None - выдачи читаются только в start)
+            clock: текущее время (подменяется в тестах)
+        """
+        super().__init__(parent)
+        self.pool = pool
+        self.clock = clock
+        # history_id -> (плановая дата, актив, сотрудник, поколение)
+        self._loans = {}
+        # (момент, поколение, history_id, вид); поколение отличает устаревшие записи
+        self._heap = []
+        self._generation = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.process_due)
+        if change_bus is not None:
+            # Коммит в потоке GUI обрабатывается сразу, из рабочего потока - через очередь событий
+            change_bus.changed.connect(self._on_data_changed)
+
+    def start(self):
+        """
+        Загрузить открытые выдачи и взвести таймер
+
+        Returns:
+            list: выдачи, уже находящиеся в состоянии tomorrow/today/overdue (сигнал тоже испускается)
+        """
+        self._loans.clear()
+        self._heap.clear()
+        reached = self._load(self.pool.execute_query(self.LOANS_QUERY))
+        self._finish(reached, mark_all=True)
+        return reached
+
+    def stop(self):
+        self._timer.stop()
+
+    def update_loans(self, history_ids):
+        """Перечитать указанные выдачи (выдача, возврат, перенос срока)"""
+        history_ids = list(history_ids)
+        if not history_ids:
+            return []
+        query = f"{self.LOANS_QUERY} AND al.history_id IN ({', '.join('?' for _ in history_ids)})"
+        rows = self.pool.execute_query(query, history_ids)
+        open_ids = {row[0] for row in rows}
+        for history_id in history_ids:
+            if history_id not in open_ids:
+                self._loans.pop(history_id, None)
+        # Неизменившиеся выдачи не перепланируются и не показываются повторно
+        changed = [row for row in rows
+                   if self._loans.get(row[0], (None,))[0] != date.fromisoformat(row[1][:10])]
+        reached = self._load(changed)
+        self._finish(reached)
+        return reached
+
+    def process_due(self):
+        """
+        Обработать наступившие переходы (вызывается таймером)
+
+        Returns:
+            list: [(вид, history_id, актив, сотрудник, плановая дата)]
+        """
+        now = self.clock()
+        reached = []
+        while self._heap and self._heap[0][0] <= now:
+            _, generation, history_id, kind = heapq.heappop(self._heap)
+            loan = self._loans.get(history_id)
+            if loan is None or loan[3] != generation:
+                continue
+            # Все переходы, пропущенные за время сна, схлопываются в текущее состояние
+            if kind != deadline_kind(loan[0], now.date()):
+                continue
+            reached.append((kind, history_id, loan[1], loan[2], loan[0]))
+        self._finish(reached)
+        return reached
+
+    def next_deadline(self):
+        """Момент ближайшего актуального перехода или None"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def mark_overdue(self, history_ids=None):
+        """
+        Отметить выдачи просроченными (Usage_History.overdue_since) одной транзакцией
+
+        Args:
+            history_ids: выдачи, у которых наступила просрочка; None - все открытые просроченные
+        """
+        if history_ids is None:
+            self.pool.execute_update(f"""
+                {self.MARK_OVERDUE} AND history_id IN (
+                    SELECT history_id FROM Active_Loans WHERE planned_return_date < ?
+                )
+            """, (self.clock().date().isoformat(),))
+            return
+        with self.pool.transaction():
+            self.pool.writer.executemany(f"{self.MARK_OVERDUE} AND history_id = ?",
+                                         ((history_id,) for history_id in history_ids))
+
+    def _on_data_changed(self, changes):
+        history_ids = changes.get('Active_Loans')
+        if history_ids:
+            try:
+                self.update_loans(history_ids)
+            except Exception as e:
+                print(f" Ошибка при обновлении сроков: {e}")
+
+    def _load(self, rows):
+        """Запланировать переходы выдач; вернуть те, что уже в состоянии tomorrow/today/overdue"""
+        now = self.clock()
+        reached = []
+        for history_id, planned_str, asset_name, employee_name in rows:
+            planned_date = date.fromisoformat(planned_str[:10])
+            self._generation += 1
+            self._loans[history_id] = (planned_date, asset_name, employee_name, self._generation)
+            for kind, offset in TRANSITIONS:
+                moment = datetime.combine(planned_date + timedelta(days=offset), datetime.min.time())
+                if moment > now:
+                    heapq.heappush(self._heap, (moment, self._generation, history_id, kind))
+            kind = deadline_kind(planned_date, now.date())
+            if kind is not None:
+                reached.append((kind, history_id, asset_name, employee_name, planned_date))
+        return reached
+
+    def _finish(self, reached, mark_all=False):
+        if reached:
+            overdue = [item[1] for item in reached if item[0] == 'overdue']
+            if overdue:
+                try:
+                    self.mark_overdue(None if mark_all else overdue)
+                except Exception as e:
+                    print(f" Ошибка при отметке просрочек: {e}")
+            self.deadlines_reached.emit(reached)
+        self._arm()
+
+    def _drop_stale(self):
+        while self._heap:
+            _, generation, history_id, _ = self._heap[0]
+            loan = self._loans.get(history_id)
+            if loan is not None and loan[3] == generation:
+                return
+            heapq.heappop(self._heap)
+
+    def _arm(self):
+        """Взвести таймер на ближайший переход"""
+        moment = self.next_deadline()
+        if moment is None:
+            self._timer.stop()
+            return
+        delay = (moment - self.clock()).total_seconds() * 1000
+        self._timer.start(int(min(max(delay, 0), self.MAX_TIMER_INTERVAL)))
@@ -3,11 +3,142 @@
 Отправляет предупреждения о сроках возврата инструментов
 """
 
+import hashlib
 import smtplib
+import time
+from collections import deque
+from html import escape
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime
+from datetime import date, datetime
 from database.db_manager import DatabaseManager
+from email_outbox import EmailOutbox
+
+
+class SMTPSession:
+    """
+    Одно аутентифицированное SMTP-соединение на серию писем
+
+    Подключение (STARTTLS, при ошибке - SSL на порту 465) и вход выполняются
+    при первом письме и повторяются только после разрыва, временной ошибки
+    сервера или после max_per_connection писем. Не больше max_per_minute
+    писем за скользящую минуту (None - без ограничения).
+    """
+
+    SSL_PORT = 465
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password,
+                 security='starttls', timeout=10, max_per_minute=None, max_per_connection=None):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.security = security
+        self.timeout = timeout
+        self.max_per_minute = max_per_minute
+        self.max_per_connection = max_per_connection
+
+        self.connections = 0  # сколько раз подключались (для статистики)
+        self._server = None
+        self._sent_on_connection = 0
+        self._sent_times = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def send(self, msg):
+        """Отправить письмо; исключение smtplib, если оно не ушло и после переподключения"""
+        self._throttle()
+        if self.max_per_connection and self._sent_on_connection >= self.max_per_connection:
+            self.close()
+
+        for attempt in (1, 2):
+            server = self._connect()
+            try:
+                server.send_message(msg)
+                break
+            except smtplib.SMTPRecipientsRefused:
+                # Адрес отклонен: smtplib уже сбросил письмо RSET, соединение годно для следующих
+                raise
+            except smtplib.SMTPResponseException as e:
+                # 5xx - письмо отклонено окончательно; 4xx - временная ошибка сервера
+                if not 400 <= e.smtp_code < 500:
+                    raise
+                self.close()
+                if attempt == 2:
+                    raise
+            except OSError:
+                # Разрыв соединения (ошибки smtplib - тоже OSError)
+                self.close()
+                if attempt == 2:
+                    raise
+            print(f"Переподключение к SMTP: {self.smtp_server}")
+
+        self._sent_on_connection += 1
+        self._sent_times.append(time.monotonic())
+
+    def close(self):
+        """Завершить соединение (QUIT)"""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+    def _connect(self):
+        if self._server is not None:
+            return self._server
+
+        print(f"Подключение к SMTP: {self.smtp_server}:{self.smtp_port}")
+        if self.security == 'starttls':
+            try:
+                server = self._open('starttls')
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"Ошибка SMTP с STARTTLS: {e}")
+                print(f"Попытка подключения через SMTP_SSL (порт {self.SSL_PORT})...")
+                server = self._open('ssl')
+                # Следующие переподключения - сразу через SSL
+                self.security = 'ssl'
+        else:
+            server = self._open(self.security)
+
+        self._server = server
+        self._sent_on_connection = 0
+        self.connections += 1
+        return server
+
+    def _open(self, security):
+        if security == 'ssl':
+            server = smtplib.SMTP_SSL(self.smtp_server, self.SSL_PORT, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            if security == 'starttls':
+                server.starttls()
+            if self.sender_password:
+                server.login(self.sender_email, self.sender_password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    def _throttle(self):
+        """Подождать, если за последнюю минуту уже отправлено max_per_minute писем"""
+        if not self.max_per_minute:
+            return
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] >= 60:
+            self._sent_times.popleft()
+        if len(self._sent_times) >= self.max_per_minute:
+            delay = 60 - (now - self._sent_times[0])
+            print(f"Лимит {self.max_per_minute} писем в минуту: пауза {delay:.1f} с")
+            time.sleep(delay)
+            self._sent_times.popleft()
 
 
 class EmailNotifier:
@@ -28,9 +159,19 @@ class EmailNotifier:
         self.sender_email = sender_email
         self.sender_password = sender_password
         self.db = DatabaseManager()
+        # Письма уведомлений уходят через очередь в БД (поток отправки запускает NotificationManager)
+        self.outbox = EmailOutbox(self.db.pool, self)
         
         # Флаг включения отправки (можно отключить для тестирования)
         self.enabled = False
+
+        # 'starttls' (587), 'ssl' (465) или 'none' (локальный релей)
+        self.security = 'starttls'
+        # Ограничения почтовых сервисов: писем в минуту и писем на одно соединение
+        self.max_per_minute = 60
+        self.max_per_connection = 100
+        # Одно письмо-сводка сотруднику (и сводка администраторам) вместо письма на каждую выдачу
+        self.digest_mode = True
         
     def configure(self, sender_email, sender_password):
         """Настроить параметры отправителя с автоопределением SMTP-сервера"""
@@ -62,6 +203,14 @@ class EmailNotifier:
                 print(f"Предупреждение: неизвестный домен {domain}, используется текущий SMTP: {self.smtp_server}:{self.smtp_port}")
                 print(f"Если письма не отправляются, укажите SMTP-сервер вручную")
         
+    def session(self):
+        """Новая SMTP-сессия с настройками отправителя (закрывается в with)"""
+        return SMTPSession(
+            self.smtp_server, self.smtp_port, self.sender_email, self.sender_password,
+            security=self.security, max_per_minute=self.max_per_minute,
+            max_per_connection=self.max_per_connection
+        )
+
     def send_email(self, recipient_email, subject, html_body, plain_body=None):
         """
         Отправить email-сообщение
@@ -75,106 +224,71 @@ class EmailNotifier:
         Returns:
             bool: True если отправка успешна, иначе False
         """
+        return self.send_batch([(recipient_email, subject, html_body, plain_body)])[0]
+
+    def send_batch(self, messages):
+        """
+        Отправить серию писем через одно SMTP-соединение
+
+        Соединение открывается и проходит аутентификацию один раз; при
+        разрыве или временной ошибке сервера сессия переподключается и
+        повторяет письмо. Ошибка одного письма (например, адрес отклонен)
+        не прерывает серию; ошибка аутентификации - прерывает.
+
+        Args:
+            messages: [(email получателя, тема, html, текст или None)]
+
+        Returns:
+            list: True/False для каждого письма
+        """
+        results = [False] * len(messages)
         if not self.enabled:
-            print(f"Email-уведомления отключены. Сообщение не отправлено: {subject}")
-            return False
-            
-        if not recipient_email or '@' not in recipient_email:
-            print(f"Некорректный email получателя: {recipient_email}")
-            return False
-            
+            print(f"Email-уведомления отключены. Писем не отправлено: {len(messages)}")
+            return results
+
+        started = time.perf_counter()
         try:
-            # Создаем multipart сообщение
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            
-            # Текстовая версия (если не указана, берем из HTML)
-            if plain_body is None:
-                plain_body = subject + "\n\n" + "Пожалуйста, откройте это письмо в почтовом клиенте с поддержкой HTML."
-            
-            # Добавляем обе версии
-            part1 = MIMEText(plain_body, 'plain', 'utf-8')
-            part2 = MIMEText(html_body, 'html', 'utf-8')
-            
-            msg.attach(part1)
-            msg.attach(part2)
-            
-            # Отправка через SMTP
-            print(f"Подключение к SMTP: {self.smtp_server}:{self.smtp_port}")
-            print(f"От: {self.sender_email}, Кому: {recipient_email}")
-            
-            try:
-                # Попытка 1: SMTP с STARTTLS (стандартный метод)
-                with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10) as server:
-                    server.set_debuglevel(0)  # Отключаем подробный вывод
-                    print("Инициализация TLS...")
-                    server.starttls()
-                    print("Аутентификация...")
-                    server.login(self.sender_email, self.sender_password)
-                    print("Отправка сообщения...")
-                    server.send_message(msg)
-                    
-                print(f"✓ Email отправлен: {recipient_email} - {subject}")
-                return True
-                
-            except (smtplib.SMTPException, ConnectionError, OSError) as smtp_error:
-                print(f"Ошибка SMTP с STARTTLS: {smtp_error}")
-                print("Попытка подключения через SMTP_SSL (порт 465)...")
-                
-                try:
-                    # Попытка 2: SMTP_SSL на порту 465
-                    with smtplib.SMTP_SSL(self.smtp_server, 465, timeout=10) as server:
-                        server.set_debuglevel(0)
-                        print("Аутентификация через SSL...")
-                        server.login(self.sender_email, self.sender_password)
-                        print("Отправка сообщения...")
-                        server.send_message(msg)
-                        
-                    print(f"✓ Email отправлен через SSL: {recipient_email} - {subject}")
-                    return True
-                    
-                except Exception as ssl_error:
-                    print(f"✗ Ошибка SMTP_SSL: {ssl_error}")
-                    raise  # Пробросим для общего обработчика
-            
+            with self.session() as session:
+                for i, (recipient_email, subject, html_body, plain_body) in enumerate(messages):
+                    if not recipient_email or '@' not in recipient_email:
+                        print(f"Некорректный email получателя: {recipient_email}")
+                        continue
+                    try:
+                        session.send(self.build_message(recipient_email, subject, html_body, plain_body))
+                        results[i] = True
+                        print(f"✓ Email отправлен: {recipient_email} - {subject}")
+                    except smtplib.SMTPAuthenticationError:
+                        raise
+                    except Exception as e:
+                        print(f"✗ Ошибка отправки email на {recipient_email}: {e}")
         except Exception as e:
-            print(f"✗ Критическая ошибка отправки email на {recipient_email}: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+            # Аутентификация или подключение не удались - остальные письма не отправить
+            print(f"✗ Критическая ошибка SMTP ({self.smtp_server}:{self.smtp_port}): {e}")
+
+        if len(messages) > 1:
+            print(f"Отправлено писем: {sum(results)} из {len(messages)} за "
+                  f"{time.perf_counter() - started:.1f} с (соединений: {session.connections})")
+        return results
+
+    def build_message(self, recipient_email, subject, html_body, plain_body=None):
+        """multipart/alternative: текстовая и HTML-версии"""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.sender_email
+        msg['To'] = recipient_email
+        msg['Subject'] = subject
+
+        # Текстовая версия (если не указана, берем из HTML)
+        if plain_body is None:
+            plain_body = subject + "\n\n" + "Пожалуйста, откройте это письмо в почтовом клиенте с поддержкой HTML."
+
+        msg.attach(MIMEText(plain_body, 'plain', 'utf-8'))
+        msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+        return msg
     
-    def send_deadline_warning(self, employee_email, employee_name, asset_name, deadline_date, days_until):
-        """
-        Отправить предупреждение о приближающемся сроке возврата
-        
-        Args:
-            employee_email: Email сотрудника
-            employee_name: ФИО сотрудника
-            asset_name: Название инструмента
-            deadline_date: Дата планируемого возврата
-            days_until: Дней до срока (0 = сегодня, -1 = просрочено на 1 день)
-        """
-        if days_until == 0:
-            subject = f"⚠️ СЕГОДНЯ срок возврата: {asset_name}"
-            warning_text = "СЕГОДНЯ истекает срок возврата"
-            color = "#ff9800"  # Оранжевый
-        elif days_until == 1:
-            subject = f"⏰ ЗАВТРА срок возврата: {asset_name}"
-            warning_text = "ЗАВТРА истекает срок возврата"
-            color = "#ffc107"  # Желтый
-        elif days_until < 0:
-            subject = f"🚨 ПРОСРОЧКА {abs(days_until)} дн.: {asset_name}"
-            warning_text = f"ПРОСРОЧКА {abs(days_until)} дней"
-            color = "#f44336"  # Красный
-        else:
-            subject = f"Напоминание о возврате: {asset_name}"
-            warning_text = f"Осталось {days_until} дней"
-            color = "#2196f3"  # Синий
-        
-        # HTML-шаблон письма
-        html_body = f"""
+    @staticmethod
+    def _html_page(color, subtitle, content):
+        """Общий HTML-шаблон писем: шапка цвета color, содержимое content, подвал"""
+        return f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -230,14 +344,71 @@ class EmailNotifier:
                     font-weight: bold;
                     margin: 15px 0;
                 }}
+                table.items {{
+                    width: 100%;
+                    border-collapse: collapse;
+                    background-color: white;
+                }}
+                table.items th, table.items td {{
+                    text-align: left;
+                    padding: 6px 8px;
+                    border-bottom: 1px solid #eee;
+                }}
             </style>
         </head>
         <body>
             <div class="header">
                 <h2>🔧 InstrumentTracker</h2>
-                <p>Уведомление о возврате инструмента</p>
+                <p>{subtitle}</p>
+            </div>
+            <div class="content">{content}
+            </div>
+            <div class="footer">
+                <p>Это автоматическое уведомление из системы InstrumentTracker</p>
+                <p>Не отвечайте на это письмо</p>
             </div>
-            <div class="content">
+        </body>
+        </html>
+        """
+
+    def send_deadline_warning(self, employee_email, employee_name, asset_name, deadline_date, days_until):
+        """Отправить предупреждение о приближающемся сроке возврата (аргументы - как у deadline_warning)"""
+        return self.send_email(*self.deadline_warning(employee_email, employee_name, asset_name,
+                                                      deadline_date, days_until))
+
+    def deadline_warning(self, employee_email, employee_name, asset_name, deadline_date, days_until):
+        """
+        Письмо-предупреждение о сроке возврата для send_email/send_batch
+        
+        Args:
+            employee_email: Email сотрудника
+            employee_name: ФИО сотрудника
+            asset_name: Название инструмента
+            deadline_date: Дата планируемого возврата
+            days_until: Дней до срока (0 = сегодня, -1 = просрочено на 1 день)
+
+        Returns:
+            tuple: (email получателя, тема, html, текст)
+        """
+        if days_until == 0:
+            subject = f"⚠️ СЕГОДНЯ срок возврата: {asset_name}"
+            warning_text = "СЕГОДНЯ истекает срок возврата"
+            color = "#ff9800"  # Оранжевый
+        elif days_until == 1:
+            subject = f"⏰ ЗАВТРА срок возврата: {asset_name}"
+            warning_text = "ЗАВТРА истекает срок возврата"
+            color = "#ffc107"  # Желтый
+        elif days_until < 0:
+            subject = f"🚨 ПРОСРОЧКА {abs(days_until)} дн.: {asset_name}"
+            warning_text = f"ПРОСРОЧКА {abs(days_until)} дней"
+            color = "#f44336"  # Красный
+        else:
+            subject = f"Напоминание о возврате: {asset_name}"
+            warning_text = f"Осталось {days_until} дней"
+            color = "#2196f3"  # Синий
+        
+        # HTML-шаблон письма
+        html_body = self._html_page(color, "Уведомление о возврате инструмента", f"""
                 <p>Здравствуйте, <strong>{employee_name}</strong>!</p>
                 
                 <div class="warning">
@@ -254,15 +425,7 @@ class EmailNotifier:
                 
                 <p style="color: #666; font-size: 14px;">
                     ℹ️ Если инструмент уже возвращен, это уведомление можно проигнорировать.
-                </p>
-            </div>
-            <div class="footer">
-                <p>Это автоматическое уведомление из системы InstrumentTracker</p>
-                <p>Не отвечайте на это письмо</p>
-            </div>
-        </body>
-        </html>
-        """
+                </p>""")
         
         # Текстовая версия
         plain_body = f"""
@@ -282,69 +445,237 @@ InstrumentTracker - Уведомление о возврате инструме
 Это автоматическое уведомление из системы InstrumentTracker
         """
         
-        return self.send_email(employee_email, subject, html_body, plain_body)
+        return employee_email, subject, html_body, plain_body
     
+    # Разделы сводки: вид напоминания, заголовок, цвет, значок темы
+    DIGEST_SECTIONS = (
+        ('overdue', "Просрочен возврат", "#f44336", "🚨"),
+        ('today', "Срок возврата СЕГОДНЯ", "#ff9800", "⚠️"),
+        ('tomorrow', "Срок возврата ЗАВТРА", "#ffc107", "⏰"),
+        ('upcoming', "Приближается срок возврата", "#2196f3", "📅"),
+    )
+    DIGEST_COUNT_LABELS = {'overdue': "просрочено", 'today': "сегодня", 'tomorrow': "завтра", 'upcoming': "скоро"}
+
+    @staticmethod
+    def _by_kind(items, days_index):
+        """Элементы по разделам сводки: [(раздел, элементы)] только непустые"""
+        sections = []
+        for section in EmailNotifier.DIGEST_SECTIONS:
+            section_items = [item for item in items if EmailNotifier.reminder_kind(item[days_index]) == section[0]]
+            if section_items:
+                sections.append((section, section_items))
+        return sections
+
+    @staticmethod
+    def _digest_subject(icon, title, sections):
+        counts = ", ".join(f"{EmailNotifier.DIGEST_COUNT_LABELS[kind]}: {len(items)}"
+                           for (kind, *_), items in sections)
+        return f"{icon} {title} ({counts})"
+
+    @staticmethod
+    def _overdue_text(days_until):
+        return f"{abs(days_until)} дн." if days_until < 0 else ""
+
+    def employee_digest(self, employee_email, employee_name, items):
+        """
+        Одно письмо сотруднику обо всех выдачах с подходящим сроком
+
+        Args:
+            items: [(название инструмента, плановая дата возврата, дней до срока)]
+
+        Returns:
+            tuple: (email получателя, тема, html, текст)
+        """
+        sections = self._by_kind(items, 2)
+        (_, _, color, icon), _ = sections[0]
+        subject = self._digest_subject(icon, "Возврат инструментов", sections)
+
+        content = f"""
+                <p>Здравствуйте, <strong>{escape(employee_name)}</strong>!</p>"""
+        plain_body = f"InstrumentTracker - Возврат инструментов\n\nЗдравствуйте, {employee_name}!\n"
+        for (kind, title, section_color, section_icon), section_items in sections:
+            rows = "".join(
+                f"<tr><td>{escape(str(asset_name))}</td><td>{deadline_date}</td>"
+                f"<td>{self._overdue_text(days_until)}</td></tr>"
+                for asset_name, deadline_date, days_until in section_items)
+            content += f"""
+                <div class="warning" style="background-color: {section_color};">{section_icon} {title}: {len(section_items)}</div>
+                <table class="items">
+                    <tr><th>Инструмент</th><th>Плановый возврат</th><th>Просрочка</th></tr>{rows}
+                </table>"""
+            plain_body += f"\n{section_icon} {title}:\n" + "".join(
+                f"  • {asset_name} — {deadline_date} {self._overdue_text(days_until)}\n"
+                for asset_name, deadline_date, days_until in section_items)
+        content += """
+                <p>Пожалуйста, верните инструменты в указанный срок или продлите срок пользования в системе InstrumentTracker.</p>
+                <p style="color: #666; font-size: 14px;">
+                    ℹ️ Если инструмент уже возвращен, это уведомление можно проигнорировать.
+                </p>"""
+        plain_body += ("\nПожалуйста, верните инструменты в указанный срок или продлите срок пользования "
+                       "в системе InstrumentTracker.\n\n---\nЭто автоматическое уведомление из системы InstrumentTracker\n")
+
+        html_body = self._html_page(color, "Сводка по срокам возврата", content)
+        return employee_email, subject, html_body, plain_body
+
+    def admin_digest(self, admin_email, items):
+        """
+        Сводка администратору по всем сотрудникам
+
+        Args:
+            items: [(ФИО сотрудника, email сотрудника, инструмент, плановая дата, дней до срока)]
+
+        Returns:
+            tuple: (email получателя, тема, html, текст)
+        """
+        sections = self._by_kind(items, 4)
+        (_, _, color, _), _ = sections[0]
+        subject = self._digest_subject("📋", "Сводка по возвратам", sections)
+
+        content = f"""
+                <p>Сводка на {datetime.now().strftime('%Y-%m-%d')}, сотрудников: {len({item[0] for item in items})}</p>"""
+        plain_body = f"InstrumentTracker - Сводка по возвратам на {datetime.now().strftime('%Y-%m-%d')}\n"
+        for (kind, title, section_color, section_icon), section_items in sections:
+            rows = "".join(
+                f"<tr><td>{escape(employee_name)}</td><td>{escape(employee_email or '—')}</td>"
+                f"<td>{escape(str(asset_name))}</td><td>{deadline_date}</td><td>{self._overdue_text(days_until)}</td></tr>"
+                for employee_name, employee_email, asset_name, deadline_date, days_until in section_items)
+            content += f"""
+                <div class="warning" style="background-color: {section_color};">{section_icon} {title}: {len(section_items)}</div>
+                <table class="items">
+                    <tr><th>Сотрудник</th><th>Email</th><th>Инструмент</th><th>Плановый возврат</th><th>Просрочка</th></tr>{rows}
+                </table>"""
+            plain_body += f"\n{section_icon} {title}:\n" + "".join(
+                f"  • {employee_name} ({employee_email or 'нет email'}): {asset_name} — {deadline_date} "
+                f"{self._overdue_text(days_until)}\n"
+                for employee_name, employee_email, asset_name, deadline_date, days_until in section_items)
+
+        html_body = self._html_page(color, "Сводка для администратора", content)
+        return admin_email, subject, html_body, plain_body
+
+    @staticmethod
+    def loan_set_hash(history_ids):
+        """Короткий хеш набора выдач для ключа сводки: другой набор - другая сводка в тот же день"""
+        ids = ",".join(str(history_id) for history_id in sorted(set(history_ids)))
+        return hashlib.sha256(ids.encode()).hexdigest()[:16]
+
+    def digest_messages(self, loans, admin_emails=(), day=None):
+        """
+        Сводки для очереди: одна сотруднику с email и одна каждому администратору
+
+        Ключ идемпотентности включает хеш набора выдач: повторная проверка в
+        тот же день не дублирует сводку, а новая или закрытая выдача дает новую.
+
+        Args:
+            loans: [(history_id, employee_id, email, ФИО, инструмент, плановая дата, дней до срока)]
+            admin_emails: адреса администраторов
+            day: дата для ключей идемпотентности (по умолчанию - сегодня)
+
+        Returns:
+            list: [(ключ идемпотентности, email, тема, html, текст)]
+        """
+        day = day or date.today().isoformat()
+        employees = {}
+        for history_id, employee_id, email, employee_name, asset_name, deadline_date, days_until in loans:
+            employee = employees.setdefault(employee_id, (email, ' '.join(employee_name.split()), [], []))
+            employee[2].append((asset_name, deadline_date, days_until))
+            employee[3].append(history_id)
+
+        messages = [
+            (f"digest:{employee_id}:{day}:{self.loan_set_hash(history_ids)}",)
+            + self.employee_digest(email, employee_name, items)
+            for employee_id, (email, employee_name, items, history_ids) in employees.items()
+            if email
+        ]
+        if loans:
+            summary = [(employee_name, email, *item)
+                       for email, employee_name, items, _ in employees.values() for item in items]
+            loans_hash = self.loan_set_hash(loan[0] for loan in loans)
+            messages += [(f"admin_digest:{admin_email}:{day}:{loans_hash}",) + self.admin_digest(admin_email, summary)
+                         for admin_email in admin_emails]
+        return messages
+
+    def admin_emails(self):
+        """Адреса активных администраторов (email связанного сотрудника)"""
+        rows = self.db.execute_query("""
+            SELECT DISTINCT e.email
+            FROM Users u
+            JOIN Employees e ON u.employee_id = e.employee_id
+            WHERE u.role = 'admin' AND u.is_active = 1
+                AND e.email IS NOT NULL AND e.email != ''
+        """)
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def reminder_kind(days_until):
+        """Вид напоминания о сроке: 'overdue', 'today', 'tomorrow' или 'upcoming'"""
+        if days_until < 0:
+            return 'overdue'
+        if days_until == 0:
+            return 'today'
+        if days_until == 1:
+            return 'tomorrow'
+        return 'upcoming'
+
+    @staticmethod
+    def deadline_key(history_id, days_until, day=None):
+        """Ключ идемпотентности: одно напоминание каждого вида по выдаче в день"""
+        day = day or date.today().isoformat()
+        return f"deadline:{history_id}:{EmailNotifier.reminder_kind(days_until)}:{day}"
+
     def check_and_send_notifications(self):
         """
-        Проверить сроки возврата и отправить уведомления
-        Вызывается периодически (например, раз в час или раз в день)
+        Проверить сроки возврата и поставить уведомления в очередь отправки
+        Вызывается периодически (например, раз в час или раз в день);
+        письмо, уже поставленное сегодня, повторно не ставится.
+        В режиме digest_mode - одна сводка на сотрудника и сводка администраторам
+
+        Returns:
+            int: сколько писем добавлено в очередь
         """
         if not self.enabled:
             print("Email-уведомления отключены")
-            return
+            return 0
         
         try:
             # Запрос активов с истекающими сроками
             query = """
                 SELECT 
+                    al.history_id,
+                    e.employee_id,
                     e.email,
                     e.last_name || ' ' || e.first_name || ' ' || COALESCE(e.patronymic, '') as employee_name,
                     a.name as asset_name,
-                    uh.planned_return_date,
-                    CAST((julianday(uh.planned_return_date) - julianday('now')) AS INTEGER) as days_until
-                FROM Usage_History uh
-                JOIN Assets a ON uh.asset_id = a.asset_id
-                JOIN Employees e ON uh.employee_id = e.employee_id
-                WHERE uh.operation_type = 'выдача'
-                    AND uh.actual_return_date IS NULL
-                    AND e.email IS NOT NULL
-                    AND e.email != ''
-                    AND (
-                        -- Завтра истекает
-                        DATE(uh.planned_return_date) = DATE('now', '+1 day')
-                        OR
-                        -- Сегодня истекает
-                        DATE(uh.planned_return_date) = DATE('now')
-                        OR
-                        -- Просрочено
-                        DATE(uh.planned_return_date) < DATE('now')
-                    )
-                ORDER BY uh.planned_return_date ASC
+                    al.planned_return_date,
+                    -- Целые дни от сегодняшней даты, а не от текущего момента (иначе завтрашний
+                    -- срок округлялся бы до «сегодня»); местная дата - как date.today() в ключе письма
+                    CAST(julianday(DATE(al.planned_return_date)) - julianday(DATE('now', 'localtime')) AS INTEGER)
+                        as days_until
+                FROM Active_Loans al
+                JOIN Assets a ON al.asset_id = a.asset_id
+                JOIN Employees e ON al.employee_id = e.employee_id
+                -- Просрочено, истекает сегодня или завтра
+                WHERE al.planned_return_date < DATE('now', 'localtime', '+2 day')
+                ORDER BY al.planned_return_date ASC
             """
             
             results = self.db.execute_query(query)
             
-            sent_count = 0
-            for row in results:
-                email, employee_name, asset_name, deadline_date, days_until = row
-                
-                # Очищаем лишние пробелы из ФИО
-                employee_name = ' '.join(employee_name.split())
-                
-                success = self.send_deadline_warning(
-                    email,
-                    employee_name,
-                    asset_name,
-                    deadline_date,
-                    days_until
-                )
-                
-                if success:
-                    sent_count += 1
+            if self.digest_mode:
+                # Сотрудники без email попадают только в сводку администраторам
+                messages = self.digest_messages(results, self.admin_emails())
+            else:
+                messages = [
+                    # Очищаем лишние пробелы из ФИО
+                    (self.deadline_key(history_id, days_until),)
+                    + self.deadline_warning(email, ' '.join(employee_name.split()), asset_name, deadline_date, days_until)
+                    for history_id, _, email, employee_name, asset_name, deadline_date, days_until in results
+                    if email
+                ]
+            queued_count = self.outbox.enqueue(messages)
             
-            print(f"Email-уведомлений отправлено: {sent_count}")
-            return sent_count
+            print(f"Email-уведомлений поставлено в очередь: {queued_count}")
+            return queued_count
             
         except Exception as e:
-            print(f"Ошибка при проверке и отправке email-уведомлений: {e}")
+            print(f"Ошибка при проверке email-уведомлений: {e}")
             return 0
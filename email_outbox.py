@@ -0,0 +1,204 @@
+"""
+Очередь исходящих писем в таблице Email_Outbox
+
+Письма не отправляются там, где созданы: enqueue только записывает их в
+таблицу (ключ идемпотентности уникален - одно и то же письмо не ставится
+дважды), а фоновый поток забирает подошедшие письма и отправляет их одной
+SMTP-сессией. Временные ошибки повторяются с экспоненциальной задержкой,
+окончательные (адрес отклонен, 5xx) сразу помечаются 'failed'. Отправленные
+письма остаются в таблице как журнал отправки.
+"""
+import smtplib
+import threading
+from datetime import datetime, timedelta
+
+
+def _timestamp(moment):
+    return moment.isoformat(timespec='seconds')
+
+
+class EmailOutbox:
+    """Очередь писем в БД и поток ее отправки"""
+
+    BATCH_SIZE = 50
+    MAX_ATTEMPTS = 8
+    # Задержка перед повтором: RETRY_BASE_DELAY * 2^(попытка-1), не больше RETRY_MAX_DELAY (с)
+    RETRY_BASE_DELAY = 60
+    RETRY_MAX_DELAY = 6 * 3600
+    # Письма, взятые в отправку, другой отправитель не трогает столько секунд
+    CLAIM_TIMEOUT = 600
+    # Проверка очереди, даже если никто не будил поток (с)
+    POLL_INTERVAL = 300
+
+    def __init__(self, pool, notifier):
+        """
+        Args:
+            pool: ConnectionPool
+            notifier: EmailNotifier - настройки SMTP и сборка писем
+        """
+        self.pool = pool
+        self.notifier = notifier
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def enqueue(self, messages):
+        """
+        Поставить письма в очередь
+
+        Args:
+            messages: [(ключ идемпотентности, email, тема, html, текст или None)]
+
+        Returns:
+            int: сколько писем добавлено (письма с известными ключами пропускаются)
+        """
+        now = _timestamp(datetime.now())
+        with self.pool.transaction():
+            cursor = self.pool.writer.cursor()
+            try:
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO Email_Outbox
+                        (idempotency_key, recipient, subject, html_body, plain_body,
+                         next_attempt_at, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, ((key, recipient, subject, html_body, plain_body, now, now)
+                      for key, recipient, subject, html_body, plain_body in messages))
+                added = cursor.rowcount
+            finally:
+                cursor.close()
+        if added:
+            print(f"📧 В очередь писем добавлено: {added}")
+            self.wake()
+        return added
+
+    def retry_failed(self):
+        """Вернуть письма с ошибкой в очередь (попытки считаются заново)"""
+        count = self.pool.execute_query("SELECT COUNT(*) FROM Email_Outbox WHERE status = 'failed'")[0][0]
+        self.pool.execute_update("""
+            UPDATE Email_Outbox
+            SET status = 'pending', attempts = 0, next_attempt_at = ?
+            WHERE status = 'failed'
+        """, (_timestamp(datetime.now()),))
+        self.wake()
+        return count
+
+    def counts(self):
+        """Число писем по статусам: {'pending': n, 'sent': n, 'failed': n}"""
+        rows = self.pool.execute_query("SELECT status, COUNT(*) FROM Email_Outbox GROUP BY status")
+        return dict(rows)
+
+    def start(self):
+        """Запустить поток отправки"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="EmailOutbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Остановить поток (текущее письмо дописывается, остальные остаются в очереди)"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Разбудить поток отправки (появились новые письма)"""
+        self._wakeup.set()
+
+    def drain(self):
+        """
+        Отправить подошедшие письма (вызывается потоком отправки)
+
+        Returns:
+            float: через сколько секунд проверить очередь снова
+        """
+        if not self.notifier.enabled:
+            return self.POLL_INTERVAL
+
+        rows = self._claim_due()
+        if rows:
+            self._send(rows)
+            if len(rows) == self.BATCH_SIZE:
+                return 0
+
+        next_attempt = self.pool.execute_query(
+            "SELECT MIN(next_attempt_at) FROM Email_Outbox WHERE status = 'pending'")[0][0]
+        if next_attempt is None:
+            return self.POLL_INTERVAL
+        delay = (datetime.fromisoformat(next_attempt) - datetime.now()).total_seconds()
+        return min(max(delay, 0), self.POLL_INTERVAL)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                delay = self.drain()
+            except Exception as e:
+                print(f"❌ Ошибка отправки писем из очереди: {e}")
+                delay = self.POLL_INTERVAL
+            self._wakeup.wait(delay)
+
+    def _claim_due(self):
+        """Взять подошедшие письма: попытка засчитывается, повтор откладывается на CLAIM_TIMEOUT"""
+        now = datetime.now()
+        with self.pool.transaction():
+            rows = self.pool.execute_query("""
+                SELECT outbox_id, recipient, subject, html_body, plain_body, attempts + 1
+                FROM Email_Outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+            """, (_timestamp(now), self.BATCH_SIZE))
+            self.pool.writer.executemany("""
+                UPDATE Email_Outbox SET attempts = attempts + 1, next_attempt_at = ?
+                WHERE outbox_id = ?
+            """, ((_timestamp(now + timedelta(seconds=self.CLAIM_TIMEOUT)), row[0]) for row in rows))
+        return rows
+
+    def _send(self, rows):
+        """Отправить взятые письма одной SMTP-сессией"""
+        with self.notifier.session() as session:
+            for i, (outbox_id, recipient, subject, html_body, plain_body, attempt) in enumerate(rows):
+                if not recipient or '@' not in recipient:
+                    self._mark_failed(outbox_id, f"Некорректный email получателя: {recipient}")
+                    continue
+                try:
+                    session.send(self.notifier.build_message(recipient, subject, html_body, plain_body))
+                except Exception as e:
+                    if self._is_permanent(e):
+                        self._mark_failed(outbox_id, str(e))
+                        continue
+                    # Сервер недоступен или отказал во входе - откладываем всю пачку
+                    print(f"✗ Ошибка SMTP, повтор позже: {e}")
+                    for row in rows[i:]:
+                        self._schedule_retry(row[0], row[5], str(e))
+                    return
+                self.pool.execute_update(
+                    "UPDATE Email_Outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE outbox_id = ?",
+                    (_timestamp(datetime.now()), outbox_id))
+                print(f"✓ Email отправлен: {recipient} - {subject}")
+
+    @staticmethod
+    def _is_permanent(error):
+        """Повтор не поможет: адрес отклонен или письмо отвергнуто с кодом 5xx"""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return True
+        return (isinstance(error, smtplib.SMTPResponseException)
+                and not isinstance(error, smtplib.SMTPAuthenticationError)
+                and error.smtp_code >= 500)
+
+    def _mark_failed(self, outbox_id, error):
+        print(f"✗ Письмо не отправлено: {error}")
+        self.pool.execute_update(
+            "UPDATE Email_Outbox SET status = 'failed', last_error = ? WHERE outbox_id = ?",
+            (error, outbox_id))
+
+    def _schedule_retry(self, outbox_id, attempt, error):
+        if attempt >= self.MAX_ATTEMPTS:
+            self._mark_failed(outbox_id, f"{error} (попыток: {attempt})")
+            return
+        delay = min(self.RETRY_BASE_DELAY * 2 ** (attempt - 1), self.RETRY_MAX_DELAY)
+        self.pool.execute_update(
+            "UPDATE Email_Outbox SET next_attempt_at = ?, last_error = ? WHERE outbox_id = ?",
+            (_timestamp(datetime.now() + timedelta(seconds=delay)), error, outbox_id))
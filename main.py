@@ -1,17 +1,14 @@
 import sys
-import csv
 from datetime import datetime
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableView, QVBoxLayout,
                              QWidget, QPushButton, QMessageBox, QHBoxLayout, QDialog,
                              QTabWidget, QLabel, QDateEdit, QComboBox, QGridLayout,
                              QFrame, QTextEdit, QMenuBar, QFileDialog, QGroupBox, QButtonGroup,
-                             QLineEdit, QInputDialog, QRadioButton, QDialogButtonBox)
-from PyQt6.QtSql import QSqlDatabase, QSqlQueryModel, QSqlQuery
-from PyQt6.QtCore import Qt, QDate, QTimer
+                             QLineEdit, QInputDialog, QRadioButton, QDialogButtonBox, QProgressBar,
+                             QProgressDialog, QSpinBox)
+from PyQt6.QtCore import Qt, QDate, QSettings, QTimer
 from PyQt6.QtGui import QAction, QIcon, QKeySequence
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 
 from views.asset_dialog import AssetDialog
 from views.issue_dialog import IssueDialog
@@ -19,18 +16,79 @@ from views.return_dialog import ReturnDialog
 from views.edit_asset_dialog import EditAssetDialog
 from views.login_dialog import LoginDialog
 from views.request_dialog import RequestAssetDialog
+from views.email_outbox_dialog import EmailOutboxDialog
+from views.entity_picker import EntityPicker
+from views.global_search import GlobalSearchBar
+from views.scan_panel import ScanPanel
+from views.table_models import AssetCatalogModel, KeysetTableModel, RowsTableModel
+from database.asset_scanner import AssetScanner
+from database.backup_manager import BackupManager
+from database.dashboard_stats import DashboardStats
+from database.migrations import SEARCH_ASSET, SEARCH_EMPLOYEE
 from database.db_manager import DatabaseManager
+from database.query_service import QueryService
 from notification_manager import NotificationManager
 from theme_manager import ThemeManager
 
 from audit_logger import AuditLogger
+from asset_importer import AssetImportWorker
+from data_exporter import ExportProgress, export_all_data, export_csv, export_xlsx
 
 
 class MainWindow(QMainWindow):
+    # Каталог активов (без ORDER BY - добавляется при загрузке)
+    ASSETS_QUERY = """
+        SELECT 
+            a.asset_id as 'ID',
+            a.name as 'Название',
+            at.type_name as 'Тип',
+            a.model as 'Модель',
+            a.serial_number as 'Серийный номер',
+            a.current_status as 'Статус',
+            l.location_name as 'Местоположение',
+            a.quantity as 'Количество'
+        FROM Assets a
+        JOIN Asset_Types at ON a.type_id = at.type_id
+        JOIN Locations l ON a.location_id = l.location_id
+    """
+    # Больше изменившихся строк - таблица перечитывается целиком
+    MAX_ROW_UPDATES = 200
+    # Как часто проверять, не пора ли делать плановую резервную копию
+    BACKUP_CHECK_INTERVAL_MS = 3600000
+
     def __init__(self, current_user=None):
         super().__init__()
         print("Инициализация главного окна...")
         self.db = DatabaseManager()
+
+        # Таблицы и дашборд загружаются в фоновых потоках
+        self.query_service = QueryService(self.db.pool, self)
+        self.query_service.busy_changed.connect(self._on_query_busy_changed)
+        self.query_service.failed.connect(self._on_query_failed)
+        # Счетчики дашборда пересчитываются, только если данные изменились
+        self.dashboard_stats = DashboardStats(self.db.pool)
+        # Режим сканирования: код -> актив через кэш и индекс Assets.serial_key
+        self.asset_scanner = AssetScanner(self.db.pool)
+
+        # Резервные копии: плановые создаются в фоне, настройки - в QSettings
+        settings = QSettings('KONSIST-OS', 'InstrumentTracker')
+        self.backup_interval_hours = int(settings.value('backup/interval_hours', 24))
+        self.backup_manager = BackupManager(
+            self.db.pool.db_path,
+            keep=int(settings.value('backup/keep', 10)),
+            compress=settings.value('backup/compress', True, type=bool)
+        )
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self._run_scheduled_backup)
+        self.backup_timer.start(self.BACKUP_CHECK_INTERVAL_MS)
+        QTimer.singleShot(60000, self._run_scheduled_backup)
+
+        # Вкладки обновляются по событиям изменения данных, а не целиком после каждой операции
+        self._data_views = {}
+        self._dirty_views = set()
+        self._pending_asset_ids = set()
+        self.db.change_bus.changed.connect(self._on_data_changed, Qt.ConnectionType.QueuedConnection)
+        self.db.change_bus.changed.connect(self.asset_scanner.invalidate, Qt.ConnectionType.QueuedConnection)
         
         # Сохраняем информацию о текущем пользователе
         self.current_user = current_user or {
@@ -55,7 +113,7 @@ class MainWindow(QMainWindow):
         
         # Инициализация менеджера уведомлений
         self.notification_manager = NotificationManager(self)
-        self.notification_manager.start_checking(interval_ms=60000)  # Проверка каждую минуту
+        self.notification_manager.start_checking()  # Таймер на ближайший срок возврата
         
         # ВРЕМЕННО: Настройка email для тестирования
         # TODO: Добавить настройку через интерфейс
@@ -149,6 +207,14 @@ class MainWindow(QMainWindow):
         # Создаем меню
         self.create_menu()
 
+        # Индикатор фоновой загрузки в строке состояния
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(150)
+        self.busy_indicator.setTextVisible(False)
+        self.busy_indicator.hide()
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+
         # Центральный виджет с вкладками
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -160,7 +226,21 @@ class MainWindow(QMainWindow):
         self.user_info_label = QLabel(f"👤 Вы вошли как: {self.current_user.get('full_name', 'Unknown')} ({self.current_user.get('role', 'user').upper()})")
         theme = ThemeManager.get_theme(self.current_theme)
         self.user_info_label.setStyleSheet(theme['user_info_style'])
-        layout.addWidget(self.user_info_label)
+
+        # Глобальный поиск (FTS5): админ - по всему, сотрудник - каталог и свои операции
+        is_admin = self.current_user.get('role') == 'admin'
+        self.global_search = GlobalSearchBar(
+            self.query_service, None if is_admin else self.current_user.get('employee_id'))
+        self.global_search.hit_activated.connect(self.open_search_hit)
+        search_shortcut = QAction(self)
+        search_shortcut.setShortcut(QKeySequence.StandardKey.Find)
+        search_shortcut.triggered.connect(self.global_search.setFocus)
+        self.addAction(search_shortcut)
+
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(self.user_info_label, 1)
+        header_layout.addWidget(self.global_search)
+        layout.addLayout(header_layout)
 
         # Создаем вкладки
         self.tabs = QTabWidget()
@@ -191,6 +271,11 @@ class MainWindow(QMainWindow):
             self.accounts_tab = QWidget()
             self.setup_accounts_tab()
             self.tabs.addTab(self.accounts_tab, "👥 Аккаунты")
+
+            # Вкладка: Журнал аудита (только для админа)
+            self.audit_tab = QWidget()
+            self.setup_audit_tab()
+            self.tabs.addTab(self.audit_tab, "🧾 Журнал аудита")
         else:
             # Вкладка для обычного пользователя: Мой профиль
             self.user_profile_tab = QWidget()
@@ -211,6 +296,20 @@ class MainWindow(QMainWindow):
         if self.current_user.get('role') == 'admin':
             self.load_accounts_data()
 
+        # Вкладка -> (таблицы БД, от которых она зависит; обновление по изменениям или None)
+        self._data_views = {
+            self.dashboard_tab: ({'Assets', 'Employees', 'Usage_History', 'Active_Loans'},
+                                 lambda changes: self.update_dashboard()),
+            self.operations_tab: ({'Usage_History', 'Assets', 'Employees'}, self.refresh_history),
+        }
+        if self.current_user.get('role') == 'admin':
+            self._data_views.update({
+                self.assets_tab: ({'Assets', 'Asset_Types', 'Locations'}, self._apply_asset_changes),
+                self.requests_tab: ({'Asset_Requests', 'Assets', 'Employees'},
+                                    lambda changes: self.load_requests_data()),
+                self.accounts_tab: ({'Users', 'Employees'}, lambda changes: self.load_accounts_data()),
+            })
+
         print(" Интерфейс инициализирован")
 
     def create_menu(self):
@@ -226,6 +325,22 @@ class MainWindow(QMainWindow):
         export_action.triggered.connect(self.export_all_data)
         file_menu.addAction(export_action)
 
+        if self.current_user.get('role') == 'admin':
+            backup_action = QAction("💾 Резервная копия", self)
+            backup_action.setStatusTip("Создать резервную копию базы данных")
+            backup_action.triggered.connect(self.create_backup)
+            file_menu.addAction(backup_action)
+
+            restore_action = QAction("♻️ Восстановить из копии...", self)
+            restore_action.setStatusTip("Заменить данные резервной копией")
+            restore_action.triggered.connect(self.restore_backup)
+            file_menu.addAction(restore_action)
+
+            outbox_action = QAction("📧 Журнал писем", self)
+            outbox_action.setStatusTip("Очередь исходящих писем и журнал отправки")
+            outbox_action.triggered.connect(self.show_email_outbox)
+            file_menu.addAction(outbox_action)
+
         file_menu.addSeparator()
 
         exit_action = QAction("🚪 Выход", self)
@@ -391,111 +506,113 @@ class MainWindow(QMainWindow):
         return widget
 
     def on_tab_changed(self, index):
-        """Обработчик смены вкладки"""
-        tab_text = self.tabs.tabText(index)
-        
-        if tab_text == "🏠 Панель управления":
+        """Обработчик смены вкладки: данные, устаревшие пока вкладка была скрыта, загружаются сейчас"""
+        widget = self.tabs.widget(index)
+
+        if widget is self.dashboard_tab:
+            # Счетчики берутся из кэша, если данные не менялись
+            self._dirty_views.discard(widget)
             self.update_dashboard()
-        elif tab_text == "📋 Каталог активов":
-            self.load_assets_data()
-        elif tab_text == "🔄 Операции":
-            self.load_history_data()
-    
+        elif widget is getattr(self, 'audit_tab', None):
+            # Журнал пишется постоянно - первая страница перечитывается при каждом открытии
+            self.load_audit_data()
+            self._reload_audit_actions()
+        elif widget in self._dirty_views:
+            self._dirty_views.discard(widget)
+            self._data_views[widget][1](None)
+
     def refresh_current_tab(self):
-        """Обновление текущей вкладки"""
-        current_index = self.tabs.currentIndex()
-        self.on_tab_changed(current_index)
+        """Принудительное обновление текущей вкладки"""
+        widget = self.tabs.currentWidget()
+        if widget in self._data_views:
+            self._dirty_views.discard(widget)
+            self._data_views[widget][1](None)
 
-    def update_dashboard(self):
-        """Обновление данных на панели управления"""
-        print(" Обновление панели управления...")
+    def _on_data_changed(self, changes):
+        """
+        Изменения в БД (сигнал ChangeBus): видимая вкладка обновляется сразу,
+        скрытые помечаются устаревшими и загрузятся при открытии
 
-        try:
-            is_admin = self.current_user.get('role') == 'admin'
-            employee_id = self.current_user.get('employee_id')
-            
-            # Общая статистика (для всех)
-            total_assets = self.db.execute_query("SELECT COUNT(*) FROM Assets")[0][0]
-            available_assets = \
-            self.db.execute_query("SELECT COUNT(*) FROM Assets WHERE current_status = 'Доступен'")[0][0]
-            
-            if is_admin:
-                # Для админа - общая статистика по всем
-                issued_count_result = self.db.execute_query("""
-                    SELECT COUNT(*)
-                    FROM Usage_History
-                    WHERE operation_type = 'выдача'
-                      AND actual_return_date IS NULL
-                """)
-                issued_assets = issued_count_result[0][0] if issued_count_result else 0
-
-                overdue_assets = self.db.execute_query("""
-                    SELECT COUNT(*) 
-                    FROM Usage_History uh
-                    JOIN Assets a ON uh.asset_id = a.asset_id
-                    WHERE uh.operation_type = 'выдача'
-                        AND uh.actual_return_date IS NULL
-                        AND DATE(uh.planned_return_date) < DATE('now')
-                """)[0][0]
-
-                total_employees = self.db.execute_query("SELECT COUNT(*) FROM Employees")[0][0]
-                total_operations = self.db.execute_query("SELECT COUNT(*) FROM Usage_History")[0][0]
+        Args:
+            changes: {таблица: set(rowid)}
+        """
+        current = self.tabs.currentWidget()
+        for widget, (tables, refresh) in self._data_views.items():
+            if tables.isdisjoint(changes):
+                continue
+            if widget is current:
+                refresh(changes)
             else:
-                # Для обычного пользователя - персональная статистика
-                issued_count_result = self.db.execute_query("""
-                    SELECT COUNT(*)
-                    FROM Usage_History
-                    WHERE operation_type = 'выдача'
-                      AND actual_return_date IS NULL
-                      AND employee_id = ?
-                """, (employee_id,))
-                issued_assets = issued_count_result[0][0] if issued_count_result else 0
-
-                overdue_assets = self.db.execute_query("""
-                    SELECT COUNT(*) 
-                    FROM Usage_History uh
-                    JOIN Assets a ON uh.asset_id = a.asset_id
-                    WHERE uh.operation_type = 'выдача'
-                        AND uh.actual_return_date IS NULL
-                        AND DATE(uh.planned_return_date) < DATE('now')
-                        AND uh.employee_id = ?
-                """, (employee_id,))[0][0]
-
-                # Для пользователя показываем общее количество сотрудников
-                total_employees = self.db.execute_query("SELECT COUNT(*) FROM Employees")[0][0]
-                # Но количество операций - только свои
-                total_operations = self.db.execute_query(
-                    "SELECT COUNT(*) FROM Usage_History WHERE employee_id = ?", 
-                    (employee_id,)
-                )[0][0]
+                self._dirty_views.add(widget)
 
-            # Обновляем значения
-            self.total_assets_value.setText(str(total_assets))
-            self.available_assets_value.setText(str(available_assets))
-            self.issued_assets_value.setText(str(issued_assets))
-            self.overdue_assets_value.setText(str(overdue_assets))
-            self.employees_value.setText(str(total_employees))
-            self.total_operations_value.setText(str(total_operations))
+    def _on_database_replaced(self):
+        """
+        База заменена целиком (восстановление из копии) - ChangeBus об этом
+        не знает, поэтому все кэши и производные состояния сбрасываются явно
+        """
+        for cache in (*self.db.lookups, self.asset_scanner):
+            cache.invalidate(None)
+        self.dashboard_stats.invalidate()
+        # Сроки возврата - заново из Active_Loans новой базы
+        self.notification_manager.deadline_scheduler.start()
+        self._dirty_views.update(self._data_views)
+        self.on_tab_changed(self.tabs.currentIndex())
+
+    def _load_table(self, key, table, query, params=(), on_loaded=None):
+        """
+        Фоновая загрузка результата запроса в таблицу
 
-            # Загружаем последние операции
-            self.load_recent_operations()
+        Повторный вызов с тем же ключом отменяет незавершенную загрузку.
+        on_loaded(model) вызывается после заполнения модели.
+        """
+        def apply(columns, rows):
+            model = table.model()
+            if not isinstance(model, RowsTableModel):
+                model = RowsTableModel(table)
+                table.setModel(model)
+            model.set_rows(columns, rows)
+            table.resizeColumnsToContents()
+            if on_loaded:
+                on_loaded(model)
+
+        self.query_service.submit_query(key, query, params, apply)
+
+    def _on_query_busy_changed(self, busy):
+        """Показ/скрытие индикатора фоновой загрузки"""
+        self.busy_indicator.setVisible(busy)
+
+    def _on_query_failed(self, key, error):
+        """Ошибка фоновой загрузки"""
+        QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки данных:\n{error}")
 
+    def update_dashboard(self):
+        """Обновление данных на панели управления (счетчики - из кэша или в фоне)"""
+        print(" Обновление панели управления...")
+
+        is_admin = self.current_user.get('role') == 'admin'
+        # Для админа - общая статистика, для пользователя - персональная
+        employee_id = None if is_admin else self.current_user.get('employee_id')
+
+        def apply(stats):
+            # Обновляем значения
+            labels = (self.total_assets_value, self.available_assets_value, self.issued_assets_value,
+                      self.overdue_assets_value, self.employees_value, self.total_operations_value)
+            for label, value in zip(labels, stats):
+                label.setText(str(value))
             print(" Панель управления обновлена")
 
-        except Exception as e:
-            print(f" Ошибка обновления панели управления: {e}")
+        def on_error(error):
+            print(f" Ошибка обновления панели управления: {error}")
 
-    def load_recent_operations(self):
-        """Загрузка последних операций для дашборда"""
-        if not hasattr(self, 'db_connection'):
+        if self.dashboard_stats.load(self.query_service, employee_id, apply, on_error):
+            # Данные не менялись - последние операции тоже прежние
             return
 
-        # Очищаем старую модель
-        if hasattr(self, 'recent_operations_table') and self.recent_operations_table.model():
-            self.recent_operations_table.setModel(None)
+        # Последние операции загружаются параллельно со счетчиками
+        self.load_recent_operations()
 
-        model = QSqlQueryModel()
-        
+    def load_recent_operations(self):
+        """Загрузка последних операций для дашборда"""
         is_admin = self.current_user.get('role') == 'admin'
         employee_id = self.current_user.get('employee_id')
 
@@ -519,9 +636,10 @@ class MainWindow(QMainWindow):
             ORDER BY uh.history_id DESC
             LIMIT 10
             """
+            params = ()
         else:
             # Для пользователя - только его операции
-            query = f"""
+            query = """
             SELECT 
                 CASE 
                     WHEN uh.operation_type = 'выдача' THEN '📤 Выдача'
@@ -534,14 +652,13 @@ class MainWindow(QMainWindow):
                 uh.operation_date as 'Дата операции'
             FROM Usage_History uh
             LEFT JOIN Assets a ON uh.asset_id = a.asset_id
-            WHERE uh.employee_id = {employee_id}
+            WHERE uh.employee_id = ?
             ORDER BY uh.history_id DESC
             LIMIT 10
             """
+            params = (employee_id,)
 
-        model.setQuery(query, self.db_connection)
-        self.recent_operations_table.setModel(model)
-        self.recent_operations_table.resizeColumnsToContents()
+        self._load_table('recent_operations', self.recent_operations_table, query, params)
 
     def setup_assets_tab(self):
         """Настройка вкладки каталога активов"""
@@ -573,10 +690,26 @@ class MainWindow(QMainWindow):
         buttons_layout.addWidget(self.btn_refresh)
         buttons_layout.addStretch()
 
+        # Поиск по мере ввода - фильтрует загруженный каталог, без запросов к БД
+        self.assets_search = QLineEdit()
+        self.assets_search.setPlaceholderText("🔍 Поиск: название, тип, модель, серийный номер...")
+        self.assets_search.setClearButtonEnabled(True)
+        self.assets_search.setMinimumWidth(320)
+        self.assets_search.textChanged.connect(self.filter_assets)
+        self.assets_count_label = QLabel()
+        buttons_layout.addWidget(self.assets_search)
+        buttons_layout.addWidget(self.assets_count_label)
+
         layout.addLayout(buttons_layout)
 
-        # Таблица активов
+        # Таблица активов: сортировка по заголовку тоже без запросов к БД
         self.assets_table = QTableView()
+        self.assets_model = AssetCatalogModel(parent=self.assets_table)
+        self.assets_table.setModel(self.assets_model)
+        self.assets_table.setSortingEnabled(True)
+        self.assets_table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        # Ширина колонок - по первым строкам, а не по всему каталогу
+        self.assets_table.horizontalHeader().setResizeContentsPrecision(KeysetTableModel.PAGE_SIZE)
         self.assets_table.doubleClicked.connect(self.edit_asset)
         layout.addWidget(self.assets_table)
 
@@ -594,8 +727,9 @@ class MainWindow(QMainWindow):
         # Панель фильтров истории
         filter_layout = QHBoxLayout()
 
-        self.history_employee_filter = QComboBox()
-        self.history_employee_filter.addItem("Все сотрудники", None)
+        # Поле с поиском вместо списка всех сотрудников; пустое - все сотрудники
+        self.history_employee_filter = EntityPicker(self.db.employee_lookup, "Все сотрудники")
+        self.history_employee_filter.setMinimumWidth(220)
 
         self.history_operation_filter = QComboBox()
         self.history_operation_filter.addItem("Все операции", None)
@@ -643,22 +777,44 @@ class MainWindow(QMainWindow):
         self.btn_history = QPushButton("🔄 Обновить")
         self.btn_history.setShortcut(QKeySequence("F5"))
         self.btn_history.setToolTip("Обновить историю операций (F5)")
+        self.btn_scan_mode = QPushButton("📷 Сканер")
+        self.btn_scan_mode.setCheckable(True)
+        self.btn_scan_mode.setShortcut(QKeySequence("F8"))
+        self.btn_scan_mode.setToolTip("Режим сканирования штрихкодов (F8)")
 
         operations_layout.addWidget(self.btn_issue)
         operations_layout.addWidget(self.btn_return)
         operations_layout.addWidget(self.btn_request)
         operations_layout.addWidget(self.btn_history)
+        operations_layout.addWidget(self.btn_scan_mode)
         
-        # Скрываем кнопку выдачи для обычных пользователей
+        # Скрываем кнопки выдачи и сканера для обычных пользователей
         if self.current_user.get('role') != 'admin':
             self.btn_issue.hide()
+            self.btn_scan_mode.hide()
         
         operations_layout.addStretch()
 
         layout.addLayout(operations_layout)
 
-        # Таблица для истории операций
+        # Панель сканирования создается при первом включении режима
+        self.scan_panel = None
+        self.scan_panel_layout = QVBoxLayout()
+        layout.addLayout(self.scan_panel_layout)
+
+        # Таблица для истории операций: одна модель на все загрузки - фильтры меняют
+        # ее запрос, изменения данных перечитывают страницы на месте (прокрутка сохраняется)
+        query, params = self.history_query()
+        # Постранично по ключу (operation_date, history_id): колонки 'Дата операции' и 'ID'
+        self.history_model = KeysetTableModel(
+            self.db.pool, query, params,
+            key_sql=('uh.operation_date', 'uh.history_id'), key_columns=(5, 0),
+            query_service=self.query_service, load_key='history', parent=self
+        )
         self.history_table = QTableView()
+        self.history_table.setModel(self.history_model)
+        # Ширина колонок - по первой странице, а не по всем строкам
+        self.history_table.horizontalHeader().setResizeContentsPrecision(KeysetTableModel.PAGE_SIZE)
         layout.addWidget(self.history_table)
 
         # Подключаем кнопки
@@ -666,12 +822,10 @@ class MainWindow(QMainWindow):
         self.btn_return.clicked.connect(self.return_asset)
         self.btn_request.clicked.connect(self.request_asset)
         self.btn_history.clicked.connect(self.load_history_data)
+        self.btn_scan_mode.toggled.connect(self.toggle_scan_mode)
         self.btn_apply_filters.clicked.connect(self.load_history_data)
         self.btn_clear_filters.clicked.connect(self.clear_history_filters)
 
-        # Загружаем данные для фильтров
-        self.load_history_filters_data()
-
     def setup_reports_tab(self):
         """Настройка вкладки отчетов"""
         layout = QVBoxLayout(self.reports_tab)
@@ -726,74 +880,84 @@ class MainWindow(QMainWindow):
         self.btn_export_csv.clicked.connect(self.export_to_csv)
         self.btn_export_excel.clicked.connect(self.export_to_excel)
 
-        # Текущий тип отчета для экспорта
+        # Текущий тип отчета и его запрос (query, params) для экспорта
         self.current_report_type = None
+        self._report_query = None
 
     def load_assets_data(self):
         """Загрузка данных об активах"""
+        # Таблица существует только у админов
+        if not hasattr(self, 'assets_table'):
+            return
+
         print(" Загрузка данных об активах...")
 
-        if not hasattr(self, 'db_connection'):
-            self.db_connection = QSqlDatabase.addDatabase("QSQLITE")
-            # Используем тот же путь к БД, что и db_manager
-            db_path = self.db._get_db_path()
-            self.db_connection.setDatabaseName(db_path)
-
-        if not self.db_connection.isOpen():
-            if not self.db_connection.open():
-                error = self.db_connection.lastError().text()
-                print(f" Ошибка подключения к базе: {error}")
-                QMessageBox.critical(self, "Ошибка", f"Не удалось подключиться к базе данных!\n{error}")
-                return
+        # Полная перезагрузка заменяет все точечные обновления
+        self.query_service.cancel('asset_rows')
+        self._pending_asset_ids.clear()
 
-        model = QSqlQueryModel()
+        model = self.assets_model
 
-        query = """
-        SELECT 
-            a.asset_id as 'ID',
-            a.name as 'Название',
-            at.type_name as 'Тип',
-            a.model as 'Модель',
-            a.serial_number as 'Серийный номер',
-            a.current_status as 'Статус',
-            l.location_name as 'Местоположение',
-            a.quantity as 'Количество'
-        FROM Assets a
-        JOIN Asset_Types at ON a.type_id = at.type_id
-        JOIN Locations l ON a.location_id = l.location_id
-        ORDER BY a.asset_id
-        """
-
-        model.setQuery(query)
+        def fetch(connection):
+            # Ключи поиска и сортировки считаются здесь же, в рабочем потоке
+            cursor = connection.execute(self.ASSETS_QUERY)
+            columns = [description[0] for description in cursor.description]
+            return model.prepare(columns, cursor.fetchall())
 
-        if model.lastError().isValid():
-            error = model.lastError().text()
-            print(f" Ошибка выполнения запроса: {error}")
-            QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки данных:\n{error}")
-        else:
-            row_count = model.rowCount()
-            print(f" Данные загружены. Найдено записей: {row_count}")
+        def apply(catalog):
+            model.set_prepared(catalog)
+            self.assets_table.resizeColumnsToContents()
+            self._update_assets_count()
+            print(f" Данные загружены. Найдено записей: {model.total_count()}")
 
-            if row_count == 0:
+            if model.total_count() == 0:
                 print("️ В базе данных нет записей.")
 
-        # Устанавливаем модель только если таблица существует (для админов)
-        if hasattr(self, 'assets_table'):
-            self.assets_table.setModel(model)
-            self.assets_table.resizeColumnsToContents()
+        self.query_service.submit('assets', fetch, apply)
 
-    def load_history_data(self):
-        """Загрузка истории операций с фильтрами"""
-        print(" Загрузка истории операций...")
-
-        # Сначала обновляем статусы просроченных активов в примечаниях
-        self._update_overdue_notes()
+    def filter_assets(self, text):
+        """Фильтр каталога по мере ввода (все слова запроса, без учета регистра)"""
+        self.assets_model.set_filter(text)
+        self._update_assets_count()
 
-        if not hasattr(self, 'db_connection'):
+    def _update_assets_count(self):
+        model = self.assets_model
+        if model.rowCount() == model.total_count():
+            self.assets_count_label.setText(f"Всего: {model.total_count()}")
+        else:
+            self.assets_count_label.setText(f"Найдено: {model.rowCount()} из {model.total_count()}")
+
+    def _apply_asset_changes(self, changes):
+        """Точечное обновление строк каталога по изменившимся asset_id (None - перезагрузить все)"""
+        model = self.assets_model
+        asset_ids = changes.get('Assets') if changes else None
+        if (not asset_ids or not model.total_count()
+                or self.query_service.is_loading('assets')
+                or not {'Asset_Types', 'Locations'}.isdisjoint(changes)
+                or len(self._pending_asset_ids | asset_ids) > self.MAX_ROW_UPDATES):
+            # Справочники влияют на многие строки, а массовые изменения дешевле перечитать целиком
+            self.load_assets_data()
             return
 
-        model = QSqlQueryModel()
+        # Незавершенное точечное обновление вытесняется - его строки берем в новое
+        self._pending_asset_ids |= asset_ids
+        ids = sorted(self._pending_asset_ids)
+        query = f"{self.ASSETS_QUERY} WHERE a.asset_id IN ({', '.join('?' for _ in ids)})"
 
+        def fetch(connection):
+            return connection.execute(query, ids).fetchall()
+
+        def apply(rows):
+            self._pending_asset_ids.difference_update(ids)
+            found = {row[0] for row in rows}
+            model.update_rows(0, rows, removed_keys=[asset_id for asset_id in ids if asset_id not in found])
+            self._update_assets_count()
+            print(f" Каталог активов: обновлено строк {len(rows)}, удалено {len(ids) - len(found)}")
+
+        self.query_service.submit('asset_rows', fetch, apply)
+
+    def history_query(self):
+        """Запрос истории операций по текущим фильтрам: (query, params)"""
         # Базовый запрос
         query = """
         SELECT 
@@ -817,8 +981,9 @@ class MainWindow(QMainWindow):
                 ELSE a.current_status
             END as 'Статус актива',
             CASE 
-                WHEN uh.operation_type = 'выдача' AND uh.actual_return_date IS NULL AND DATE(uh.planned_return_date) < DATE('now')
-                THEN COALESCE(uh.notes, '') || ' [Просрочено]'
+                WHEN uh.operation_type = 'выдача' AND uh.actual_return_date IS NULL AND uh.planned_return_date < DATE('now', 'localtime')
+                THEN COALESCE(uh.notes, '') || ' [Просрочено с '
+                     || COALESCE(uh.overdue_since, DATE(uh.planned_return_date, '+1 day')) || ']'
                 WHEN uh.actual_return_date IS NOT NULL AND DATE(uh.actual_return_date) > DATE(uh.planned_return_date)
                 THEN COALESCE(uh.notes, '') || ' [Возвращено с опозданием]'
                 ELSE COALESCE(uh.notes, '')
@@ -844,83 +1009,66 @@ class MainWindow(QMainWindow):
 
         date_from = self.history_date_from.date().toString("yyyy-MM-dd")
         date_to = self.history_date_to.date().toString("yyyy-MM-dd")
-        query += " AND DATE(uh.operation_date) BETWEEN ? AND ?"
+        # Полуоткрытый диапазон без функции над колонкой - работает индекс по operation_date
+        query += " AND uh.operation_date >= ? AND uh.operation_date < DATE(?, '+1 day')"
         params.extend([date_from, date_to])
 
-        query += " ORDER BY uh.operation_date DESC"
+        return query, params
 
-        # Выполняем запрос
-        query_obj = QSqlQuery(self.db_connection)
-        query_obj.prepare(query)
+    def load_history_data(self):
+        """Загрузка истории операций с фильтрами (с первой страницы)"""
+        print(" Загрузка истории операций...")
+        model = self.history_model
+        model.set_query(*self.history_query())
 
-        for param in params:
-            query_obj.addBindValue(param)
+        def apply(result):
+            model.set_first_page(result)
+            self.history_table.resizeColumnsToContents()
+            print(f" История загружена. Первая страница: {model.rowCount()} записей")
 
-        # Очищаем старую модель
-        if hasattr(self, 'history_table') and self.history_table.model():
-            self.history_table.setModel(None)
+        self.query_service.submit('history', model.fetch_first_page, apply)
 
-        if not query_obj.exec():
-            error = query_obj.lastError().text()
-            print(f" Ошибка загрузки истории: {error}")
+    def refresh_history(self, changes):
+        """Изменения данных: перечитать загруженные страницы истории, не сбрасывая таблицу"""
+        if self.history_model.columnCount() == 0:
+            self.load_history_data()
         else:
-            model.setQuery(query_obj)
-            print(f" История загружена. Записей: {model.rowCount()}")
-
-        self.history_table.setModel(model)
-        self.history_table.resizeColumnsToContents()
-
-    def _update_overdue_notes(self):
-        """Автоматическое обновление примечаний для просроченных активов"""
-        try:
-            # Получаем просроченные активы без отметки в примечаниях
-            query = """
-                SELECT history_id, notes
-                FROM Usage_History
-                WHERE operation_type = 'выдача'
-                    AND actual_return_date IS NULL
-                    AND DATE(planned_return_date) < DATE('now')
-                    AND (notes IS NULL OR notes NOT LIKE '%Просрочено%')
-            """
-            
-            results = self.db.execute_query(query)
-            
-            for history_id, notes in results:
-                from PyQt6.QtCore import QDate
-                new_notes = f"{notes}\n[Просрочено: {QDate.currentDate().toString('yyyy-MM-dd')}]" if notes else f"[Просрочено: {QDate.currentDate().toString('yyyy-MM-dd')}]"
-                
-                self.db.execute_update(
-                    "UPDATE Usage_History SET notes = ? WHERE history_id = ?",
-                    (new_notes, history_id)
-                )
-                
-        except Exception as e:
-            print(f"️ Предупреждение при обновлении примечаний: {e}")
-
-
-    def load_history_filters_data(self):
-        """Загрузка данных для фильтров истории"""
-        try:
-            employees = self.db.execute_query("""
-                SELECT employee_id, last_name || ' ' || first_name as full_name
-                FROM Employees 
-                ORDER BY last_name, first_name
-            """)
-
-            for employee_id, full_name in employees:
-                self.history_employee_filter.addItem(full_name, employee_id)
-
-        except Exception as e:
-            print(f"Ошибка загрузки фильтров истории: {e}")
+            self.history_model.refresh()
 
     def clear_history_filters(self):
         """Сброс фильтров истории"""
-        self.history_employee_filter.setCurrentIndex(0)
+        self.history_employee_filter.set_current(None)
         self.history_operation_filter.setCurrentIndex(0)
         self.history_date_from.setDate(QDate.currentDate().addDays(-30))
         self.history_date_to.setDate(QDate.currentDate())
         self.load_history_data()
 
+    def open_search_hit(self, hit):
+        """Переход к найденному: актив - в каталоге, сотрудник и операция - в истории операций"""
+        if hit.kind == SEARCH_ASSET and hasattr(self, 'assets_tab'):
+            self.tabs.setCurrentWidget(self.assets_tab)
+            if self.assets_model.row_of(hit.entity_id) is None:
+                self.assets_search.clear()
+            row = self.assets_model.row_of(hit.entity_id)
+            if row is not None:
+                self.assets_table.selectRow(row)
+                self.assets_table.scrollTo(self.assets_model.index(row, 0))
+            return
+
+        employee_id = hit.entity_id if hit.kind == SEARCH_EMPLOYEE else hit.employee_id
+        if hit.kind == SEARCH_ASSET or employee_id is None:
+            return
+        self.tabs.setCurrentWidget(self.operations_tab)
+        self.history_employee_filter.set_current(employee_id)
+        self.history_operation_filter.setCurrentIndex(0)
+        if hit.operation_date:
+            # Период с найденной операцией
+            day = QDate.fromString(hit.operation_date[:10], "yyyy-MM-dd")
+            if day.isValid():
+                self.history_date_from.setDate(min(day, self.history_date_from.date()))
+                self.history_date_to.setDate(max(day, self.history_date_to.date()))
+        self.load_history_data()
+
     def get_selected_asset_id(self):
         """Получение ID выбранного актива"""
         # Получаем текущую выбранную строку
@@ -942,7 +1090,7 @@ class MainWindow(QMainWindow):
         print("➕ Открытие диалога добавления актива...")
         dialog = AssetDialog(self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self._refresh_all_data()
+            print(" Актив добавлен")
 
     def edit_asset(self):
         """Редактирование выбранного актива"""
@@ -955,7 +1103,6 @@ class MainWindow(QMainWindow):
         dialog = EditAssetDialog(asset_id, self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             print(" Актив успешно отредактирован")
-            self._refresh_all_data()
 
     def delete_asset(self):
         """Удаление выбранного актива"""
@@ -969,45 +1116,35 @@ class MainWindow(QMainWindow):
         # Создаем диалог для удаления
         dialog = EditAssetDialog(asset_id, self)
 
-        # Подключаемся к сигналу закрытия диалога
-        dialog.finished.connect(lambda result: self.on_asset_dialog_finished(result, asset_id))
-
         # Показываем диалог - пользователь сам нажмет кнопку удаления внутри диалога
         dialog.exec()
 
-    def _refresh_all_data(self):
-        """Обновление всех таблиц и панелей после операции"""
-        self.load_assets_data()
-        self.load_history_data()
-        self.load_recent_operations()
-        
-        # Обновляем статистику на панели управления
-        if hasattr(self, 'total_assets_value'):
-            self.update_dashboard()
-
-    def on_asset_dialog_finished(self, result, asset_id):
-        """Обработчик завершения работы диалога редактирования/удаления"""
-        if result == QDialog.DialogCode.Accepted:
-            print(" Операция с активом завершена, обновляем таблицы...")
-            self._refresh_all_data()
-
     def issue_asset(self):
         """Выдача актива сотруднику"""
         print("Открытие диалога выдачи актива...")
         dialog = IssueDialog(self)
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            self._refresh_all_data()
+        dialog.exec()
 
     def return_asset(self):
         """Возврат актива"""
         print("Открытие диалога возврата актива...")
         dialog = ReturnDialog(self, self.current_user)
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            self._refresh_all_data()
+        dialog.exec()
+
+    def toggle_scan_mode(self, enabled):
+        """Показать или скрыть панель сканирования"""
+        if enabled and self.scan_panel is None:
+            self.scan_panel = ScanPanel(self.asset_scanner, self.db.employee_lookup, self.current_user, self)
+            self.scan_panel_layout.addWidget(self.scan_panel)
+        if self.scan_panel is not None:
+            self.scan_panel.setVisible(enabled)
+        if enabled:
+            self.tabs.setCurrentWidget(self.operations_tab)
+            self.scan_panel.activate()
 
     def export_to_csv(self):
         """Экспорт текущего отчета в CSV"""
-        if not self.reports_table.model():
+        if self._report_query is None:
             QMessageBox.warning(self, "Ошибка", "Сначала сгенерируйте отчет!")
             return
 
@@ -1023,40 +1160,11 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
 
-        try:
-            model = self.reports_table.model()
-            
-            with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                # Получаем количество столбцов и строк
-                row_count = model.rowCount()
-                col_count = model.columnCount()
-                
-                # Пишем заголовки
-                headers = []
-                for col in range(col_count):
-                    header = model.headerData(col, Qt.Orientation.Horizontal)
-                    headers.append(str(header) if header else "")
-                
-                writer = csv.writer(csvfile, delimiter=';')
-                writer.writerow(headers)
-                
-                # Пишем данные
-                for row in range(row_count):
-                    row_data = []
-                    for col in range(col_count):
-                        index = model.index(row, col)
-                        value = model.data(index)
-                        row_data.append(str(value) if value is not None else "")
-                    writer.writerow(row_data)
-            
-            QMessageBox.information(self, "Успех", f"Отчет успешно сохранен:\n{file_path}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка экспорта в CSV: {e}")
+        self._export_report(export_csv, file_path, "CSV")
 
     def export_to_excel(self):
         """Экспорт текущего отчета в Excel"""
-        if not self.reports_table.model():
+        if self._report_query is None:
             QMessageBox.warning(self, "Ошибка", "Сначала сгенерируйте отчет!")
             return
 
@@ -1072,59 +1180,59 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
 
-        try:
-            model = self.reports_table.model()
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Отчет"
-            
-            # Получаем количество столбцов и строк
-            row_count = model.rowCount()
-            col_count = model.columnCount()
-            
-            # Стили для заголовка
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            
-            # Пишем заголовки
-            for col in range(col_count):
-                header = model.headerData(col, Qt.Orientation.Horizontal)
-                header_text = str(header) if header else ""
-                cell = ws.cell(row=1, column=col+1, value=header_text)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-            
-            # Пишем данные
-            for row in range(row_count):
-                for col in range(col_count):
-                    index = model.index(row, col)
-                    value = model.data(index)
-                    cell = ws.cell(row=row+2, column=col+1, value=value)
-                    cell.alignment = Alignment(wrap_text=True)
-            
-            # Автоматически регулируем ширину столбцов
-            for col in range(col_count):
-                max_length = 0
-                column_letter = chr(65 + col) if col < 26 else "A" + chr(65 + col - 26)
-                
-                for row in range(row_count + 1):
-                    try:
-                        cell_value = str(ws.cell(row=row+1, column=col+1).value or "")
-                        if len(cell_value) > max_length:
-                            max_length = len(cell_value)
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[chr(65 + col) if col < 26 else "A" + chr(65 + col - 26)].width = adjusted_width
-            
-            wb.save(file_path)
-            QMessageBox.information(self, "Успех", f"Отчет успешно сохранен:\n{file_path}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка экспорта в Excel: {e}")
+        self._export_report(export_xlsx, file_path, "Excel")
+
+    def _export_report(self, export, file_path, format_name):
+        """
+        Выгрузка отчета: запрос отчета выполняется заново, строки
+        пишутся в файл прямо из курсора (export_csv / export_xlsx)
+        """
+        query, params = self._report_query
+        self._export_in_background(
+            f"Экспорт в {format_name}", "Экспорт отчета...",
+            lambda connection, progress: export(connection, query, params, file_path, progress),
+            lambda count: f"Отчет успешно сохранен (строк: {count}):\n{file_path}",
+            f"Ошибка экспорта в {format_name}"
+        )
+
+    def _export_in_background(self, title, label, export, success_message, error_prefix):
+        """
+        Фоновая выгрузка через QueryService с окном прогресса и отменой
+
+        export(connection, progress) выполняется в рабочем потоке на read-only
+        соединении и возвращает число строк; success_message(count) - текст итога.
+        """
+        progress = QProgressDialog(label, "Отмена", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+
+        export_progress = ExportProgress(progress)
+        export_progress.rows_written.connect(
+            lambda count: progress.setLabelText(f"{label} строк: {count}"))
+
+        def on_cancel():
+            # Рабочий поток прерывается и удаляет недописанный файл
+            self.query_service.cancel('export')
+            progress.close()
+
+        def on_result(count):
+            progress.close()
+            QMessageBox.information(self, "Успех", success_message(count))
+
+        def on_error(error):
+            progress.close()
+            QMessageBox.critical(self, "Ошибка", f"{error_prefix}: {error}")
+
+        progress.canceled.connect(on_cancel)
+        self.query_service.submit(
+            'export',
+            lambda connection: export(connection, export_progress.rows_written.emit),
+            on_result, on_error
+        )
+        progress.show()
 
     def print_report(self):
         """Метод больше не используется"""
@@ -1135,14 +1243,8 @@ class MainWindow(QMainWindow):
         print("Генерация отчета по просрочкам...")
         self.current_report_type = "overdue_report"
 
-        if not hasattr(self, 'db_connection'):
-            return
-
-        # Очищаем старую модель
-        if hasattr(self, 'reports_table') and self.reports_table.model():
-            self.reports_table.setModel(None)
-
-        model = QSqlQueryModel()
+        # Очищаем старый отчет, чтобы не экспортировать его, пока грузится новый
+        self.reports_table.setModel(None)
 
         query = """
         SELECT 
@@ -1154,7 +1256,7 @@ class MainWindow(QMainWindow):
             uh.actual_return_date as 'Фактический возврат',
             CASE 
                 WHEN uh.actual_return_date IS NULL 
-                THEN CAST(JULIANDAY('now') - JULIANDAY(uh.planned_return_date) AS INTEGER)
+                THEN CAST(JULIANDAY(DATE('now', 'localtime')) - JULIANDAY(uh.planned_return_date) AS INTEGER)
                 ELSE CAST(JULIANDAY(uh.actual_return_date) - JULIANDAY(uh.planned_return_date) AS INTEGER)
             END as 'Дней просрочки',
             CASE 
@@ -1168,29 +1270,26 @@ class MainWindow(QMainWindow):
         JOIN Employees e ON uh.employee_id = e.employee_id
         WHERE uh.operation_type = 'выдача'
             AND (
-                (uh.actual_return_date IS NULL AND DATE(uh.planned_return_date) < DATE('now'))
+                (uh.actual_return_date IS NULL AND uh.planned_return_date < DATE('now', 'localtime'))
                 OR
                 (uh.actual_return_date IS NOT NULL AND DATE(uh.actual_return_date) > DATE(uh.planned_return_date))
             )
         ORDER BY uh.planned_return_date
         """
 
-        model.setQuery(query, self.db_connection)
-        self.reports_table.setModel(model)
-        self.reports_table.resizeColumnsToContents()
+        def on_loaded(model):
+            if model.rowCount() == 0:
+                QMessageBox.information(self, "Информация", "Нет просроченных активов!")
 
-        if model.rowCount() == 0:
-            QMessageBox.information(self, "Информация", "Нет просроченных активов!")
+        self._report_query = (query, ())
+        self._load_table('report', self.reports_table, query, (), on_loaded)
 
     def generate_usage_report(self):
         """Генерация отчета по использованию активов"""
         print("Генерация отчета по использованию...")
         self.current_report_type = "usage_report"
 
-        if not hasattr(self, 'db_connection'):
-            return
-
-        model = QSqlQueryModel()
+        self.reports_table.setModel(None)
 
         query = """
         SELECT 
@@ -1205,19 +1304,15 @@ class MainWindow(QMainWindow):
         ORDER BY COUNT(uh.history_id) DESC
         """
 
-        model.setQuery(query)
-        self.reports_table.setModel(model)
-        self.reports_table.resizeColumnsToContents()
+        self._report_query = (query, ())
+        self._load_table('report', self.reports_table, query)
 
     def generate_inventory_report(self):
         """Генерация инвентаризационной ведомости"""
         print("Генерация инвентаризационной ведомости...")
         self.current_report_type = "inventory_report"
 
-        if not hasattr(self, 'db_connection'):
-            return
-
-        model = QSqlQueryModel()
+        self.reports_table.setModel(None)
 
         query = """
         SELECT 
@@ -1235,9 +1330,8 @@ class MainWindow(QMainWindow):
         ORDER BY a.asset_id
         """
 
-        model.setQuery(query)
-        self.reports_table.setModel(model)
-        self.reports_table.resizeColumnsToContents()
+        self._report_query = (query, ())
+        self._load_table('report', self.reports_table, query)
 
     def export_all_data(self):
         """Экспорт всех данных системы в Excel"""
@@ -1252,271 +1346,89 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
 
-        try:
-            wb = Workbook()
-            wb.remove(wb.active)  # Удаляем лист по умолчанию
-            
-            # Стили для заголовков
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            data_alignment = Alignment(wrap_text=True, vertical="top")
-            
-            # 1. Лист с активами
-            self._export_assets_sheet(wb, header_font, header_fill, header_alignment, data_alignment)
-            
-            # 2. Лист с сотрудниками
-            self._export_employees_sheet(wb, header_font, header_fill, header_alignment, data_alignment)
-            
-            # 3. Лист с историей операций
-            self._export_history_sheet(wb, header_font, header_fill, header_alignment, data_alignment)
-            
-            # 4. Лист с типами активов
-            self._export_asset_types_sheet(wb, header_font, header_fill, header_alignment, data_alignment)
-            
-            # 5. Лист с местоположениями
-            self._export_locations_sheet(wb, header_font, header_fill, header_alignment, data_alignment)
-            
-            # 6. Лист со статистикой
-            self._export_statistics_sheet(wb, header_font, header_fill, header_alignment, data_alignment)
-            
-            wb.save(file_path)
-            QMessageBox.information(self, "Успех", f"Все данные успешно экспортированы:\n{file_path}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при экспорте данных: {e}")
+        # Все листы - из одного снимка БД (см. data_exporter.export_all_data)
+        self._export_in_background(
+            "Экспорт всех данных", "Экспорт данных...",
+            lambda connection, progress: export_all_data(connection, file_path, progress),
+            lambda count: f"Все данные успешно экспортированы:\n{file_path}",
+            "Ошибка при экспорте данных"
+        )
 
-    def _export_assets_sheet(self, wb, header_font, header_fill, header_alignment, data_alignment):
-        """Экспорт таблицы активов"""
-        ws = wb.create_sheet("Активы")
-        
-        headers = ["ID", "Название", "Тип", "Модель", "Серийный номер", "Статус", "Местоположение", "Количество"]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Получаем данные активов
-        query = """
-        SELECT a.asset_id, a.name, at.type_name, a.model, a.serial_number, 
-               a.current_status, l.location_name, a.quantity
-        FROM Assets a
-        JOIN Asset_Types at ON a.type_id = at.type_id
-        JOIN Locations l ON a.location_id = l.location_id
-        ORDER BY a.asset_id
-        """
-        
-        rows = self.db.execute_query(query)
-        for row_idx, row_data in enumerate(rows, 2):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.alignment = data_alignment
-        
-        # Регулируем ширину столбцов
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[chr(64 + col)].width = 20
+    def create_backup(self):
+        """Создание резервной копии базы данных"""
+        self._start_backup(manual=True)
 
-    def _export_employees_sheet(self, wb, header_font, header_fill, header_alignment, data_alignment):
-        """Экспорт таблицы сотрудников"""
-        ws = wb.create_sheet("Сотрудники")
-        
-        headers = ["ID", "Фамилия", "Имя", "Отчество", "Должность", "Email", "Телефон"]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Получаем данные сотрудников с присоединением таблицы должностей
-        query = """
-        SELECT e.employee_id, e.last_name, e.first_name, e.patronymic, 
-               COALESCE(p.position_name, ''), e.email, e.phone 
-        FROM Employees e
-        LEFT JOIN Positions p ON e.position_id = p.position_id
-        ORDER BY e.employee_id
-        """
-        
-        rows = self.db.execute_query(query)
-        for row_idx, row_data in enumerate(rows, 2):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.alignment = data_alignment
-        
-        # Регулируем ширину столбцов
-        widths = [10, 15, 15, 15, 20, 25, 15]
-        for col, width in enumerate(widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
+    def _run_scheduled_backup(self):
+        """Плановая копия, если с последней прошло больше интервала"""
+        if self.query_service.is_loading('backup') or self.query_service.is_loading('restore'):
+            return
+        if self.backup_manager.is_due(self.backup_interval_hours):
+            self._start_backup(manual=False)
+
+    def _start_backup(self, manual):
+        """Создание копии в фоне (окно не блокируется, запись в БД продолжается)"""
+        if self.query_service.is_loading('backup'):
+            if manual:
+                QMessageBox.information(self, "Резервное копирование", "Резервная копия уже создается")
+            return
 
-    def _export_history_sheet(self, wb, header_font, header_fill, header_alignment, data_alignment):
-        """Экспорт таблицы истории операций"""
-        ws = wb.create_sheet("История операций")
-        
-        headers = ["ID", "Актив", "Сотрудник", "Тип операции", "Дата операции", 
-                   "Плановый возврат", "Фактический возврат", "Примечания"]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Получаем данные истории
-        query = """
-        SELECT uh.history_id, a.name, e.last_name || ' ' || e.first_name, 
-               uh.operation_type, uh.operation_date, uh.planned_return_date, 
-               uh.actual_return_date, COALESCE(uh.notes, '')
-        FROM Usage_History uh
-        JOIN Assets a ON uh.asset_id = a.asset_id
-        JOIN Employees e ON uh.employee_id = e.employee_id
-        ORDER BY uh.history_id DESC
-        """
-        
-        rows = self.db.execute_query(query)
-        for row_idx, row_data in enumerate(rows, 2):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.alignment = data_alignment
-        
-        # Регулируем ширину столбцов
-        widths = [10, 25, 25, 15, 20, 20, 20, 40]
-        for col, width in enumerate(widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
+        print(" Создание резервной копии...")
+        self.statusBar().showMessage("Создание резервной копии...")
 
-    def _export_asset_types_sheet(self, wb, header_font, header_fill, header_alignment, data_alignment):
-        """Экспорт таблицы типов активов"""
-        ws = wb.create_sheet("Типы активов")
-        
-        headers = ["ID", "Название типа"]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Получаем данные типов
-        query = "SELECT type_id, type_name FROM Asset_Types ORDER BY type_id"
-        
-        rows = self.db.execute_query(query)
-        for row_idx, row_data in enumerate(rows, 2):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.alignment = data_alignment
-        
-        # Регулируем ширину столбцов
-        ws.column_dimensions['A'].width = 10
-        ws.column_dimensions['B'].width = 30
+        def on_result(path):
+            self.statusBar().showMessage(f"Резервная копия создана: {path}", 10000)
+            if manual:
+                QMessageBox.information(self, "Резервное копирование", f"Резервная копия создана:\n{path}")
 
-    def _export_locations_sheet(self, wb, header_font, header_fill, header_alignment, data_alignment):
-        """Экспорт таблицы местоположений"""
-        ws = wb.create_sheet("Местоположения")
-        
-        headers = ["ID", "Название местоположения"]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Получаем данные местоположений
-        query = "SELECT location_id, location_name FROM Locations ORDER BY location_id"
-        
-        rows = self.db.execute_query(query)
-        for row_idx, row_data in enumerate(rows, 2):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.alignment = data_alignment
-        
-        # Регулируем ширину столбцов
-        ws.column_dimensions['A'].width = 10
-        ws.column_dimensions['B'].width = 40
+        def on_error(error):
+            self.statusBar().showMessage("Ошибка резервного копирования", 10000)
+            if manual:
+                QMessageBox.critical(self, "Ошибка", f"Ошибка резервного копирования:\n{error}")
 
-    def _export_statistics_sheet(self, wb, header_font, header_fill, header_alignment, data_alignment):
-        """Экспорт листа со статистикой"""
-        ws = wb.create_sheet("Статистика", 0)  # Добавляем в начало
-        
-        ws.title = "Статистика"
-        
-        # Заголовок
-        title_cell = ws.cell(row=1, column=1, value="СТАТИСТИКА СИСТЕМЫ")
-        title_cell.font = Font(bold=True, size=14, color="FFFFFF")
-        title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        title_cell.alignment = Alignment(horizontal="center", vertical="center")
-        ws.merge_cells('A1:B1')
-        ws.row_dimensions[1].height = 25
-        
-        # Пустая строка
-        ws.row_dimensions[2].height = 5
-        
-        # Получаем статистику
-        row = 3
-        
-        # Всего активов
-        total_assets = self.db.execute_query("SELECT COUNT(*) FROM Assets")[0][0]
-        ws.cell(row=row, column=1, value="Всего активов:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=total_assets)
-        row += 1
-        
-        # Доступны
-        available = self.db.execute_query("SELECT COUNT(*) FROM Assets WHERE current_status = 'Доступен'")[0][0]
-        ws.cell(row=row, column=1, value="Доступно активов:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=available)
-        row += 1
-        
-        # Выданы
-        issued = self.db.execute_query("""
-            SELECT COUNT(*) FROM Usage_History 
-            WHERE operation_type = 'выдача' AND actual_return_date IS NULL
-        """)[0][0]
-        ws.cell(row=row, column=1, value="Выдано активов:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=issued)
-        row += 1
-        
-        # Списаны
-        written_off = self.db.execute_query("SELECT COUNT(*) FROM Assets WHERE current_status = 'Списан'")[0][0]
-        ws.cell(row=row, column=1, value="Списано активов:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=written_off)
-        row += 1
-        
-        # Просроченные
-        overdue = self.db.execute_query("""
-            SELECT COUNT(*) FROM Usage_History uh
-            WHERE uh.operation_type = 'выдача'
-                AND uh.actual_return_date IS NULL
-                AND DATE(uh.planned_return_date) < DATE('now')
-        """)[0][0]
-        ws.cell(row=row, column=1, value="Просроченные активы:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=overdue)
-        row += 2
-        
-        # Количество сотрудников
-        employees = self.db.execute_query("SELECT COUNT(*) FROM Employees")[0][0]
-        ws.cell(row=row, column=1, value="Количество сотрудников:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=employees)
-        row += 1
-        
-        # Всего операций
-        operations = self.db.execute_query("SELECT COUNT(*) FROM Usage_History")[0][0]
-        ws.cell(row=row, column=1, value="Всего операций:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=operations)
-        row += 2
-        
-        # Дата экспорта
-        ws.cell(row=row, column=1, value="Дата экспорта:").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        
-        # Регулируем ширину столбцов
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['B'].width = 20
+        self.query_service.submit('backup', self.backup_manager.create_backup, on_result, on_error)
 
-    def create_backup(self):
-        """Создание резервной копии базы данных"""
-        QMessageBox.information(self, "Резервное копирование",
-                                "Функция резервного копирования будет реализована в следующей версии")
+    def restore_backup(self):
+        """Восстановление базы данных из резервной копии"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Выбрать резервную копию",
+            self.backup_manager.backup_dir,
+            "Резервные копии (*.db *.db.gz);;All Files (*)"
+        )
+
+        if not file_path:
+            return
+
+        reply = QMessageBox.question(
+            self,
+            "Восстановление",
+            f"Все текущие данные будут заменены данными из копии:\n{file_path}\n\n"
+            "Текущее состояние будет предварительно сохранено. Продолжить?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        progress = QProgressDialog("Восстановление из резервной копии...", None, 0, 0, self)
+        progress.setWindowTitle("Восстановление")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_result(safety_copy):
+            progress.close()
+            self._on_database_replaced()
+            QMessageBox.information(self, "Восстановление",
+                                    f"База данных восстановлена.\nПредыдущее состояние сохранено:\n{safety_copy}")
+
+        def on_error(error):
+            progress.close()
+            QMessageBox.critical(self, "Ошибка", f"Ошибка восстановления:\n{error}")
+
+        self.query_service.submit(
+            'restore', lambda connection: self.backup_manager.restore(self.db.pool, file_path),
+            on_result, on_error
+        )
+        progress.show()
 
     def show_about(self):
         """Показ информации о программе"""
@@ -1641,7 +1553,7 @@ class MainWindow(QMainWindow):
         QMessageBox.information(self, "Обновления", "Проверка обновлений...\nУ вас установлена последняя версия.")
 
     def import_assets_from_excel(self):
-        """Импорт активов из Excel файла"""
+        """Импорт активов из Excel файла (в фоне, с прогрессом и отменой)"""
         print("Открытие диалога импорта активов из Excel...")
         
         file_path, _ = QFileDialog.getOpenFileName(
@@ -1654,125 +1566,39 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
 
-        try:
-            wb = load_workbook(file_path)
-            ws = wb.active
-
-            # Пропускаем заголовок и читаем данные
-            assets_count = 0
-            errors = []
-
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                try:
-                    # Распаковываем данные: название, тип, модель, серийный номер, местоположение, количество
-                    if len(row) < 6:
-                        errors.append(f"Строка {row_idx}: недостаточно данных")
-                        continue
-
-                    name = str(row[0]).strip() if row[0] else None
-                    type_name = str(row[1]).strip() if row[1] else None
-                    model = str(row[2]).strip() if row[2] else ""
-                    serial_number = str(row[3]).strip() if row[3] else ""
-                    location_name = str(row[4]).strip() if row[4] else None
-                    quantity = int(row[5]) if row[5] and str(row[5]).isdigit() else 1
-
-                    # Проверяем обязательные поля
-                    if not name:
-                        errors.append(f"Строка {row_idx}: отсутствует название актива")
-                        continue
-                    if not type_name:
-                        errors.append(f"Строка {row_idx}: отсутствует тип актива")
-                        continue
-                    if not location_name:
-                        errors.append(f"Строка {row_idx}: отсутствует местоположение")
-                        continue
-
-                    # Получаем или создаем тип актива
-                    type_id = self._get_or_create_asset_type(type_name)
-                    if not type_id:
-                        errors.append(f"Строка {row_idx}: не удалось создать тип '{type_name}'")
-                        continue
-
-                    # Получаем или создаем местоположение
-                    location_id = self._get_or_create_location(location_name)
-                    if not location_id:
-                        errors.append(f"Строка {row_idx}: не удалось создать местоположение '{location_name}'")
-                        continue
-
-                    # Добавляем актив в базу данных
-                    query = """
-                    INSERT INTO Assets (name, type_id, model, serial_number, location_id, current_status, quantity)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """
-                    self.db.execute_update(
-                        query,
-                        (name, type_id, model, serial_number, location_id, "Доступен", quantity)
-                    )
-                    assets_count += 1
-                    print(f" Актив добавлен (строка {row_idx}): {name}")
-
-                except Exception as e:
-                    errors.append(f"Строка {row_idx}: {str(e)}")
-                    continue
-
-            # Показываем результаты
-            message = f"✅ Успешно импортировано активов: {assets_count}"
-            if errors:
-                message += f"\n\n⚠️ Ошибки при импорте ({len(errors)}):\n"
-                message += "\n".join(errors[:10])  # Показываем первые 10 ошибок
-                if len(errors) > 10:
-                    message += f"\n... и еще {len(errors) - 10} ошибок"
-
-            QMessageBox.information(self, "Результаты импорта", message)
-
-            # Обновляем таблицу активов
-            if assets_count > 0:
-                self.load_assets_data()
-
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при импорте файла:\n{str(e)}")
-
-    def _get_or_create_asset_type(self, type_name):
-        """Получает ID типа актива, если существует, или создает новый"""
-        try:
-            # Проверяем, существует ли тип
-            result = self.db.execute_query(
-                "SELECT type_id FROM Asset_Types WHERE type_name = ?",
-                (type_name,)
-            )
-            if result:
-                return result[0][0]
-
-            # Создаем новый тип
-            new_id = self.db.execute_update(
-                "INSERT INTO Asset_Types (type_name) VALUES (?)",
-                (type_name,)
-            )
-            return new_id
-        except Exception as e:
-            print(f" Ошибка при работе с типом актива: {e}")
-            return None
-
-    def _get_or_create_location(self, location_name):
-        """Получает ID местоположения, если существует, или создает новое"""
-        try:
-            # Проверяем, существует ли местоположение
-            result = self.db.execute_query(
-                "SELECT location_id FROM Locations WHERE location_name = ?",
-                (location_name,)
-            )
-            if result:
-                return result[0][0]
-
-            # Создаем новое местоположение
-            new_id = self.db.execute_update(
-                "INSERT INTO Locations (location_name) VALUES (?)",
-                (location_name,)
-            )
-            return new_id
-        except Exception as e:
-            print(f" Ошибка при работе с местоположением: {e}")
-            return None
+        progress = QProgressDialog("Импорт активов...", "Отмена", 0, 0, self)
+        progress.setWindowTitle("Импорт из Excel")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+
+        worker = AssetImportWorker(self.db.pool, file_path, self)
+        progress.canceled.connect(worker.requestInterruption)
+
+        def on_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(min(done, total) if total else 0)
+
+        worker.progress.connect(on_progress)
+        worker.report_ready.connect(lambda report: self._show_import_report(report, progress))
+        worker.finished.connect(worker.deleteLater)
+        self._import_worker = worker
+        worker.start()
+        progress.show()
+
+    def _show_import_report(self, report, progress):
+        """Итог импорта; полный список ошибок - в подробностях сообщения"""
+        progress.close()
+        self._import_worker = None
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Результаты импорта")
+        box.setIcon(QMessageBox.Icon.Critical if report.failure else QMessageBox.Icon.Information)
+        box.setText(report.summary())
+        if report.errors:
+            box.setDetailedText(report.error_text())
+        box.exec()
 
     def setup_requests_tab(self):
         """Настройка вкладки запросов на выдачу активов (только для админа)"""
@@ -1846,8 +1672,6 @@ class MainWindow(QMainWindow):
         """Загрузка списка всех аккаунтов"""
         print(" Загрузка аккаунтов...")
 
-        model = QSqlQueryModel()
-
         query = """
         SELECT 
             u.user_id as 'ID',
@@ -1862,12 +1686,10 @@ class MainWindow(QMainWindow):
         ORDER BY u.created_at DESC
         """
 
-        model.setQuery(query, self.db_connection)
-        self.accounts_table.setModel(model)
-        self.accounts_table.resizeColumnsToContents()
+        def on_loaded(model):
+            print(f" Загружено аккаунтов: {model.rowCount()}")
 
-        row_count = model.rowCount()
-        print(f" Загружено аккаунтов: {row_count}")
+        self._load_table('accounts', self.accounts_table, query, (), on_loaded)
 
     def delete_account(self):
         """Удаление аккаунта пользователя с подтверждением пароля"""
@@ -1940,9 +1762,6 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Успех", f"Аккаунт '{username}' успешно удален!")
             print(f"Удален аккаунт: {username} (ID: {user_id})")
             
-            # Обновляем таблицу
-            self.load_accounts_data()
-            
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при удалении аккаунта:\n{str(e)}")
             print(f"Ошибка удаления аккаунта: {e}")
@@ -2002,12 +1821,11 @@ class MainWindow(QMainWindow):
             SELECT 
                 a.name,
                 uh.planned_return_date,
-                CAST((julianday(uh.planned_return_date) - julianday('now')) AS INTEGER) as days_until
-            FROM Usage_History uh
+                CAST(julianday(DATE(uh.planned_return_date)) - julianday(DATE('now', 'localtime')) AS INTEGER)
+                    as days_until
+            FROM Active_Loans uh
             JOIN Assets a ON uh.asset_id = a.asset_id
             WHERE uh.employee_id = ?
-                AND uh.operation_type = 'выдача'
-                AND uh.actual_return_date IS NULL
             ORDER BY uh.planned_return_date ASC
         """, (employee_id,))
         
@@ -2097,71 +1915,155 @@ class MainWindow(QMainWindow):
         # Определяем тему
         is_overdue = radio_overdue.isChecked()
         
-        # Отправляем письма для каждого инструмента
-        sent_count = 0
-        failed_count = 0
-        
-        print(f"Отправка писем: is_overdue={is_overdue}, всего инструментов={len(active_issues)}")
+        # Одно письмо-сводка по выбранной теме - через очередь: окно не ждет SMTP,
+        # та же сводка сегодня повторно не ставится
+        notifier = self.notification_manager.email_notifier
+        print(f"Постановка письма в очередь: is_overdue={is_overdue}, всего инструментов={len(active_issues)}")
         
-        for asset_name, return_date, days_until in active_issues:
-            print(f"  Проверка: {asset_name}, days_until={days_until}")
-            
-            # Фильтруем по выбранной теме
-            if is_overdue:
-                # Тема "просрочка" - отправляем только для days_until <= 0 (сегодня или просрочено)
-                if days_until > 0:
-                    print(f"    Пропускаем (не просрочен)")
-                    continue
-            else:
-                # Тема "приближается срок" - отправляем только для days_until > 0 (будущие даты)
-                if days_until <= 0:
-                    print(f"    Пропускаем (уже просрочен или сегодня)")
-                    continue
-            
-            print(f"    Отправка письма...")
-            try:
-                success = self.notification_manager.email_notifier.send_deadline_warning(
-                    employee_email=email,
-                    employee_name=employee_name,
-                    asset_name=asset_name,
-                    deadline_date=return_date,
-                    days_until=days_until
-                )
-                
-                if success:
-                    sent_count += 1
-                else:
-                    failed_count += 1
-                    
-            except Exception as e:
-                print(f"Ошибка отправки письма: {e}")
-                import traceback
-                traceback.print_exc()
-                failed_count += 1
-        
-        print(f"Итого: отправлено={sent_count}, ошибок={failed_count}")
-        
-        # Показываем результат
-        if sent_count > 0:
-            QMessageBox.information(
-                self,
-                "Письма отправлены",
-                f"✅ Отправлено писем: {sent_count}\n"
-                f"{'❌ Ошибок: ' + str(failed_count) if failed_count > 0 else ''}\n\n"
-                f"Получатель: {employee_name} ({email})"
-            )
-        else:
-            error_details = ""
-            if failed_count == 0:
-                error_details = "Не найдено инструментов для выбранной темы письма.\n\nПопробуйте выбрать другую тему."
-            else:
-                error_details = f"Произошли ошибки при отправке ({failed_count} ошибок).\n\nПроверьте консоль для деталей.\n\nВозможные причины:\n• Email-уведомления не настроены\n• Неверные SMTP-настройки\n• Проблемы с сетью"
-            
+        # Тема "просрочка" - только сегодня или просрочено, "приближается срок" - только будущие даты
+        items = [issue for issue in active_issues if (issue[2] <= 0) == is_overdue]
+        if not items:
             QMessageBox.warning(
                 self,
                 "Письма не отправлены",
-                error_details
+                "Не найдено инструментов для выбранной темы письма.\n\nПопробуйте выбрать другую тему."
             )
+            return
+        
+        theme = 'overdue' if is_overdue else 'upcoming'
+        key = f"manual_digest:{employee_id}:{theme}:{datetime.now().date().isoformat()}"
+        try:
+            queued_count = notifier.outbox.enqueue([(key,) + notifier.employee_digest(email, employee_name, items)])
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось поставить письмо в очередь:\n{e}")
+            return
+        
+        QMessageBox.information(
+            self,
+            "Письмо поставлено в очередь",
+            (f"✅ Письмо поставлено в очередь, инструментов в письме: {len(items)}\n\n"
+             if queued_count else "ℹ️ Такое письмо сегодня уже отправлялось\n\n")
+            + f"Получатель: {employee_name} ({email})\n"
+            f"Состояние отправки - в меню «Файл → Журнал писем»"
+        )
+
+    def show_email_outbox(self):
+        """Журнал исходящих писем"""
+        dialog = EmailOutboxDialog(self.notification_manager.email_notifier.outbox, self)
+        dialog.exec()
+
+    def setup_audit_tab(self):
+        """Настройка вкладки журнала аудита (только для админа)"""
+        layout = QVBoxLayout(self.audit_tab)
+
+        filter_layout = QHBoxLayout()
+
+        self.audit_user_filter = EntityPicker(self.db.user_lookup, "Все пользователи")
+        self.audit_user_filter.setMinimumWidth(180)
+
+        self.audit_action_filter = QComboBox()
+        self.audit_action_filter.addItem("Все действия", None)
+
+        self.audit_asset_filter = QSpinBox()
+        self.audit_asset_filter.setRange(0, 2147483647)
+        self.audit_asset_filter.setSpecialValueText("Любой")
+
+        self.audit_date_from = QDateEdit()
+        self.audit_date_from.setDate(QDate.currentDate().addDays(-30))
+        self.audit_date_from.setCalendarPopup(True)
+
+        self.audit_date_to = QDateEdit()
+        self.audit_date_to.setDate(QDate.currentDate())
+        self.audit_date_to.setCalendarPopup(True)
+
+        btn_apply = QPushButton("🔍 Применить фильтры")
+        btn_clear = QPushButton("❌ Сбросить")
+
+        filter_layout.addWidget(QLabel("Пользователь:"))
+        filter_layout.addWidget(self.audit_user_filter)
+        filter_layout.addWidget(QLabel("Действие:"))
+        filter_layout.addWidget(self.audit_action_filter)
+        filter_layout.addWidget(QLabel("ID актива:"))
+        filter_layout.addWidget(self.audit_asset_filter)
+        filter_layout.addWidget(QLabel("С:"))
+        filter_layout.addWidget(self.audit_date_from)
+        filter_layout.addWidget(QLabel("По:"))
+        filter_layout.addWidget(self.audit_date_to)
+        filter_layout.addWidget(btn_apply)
+        filter_layout.addWidget(btn_clear)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        self.audit_table = QTableView()
+        layout.addWidget(self.audit_table)
+
+        btn_apply.clicked.connect(self.load_audit_data)
+        btn_clear.clicked.connect(self.clear_audit_filters)
+
+        self._reload_audit_actions()
+
+    def _reload_audit_actions(self):
+        """Обновить список действий, сохранив выбранное"""
+        selected = self.audit_action_filter.currentData()
+        self.audit_action_filter.blockSignals(True)
+        self.audit_action_filter.clear()
+        self.audit_action_filter.addItem("Все действия", None)
+        for action in AuditLogger.list_actions():
+            self.audit_action_filter.addItem(action, action)
+        index = self.audit_action_filter.findData(selected)
+        self.audit_action_filter.setCurrentIndex(max(index, 0))
+        self.audit_action_filter.blockSignals(False)
+
+    def load_audit_data(self):
+        """Загрузка журнала аудита с фильтрами (постранично, от новых к старым)"""
+        conditions, params = AuditLogger.filter_conditions(
+            date_from=self.audit_date_from.date().toString("yyyy-MM-dd"),
+            date_to=self.audit_date_to.date().toString("yyyy-MM-dd"),
+            user_id=self.audit_user_filter.currentData(),
+            action=self.audit_action_filter.currentData(),
+            asset_id=self.audit_asset_filter.value() or None,
+        )
+        query = f"""
+        SELECT
+            log_id as 'ID',
+            timestamp as 'Время',
+            username as 'Пользователь',
+            action as 'Действие',
+            asset_id as 'ID актива',
+            details as 'Подробности'
+        FROM Audit_Log
+        WHERE 1=1{conditions}
+        """
+
+        # Постранично по ключу (timestamp, log_id): колонки 'Время' и 'ID'
+        model = KeysetTableModel(
+            self.db.pool, query, params,
+            key_sql=('timestamp', 'log_id'), key_columns=(1, 0),
+            query_service=self.query_service, load_key='audit'
+        )
+
+        def apply(result):
+            model.set_first_page(result)
+            self.audit_table.setModel(model)
+            self.audit_table.horizontalHeader().setResizeContentsPrecision(model.PAGE_SIZE)
+            self.audit_table.resizeColumnsToContents()
+
+        def fetch_first_page(connection):
+            # Только что записанные действия - в фоне и недолго, без сохранения очереди в файл
+            AuditLogger.wait_written()
+            return model.fetch_first_page(connection)
+
+        self.query_service.submit('audit', fetch_first_page, apply)
+
+    def clear_audit_filters(self):
+        """Сброс фильтров журнала аудита"""
+        self.audit_user_filter.set_current(None)
+        self.audit_action_filter.setCurrentIndex(0)
+        self.audit_asset_filter.setValue(0)
+        self.audit_date_from.setDate(QDate.currentDate().addDays(-30))
+        self.audit_date_to.setDate(QDate.currentDate())
+        self._reload_audit_actions()
+        self.load_audit_data()
 
     def setup_user_profile_tab(self):
         """Настройка вкладки профиля пользователя"""
@@ -2442,26 +2344,9 @@ class MainWindow(QMainWindow):
         """Загрузка списка запросов на выдачу активов"""
         print(" Загрузка запросов на выдачу активов...")
 
-        if not hasattr(self, 'db_connection'):
-            # Проверяем, существует ли уже подключение с таким именем
-            connection_name = 'qt_sql_default_connection'
-            if QSqlDatabase.contains(connection_name):
-                self.db_connection = QSqlDatabase.database(connection_name)
-            else:
-                self.db_connection = QSqlDatabase.addDatabase("QSQLITE", connection_name)
-                # Используем тот же путь к БД, что и db_manager
-                db_path = self.db._get_db_path()
-                self.db_connection.setDatabaseName(db_path)
-
-        if not self.db_connection.isOpen():
-            if not self.db_connection.open():
-                return
-
-        # Очищаем старую модель
-        if hasattr(self, 'requests_table') and self.requests_table.model():
-            self.requests_table.setModel(None)
-
-        model = QSqlQueryModel()
+        # Таблица существует только у админов
+        if not hasattr(self, 'requests_table'):
+            return
 
         query = """
         SELECT 
@@ -2484,15 +2369,10 @@ class MainWindow(QMainWindow):
         ORDER BY ar.request_date DESC
         """
 
-        model.setQuery(query, self.db_connection)
-        
-        # Устанавливаем модель только если таблица существует (только для админов)
-        if hasattr(self, 'requests_table'):
-            self.requests_table.setModel(model)
-            self.requests_table.resizeColumnsToContents()
+        def on_loaded(model):
+            print(f" Загружено запросов: {model.rowCount()}")
 
-        row_count = model.rowCount()
-        print(f" Загружено запросов: {row_count}")
+        self._load_table('requests', self.requests_table, query, (), on_loaded)
 
     def approve_request(self):
         """Одобрение запроса на выдачу актива"""
@@ -2519,69 +2399,61 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            # Получаем информацию из запроса
-            req_data = self.db.execute_query(
-                "SELECT asset_id, employee_id, planned_return_date, notes FROM Asset_Requests WHERE request_id = ?",
-                (request_id,)
-            )[0]
-
-            asset_id, employee_id, planned_return_date, notes = req_data
-
-            # Проверяем количество доступных активов
-            asset_data = self.db.execute_query(
-                "SELECT quantity, current_status FROM Assets WHERE asset_id = ?",
-                (asset_id,)
-            )[0]
+            # Выдача, списание со склада и закрытие запроса - одна транзакция
+            with self.db.transaction():
+                # Получаем информацию из запроса
+                req_data = self.db.execute_query(
+                    "SELECT asset_id, employee_id, planned_return_date, notes FROM Asset_Requests WHERE request_id = ?",
+                    (request_id,)
+                )[0]
+
+                asset_id, employee_id, planned_return_date, notes = req_data
+
+                # Проверяем количество доступных активов
+                current_qty = self.db.execute_query(
+                    "SELECT quantity FROM Assets WHERE asset_id = ?",
+                    (asset_id,)
+                )[0][0]
 
-            current_qty, status = asset_data
+                # Запрос всегда на одну единицу
+                quantity_issued = 1
+                if current_qty < quantity_issued:
+                    raise ValueError("На складе нет доступных единиц!")
 
-            if current_qty <= 0:
-                QMessageBox.warning(self, "Ошибка", "На складе нет доступных единиц!")
-                return
+                # Создаем операцию выдачи
+                history_query = """
+                INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, planned_return_date, quantity, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """
 
-            # Создаем операцию выдачи
-            history_query = """
-            INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, planned_return_date, notes)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """
-
-            self.db.execute_update(
-                history_query,
-                (asset_id, employee_id, 'выдача', datetime.now().isoformat(), planned_return_date, notes)
-            )
-
-            # Обновляем количество активов
-            new_qty = current_qty - 1
+                self.db.execute_update(
+                    history_query,
+                    (asset_id, employee_id, 'выдача', datetime.now().isoformat(), planned_return_date,
+                     quantity_issued, notes)
+                )
 
-            self.db.execute_update(
-                "UPDATE Assets SET quantity = ? WHERE asset_id = ?",
-                (new_qty, asset_id)
-            )
-            
-            # Обновляем статус на основе активных выдач
-            self.db.update_asset_status(asset_id)
+                # Обновляем количество активов
+                self.db.execute_update(
+                    "UPDATE Assets SET quantity = quantity - ? WHERE asset_id = ?",
+                    (quantity_issued, asset_id)
+                )
+                
+                # Обновляем статус на основе активных выдач
+                self.db.update_asset_status(asset_id)
 
-            # Обновляем статус запроса
-            self.db.execute_update(
-                "UPDATE Asset_Requests SET status = ?, approved_by = ?, approved_at = ? WHERE request_id = ?",
-                ('approved', int(self.current_user.get('user_id', 0)), datetime.now().isoformat(), request_id)
-            )
+                # Обновляем статус запроса
+                self.db.execute_update(
+                    "UPDATE Asset_Requests SET status = ?, approved_by = ?, approved_at = ? WHERE request_id = ?",
+                    ('approved', int(self.current_user.get('user_id', 0)), datetime.now().isoformat(), request_id)
+                )
 
-            # Обновляем все данные для отображения изменений
-            self._refresh_all_data()
-            
-            # Принудительно обновляем таблицу запросов
-            if hasattr(self, 'requests_table'):
-                self.load_requests_data()
-            
-            # Обновляем историю операций
-            if hasattr(self, 'history_table'):
-                self.load_history_data()
-            
             print(f"Запрос {request_id} одобрен: актив {asset_id} выдан сотруднику {employee_id}")
             
             QMessageBox.information(self, "Успех", "✅ Запрос одобрен и актив выдан!")
 
+        except ValueError as e:
+            # Проверка остатка внутри транзакции - транзакция уже откатена
+            QMessageBox.warning(self, "Ошибка", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при одобрении запроса:\n{str(e)}")
             import traceback
@@ -2618,7 +2490,6 @@ class MainWindow(QMainWindow):
             )
 
             QMessageBox.information(self, "Успех", "✅ Запрос отклонен!")
-            self.load_requests_data()
 
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при отклонении запроса:\n{str(e)}")
@@ -2630,10 +2501,7 @@ class MainWindow(QMainWindow):
             return
 
         dialog = RequestAssetDialog(self.current_user, self)
-        if dialog.exec() == QDialog.DialogCode.Accepted:
-            # Обновляем список запросов только если таблица существует (для админов)
-            if hasattr(self, 'requests_table'):
-                self.load_requests_data()
+        dialog.exec()
 
     def logout(self):
         """Выход и возврат на экран авторизации"""
@@ -2654,6 +2522,15 @@ class MainWindow(QMainWindow):
         # Останавливаем проверку уведомлений
         if hasattr(self, 'notification_manager'):
             self.notification_manager.cleanup()
+
+        # Прерываем создание резервной копии, отменяем фоновые загрузки и ждем рабочие потоки
+        if hasattr(self, 'backup_manager'):
+            self.backup_timer.stop()
+            self.backup_manager.cancel()
+        if hasattr(self, 'query_service'):
+            self.query_service.shutdown()
+        # Дописываем в БД действия, еще стоящие в очереди аудит-лога
+        AuditLogger.flush()
         
         super().closeEvent(event)
 
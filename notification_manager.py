@@ -274,10 +274,12 @@ class NotificationManager:
         self.db = DatabaseManager()
         self.main_window = main_window
         self.signals = NotificationSignals()
-        self.check_timer = QTimer()
-        self.check_timer.setSingleShot(False)
-        self.check_timer.timeout.connect(self._check_deadlines)
         self.notification_widgets = []
+
+        # Сроки возврата: таймер только на ближайший переход, без опроса раз в минуту
+        from deadline_scheduler import DeadlineScheduler
+        self.deadline_scheduler = DeadlineScheduler(self.db.pool, self.db.change_bus)
+        self.deadline_scheduler.deadlines_reached.connect(self._show_deadlines)
         
         # Email-уведомления
         from email_notifier import EmailNotifier
@@ -298,6 +300,8 @@ class NotificationManager:
         if self.email_notifier.enabled:
             print(f"Запуск проверки email-уведомлений (каждые {interval_ms//60000} мин)...")
             self.email_timer.start(interval_ms)
+            # Письма, оставшиеся в очереди с прошлого запуска, уходят сразу
+            self.email_notifier.outbox.start()
             # НЕ отправляем сразу при старте - только по таймеру, чтобы не замедлять загрузку
             print("Email будут отправляться по расписанию (не при каждом входе)")
         else:
@@ -306,24 +310,24 @@ class NotificationManager:
     def stop_email_checking(self):
         """Остановить проверку email"""
         self.email_timer.stop()
+        self.email_notifier.outbox.stop()
         
     def _check_and_send_emails(self):
-        """Проверить сроки и отправить email-уведомления"""
+        """Поставить email-уведомления в очередь (отправляет поток EmailOutbox, окно SMTP не ждет)"""
         try:
             self.email_notifier.check_and_send_notifications()
         except Exception as e:
             print(f"Ошибка при отправке email-уведомлений: {e}")
         
-    def start_checking(self, interval_ms=60000):
-        """Запустить периодическую проверку сроков (по умолчанию каждую минуту)"""
+    def start_checking(self):
+        """Запустить отслеживание сроков (уведомления при наступлении срока, а не по опросу)"""
         print("Запуск проверки сроков уведомлений...")
-        self.check_timer.start(interval_ms)
-        # Сразу проверяем при старте
-        self._check_deadlines()
+        # Сразу показываем текущее состояние, дальше - только переходы
+        self.deadline_scheduler.start()
         
     def stop_checking(self):
         """Остановить проверку сроков"""
-        self.check_timer.stop()
+        self.deadline_scheduler.stop()
     
     def update_all_notifications_theme(self, new_theme):
         """Обновить тему всех активных уведомлений"""
@@ -334,81 +338,16 @@ class NotificationManager:
             except Exception as e:
                 print(f"Ошибка при обновлении темы уведомления: {e}")
         
-    def _check_deadlines(self):
-        """Проверка сроков возврата и создание уведомлений"""
-        try:
-            today = QDate.currentDate()
-            tomorrow = today.addDays(1)
-            
-            # Получаем активы, которые нужно вернуть
-            query = """
-                SELECT 
-                    uh.history_id,
-                    a.asset_id,
-                    a.name,
-                    e.last_name || ' ' || e.first_name as employee_name,
-                    uh.planned_return_date,
-                    uh.actual_return_date,
-                    DATE('now') as today
-                FROM Usage_History uh
-                JOIN Assets a ON uh.asset_id = a.asset_id
-                JOIN Employees e ON uh.employee_id = e.employee_id
-                WHERE uh.operation_type = 'выдача'
-                    AND uh.actual_return_date IS NULL
-                    AND DATE(uh.planned_return_date) <= DATE('+1 day')
-                ORDER BY uh.planned_return_date ASC
-            """
-            
-            results = self.db.execute_query(query)
-            
-            for row in results:
-                history_id, asset_id, asset_name, employee_name, planned_date_str, _, _ = row
-                
-                planned_date = QDate.fromString(planned_date_str, "yyyy-MM-dd")
-                
-                # Определяем тип уведомления
-                if planned_date == today:
-                    notif_type = 'error'
-                    title = '⚠️ Срок истекает сегодня'
-                    message = f'{asset_name}\nу {employee_name}'
-                elif planned_date == tomorrow:
-                    notif_type = 'warning'
-                    title = '⏰ Завтра истекает срок'
-                    message = f'{asset_name}\nу {employee_name}'
-                elif planned_date < today:
-                    notif_type = 'error'
-                    title = '🚨 Инструмент просрочен'
-                    message = f'{asset_name}\nу {employee_name}'
-                    # Обновляем примечание в истории
-                    self._mark_as_overdue(history_id)
-                else:
-                    continue
-                
-                # Показываем уведомление
-                self.show_notification(notif_type, title, message)
-                
-        except Exception as e:
-            print(f" Ошибка при проверке сроков: {e}")
-    
-    def _mark_as_overdue(self, history_id):
-        """Отметить запись как просроченную"""
-        try:
-            # Проверяем, уже ли отмечена как просроченная
-            result = self.db.execute_query(
-                "SELECT notes FROM Usage_History WHERE history_id = ?",
-                (history_id,)
-            )
-            
-            if result:
-                notes = result[0][0] or ""
-                if "Просрочено" not in notes:
-                    new_notes = f"{notes}\n[Просрочено: {QDate.currentDate().toString('yyyy-MM-dd')}]" if notes else f"[Просрочено: {QDate.currentDate().toString('yyyy-MM-dd')}]"
-                    self.db.execute_update(
-                        "UPDATE Usage_History SET notes = ? WHERE history_id = ?",
-                        (new_notes, history_id)
-                    )
-        except Exception as e:
-            print(f" Ошибка при отметке как просроченная: {e}")
+    def _show_deadlines(self, reached):
+        """Уведомления о выдачах, перешедших в новое состояние (сигнал DeadlineScheduler)"""
+        titles = {
+            'overdue': ('error', '🚨 Инструмент просрочен'),
+            'today': ('error', '⚠️ Срок истекает сегодня'),
+            'tomorrow': ('warning', '⏰ Завтра истекает срок'),
+        }
+        for kind, history_id, asset_name, employee_name, planned_date in reached:
+            notif_type, title = titles[kind]
+            self.show_notification(notif_type, title, f'{asset_name}\nу {employee_name}')
     
     def show_notification(self, notif_type='info', title='', message='', persistent=False, variant='default'):
         """Показать всплывающее уведомление"""
@@ -469,15 +408,13 @@ class NotificationManager:
                         a.asset_id,
                         a.name,
                         e.last_name || ' ' || e.first_name as employee_name,
-                        uh.planned_return_date,
-                        CAST((DATE('now') - DATE(uh.planned_return_date)) AS INTEGER) as days_overdue
-                    FROM Usage_History uh
-                    JOIN Assets a ON uh.asset_id = a.asset_id
-                    JOIN Employees e ON uh.employee_id = e.employee_id
-                    WHERE uh.operation_type = 'выдача'
-                        AND uh.actual_return_date IS NULL
-                        AND DATE(uh.planned_return_date) < DATE('now')
-                    ORDER BY uh.planned_return_date ASC
+                        al.planned_return_date,
+                        CAST(julianday(DATE('now', 'localtime')) - julianday(DATE(al.planned_return_date)) AS INTEGER) as days_overdue
+                    FROM Active_Loans al
+                    JOIN Assets a ON al.asset_id = a.asset_id
+                    JOIN Employees e ON al.employee_id = e.employee_id
+                    WHERE al.planned_return_date < DATE('now', 'localtime')
+                    ORDER BY al.planned_return_date ASC
                 """
                 
                 return self.db.execute_query(query)
@@ -495,24 +432,21 @@ class NotificationManager:
             # Получаем активы пользователя, которые нужно вернуть
             query = """
                 SELECT 
-                    uh.history_id,
+                    al.history_id,
                     a.asset_id,
                     a.name,
-                    uh.planned_return_date,
-                    uh.actual_return_date
-                FROM Usage_History uh
-                JOIN Assets a ON uh.asset_id = a.asset_id
-                WHERE uh.employee_id = ?
-                    AND uh.operation_type = 'выдача'
-                    AND uh.actual_return_date IS NULL
-                    AND DATE(uh.planned_return_date) <= DATE('now')
-                ORDER BY uh.planned_return_date ASC
+                    al.planned_return_date
+                FROM Active_Loans al
+                JOIN Assets a ON al.asset_id = a.asset_id
+                WHERE al.employee_id = ?
+                    AND al.planned_return_date < DATE('now', 'localtime', '+1 day')
+                ORDER BY al.planned_return_date ASC
             """
             
             overdue_results = self.db.execute_query(query, (employee_id,))
             
             for row in overdue_results:
-                history_id, asset_id, asset_name, planned_date_str, _ = row
+                history_id, asset_id, asset_name, planned_date_str = row
                 planned_date = QDate.fromString(planned_date_str, "yyyy-MM-dd")
                 
                 if planned_date < today:
@@ -522,7 +456,6 @@ class NotificationManager:
                     title = '🚨 Просрочка'
                     message = f'{asset_name}\nПросрочка: {days_overdue} дн.'
                     self.show_notification('error', title, message, persistent=True)
-                    self._mark_as_overdue(history_id)
                 elif planned_date == today:
                     # Сегодня истекает срок - PERSISTENT
                     title = '⚠️ Срок истекает сегодня'
@@ -532,17 +465,16 @@ class NotificationManager:
             # Проверяем активы, которые нужно вернуть завтра
             query_tomorrow = """
                 SELECT 
-                    uh.history_id,
+                    al.history_id,
                     a.asset_id,
                     a.name,
-                    uh.planned_return_date
-                FROM Usage_History uh
-                JOIN Assets a ON uh.asset_id = a.asset_id
-                WHERE uh.employee_id = ?
-                    AND uh.operation_type = 'выдача'
-                    AND uh.actual_return_date IS NULL
-                    AND DATE(uh.planned_return_date) = DATE('now', '+1 day')
-                ORDER BY uh.planned_return_date ASC
+                    al.planned_return_date
+                FROM Active_Loans al
+                JOIN Assets a ON al.asset_id = a.asset_id
+                WHERE al.employee_id = ?
+                    AND al.planned_return_date >= DATE('now', 'localtime', '+1 day')
+                    AND al.planned_return_date < DATE('now', 'localtime', '+2 day')
+                ORDER BY al.planned_return_date ASC
             """
             
             tomorrow_results = self.db.execute_query(query_tomorrow, (employee_id,))
@@ -564,17 +496,15 @@ class NotificationManager:
             # Получаем ВСЕ просроченные активы (выданные, но не возвращённые, и срок уже прошёл)
             query = """
                 SELECT 
-                    uh.history_id,
+                    al.history_id,
                     e.last_name || ' ' || e.first_name || COALESCE(' ' || e.patronymic, '') as employee_full_name,
                     a.name,
-                    uh.planned_return_date
-                FROM Usage_History uh
-                JOIN Assets a ON uh.asset_id = a.asset_id
-                JOIN Employees e ON uh.employee_id = e.employee_id
-                WHERE uh.operation_type = 'выдача'
-                    AND uh.actual_return_date IS NULL
-                    AND DATE(uh.planned_return_date) < DATE('now')
-                ORDER BY uh.planned_return_date ASC
+                    al.planned_return_date
+                FROM Active_Loans al
+                JOIN Assets a ON al.asset_id = a.asset_id
+                JOIN Employees e ON al.employee_id = e.employee_id
+                WHERE al.planned_return_date < DATE('now', 'localtime')
+                ORDER BY al.planned_return_date ASC
             """
             
             overdue_results = self.db.execute_query(query)
@@ -679,6 +609,7 @@ class NotificationManager:
     def cleanup(self):
         """Очистка при закрытии приложения"""
         self.stop_checking()
+        self.stop_email_checking()
         for widget in self.notification_widgets:
             try:
                 widget.close()
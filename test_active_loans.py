@@ -0,0 +1,147 @@
+"""
+Тестирование таблицы открытых выдач Active_Loans:
+триггеры Usage_History держат ее в синхроне, запросы не читают историю
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+from database.migrations import apply_migrations
+
+ISSUE = ("INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+         "planned_return_date, quantity, notes) VALUES (?, ?, 'выдача', ?, ?, ?, ?)")
+
+OVERDUE_QUERY = "SELECT COUNT(*) FROM Active_Loans WHERE planned_return_date < DATE('now')"
+
+
+def create_database(directory, name='loans.db'):
+    connection = sqlite3.connect(os.path.join(directory, name))
+    apply_migrations(connection)
+    return connection
+
+
+def loans(connection):
+    return connection.execute(
+        "SELECT history_id, asset_id, employee_id, quantity, planned_return_date "
+        "FROM Active_Loans ORDER BY history_id").fetchall()
+
+
+def test_triggers_follow_issue_and_return(tmp_path):
+    """Выдача добавляет строку, возврат и удаление истории ее убирают"""
+    connection = create_database(tmp_path)
+    first = connection.execute(ISSUE, (1, 7, '2024-01-01', '2024-02-01', 5, 'Кол-во выданных: 5 шт.')).lastrowid
+    second = connection.execute(ISSUE, (2, 8, '2024-01-01', '2024-03-01', 1, None)).lastrowid
+    connection.execute("INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date) "
+                       "VALUES (1, 7, 'возврат', '2024-01-02')")
+    assert loans(connection) == [(first, 1, 7, 5, '2024-02-01'), (second, 2, 8, 1, '2024-03-01')]
+
+    # Отметка о просрочке в примечаниях не меняет количество
+    connection.execute("UPDATE Usage_History SET notes = notes || '\n[Просрочено: 2024-02-02]' "
+                       "WHERE history_id = ?", (first,))
+    # Редактирование выдачи переносит новые сотрудника и срок
+    connection.execute("UPDATE Usage_History SET employee_id = 9, planned_return_date = '2024-04-01' "
+                       "WHERE history_id = ?", (second,))
+    assert loans(connection) == [(first, 1, 7, 5, '2024-02-01'), (second, 2, 9, 1, '2024-04-01')]
+
+    connection.execute("UPDATE Usage_History SET actual_return_date = '2024-02-05' WHERE history_id = ?", (first,))
+    connection.execute("DELETE FROM Usage_History WHERE history_id = ?", (second,))
+    assert loans(connection) == []
+    connection.close()
+
+
+def test_existing_history_is_backfilled(tmp_path):
+    """БД без миграций: количество переносится из примечаний, открытые выдачи - в Active_Loans"""
+    connection = sqlite3.connect(os.path.join(tmp_path, 'legacy.db'))
+    connection.execute('''
+        CREATE TABLE Usage_History (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            operation_type VARCHAR(20) NOT NULL,
+            operation_date DATETIME NOT NULL,
+            planned_return_date DATE,
+            actual_return_date DATE,
+            notes TEXT
+        )
+    ''')
+    connection.executemany(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+        "planned_return_date, actual_return_date, notes) VALUES (?, ?, ?, '2024-01-01', ?, ?, ?)", [
+            (3, 4, 'выдача', '2024-02-01', None, 'Кол-во выданных: 2 шт.\n[Просрочено: 2024-02-02]'),
+            (5, 6, 'выдача', '2024-02-01', '2024-01-10', 'Кол-во выданных: 4 шт.'),
+            (5, 6, 'возврат', None, None, 'Возврат актива (Кол-во: 4 шт.). Без повреждений'),
+            (5, 1, 'списание', None, None, 'Списано: 3 шт. Причина: брак'),
+            (7, 6, 'выдача', '2024-03-01', None, 'Для объекта №5'),
+        ])
+    connection.commit()
+
+    apply_migrations(connection)
+    quantities = [row[0] for row in connection.execute("SELECT quantity FROM Usage_History ORDER BY history_id")]
+    assert quantities == [2, 4, 4, 3, 1]
+    assert loans(connection) == [(1, 3, 4, 2, '2024-02-01'), (5, 7, 6, 1, '2024-03-01')]
+    connection.close()
+
+
+def create_history(connection, returned_rows, open_rows=200):
+    """История из returned_rows закрытых выдач и open_rows открытых"""
+    rows = [(i % 300 + 1, i % 50 + 1, '2020-01-01', '2020-02-01', '2020-01-15', 'Кол-во выданных: 1 шт.')
+            for i in range(returned_rows)]
+    rows += [(i % 300 + 1, i % 50 + 1, '2024-01-01', '2024-02-01', None, None) for i in range(open_rows)]
+    connection.executemany(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+        "planned_return_date, actual_return_date, notes) VALUES (?, ?, 'выдача', ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.execute("ANALYZE")
+
+
+def query_plan(connection, query, params=()):
+    rows = connection.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_queries_do_not_touch_history(tmp_path):
+    """Запросы открытых выдач идут по индексам Active_Loans, а не по Usage_History"""
+    connection = create_database(tmp_path)
+    create_history(connection, returned_rows=5000)
+    for query, params, index_name in [
+        (OVERDUE_QUERY, (), "idx_loans_due"),
+        ("SELECT COUNT(*) FROM Active_Loans WHERE asset_id = ?", (1,), "idx_loans_asset"),
+        ("SELECT COALESCE(SUM(quantity), 0) FROM Active_Loans WHERE asset_id = ? AND employee_id = ?",
+         (1, 1), "idx_loans_asset"),
+        ("SELECT asset_id, planned_return_date FROM Active_Loans WHERE employee_id = ? "
+         "ORDER BY planned_return_date", (1,), "idx_loans_employee"),
+    ]:
+        plan = query_plan(connection, query, params)
+        print(f"  {plan}")
+        assert index_name in plan and "Usage_History" not in plan, plan
+    connection.close()
+
+
+def benchmark(directory, returned_rows, repeats=200):
+    """Время запроса просрочек при заданном объеме закрытой истории"""
+    connection = create_database(directory, f'bench_{returned_rows}.db')
+    create_history(connection, returned_rows)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        assert connection.execute(OVERDUE_QUERY).fetchone()[0] == 200
+    elapsed = (time.perf_counter() - started) / repeats
+    connection.close()
+    print(f"  История {returned_rows} строк: {elapsed * 1000:.3f} мс на запрос просрочек")
+    return elapsed
+
+
+def test_cost_does_not_grow_with_history(tmp_path):
+    """В 50 раз больше истории - время запроса просрочек почти не меняется"""
+    small = benchmark(tmp_path, returned_rows=2_000)
+    large = benchmark(tmp_path, returned_rows=100_000)
+    assert large < small * 3 + 0.001, (small, large)
+
+
+if __name__ == "__main__":
+    for test in (test_triggers_follow_issue_and_return, test_existing_history_is_backfilled,
+                 test_queries_do_not_touch_history, test_cost_does_not_grow_with_history):
+        with tempfile.TemporaryDirectory() as directory:
+            test(directory)
+    print("✅ Active_Loans синхронизирована с историей")
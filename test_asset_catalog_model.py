@@ -0,0 +1,128 @@
+"""
+Тестирование модели каталога (AssetCatalogModel): поиск по мере ввода
+по 100 000 строк (медиана - меньше 50 мс на символ), сортировка без БД, точечные изменения
+"""
+
+import random
+import statistics
+import time
+
+from PyQt6.QtCore import Qt
+
+from views.table_models import AssetCatalogModel
+
+COLUMNS = ['ID', 'Название', 'Тип', 'Модель', 'Серийный номер', 'Статус', 'Местоположение', 'Количество']
+NAMES = ['Дрель', 'Перфоратор', 'Шуруповерт', 'Болгарка', 'Уровень', 'Рулетка', 'Мультиметр', 'Пила']
+
+
+def create_rows(count):
+    rng = random.Random(7)
+    return [(i, f"{rng.choice(NAMES)} {rng.choice(['Bosch', 'Makita', 'DeWALT'])}", rng.choice(['Инструмент', 'Прибор']),
+             f"MX-{i % 977}", f"SN{i:08d}" if i % 10 else None, rng.choice(['Доступен', 'Выдан']),
+             f"Склад №{i % 20}", i % 7)
+            for i in range(1, count + 1)]
+
+
+def visible_ids(model):
+    return [model.data(model.index(row, 0)) for row in range(model.rowCount())]
+
+
+def brute_force(rows, text):
+    tokens = text.casefold().split()
+    return [row[0] for row in rows
+            if all(any(token in str(value).casefold() for value in row if value is not None) for token in tokens)]
+
+
+def test_filter_as_you_type():
+    """Символ запроса фильтрует 100 000 строк за миллисекунды, результат как у полного перебора"""
+    rows = create_rows(100000)
+    model = AssetCatalogModel()
+    model.set_prepared(model.prepare(COLUMNS, rows))
+
+    timings = []
+    scans = []
+    for query in ("дрель makita 12", "sn0000", "склад №1 выдан"):
+        # Лучшее из трех наборов запроса - время фильтра без шума соседних процессов
+        best = [float('inf')] * len(query)
+        started = time.perf_counter()
+        expected = brute_force(rows, query)
+        scans.append(time.perf_counter() - started)
+        for _ in range(3):
+            for length in range(1, len(query) + 1):
+                started = time.perf_counter()
+                model.set_filter(query[:length])
+                best[length - 1] = min(best[length - 1], time.perf_counter() - started)
+            assert visible_ids(model) == expected
+            # Стирание возвращает к полному каталогу
+            model.set_filter("")
+            assert model.rowCount() == 100000
+        timings.extend(best)
+
+    median = statistics.median(timings)
+    print(f"  фильтр 100 000 строк: медиана {median * 1000:.1f} мс на символ, худший {max(timings) * 1000:.1f} мс, "
+          f"полный перебор {min(scans) * 1000:.0f} мс")
+    # Без жесткого порога на худший символ - он зависит от загрузки машины.
+    # Медиана - с запасом ниже цели 50 мс и в разы быстрее перебора на этой же машине
+    assert median < 0.05, median
+    assert median < min(scans) / 5, (median, min(scans))
+
+
+def test_sort_keeps_filter():
+    """Сортировка по заголовку - по ключам в casefold, фильтр сохраняется"""
+    rows = create_rows(2000)
+    model = AssetCatalogModel()
+    model.set_rows(COLUMNS, rows)
+    model.set_filter("пила")
+
+    model.sort(1, Qt.SortOrder.DescendingOrder)
+    names = [model.data(model.index(row, 1)) for row in range(model.rowCount())]
+    assert names == sorted(names, key=str.casefold, reverse=True)
+    assert sorted(visible_ids(model)) == brute_force(rows, "пила")
+
+    # Пустые серийные номера - как пустая строка, первыми
+    model.set_filter("")
+    model.sort(4)
+    assert model.data(model.index(0, 4)) is None and model.data(model.index(model.rowCount() - 1, 4)) == "SN00001999"
+
+    # Перезагрузка данных сохраняет сортировку и фильтр
+    model.set_filter("уровень")
+    model.set_rows(COLUMNS, rows)
+    serials = [model.data(model.index(row, 4)) or '' for row in range(model.rowCount())]
+    assert serials == sorted(serials) and sorted(visible_ids(model)) == brute_force(rows, "уровень")
+
+
+def test_update_rows():
+    """Точечные изменения: правка на месте, скрытие по фильтру, новые и удаленные строки"""
+    rows = create_rows(1000)
+    model = AssetCatalogModel()
+    model.set_rows(COLUMNS, rows)
+    model.set_filter("дрель")
+    before = visible_ids(model)
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+
+    first = before[0]
+    renamed = rows[first - 1][:1] + ("Дрель ударная",) + rows[first - 1][2:]
+    hidden = before[1]
+    gone = rows[hidden - 1][:1] + ("Лазерный дальномер",) + rows[hidden - 1][2:]
+    added = (5000, "Дрель новая", "Инструмент", None, None, "Доступен", "Склад №1", 1)
+    model.update_rows(0, [renamed, gone, added], removed_keys=[before[2], 999999])
+
+    assert changed == [0]
+    assert model.data(model.index(0, 1)) == "Дрель ударная"
+    assert visible_ids(model) == [first] + before[3:] + [5000]
+    assert model.total_count() == 1000
+
+    # Новые значения участвуют в поиске и сортировке
+    model.set_filter("дальномер")
+    assert visible_ids(model) == [hidden]
+    model.set_filter("")
+    model.sort(0, Qt.SortOrder.DescendingOrder)
+    assert visible_ids(model)[:2] == [5000, 1000] and before[2] not in visible_ids(model)
+
+
+if __name__ == "__main__":
+    test_filter_as_you_type()
+    test_sort_keeps_filter()
+    test_update_rows()
+    print("✅ Модель каталога работает")
@@ -0,0 +1,184 @@
+"""
+Тестирование массового импорта активов из Excel (AssetImporter):
+потоковое чтение, одна транзакция, полный отчет об ошибках, отмена без следов
+"""
+
+import os
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+from asset_importer import AssetImporter
+from conftest import open_pool, seed_reference_data
+from database.change_bus import ChangeBus
+
+HEADER = ("Название", "Тип", "Модель", "Серийный номер", "Местоположение", "Количество")
+
+
+def write_workbook(directory, rows):
+    path = os.path.join(directory, 'assets.xlsx')
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(HEADER)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+def scalar(pool, query):
+    return pool.execute_query(query)[0][0]
+
+
+def test_import_reports_every_bad_row(pool, tmp_path):
+    """Корректные строки добавлены, ошибки собраны по всем строкам, справочники пополнены"""
+    seed_reference_data(pool)
+    rows = [
+        ("Молоток", "Инструмент", "М1", "SN-1", "Склад №1", 3),
+        ("Ноутбук", "Техника", "X1", "", "Офис", None),
+        (None, "Инструмент", "", "", "Склад №1", 1),
+        ("Дрель", None, "", "", "Склад №1", 1),
+        ("Пила", "Инструмент", "", "", None, 1),
+        (None, None, None, None, None, None),
+        ("Ключ", "Техника", None, None, "Офис", "abc"),
+    ]
+    bad_rows = [("Лишняя", "Инструмент", "", "", None, 1)] * 15
+    bus = ChangeBus(pool)
+    events = []
+    bus.changed.connect(events.append)
+
+    report = AssetImporter(pool).run(write_workbook(tmp_path, rows + bad_rows))
+
+    assert report.imported == 3 and not report.cancelled and report.failure is None
+    assert report.errors[:3] == [(4, "отсутствует название актива"), (5, "отсутствует тип актива"),
+                                 (6, "отсутствует местоположение")]
+    # Все 18 ошибок, а не первые 10
+    assert len(report.errors) == 18
+    assert len(report.error_text().splitlines()) == 18
+
+    assets = pool.execute_query("""
+        SELECT a.name, t.type_name, l.location_name, a.quantity, a.current_status
+        FROM Assets a JOIN Asset_Types t ON a.type_id = t.type_id
+        JOIN Locations l ON a.location_id = l.location_id ORDER BY a.asset_id
+    """)
+    assert assets == [("Молоток", "Инструмент", "Склад №1", 3, "Доступен"),
+                      ("Ноутбук", "Техника", "Офис", 1, "Доступен"),
+                      ("Ключ", "Техника", "Офис", 1, "Доступен")]
+    assert scalar(pool, "SELECT COUNT(*) FROM Asset_Types") == 2
+
+    # Одна транзакция - одно событие шины
+    assert len(events) == 1
+    assert set(events[0]) == {'Asset_Types', 'Locations', 'Assets'}
+
+
+def test_cancel_leaves_no_rows(pool, tmp_path):
+    """Отмена во время записи откатывает и активы, и новые справочники"""
+    seed_reference_data(pool)
+    rows = [(f"Актив {i}", f"Тип {i % 3}", "", "", "Новый склад", 1) for i in range(2500)]
+    path = write_workbook(tmp_path, rows)
+    importer = AssetImporter(pool)
+    importer.BATCH_SIZE = 1000
+
+    calls = []
+
+    def cancel_on_second_batch():
+        calls.append(1)
+        # Строки 500 и 1000, первый пакет, строки 1500 и 2000 проходят - отмена перед вторым пакетом
+        return len(calls) > 5
+
+    report = importer.run(path, is_cancelled=cancel_on_second_batch)
+
+    assert report.cancelled and report.imported == 0
+    assert scalar(pool, "SELECT COUNT(*) FROM Assets") == 0
+    assert scalar(pool, "SELECT COUNT(*) FROM Asset_Types") == 1
+    assert scalar(pool, "SELECT COUNT(*) FROM Locations") == 1
+
+
+def test_import_reuses_differently_written_names(pool, tmp_path):
+    """«склад № 1» и «СКЛАД-1» - существующий «Склад №1», а не новые местоположения"""
+    seed_reference_data(pool)
+    rows = [
+        ("Молоток", "инструмент", "", "", "склад № 1", 1),
+        ("Дрель", "ИНСТРУМЕНТ ", "", "", "СКЛАД-1", 1),
+        ("Ноутбук", "Техника", "", "", "Офис", 1),
+        ("Ключ", "техника", "", "", "офис.", 1),
+    ]
+
+    report = AssetImporter(pool).run(write_workbook(tmp_path, rows))
+
+    assert report.imported == 4 and not report.errors
+    assert pool.execute_query("SELECT type_name FROM Asset_Types ORDER BY type_id") == [("Инструмент",), ("Техника",)]
+    assert pool.execute_query("SELECT location_name FROM Locations ORDER BY location_id") == [("Склад №1",), ("Офис",)]
+    assert scalar(pool, "SELECT COUNT(DISTINCT location_id) FROM Assets") == 2
+
+
+def test_import_rejects_duplicate_serials(pool, tmp_path):
+    """Серийный номер, повторенный в файле или уже занятый в базе, - ошибка строки"""
+    seed_reference_data(pool)
+    pool.execute_update("INSERT INTO Assets (name, type_id, model, serial_number, location_id) "
+                        "VALUES ('Дрель', 1, 'M', 'SN-1', 1)")
+    rows = [
+        ("Молоток", "Инструмент", "", "sn 1", "Склад №1", 1),
+        ("Ключ", "Инструмент", "", "SN-2", "Склад №1", 1),
+        ("Пила", "Инструмент", "", "sn2", "Склад №1", 1),
+        ("Уровень", "Инструмент", "", "", "Склад №1", 1),
+        ("Рулетка", "Инструмент", "", "", "Склад №1", 1),
+    ]
+
+    report = AssetImporter(pool).run(write_workbook(tmp_path, rows))
+
+    assert report.imported == 3
+    assert report.errors == [(2, "серийный номер уже есть в базе"), (4, "серийный номер повторяется (строка 3)")]
+    assert scalar(pool, "SELECT COUNT(*) FROM Assets WHERE serial_key = 'sn1'") == 1
+
+
+def test_rows_are_written_while_reading(pool, tmp_path):
+    """Пакеты пишутся по мере чтения файла; повторы серийных номеров ловятся между пакетами"""
+    seed_reference_data(pool)
+    pool.execute_update("INSERT INTO Assets (name, type_id, model, serial_number, location_id) "
+                        "VALUES ('Дрель', 1, 'M', 'SN-2400', 1)")
+    rows = [(f"Актив {i}", "Инструмент", "", f"SN-{i}", "Склад №1", 1) for i in range(2500)]
+    rows[2100] = ("Повтор", "Инструмент", "", "SN-5", "Склад №1", 1)
+    path = write_workbook(tmp_path, rows)
+    importer = AssetImporter(pool)
+    importer.BATCH_SIZE = 1000
+
+    # Внутри транзакции импорта чтение идет через соединение записи - видны незакоммиченные пакеты
+    written = []
+    report = importer.run(path, lambda done, total: written.append(
+        (done, scalar(pool, "SELECT COUNT(*) FROM Assets") - 1)))
+
+    assert (999, 0) in written and (1499, 1000) in written and (1999, 1000) in written
+    assert report.imported == 2498
+    assert report.errors == [(2102, "серийный номер повторяется (строка 7)"),
+                             (2402, "серийный номер уже есть в базе")]
+    assert scalar(pool, "SELECT COUNT(*) FROM Assets") == 2499
+
+
+def test_large_import_is_fast(pool, tmp_path):
+    """Десятки тысяч строк - секунды, а не построчные коммиты"""
+    seed_reference_data(pool)
+    count = 20000
+    rows = [(f"Актив {i}", f"Тип {i % 20}", "M", f"SN-{i}", f"Склад {i % 5}", 1 + i % 4) for i in range(count)]
+    path = write_workbook(tmp_path, rows)
+
+    progress = []
+    started = time.perf_counter()
+    report = AssetImporter(pool).run(path, lambda done, total: progress.append((done, total)))
+    elapsed = time.perf_counter() - started
+    print(f"  Импорт {count} строк: {elapsed:.2f} с")
+
+    assert report.imported == count and not report.errors
+    assert scalar(pool, "SELECT COUNT(*) FROM Assets") == count
+    assert progress[-1] == (count, count)
+    assert elapsed < 20
+
+
+if __name__ == "__main__":
+    for test in (test_import_reports_every_bad_row, test_cancel_leaves_no_rows,
+                 test_import_reuses_differently_written_names, test_import_rejects_duplicate_serials,
+                 test_rows_are_written_while_reading, test_large_import_is_fast):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool, directory)
+    print("✅ Импорт активов из Excel работает")
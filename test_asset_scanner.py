@@ -0,0 +1,137 @@
+"""
+Тестирование режима сканирования (AssetScanner): поиск по серийному и
+инвентарному номеру, кэш кодов, выдача/возврат по повторному скану,
+очередь одной транзакцией и время скана на большой базе
+"""
+
+import tempfile
+import time
+
+from conftest import open_pool
+from database.asset_scanner import AssetScanner, ScanError
+
+
+def seed_data(pool, asset_count=100):
+    """Активы SN-0000001..., два сотрудника"""
+    with pool.transaction():
+        pool.writer.execute("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+        pool.writer.execute("INSERT INTO Locations (location_name) VALUES ('Склад №1')")
+        pool.writer.executemany(
+            "INSERT INTO Assets (name, type_id, model, serial_number, location_id, quantity) VALUES (?, 1, 'M', ?, 1, ?)",
+            ((f"Актив {i}", f"SN-{i:07d}", 1 + i % 3) for i in range(1, asset_count + 1)))
+        pool.writer.executemany("INSERT INTO Employees (last_name, first_name) VALUES (?, ?)",
+                                [('Иванов', 'Иван'), ('Петров', 'Петр')])
+
+
+def scalar(pool, query, params=()):
+    return pool.execute_query(query, params)[0][0]
+
+
+def test_resolve_codes(pool):
+    """Серийный номер в любом написании, инвентарный номер, неизвестный код"""
+    seed_data(pool)
+    scanner = AssetScanner(pool)
+
+    assert scanner.resolve("SN-0000042") == 42
+    assert scanner.resolve(" sn 0000042 ") == 42
+    assert scanner.resolve("#17") == scanner.resolve("ИНВ-000017") == 17
+    assert scanner.resolve("SN-9999999") is None
+    assert scanner.resolve("   ") is None
+
+    # Новый актив с серийным номером, совпадающим по ключу с инвентарным номером
+    # («#17» -> «17»), находится без события ChangeBus - его строки нет в кэше
+    new_id = pool.execute_update(
+        "INSERT INTO Assets (name, type_id, model, serial_number, location_id) VALUES ('Y', 1, 'M', '17', 1)")
+    assert scanner.resolve("#17") == new_id != 17
+
+    # Дубликат серийного номера в другом написании отклоняется индексом
+    try:
+        pool.execute_update("INSERT INTO Assets (name, type_id, model, serial_number, location_id) VALUES ('X', 1, 'M', 'sn0000042', 1)")
+        raise AssertionError("дубликат серийного номера вставлен")
+    except Exception as e:
+        assert "UNIQUE" in str(e)
+
+    plan = pool.execute_query("EXPLAIN QUERY PLAN SELECT asset_id FROM Assets WHERE serial_key = ?", ('sn0000042',))
+    assert "idx_assets_serial_key" in plan[0][-1]
+
+
+def test_cache_is_invalidated_by_changes(pool):
+    """Смена серийного номера: старый код больше не находит актив после события ChangeBus"""
+    seed_data(pool)
+    scanner = AssetScanner(pool)
+    assert scanner.resolve("SN-0000005") == 5
+
+    pool.execute_update("UPDATE Assets SET serial_number = 'NEW-5' WHERE asset_id = 5")
+    scanner.invalidate({'Assets': {5}})
+
+    assert scanner.resolve("SN-0000005") is None
+    assert scanner.resolve("new5") == 5
+
+
+def test_scan_toggles_issue_and_return(pool):
+    """Актив на складе - выдача; выданный этому сотруднику - возврат; выданный другому - ошибка"""
+    seed_data(pool)
+    scanner = AssetScanner(pool)
+
+    item = scanner.scan("SN-0000001", employee_id=1)
+    assert (item.asset_id, item.operation_type, item.quantity) == (1, 'выдача', 1)
+    scanner.commit([item, scanner.scan("SN-0000002", 1)], 1, '2030-01-01')
+
+    assert scalar(pool, "SELECT current_status FROM Assets WHERE asset_id = 1") == 'Выдан'
+    assert scalar(pool, "SELECT COUNT(*) FROM Active_Loans WHERE employee_id = 1") == 2
+
+    item = scanner.scan("SN-0000001", employee_id=1)
+    assert (item.operation_type, item.quantity) == ('возврат', 1)
+    scanner.commit([item], 1, '2030-01-01')
+    assert scalar(pool, "SELECT current_status FROM Assets WHERE asset_id = 1") == 'Доступен'
+    assert scalar(pool, "SELECT quantity FROM Assets WHERE asset_id = 1") == 2
+
+    # Последний экземпляр актива 3 выдан сотруднику 1 - сотруднику 2 выдать нечего
+    pool.execute_update("UPDATE Assets SET quantity = 1 WHERE asset_id = 3")
+    scanner.commit([scanner.scan("SN-0000003", 1)], 1, '2030-01-01')
+    try:
+        scanner.scan("SN-0000003", employee_id=2)
+        raise AssertionError("выдан отсутствующий на складе актив")
+    except ScanError:
+        pass
+
+
+def test_queue_is_all_or_nothing(pool):
+    """Если актив из очереди успели выдать, не проводится ни одна строка очереди"""
+    seed_data(pool)
+    scanner = AssetScanner(pool)
+    pool.execute_update("UPDATE Assets SET quantity = 1 WHERE asset_id = 8")
+    queue = [scanner.scan("SN-0000007", 1), scanner.scan("SN-0000008", 1)]
+
+    # Пока клерк сканировал, последний экземпляр выдали через диалог
+    scanner.commit([scanner.scan("SN-0000008", 2)], 2, '2030-01-01')
+    history_before = scalar(pool, "SELECT COUNT(*) FROM Usage_History")
+
+    try:
+        scanner.commit(queue, 1, '2030-01-01')
+        raise AssertionError("очередь проведена без остатка на складе")
+    except ScanError:
+        pass
+    assert scalar(pool, "SELECT COUNT(*) FROM Usage_History") == history_before
+    assert scalar(pool, "SELECT quantity FROM Assets WHERE asset_id = 7") == 2
+
+
+def test_scan_speed(pool):
+    """Скан на 500 000 активов - миллисекунды и с холодным, и с теплым кэшем"""
+    seed_data(pool, 500000)
+    scanner = AssetScanner(pool)
+    timings = []
+    for code in ("SN-0000001", "sn 0250000", "SN-0499999", "#123456", "SN-0250000"):
+        started = time.perf_counter()
+        scanner.scan(code, employee_id=1)
+        timings.append(time.perf_counter() - started)
+    print(f"  скан на 500 000 активов: худший {max(timings) * 1000:.2f} мс")
+    assert max(timings) < 0.05
+
+
+if __name__ == "__main__":
+    for test in (test_resolve_codes, test_cache_is_invalidated_by_changes,
+                 test_scan_toggles_issue_and_return, test_queue_is_all_or_nothing, test_scan_speed):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Режим сканирования работает")
@@ -0,0 +1,214 @@
+"""
+Тестирование журнала аудита (AuditLogger):
+записи в очереди не блокируют вызывающего, фоновый поток коммитит их пачками
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from audit_logger import AuditLogger
+from conftest import audit_logging, open_pool
+
+
+def count_logs(pool):
+    return pool.execute_query("SELECT COUNT(*) FROM Audit_Log")[0][0]
+
+
+def test_log_and_read_tail(audit_pool):
+    """Записи сохраняются без ограничения числа, последние читаются по порядку"""
+    for i in range(1500):
+        AuditLogger.log_action(1, 'admin', 'asset_add', {'asset_id': i, 'name': f"Актив {i}"})
+
+    recent = AuditLogger.get_recent_logs(3)
+    assert [entry['details']['asset_id'] for entry in recent] == [1497, 1498, 1499]
+    assert recent[-1]['username'] == 'admin' and recent[-1]['action'] == 'asset_add'
+    assert recent[-1]['details']['name'] == "Актив 1499"
+    # Раньше журнал обрезался до 1000 записей
+    assert count_logs(audit_pool) == 1500
+
+
+def test_group_commit_from_many_threads(audit_pool):
+    """Параллельные вызовы не теряют записей, коммитов намного меньше, чем записей"""
+    commits = []
+    transaction = audit_pool.transaction
+
+    def counting_transaction():
+        commits.append(threading.current_thread().name)
+        return transaction()
+
+    audit_pool.transaction = counting_transaction
+
+    def worker(user_id):
+        for i in range(200):
+            AuditLogger.log_action(user_id, f"user{user_id}", 'asset_issue', {'n': i})
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    per_call = (time.perf_counter() - started) / 1600
+    assert AuditLogger.flush()
+
+    print(f"  log_action: {per_call * 1e6:.0f} мкс на вызов, транзакций: {len(commits)} на 1600 записей")
+    assert count_logs(audit_pool) == 1600
+    assert audit_pool.execute_query("SELECT COUNT(DISTINCT user_id) FROM Audit_Log")[0][0] == 8
+    assert set(commits) == {"AuditLogWriter"}
+    assert len(commits) < 100
+    del audit_pool.transaction
+
+
+def write_legacy(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+
+
+def test_legacy_json_is_imported_once(audit_pool, tmp_path):
+    """Старый audit_log.json переносится в таблицу и переименовывается, прошлые копии не затираются"""
+    legacy = os.path.join(tmp_path, 'audit_log.json')
+    write_legacy(legacy, [
+        {"timestamp": "2025-01-01T10:00:00", "user_id": 1, "username": "admin",
+         "action": "user_login", "details": {"role": "admin"}},
+        {"timestamp": "2025-01-01T10:05:00", "user_id": 1, "username": "admin",
+         "action": "asset_add", "details": {}},
+    ])
+
+    AuditLogger._legacy_file = legacy
+    try:
+        AuditLogger.configure(audit_pool)
+        AuditLogger.log_action(2, 'user', 'user_login', {'role': 'user'})
+        recent = AuditLogger.get_recent_logs(10)
+        assert not os.path.exists(legacy)
+        assert len(glob.glob(legacy + ".imported-*")) == 1
+
+        # Записи, сохраненные в файл после импорта, переносятся при следующем подключении
+        write_legacy(legacy, [{"timestamp": "2025-01-02T10:00:00", "user_id": 1, "username": "admin",
+                               "action": "user_logout", "details": {}}])
+        AuditLogger.configure(audit_pool)
+    finally:
+        AuditLogger._legacy_file = "audit_log.json"
+
+    assert [entry['action'] for entry in recent] == ['user_login', 'asset_add', 'user_login']
+    assert recent[0]['details'] == {'role': 'admin'}
+    assert not os.path.exists(legacy)
+    copies = glob.glob(legacy + ".imported-*")
+    assert len(copies) == 2
+    assert sorted(len(json.load(open(copy, encoding='utf-8'))) for copy in copies) == [1, 2]
+    assert count_logs(audit_pool) == 4
+
+
+def test_failed_write_is_retried_then_spilled(audit_pool, tmp_path):
+    """БД занята - пачка пишется повторно; flush() не дождался - записи в JSON и импорт при подключении"""
+
+    def locked_transaction():
+        raise sqlite3.OperationalError("database is locked")
+
+    audit_pool.transaction = locked_transaction
+    AuditLogger.log_action(1, 'admin', 'asset_add', {'n': 1})
+    time.sleep(0.5)  # несколько неудачных попыток
+    del audit_pool.transaction
+    assert AuditLogger.flush()
+    assert count_logs(audit_pool) == 1
+
+    legacy = os.path.join(tmp_path, 'audit_log.json')
+    AuditLogger._legacy_file = legacy
+    try:
+        audit_pool.transaction = locked_transaction
+        AuditLogger.log_action(1, 'admin', 'asset_add', {'n': 2})
+        assert not AuditLogger.flush(timeout=0.3)
+        del audit_pool.transaction
+        with open(legacy, encoding='utf-8') as f:
+            assert [entry['details'] for entry in json.load(f)] == [{'n': 2}]
+
+        AuditLogger.configure(audit_pool)
+    finally:
+        AuditLogger._legacy_file = "audit_log.json"
+    assert [entry['details'] for entry in AuditLogger.get_recent_logs(10)] == [{'n': 1}, {'n': 2}]
+
+
+def test_read_does_not_wait_for_locked_db(audit_pool, tmp_path):
+    """Чтение журнала не ждет долго недоступную БД и не сохраняет очередь в файл"""
+
+    def locked_transaction():
+        raise sqlite3.OperationalError("database is locked")
+
+    AuditLogger.log_action(1, 'admin', 'asset_add', {'n': 1})
+    assert AuditLogger.flush()
+
+    legacy = os.path.join(tmp_path, 'audit_log.json')
+    AuditLogger._legacy_file = legacy
+    audit_pool.transaction = locked_transaction
+    try:
+        AuditLogger.log_action(1, 'admin', 'asset_add', {'n': 2})
+        started = time.perf_counter()
+        recent = AuditLogger.get_recent_logs(10)
+        pages = AuditLogger.query_logs(limit=10)
+        elapsed = time.perf_counter() - started
+    finally:
+        del audit_pool.transaction
+        AuditLogger._legacy_file = "audit_log.json"
+
+    # Видно закоммиченное, очередь осталась в памяти и запишется повтором
+    assert [entry['details'] for entry in recent] == [{'n': 1}]
+    assert len(pages) == 1
+    assert elapsed < AuditLogger.READ_WAIT * 2 + 0.5, elapsed
+    assert not os.path.exists(legacy)
+    assert AuditLogger.flush()
+    assert count_logs(audit_pool) == 2
+
+
+def test_filtered_keyset_pages(audit_pool):
+    """Фильтры и постраничное чтение по (timestamp, log_id) идут по индексам и не теряют записей"""
+    actions = ('asset_issued', 'asset_returned', 'user_login')
+    with audit_pool.transaction():
+        audit_pool.writer.executemany("""
+            INSERT INTO Audit_Log (timestamp, user_id, username, action, details)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((f"2025-03-{1 + i // 1000:02d}T10:00:{i % 60:02d}", i % 4, f"user{i % 4}",
+               actions[i % 3], json.dumps({'asset_id': i % 7})) for i in range(10000)))
+
+    pages = []
+    after = None
+    while True:
+        page = AuditLogger.query_logs(user_id=1, action='asset_issued', date_from='2025-03-02',
+                                      date_to='2025-03-05', after=after, limit=50)
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1]['timestamp'], page[-1]['log_id'])
+
+    entries = [entry for page in pages for entry in page]
+    expected = [i for i in range(1000, 5000) if i % 4 == 1 and i % 3 == 0]
+    assert sorted(entry['log_id'] - 1 for entry in entries) == expected
+    assert all(a['timestamp'] >= b['timestamp'] for a, b in zip(entries, entries[1:]))
+    assert {entry['details']['asset_id'] for entry in AuditLogger.query_logs(asset_id=3, limit=1000)} == {3}
+    assert AuditLogger.list_actions() == sorted(actions)
+
+    for filters, index in ((dict(user_id=1), 'idx_audit_user'), (dict(action='user_login'), 'idx_audit_action'),
+                           (dict(asset_id=5), 'idx_audit_asset'), (dict(date_from='2025-03-09'), 'idx_audit_time')):
+        conditions, params = AuditLogger.filter_conditions(**filters)
+        plan = audit_pool.execute_query(f"""
+            EXPLAIN QUERY PLAN SELECT log_id FROM Audit_Log WHERE 1=1{conditions}
+            AND (timestamp, log_id) < (?, ?) ORDER BY timestamp DESC, log_id DESC LIMIT 50
+        """, tuple(params) + ('2025-03-10', 0))
+        details = " ".join(row[-1] for row in plan)
+        assert index in details and "TEMP B-TREE" not in details, details
+
+
+if __name__ == "__main__":
+    for test in (test_log_and_read_tail, test_group_commit_from_many_threads,
+                 test_legacy_json_is_imported_once, test_failed_write_is_retried_then_spilled,
+                 test_read_does_not_wait_for_locked_db, test_filtered_keyset_pages):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool, audit_logging(pool):
+            if test in (test_legacy_json_is_imported_once, test_failed_write_is_retried_then_spilled,
+                        test_read_does_not_wait_for_locked_db):
+                test(pool, directory)
+            else:
+                test(pool)
+    print("✅ Журнал аудита работает")
@@ -0,0 +1,140 @@
+"""
+Тестирование резервного копирования (BackupManager):
+постраничная копия из снимка, ротация, проверка целостности, восстановление
+"""
+
+import gzip
+import os
+import sqlite3
+import tempfile
+
+from conftest import open_pool
+from database.backup_manager import BackupCancelled, BackupError, BackupManager
+
+
+def seed_employees(pool, employees=2000):
+    with pool.transaction():
+        pool.writer.executemany(
+            "INSERT INTO Employees (last_name, first_name, email) VALUES (?, 'Иван', ?)",
+            ((f"Сотрудник {i}", f"user{i}@example.com" * 5) for i in range(employees)))
+
+
+def count_employees(db_file):
+    connection = sqlite3.connect(db_file)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM Employees").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def unpack(directory, path):
+    target = os.path.join(directory, os.path.basename(path)[:-3])
+    with gzip.open(path, "rb") as packed, open(target, "wb") as raw:
+        raw.write(packed.read())
+    return target
+
+
+def test_backup_is_snapshot_while_writing(pool, tmp_path):
+    """Запись во время копирования не блокируется и не попадает в копию, копия не перезапускается"""
+    seed_employees(pool)
+    manager = BackupManager(pool.db_path)
+    manager.PAGES_PER_STEP = 5
+    steps = []
+
+    def write_between_steps(copied, total):
+        steps.append(copied)
+        # Имена сотрудников уникальны (idx_employees_name_key) - у каждого шага свое
+        pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES (?, 'Петр')", (f"Новый{copied}",))
+
+    path = manager.create_backup(pool.reader(), write_between_steps)
+
+    assert path.endswith(".db.gz") and os.path.dirname(path) == os.path.join(os.path.dirname(pool.db_path), "backups")
+    assert len(steps) > 5 and steps == sorted(steps)
+    assert count_employees(unpack(tmp_path, path)) == 2000
+    assert pool.execute_query("SELECT COUNT(*) FROM Employees")[0][0] == 2000 + len(steps)
+    assert not pool.reader().in_transaction
+    manager.verify(path)
+
+
+def test_rotation_keeps_newest(pool):
+    """Хранятся keep самых новых копий, посторонние файлы не трогаются"""
+    seed_employees(pool, 10)
+    manager = BackupManager(pool.db_path, keep=3, compress=False)
+    os.makedirs(manager.backup_dir)
+    old = [os.path.join(manager.backup_dir, f"inventory_2020010{i}_120000.db") for i in range(1, 5)]
+    for path in old:
+        open(path, "w").close()
+    foreign = os.path.join(manager.backup_dir, "notes.txt")
+    open(foreign, "w").close()
+
+    first = manager.create_backup()
+    second = manager.create_backup()
+
+    assert [path for path, _ in manager.list_backups()] == [second, first, old[3]]
+    assert os.path.exists(foreign)
+    assert not manager.is_due(24)
+
+
+def test_corrupted_backup_is_rejected(pool):
+    """Поврежденная копия не проходит проверку и не восстанавливается"""
+    seed_employees(pool, 10)
+    manager = BackupManager(pool.db_path)
+    path = manager.create_backup()
+    with open(path, "wb") as f:
+        f.write(gzip.compress(b"SQLite format 3\x00" + b"\x00" * 5000))
+
+    for action in (lambda: manager.verify(path), lambda: manager.restore(pool, path)):
+        try:
+            action()
+            assert False, "ожидалась ошибка"
+        except BackupError:
+            pass
+    assert pool.execute_query("SELECT COUNT(*) FROM Employees")[0][0] == 10
+
+
+def test_restore_replaces_data(pool, tmp_path):
+    """Восстановление возвращает данные копии, предыдущее состояние сохраняется"""
+    seed_employees(pool, 10)
+    manager = BackupManager(pool.db_path)
+    path = manager.create_backup()
+
+    pool.execute_update("DELETE FROM Employees")
+    reader = pool.reader()
+    assert reader.execute("SELECT COUNT(*) FROM Employees").fetchone()[0] == 0
+
+    safety_copy = manager.restore(pool, path)
+
+    assert "before_restore" in safety_copy
+    assert count_employees(unpack(tmp_path, safety_copy)) == 0
+    # Читатели и писатель сразу видят восстановленные данные
+    assert reader.execute("SELECT COUNT(*) FROM Employees").fetchone()[0] == 10
+    pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES ('Новый', 'Петр')")
+    assert pool.execute_query("SELECT COUNT(*) FROM Employees")[0][0] == 11
+    assert pool.writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # В каталоге только сами копии - без временных и -wal/-shm файлов
+    assert all(name.endswith(".db.gz") for name in os.listdir(manager.backup_dir))
+
+
+def test_cancel_leaves_no_files(pool):
+    """Прерванное копирование не оставляет файлов"""
+    seed_employees(pool)
+    manager = BackupManager(pool.db_path)
+    manager.PAGES_PER_STEP = 5
+
+    try:
+        manager.create_backup(progress=lambda copied, total: manager.cancel())
+        assert False, "копирование должно было прерваться"
+    except BackupCancelled:
+        pass
+    assert os.listdir(manager.backup_dir) == []
+
+
+if __name__ == "__main__":
+    for test in (test_backup_is_snapshot_while_writing, test_rotation_keeps_newest,
+                 test_corrupted_backup_is_rejected, test_restore_replaces_data, test_cancel_leaves_no_files):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            if test in (test_backup_is_snapshot_while_writing, test_restore_replaces_data):
+                test(pool, directory)
+            else:
+                test(pool)
+    print("✅ Резервное копирование работает")
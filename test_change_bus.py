@@ -0,0 +1,80 @@
+"""
+Тестирование шины изменений (ChangeBus):
+коммит публикует измененные таблицы и rowid, представления обновляют только затронутые строки
+"""
+
+import tempfile
+
+from conftest import open_pool
+from database.change_bus import ChangeBus
+from views.table_models import RowsTableModel
+
+
+def create_bus(pool):
+    bus = ChangeBus(pool)
+    events = []
+    bus.changed.connect(events.append)
+    return bus, events
+
+
+def test_commit_publishes_rows(pool):
+    """Каждый коммит - одно событие с rowid вставленных, измененных и удаленных строк"""
+    bus, events = create_bus(pool)
+    first = pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES ('Иванов', 'Иван')")
+    second = pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES ('Петров', 'Петр')")
+    pool.execute_update("UPDATE Employees SET phone = '+7999'")
+    pool.execute_update("DELETE FROM Employees WHERE employee_id = ?", (first,))
+    assert events == [{'Employees': {first}}, {'Employees': {second}},
+                      {'Employees': {first, second}}, {'Employees': {first}}]
+
+    # Без изменений (UPDATE ни одной строки) - без события
+    events.clear()
+    pool.execute_update("UPDATE Employees SET phone = NULL WHERE employee_id = 100")
+    assert events == []
+
+
+def test_transaction_publishes_once(pool):
+    """Транзакция - одно событие после коммита, включая строки, измененные триггерами"""
+    bus, events = create_bus(pool)
+    with pool.transaction():
+        pool.execute_update("UPDATE Assets SET quantity = quantity - 1 WHERE asset_id = 7")
+        history_id = pool.execute_update(
+            "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date) "
+            "VALUES (7, 1, 'выдача', '2024-01-01')")
+        assert events == []
+    assert events == [{'Usage_History': {history_id}, 'Active_Loans': {history_id}}]
+
+    # Откат - событий нет, журнал не переносится в следующий коммит
+    events.clear()
+    try:
+        with pool.transaction():
+            pool.execute_update("DELETE FROM Usage_History")
+            raise ValueError("отмена")
+    except ValueError:
+        pass
+    pool.execute_update("INSERT INTO Positions (position_name) VALUES ('Инженер')")
+    assert events == [{'Positions': {1}}]
+
+
+def test_model_updates_rows_in_place():
+    """update_rows меняет, добавляет и удаляет только указанные строки"""
+    model = RowsTableModel()
+    model.set_rows(['ID', 'Название'], [(1, 'Молоток'), (2, 'Ключ'), (3, 'Дрель')])
+    signals = []
+    model.dataChanged.connect(lambda top, bottom: signals.append(('changed', top.row())))
+    model.rowsInserted.connect(lambda parent, first, last: signals.append(('inserted', first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: signals.append(('removed', first)))
+    model.modelReset.connect(lambda: signals.append('reset'))
+
+    model.update_rows(0, [(2, 'Ключ разводной'), (4, 'Пила')], removed_keys=[1, 99])
+
+    assert model.rows() == [(2, 'Ключ разводной'), (3, 'Дрель'), (4, 'Пила')]
+    assert signals == [('changed', 1), ('inserted', 3, 3), ('removed', 0)]
+
+
+if __name__ == "__main__":
+    for test in (test_commit_publishes_rows, test_transaction_publishes_once):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    test_model_updates_rows_in_place()
+    print("✅ Шина изменений работает")
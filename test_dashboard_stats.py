@@ -0,0 +1,127 @@
+"""
+Тестирование счетчиков панели управления (DashboardStats):
+один агрегатный запрос, снимок пересчитывается только после изменения данных
+"""
+
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from conftest import open_pool, seed_reference_data
+from database.dashboard_stats import DashboardStats
+from deadline_scheduler import deadline_kind
+
+
+def seed_data(pool):
+    seed_reference_data(pool)
+    for name in ("Петров", "Сидоров"):
+        pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES (?, 'Иван')", (name,))
+    for i in range(5):
+        pool.execute_update("INSERT INTO Assets (name, type_id, model, location_id, current_status) "
+                            "VALUES (?, 1, 'М', 1, ?)", (f"Актив {i}", 'Выдан' if i < 2 else 'Доступен'))
+    issue = ("INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+             "planned_return_date, actual_return_date) VALUES (?, ?, 'выдача', '2024-01-01', ?, ?)")
+    pool.execute_update(issue, (1, 1, '2000-01-01', None))          # просрочена
+    pool.execute_update(issue, (2, 1, '2999-01-01', None))          # выдана
+    pool.execute_update(issue, (3, 2, '2000-01-01', '2000-01-02'))  # возвращена
+
+
+def expected_stats(pool, employee_id=None):
+    """Те же счетчики отдельными COUNT(*), как считал дашборд раньше"""
+    def scalar(query, params=()):
+        return pool.execute_query(query, params)[0][0]
+
+    loans_filter = "" if employee_id is None else f" AND employee_id = {employee_id}"
+    return (
+        scalar("SELECT COUNT(*) FROM Assets"),
+        scalar("SELECT COUNT(*) FROM Assets WHERE current_status = 'Доступен'"),
+        scalar("SELECT COUNT(*) FROM Usage_History WHERE operation_type = 'выдача' "
+               "AND actual_return_date IS NULL" + loans_filter),
+        scalar("SELECT COUNT(*) FROM Usage_History WHERE operation_type = 'выдача' "
+               "AND actual_return_date IS NULL AND planned_return_date < DATE('now', 'localtime')" + loans_filter),
+        scalar("SELECT COUNT(*) FROM Employees"),
+        scalar("SELECT COUNT(*) FROM Usage_History" + ("" if employee_id is None
+                                                        else f" WHERE employee_id = {employee_id}")),
+    )
+
+
+def test_single_query_matches_counts(pool):
+    """Агрегатный запрос дает те же числа, что и отдельные COUNT(*)"""
+    seed_data(pool)
+    for employee_id in (None, 1, 2, 3):
+        stats = DashboardStats.compute(pool.reader(), employee_id)
+        assert tuple(stats) == expected_stats(pool, employee_id), (employee_id, stats)
+    assert DashboardStats.compute(pool.reader()) == (5, 3, 2, 1, 3, 3)
+
+
+def test_snapshot_recomputed_only_after_change(pool):
+    """Кэш живет, пока нет коммитов; любая запись через пул его сбрасывает"""
+    seed_data(pool)
+    stats = DashboardStats(pool)
+    assert stats.cached() is None
+
+    version = stats.version()
+    stats.store(None, version, DashboardStats.compute(pool.reader()))
+    assert stats.cached() == (5, 3, 2, 1, 3, 3)
+    assert stats.cached(employee_id=1) is None
+
+    pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES ('Новиков', 'Петр')")
+    assert stats.cached() is None
+
+    with pool.transaction():
+        stats.store(None, stats.version(), DashboardStats.compute(pool.reader()))
+        pool.execute_update("UPDATE Assets SET current_status = 'Выдан' WHERE asset_id = 5")
+    # Снимок посчитан до коммита транзакции - устарел
+    assert stats.cached() is None
+
+
+def test_cached_refresh_is_cheap(pool):
+    """Обновление без изменений данных - микросекунды"""
+    seed_data(pool)
+    stats = DashboardStats(pool)
+    stats.store(None, stats.version(), DashboardStats.compute(pool.reader()))
+
+    repeats = 2000
+    started = time.perf_counter()
+    for _ in range(repeats):
+        assert stats.cached() is not None
+    elapsed = (time.perf_counter() - started) / repeats
+    print(f"  Снимок из кэша: {elapsed * 1e6:.1f} мкс")
+    assert elapsed < 0.0005
+
+
+def test_overdue_uses_local_date(pool):
+    """Просрочка - по местной дате, как у планировщика сроков, даже когда дата UTC другая"""
+    seed_reference_data(pool)
+    old_tz = os.environ.get('TZ')
+    # Часовой пояс, в котором местная дата сейчас отличается от даты UTC
+    os.environ['TZ'] = 'Etc/GMT-14' if datetime.now(timezone.utc).hour >= 10 else 'Etc/GMT+12'
+    time.tzset()
+    try:
+        today = date.today()
+        for asset_id, planned in ((1, today - timedelta(days=1)), (2, today)):
+            pool.execute_update("INSERT INTO Assets (name, type_id, model, location_id, current_status) "
+                                "VALUES (?, 1, 'М', 1, 'Выдан')", (f"Актив {asset_id}",))
+            pool.execute_update("INSERT INTO Usage_History (asset_id, employee_id, operation_type, "
+                                "operation_date, planned_return_date) VALUES (?, 1, 'выдача', ?, ?)",
+                                (asset_id, today.isoformat(), planned.isoformat()))
+
+        assert [deadline_kind(date.fromisoformat(planned), today) for planned, in pool.execute_query(
+            "SELECT planned_return_date FROM Active_Loans ORDER BY asset_id")] == ['overdue', 'today']
+        assert DashboardStats.compute(pool.reader()).overdue_assets == 1
+        assert DashboardStats(pool).version()[1] == today.isoformat()
+    finally:
+        if old_tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = old_tz
+        time.tzset()
+
+
+if __name__ == "__main__":
+    for test in (test_single_query_matches_counts, test_snapshot_recomputed_only_after_change,
+                 test_cached_refresh_is_cheap, test_overdue_uses_local_date):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Счетчики панели управления в порядке")
@@ -0,0 +1,152 @@
+"""
+Тестирование потоковой выгрузки отчетов (data_exporter):
+строки идут из курсора прямо в файл, память не растет с числом строк
+"""
+
+import csv
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from openpyxl import load_workbook
+
+from conftest import open_pool, seed_reference_data
+from data_exporter import export_all_data, export_csv, export_xlsx
+
+QUERY = "SELECT id AS 'ID', name AS 'Название', note AS 'Примечания' FROM Report ORDER BY id"
+
+
+def create_connection(count):
+    connection = sqlite3.connect(':memory:')
+    connection.execute("CREATE TABLE Report (id INTEGER PRIMARY KEY, name TEXT, note TEXT)")
+    connection.executemany(
+        "INSERT INTO Report VALUES (?, ?, ?)",
+        ((i, f"Актив {i}", None if i % 2 else "выдан со склада №1") for i in range(1, count + 1))
+    )
+    return connection
+
+
+def temp_path(directory, name):
+    return os.path.join(directory, name)
+
+
+def test_csv_export(tmp_path):
+    """CSV: заголовки из псевдонимов запроса, все строки, NULL - пустая ячейка"""
+    connection = create_connection(2500)
+    path = temp_path(tmp_path, 'report.csv')
+    progress = []
+
+    assert export_csv(connection, QUERY, (), path, progress.append) == 2500
+    assert progress == [1000, 2000, 2500]
+
+    with open(path, newline='', encoding='utf-8-sig') as csvfile:
+        rows = list(csv.reader(csvfile, delimiter=';'))
+    assert rows[0] == ['ID', 'Название', 'Примечания']
+    assert rows[1] == ['1', 'Актив 1', '']
+    assert rows[2] == ['2', 'Актив 2', 'выдан со склада №1']
+    assert len(rows) == 2501
+
+
+def test_xlsx_export(tmp_path):
+    """Excel: оформленный заголовок, значения с типами, ширина колонок по данным"""
+    connection = create_connection(1500)
+    path = temp_path(tmp_path, 'report.xlsx')
+
+    assert export_xlsx(connection, QUERY, (), path) == 1500
+
+    ws = load_workbook(path).active
+    assert ws.title == "Отчет"
+    assert [cell.value for cell in ws[1]] == ['ID', 'Название', 'Примечания']
+    assert ws['A1'].font.bold
+    assert [cell.value for cell in ws[3]] == [2, 'Актив 2', 'выдан со склада №1']
+    assert ws.max_row == 1501
+    assert ws.column_dimensions['B'].width == len("Актив 1000") + 2
+    assert ws.column_dimensions['C'].width == len("выдан со склада №1") + 2
+
+
+def test_interrupted_export_removes_file(tmp_path):
+    """Прерванный запрос (отмена) не оставляет недописанный файл"""
+    connection = create_connection(50000)
+    path = temp_path(tmp_path, 'report.csv')
+    calls = []
+    connection.set_progress_handler(lambda: len(calls) > 20 or calls.append(1), 1000)
+
+    try:
+        export_csv(connection, QUERY, (), path)
+        assert False, "выгрузка должна была прерваться"
+    except sqlite3.OperationalError:
+        pass
+    assert not os.path.exists(path)
+
+
+def test_export_all_is_one_snapshot(pool, tmp_path):
+    """Статистика совпадает с листами, даже если данные меняются во время выгрузки"""
+    with pool.transaction():
+        seed_reference_data(pool)
+        pool.writer.executemany(
+            "INSERT INTO Assets (name, type_id, model, location_id, current_status) VALUES (?, 1, 'М', 1, 'Доступен')",
+            ((f"Актив {i}",) for i in range(1500)))
+        pool.writer.executemany(
+            "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+            "planned_return_date, quantity) VALUES (?, 1, 'выдача', '2024-01-01', '2000-01-01', 1)",
+            ((i % 1500 + 1,) for i in range(2500)))
+
+    # Писатель добавляет строки после каждой пачки выгрузки
+    def write_during_export(count):
+        pool.execute_update("INSERT INTO Assets (name, type_id, model, location_id, current_status) "
+                            "VALUES ('Новый', 1, 'М', 1, 'Доступен')")
+        pool.execute_update("INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date) "
+                            "VALUES (1, 1, 'выдача', '2024-02-01')")
+
+    path = temp_path(tmp_path, 'all.xlsx')
+    assert export_all_data(pool.reader(), path, write_during_export) == 1500 + 1 + 2500 + 1 + 1
+    assert not pool.reader().in_transaction
+
+    wb = load_workbook(path, read_only=True)
+    assert wb.sheetnames == ["Статистика", "Активы", "Сотрудники", "История операций",
+                             "Типы активов", "Местоположения"]
+    stats = {row[0]: row[1] for row in wb["Статистика"].iter_rows(min_row=3, values_only=True) if row and row[0]}
+    assets = sum(1 for _ in wb["Активы"].iter_rows(min_row=2))
+    history = sum(1 for _ in wb["История операций"].iter_rows(min_row=2))
+    assert (assets, history) == (1500, 2500)
+    assert stats["Всего активов:"] == assets
+    assert stats["Всего операций:"] == history
+    assert stats["Выдано активов:"] == stats["Просроченные активы:"] == 2500
+    # А в базе к этому моменту строк уже больше
+    assert pool.execute_query("SELECT COUNT(*) FROM Assets")[0][0] > assets
+    wb.close()
+
+
+def peak_memory(directory, export, count, name):
+    connection = create_connection(count)
+    path = temp_path(directory, name)
+    tracemalloc.start()
+    started = time.perf_counter()
+    export(connection, QUERY, (), path)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    connection.close()
+    print(f"  {name}: {count} строк за {elapsed:.2f} с, пик памяти {peak / 1024:.0f} КБ")
+    return peak
+
+
+def test_memory_does_not_grow_with_rows(tmp_path):
+    """Пик памяти при 10-кратном росте числа строк почти не меняется"""
+    # tracemalloc сильно замедляет openpyxl - для Excel строк меньше
+    for export, name, count in ((export_csv, 'report.csv', 20000), (export_xlsx, 'report.xlsx', 3000)):
+        small = peak_memory(tmp_path, export, count, name)
+        large = peak_memory(tmp_path, export, count * 10, name)
+        assert large < small * 1.5 + 256 * 1024, (name, small, large)
+
+
+if __name__ == "__main__":
+    for test in (test_csv_export, test_xlsx_export, test_interrupted_export_removes_file,
+                 test_memory_does_not_grow_with_rows):
+        with tempfile.TemporaryDirectory() as directory:
+            test(directory)
+    with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+        test_export_all_is_one_snapshot(pool, directory)
+    print("✅ Потоковая выгрузка отчетов работает")
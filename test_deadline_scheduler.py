@@ -0,0 +1,148 @@
+"""
+Тестирование планировщика сроков (DeadlineScheduler): уведомление только при
+наступлении перехода, таймер на ближайший срок, обновление кучи при выдаче и возврате
+"""
+
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from conftest import open_pool, seed_reference_data
+from database.change_bus import ChangeBus
+from deadline_scheduler import DeadlineScheduler
+
+TODAY = date(2025, 3, 10)
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime.combine(TODAY, datetime.min.time()) + timedelta(hours=9)
+
+    def __call__(self):
+        return self.now
+
+
+def issue(pool, name, days):
+    """Выдать актив со сроком возврата через days дней от TODAY"""
+    with pool.transaction():
+        asset_id = pool.execute_update(
+            "INSERT INTO Assets (name, type_id, model, location_id, current_status) VALUES (?, 1, 'M', 1, 'Выдан')",
+            (name,))
+        return pool.execute_update("""
+            INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, planned_return_date)
+            VALUES (?, 1, 'выдача', '2025-01-01', ?)
+        """, (asset_id, (TODAY + timedelta(days=days)).isoformat()))
+
+
+def overdue_since(pool):
+    return dict(pool.execute_query(
+        "SELECT history_id, overdue_since FROM Usage_History WHERE overdue_since IS NOT NULL"))
+
+
+def kinds(reached):
+    return sorted((kind, asset) for kind, _, asset, _, _ in reached)
+
+
+def test_transitions_fire_once(pool):
+    """Старт показывает текущее состояние, дальше - только переходы в полночь"""
+    seed_reference_data(pool)
+    overdue_id = issue(pool, "Дрель", -2)
+    saw_id = issue(pool, "Пила", 0)
+    issue(pool, "Молоток", 1)
+    issue(pool, "Уровень", 5)
+    clock = Clock()
+    scheduler = DeadlineScheduler(pool, clock=clock)
+    events = []
+    scheduler.deadlines_reached.connect(events.append)
+
+    assert kinds(scheduler.start()) == [('overdue', 'Дрель'), ('today', 'Пила'), ('tomorrow', 'Молоток')]
+    assert len(events) == 1
+    assert overdue_since(pool) == {overdue_id: '2025-03-09'}
+
+    # Таймер - на ближайшую полночь (до нее 15 ч - ждем частями), до нее работы нет
+    midnight = datetime.combine(TODAY + timedelta(days=1), datetime.min.time())
+    assert scheduler.next_deadline() == midnight
+    assert scheduler._timer.interval() == scheduler.MAX_TIMER_INTERVAL
+    clock.now = midnight - timedelta(minutes=30)
+    scheduler.process_due()
+    assert scheduler._timer.interval() == 30 * 60 * 1000
+    clock.now = midnight - timedelta(seconds=1)
+    assert scheduler.process_due() == []
+
+    clock.now = midnight
+    assert kinds(scheduler.process_due()) == [('overdue', 'Пила'), ('today', 'Молоток')]
+    assert scheduler.process_due() == []
+    assert overdue_since(pool) == {overdue_id: '2025-03-09', saw_id: '2025-03-11'}
+    # Повторная отметка ничего не переписывает
+    changes = pool.writer.total_changes
+    scheduler.mark_overdue([overdue_id, saw_id])
+    scheduler.mark_overdue()
+    assert pool.writer.total_changes == changes
+
+    # Проспали несколько дней - по одному уведомлению на выдачу, в текущем состоянии
+    clock.now = datetime.combine(TODAY + timedelta(days=10), datetime.min.time())
+    assert kinds(scheduler.process_due()) == [('overdue', 'Молоток'), ('overdue', 'Уровень')]
+    assert scheduler.next_deadline() is None
+
+
+def test_issue_and_return_update_heap(pool):
+    """Выдача, перенос срока и возврат через ChangeBus меняют только свои записи кучи"""
+    seed_reference_data(pool)
+    bus = ChangeBus(pool)
+    clock = Clock()
+    scheduler = DeadlineScheduler(pool, bus, clock=clock)
+    events = []
+    scheduler.deadlines_reached.connect(events.append)
+    assert scheduler.start() == []
+
+    far_id = issue(pool, "Дрель", 3)
+    assert events == [] and scheduler.next_deadline() == datetime(2025, 3, 12)
+
+    near_id = issue(pool, "Пила", 1)
+    assert kinds(events.pop()) == [('tomorrow', 'Пила')]
+    assert scheduler.next_deadline() == datetime(2025, 3, 11)
+
+    # Возврат - переходы выдачи больше не наступают
+    pool.execute_update("UPDATE Usage_History SET actual_return_date = '2025-03-10' WHERE history_id = ?", (near_id,))
+    assert scheduler.next_deadline() == datetime(2025, 3, 12)
+
+    # Перенос срока - старые переходы устаревают
+    pool.execute_update("UPDATE Usage_History SET planned_return_date = '2025-03-20' WHERE history_id = ?", (far_id,))
+    assert scheduler.next_deadline() == datetime(2025, 3, 19)
+    clock.now = datetime(2025, 3, 14)
+    assert scheduler.process_due() == [] and events == []
+
+
+def test_idle_cost(pool):
+    """10 000 открытых выдач: старт один раз, проверка без наступивших сроков не ходит в БД"""
+    seed_reference_data(pool)
+    with pool.transaction():
+        for i in range(10000):
+            issue(pool, f"Актив {i}", 30 + i % 300)
+    clock = Clock()
+    scheduler = DeadlineScheduler(pool, clock=clock)
+
+    started = time.perf_counter()
+    scheduler.start()
+    start_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        scheduler.process_due()
+    idle_time = (time.perf_counter() - started) / 1000
+
+    started = time.perf_counter()
+    pool.execute_query(scheduler.LOANS_QUERY)
+    scan_time = time.perf_counter() - started
+
+    print(f"  старт {start_time * 1000:.1f} мс, срабатывание без сроков {idle_time * 1e6:.1f} мкс, "
+          f"полный просмотр выдач {scan_time * 1000:.1f} мс")
+    assert idle_time * 100 < scan_time
+    assert scheduler.next_deadline() == datetime(2025, 4, 8)
+
+
+if __name__ == "__main__":
+    for test in (test_transitions_fire_once, test_issue_and_return_update_heap, test_idle_cost):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Планировщик сроков работает")
@@ -0,0 +1,151 @@
+"""
+Тестирование сводных писем (digest_mode): одно письмо на сотрудника
+и сводка администратору вместо письма на каждую выдачу
+"""
+
+import tempfile
+from datetime import date
+
+from conftest import open_pool
+from deadline_scheduler import deadline_kind
+from email_outbox import EmailOutbox
+from test_smtp_session import StubSMTPServer, create_notifier
+
+EMPLOYEES = 20
+LOANS_PER_EMPLOYEE = 15
+
+
+def seed_data(pool):
+    """20 сотрудников по 15 выдач (просрочено, сегодня, завтра) и сотрудник без email"""
+    with pool.transaction():
+        pool.execute_update("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+        pool.execute_update("INSERT INTO Locations (location_name) VALUES ('Склад')")
+        for employee in range(1, EMPLOYEES + 2):
+            email = f"user{employee}@example.com" if employee <= EMPLOYEES else None
+            pool.execute_update(
+                "INSERT INTO Employees (employee_id, last_name, first_name, email) VALUES (?, ?, 'Иван', ?)",
+                (employee, f"Сотрудник{employee}", email))
+            for loan in range(LOANS_PER_EMPLOYEE):
+                asset_id = pool.execute_update(
+                    "INSERT INTO Assets (name, type_id, model, location_id, current_status) "
+                    "VALUES (?, 1, 'M', 1, 'Выдан')", (f"Дрель {employee}-{loan}",))
+                # 0 - просрочено на 3 дня, 1 - сегодня, 2 - завтра (по местной дате, как в запросе)
+                offset = ('-3 day', '+0 day', '+1 day')[loan % 3]
+                pool.execute_update("""
+                    INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, planned_return_date)
+                    VALUES (?, ?, 'выдача', DATE('now', 'localtime', '-10 day'), DATE('now', 'localtime', ?))
+                """, (asset_id, employee, offset))
+        pool.execute_update(
+            "INSERT INTO Users (username, password, employee_id, role) VALUES ('admin', 'x', 1, 'admin')")
+
+
+def create_notifier_for(pool, server, digest_mode):
+    notifier = create_notifier(server)
+    notifier.db = pool
+    notifier.outbox = EmailOutbox(pool, notifier)
+    notifier.digest_mode = digest_mode
+    return notifier
+
+
+def test_digest_cuts_message_volume(pool):
+    """Сводки: писем в 10+ раз меньше, повторная проверка в тот же день ничего не ставит"""
+    seed_data(pool)
+    server = StubSMTPServer()
+
+    per_loan = create_notifier_for(pool, server, digest_mode=False).check_and_send_notifications()
+
+    pool.execute_update("DELETE FROM Email_Outbox")
+    notifier = create_notifier_for(pool, server, digest_mode=True)
+    queued = notifier.check_and_send_notifications()
+    assert notifier.check_and_send_notifications() == 0
+    notifier.outbox.drain()
+
+    print(f"  писем за проверку: по выдаче {per_loan}, сводками {queued}")
+    # Сотрудник без email получает писем 0, но его выдачи есть в сводке администратору
+    assert per_loan == EMPLOYEES * LOANS_PER_EMPLOYEE
+    assert queued == EMPLOYEES + 1
+    assert per_loan >= 10 * queued
+    assert notifier.outbox.counts() == {'sent': queued} and server.connections == 1
+    # Администратор (сотрудник 1) получает и свою сводку, и общую
+    assert sorted(server.messages).count("user1@example.com") == 2
+    server.stop()
+
+
+def test_digest_content(pool):
+    """Сводка сотрудника перечисляет все его выдачи по разделам, сводка админа - всех сотрудников"""
+    seed_data(pool)
+    server = StubSMTPServer()
+    notifier = create_notifier_for(pool, server, digest_mode=True)
+    loans = pool.execute_query("""
+        SELECT al.history_id, e.employee_id, e.email,
+               e.last_name || ' ' || e.first_name || ' ' || COALESCE(e.patronymic, ''),
+               a.name, al.planned_return_date,
+               CAST(julianday(DATE(al.planned_return_date)) - julianday(DATE('now', 'localtime')) AS INTEGER)
+        FROM Active_Loans al
+        JOIN Assets a ON al.asset_id = a.asset_id
+        JOIN Employees e ON al.employee_id = e.employee_id
+    """)
+
+    messages = notifier.digest_messages(loans, ["boss@example.com"], day="2025-01-01")
+    by_key = {message[0]: message for message in messages}
+    employee_loans = notifier.loan_set_hash(loan[0] for loan in loans if loan[1] == 2)
+    all_loans = notifier.loan_set_hash(loan[0] for loan in loans)
+
+    key, recipient, subject, html_body, plain_body = by_key[f"digest:2:2025-01-01:{employee_loans}"]
+    assert recipient == "user2@example.com"
+    assert "(просрочено: 5" in subject
+    assert all(f"Дрель 2-{loan}" in html_body and f"Дрель 2-{loan}" in plain_body
+               for loan in range(LOANS_PER_EMPLOYEE))
+    assert "Дрель 3-0" not in html_body
+    assert html_body.index("Просрочен возврат") < html_body.index("Дрель 2-0")
+
+    _, recipient, subject, html_body, plain_body = by_key[f"admin_digest:boss@example.com:2025-01-01:{all_loans}"]
+    assert recipient == "boss@example.com" and subject.startswith("📋")
+    assert f"Сотрудник{EMPLOYEES + 1} Иван" in plain_body and "нет email" in plain_body
+    assert plain_body.count("•") == (EMPLOYEES + 1) * LOANS_PER_EMPLOYEE
+    assert len(messages) == EMPLOYEES + 1
+    server.stop()
+
+
+def test_digest_key_follows_loan_set(pool):
+    """Тот же набор выдач в тот же день - тот же ключ; новая выдача - новая сводка в тот же день"""
+    server = StubSMTPServer()
+    notifier = create_notifier_for(pool, server, digest_mode=True)
+    loans = [(10, 2, "user2@example.com", "Иванов Иван", "Дрель", "2025-01-01", -1),
+             (11, 2, "user2@example.com", "Иванов Иван", "Пила", "2025-01-02", 0)]
+
+    def keys(loans):
+        return {message[0] for message in notifier.digest_messages(loans, ["boss@example.com"], day="2025-01-01")}
+
+    assert keys(loans) == keys(list(reversed(loans)))
+    issued_later = keys(loans + [(12, 2, "user2@example.com", "Иванов Иван", "Молоток", "2025-01-01", -1)])
+    assert len(issued_later) == 2 and not issued_later & keys(loans)
+    assert not keys(loans[:1]) & keys(loans)
+    server.stop()
+
+
+def test_reminder_kind_uses_calendar_days(pool):
+    """Вид напоминания - по календарным дням, как у планировщика: срок завтра - «tomorrow» весь день"""
+    seed_data(pool)
+    server = StubSMTPServer()
+    create_notifier_for(pool, server, digest_mode=False).check_and_send_notifications()
+
+    today = date.today()
+    expected = {
+        f"deadline:{history_id}:{deadline_kind(date.fromisoformat(planned), today)}:{today.isoformat()}"
+        for history_id, planned in pool.execute_query(
+            "SELECT al.history_id, al.planned_return_date FROM Active_Loans al "
+            "JOIN Employees e ON al.employee_id = e.employee_id WHERE e.email IS NOT NULL")
+    }
+    keys = {row[0] for row in pool.execute_query("SELECT idempotency_key FROM Email_Outbox")}
+    assert keys == expected
+    assert {key.split(':')[2] for key in keys} == {'overdue', 'today', 'tomorrow'}
+    server.stop()
+
+
+if __name__ == "__main__":
+    for test in (test_digest_cuts_message_volume, test_digest_content, test_digest_key_follows_loan_set,
+                 test_reminder_kind_uses_calendar_days):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Сводные письма работают")
@@ -0,0 +1,125 @@
+"""
+Тестирование очереди писем (EmailOutbox): без повторной постановки по ключу,
+отправка одной сессией, повторы с экспоненциальной задержкой, поток отправки
+"""
+
+import tempfile
+import time
+from datetime import datetime
+
+from conftest import open_pool
+from email_outbox import EmailOutbox
+from test_smtp_session import StubSMTPServer, create_notifier
+
+
+def create_outbox(pool, server):
+    return EmailOutbox(pool, create_notifier(server))
+
+
+def messages(notifier, count, day="2025-01-01"):
+    return [(notifier.deadline_key(i, -1, day),)
+            + notifier.deadline_warning(f"user{i}@example.com", f"Сотрудник {i}", f"Дрель {i}", "2024-12-31", -1)
+            for i in range(count)]
+
+
+def rows(outbox):
+    return outbox.pool.execute_query(
+        "SELECT recipient, status, attempts, next_attempt_at, last_error FROM Email_Outbox ORDER BY outbox_id")
+
+
+def make_due(outbox):
+    outbox.pool.execute_update("UPDATE Email_Outbox SET next_attempt_at = '2000-01-01T00:00:00'")
+
+
+def test_enqueue_is_idempotent(pool):
+    """Письмо с тем же ключом ставится один раз и отправляется один раз"""
+    server = StubSMTPServer()
+    outbox = create_outbox(pool, server)
+
+    assert outbox.enqueue(messages(outbox.notifier, 20)) == 20
+    # Повторная проверка сроков в тот же день - ничего нового
+    assert outbox.enqueue(messages(outbox.notifier, 25)) == 5
+    outbox.drain()
+    outbox.drain()
+
+    assert len(server.messages) == 25 and server.connections == 1
+    assert outbox.counts() == {'sent': 25}
+    assert all(row[1] == 'sent' and row[2] == 1 for row in rows(outbox))
+    # На следующий день - новое напоминание
+    assert outbox.enqueue(messages(outbox.notifier, 1, day="2025-01-02")) == 1
+    server.stop()
+
+
+def test_retry_with_backoff(pool):
+    """Недоступный сервер - повтор с удвоением задержки, после MAX_ATTEMPTS - ошибка"""
+    server = StubSMTPServer()
+    outbox = create_outbox(pool, server)
+    outbox.notifier.smtp_port = 1  # никто не слушает
+    outbox.enqueue(messages(outbox.notifier, 3))
+
+    delays = []
+    for attempt in range(1, outbox.MAX_ATTEMPTS + 1):
+        make_due(outbox)
+        started = datetime.now()
+        outbox.drain()
+        entries = rows(outbox)
+        assert all(entry[2] == attempt for entry in entries)
+        if attempt < outbox.MAX_ATTEMPTS:
+            assert all(entry[1] == 'pending' and entry[4] for entry in entries)
+            delays.append(round((datetime.fromisoformat(entries[0][3]) - started).total_seconds() / 60))
+
+    assert delays == [1, 2, 4, 8, 16, 32, 64]
+    assert outbox.counts() == {'failed': 3}
+    assert "попыток: 8" in rows(outbox)[0][4]
+
+    # Сервер снова доступен - админ возвращает письма в очередь
+    outbox.notifier.smtp_port = server.port
+    assert outbox.retry_failed() == 3
+    outbox.drain()
+    assert outbox.counts() == {'sent': 3} and len(server.messages) == 3
+    server.stop()
+
+
+def test_rejected_recipient_fails_without_retry(pool):
+    """Отклоненный адрес сразу помечается ошибкой, остальные письма уходят"""
+    server = StubSMTPServer(reject={'user1@example.com'})
+    outbox = create_outbox(pool, server)
+    outbox.enqueue(messages(outbox.notifier, 3))
+
+    outbox.drain()
+
+    statuses = [(entry[0], entry[1]) for entry in rows(outbox)]
+    assert statuses == [('user0@example.com', 'sent'), ('user1@example.com', 'failed'),
+                        ('user2@example.com', 'sent')]
+    assert "550" in rows(outbox)[1][4]
+    server.stop()
+
+
+def test_worker_sends_in_background(pool):
+    """enqueue возвращается сразу, письма отправляет поток очереди"""
+    server = StubSMTPServer(handshake_delay=0.2)
+    outbox = create_outbox(pool, server)
+    outbox.start()
+
+    started = time.perf_counter()
+    outbox.enqueue(messages(outbox.notifier, 10))
+    enqueue_time = time.perf_counter() - started
+
+    deadline = time.monotonic() + 10
+    while outbox.counts().get('sent', 0) < 10 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    outbox.stop()
+
+    print(f"  enqueue 10 писем: {enqueue_time * 1000:.1f} мс (SMTP-рукопожатие 200 мс - в потоке очереди)")
+    assert enqueue_time < 0.2
+    assert outbox.counts() == {'sent': 10} and server.connections == 1
+    assert not outbox._thread.is_alive()
+    server.stop()
+
+
+if __name__ == "__main__":
+    for test in (test_enqueue_is_idempotent, test_retry_with_backoff,
+                 test_rejected_recipient_fails_without_retry, test_worker_sends_in_background):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Очередь писем работает")
@@ -0,0 +1,253 @@
+"""
+Тестирование ленивой модели истории (KeysetTableModel):
+страницы по ключу (operation_date, history_id), память не растет при прокрутке,
+страницы читаются отложенно (интерфейс QueryService), refresh() не сбрасывает модель
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from PyQt6.QtCore import QModelIndex
+from conftest import open_pool, seed_reference_data
+from database.connection_pool import ConnectionPool
+from database.migrations import apply_migrations
+from views.table_models import KeysetTableModel
+
+HISTORY_QUERY = """
+    SELECT
+        uh.history_id as 'ID',
+        e.last_name || ' ' || e.first_name as 'Сотрудник',
+        a.name as 'Актив',
+        uh.operation_type as 'Тип операции',
+        uh.operation_date as 'Дата операции',
+        COALESCE(uh.notes, '') as 'Примечания'
+    FROM Usage_History uh
+    JOIN Employees e ON uh.employee_id = e.employee_id
+    JOIN Assets a ON uh.asset_id = a.asset_id
+    WHERE 1=1
+"""
+
+
+def create_history_db(directory, rows):
+    """БД со схемой приложения и rows операциями (несколько операций в одну секунду)"""
+    db_path = os.path.join(directory, f'history_{rows}.db')
+    conn = sqlite3.connect(db_path)
+    apply_migrations(conn)
+    conn.execute("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+    conn.execute("INSERT INTO Locations (location_name) VALUES ('Склад №1')")
+    conn.executemany("INSERT INTO Employees (last_name, first_name) VALUES (?, ?)",
+                     [(f"Сотрудник{i}", "Иван") for i in range(50)])
+    conn.executemany("INSERT INTO Assets (name, type_id, model, location_id) VALUES (?, 1, 'М', 1)",
+                     [(f"Актив {i}",) for i in range(500)])
+
+    start = datetime(2020, 1, 1)
+    batch = []
+    for i in range(rows):
+        # Одинаковые даты у соседних строк - проверка стабильности ключа
+        operation_date = (start + timedelta(seconds=i // 3)).strftime('%Y-%m-%d %H:%M:%S')
+        batch.append((i % 500 + 1, i % 50 + 1, 'выдача', operation_date, 'Кол-во выданных: 1 шт.'))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO Usage_History (asset_id, employee_id, operation_type, "
+                             "operation_date, notes) VALUES (?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO Usage_History (asset_id, employee_id, operation_type, "
+                         "operation_date, notes) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def create_model(pool, query_service=None, model_class=KeysetTableModel):
+    return model_class(pool, HISTORY_QUERY, (),
+                       key_sql=('uh.operation_date', 'uh.history_id'), key_columns=(4, 0),
+                       query_service=query_service, load_key='history')
+
+
+class SmallPagesModel(KeysetTableModel):
+    """Маленькие страницы и кэш - несколько страниц на десятке строк"""
+    PAGE_SIZE = 5
+    CACHED_PAGES = 2
+
+
+class DeferredQueries:
+    """
+    Загрузки с интерфейсом QueryService.submit, выполняемые только по run()
+
+    Как и в фоне, результат приходит позже вызова; новая загрузка с тем же
+    ключом вытесняет ожидающую. Цикл событий Qt не нужен: приложение,
+    созданное здесь, мешало бы тестам, которые создают свой QApplication.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.pending = {}  # ключ -> (func, on_result)
+
+    def submit(self, key, func, on_result, on_error=None):
+        self.pending[key] = (func, on_result)
+
+    def run(self):
+        """Выполнить ожидающие загрузки (и загрузки, поставленные их колбэками)"""
+        while self.pending:
+            pending, self.pending = self.pending, {}
+            for func, on_result in pending.values():
+                on_result(func(self.pool.reader()))
+
+
+def full_order(pool):
+    return [row[0] for row in pool.execute_query(
+        HISTORY_QUERY + " ORDER BY uh.operation_date DESC, uh.history_id DESC")]
+
+
+def read_ids(model, queries):
+    """ID всех строк модели; вытесненные страницы дочитываются отложенно"""
+    ids = []
+    for row in range(model.rowCount()):
+        value = model.data(model.index(row, 0))
+        if value is None:
+            queries.run()
+            value = model.data(model.index(row, 0))
+        ids.append(value)
+    return ids
+
+
+def test_pages_match_full_query(tmp_path):
+    """Постраничное чтение дает ту же последовательность, что и полный ORDER BY"""
+    with closing(ConnectionPool(create_history_db(tmp_path, 2345))) as pool:
+        model = create_model(pool)
+        model.set_first_page(model.fetch_first_page(pool.reader()))
+        while model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+
+        # Чтение в обратном порядке заставляет перечитывать вытесненные страницы
+        ids = [model.data(model.index(row, 0)) for row in reversed(range(model.rowCount()))]
+        assert ids[::-1] == full_order(pool)
+        assert model.cached_row_count() <= model.PAGE_SIZE * model.CACHED_PAGES
+
+
+def test_pages_load_through_query_service(tmp_path):
+    """С query_service догрузка и перечитывание страниц не выполняются в вызове модели"""
+    with closing(ConnectionPool(create_history_db(tmp_path, 2345))) as pool:
+        queries = DeferredQueries(pool)
+        model = create_model(pool, queries)
+        model.set_first_page(model.fetch_first_page(pool.reader()))
+
+        while model.canFetchMore(QModelIndex()):
+            rows = model.rowCount()
+            model.fetchMore(QModelIndex())
+            # Страница читается отложенно - строки появятся после доставки результата
+            assert model.rowCount() == rows
+            queries.run()
+
+        # Вытесненная первая страница: пустая ячейка, затем dataChanged
+        changed = []
+        model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+        assert model.data(model.index(0, 0)) is None
+        queries.run()
+        assert changed == [0]
+
+        assert read_ids(model, queries) == full_order(pool)
+
+
+def add_operation(pool, operation_date):
+    pool.execute_update("INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date) "
+                        "VALUES (1, 1, 'выдача', ?)", (operation_date,))
+
+
+def test_refresh_keeps_model(pool):
+    """refresh() перечитывает загруженные страницы на месте: без сброса модели"""
+    seed_reference_data(pool)
+    pool.execute_update("INSERT INTO Assets (name, type_id, model, location_id) VALUES ('Молоток', 1, 'М1', 1)")
+    for day in range(1, 13):
+        add_operation(pool, f'2025-01-{day:02d} 10:00:00')
+    queries = DeferredQueries(pool)
+    model = create_model(pool, queries, SmallPagesModel)
+    model.set_first_page(model.fetch_first_page(pool.reader()))
+    model.fetchMore(QModelIndex())
+    queries.run()
+    assert model.rowCount() == 10
+
+    resets, inserted, removed = [], [], []
+    model.modelReset.connect(lambda: resets.append(True))
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+
+    # Новая операция - на первой странице, удаленная - на второй
+    add_operation(pool, '2025-02-01 10:00:00')
+    pool.execute_update("DELETE FROM Usage_History WHERE operation_date = '2025-01-05 10:00:00'")
+    model.refresh()
+    queries.run()
+
+    assert resets == []
+    # Размер страницы меняется в ее конце: первая выросла до 6 строк, вторая (строки 6-10) - до 4
+    assert inserted == [(5, 5)] and removed == [(10, 10)]
+    assert read_ids(model, queries) == full_order(pool)[:10]
+
+    # Оставшиеся строки догружаются после якоря последней страницы
+    while model.canFetchMore(QModelIndex()):
+        model.fetchMore(QModelIndex())
+        queries.run()
+    assert read_ids(model, queries) == full_order(pool)
+
+
+def scroll_to_end(model):
+    """Прокрутка: представление догружает страницы и читает видимые строки"""
+    while model.canFetchMore(QModelIndex()):
+        model.fetchMore(QModelIndex())
+        model.data(model.index(model.rowCount() - 1, 1))
+
+
+def benchmark(directory, rows):
+    """Открытие истории и прокрутка до конца: время и пик памяти"""
+    with closing(ConnectionPool(create_history_db(directory, rows))) as pool:
+        return measure_scroll(pool, rows)
+
+
+def measure_scroll(pool, rows):
+    model = create_model(pool)
+    started = time.perf_counter()
+    model.set_first_page(model.fetch_first_page(pool.reader()))
+    first_page = time.perf_counter() - started
+    started = time.perf_counter()
+    scroll_to_end(model)
+    scroll = time.perf_counter() - started
+
+    # Память меряем отдельным проходом - tracemalloc сильно замедляет выполнение
+    model = create_model(pool)
+    tracemalloc.start()
+    model.set_first_page(model.fetch_first_page(pool.reader()))
+    scroll_to_end(model)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Usage_History: {rows} строк")
+    print(f"  Первая страница: {first_page * 1000:.1f} мс")
+    print(f"  Прокрутка до конца: {scroll:.2f} с, строк в модели: {model.rowCount()}")
+    print(f"  Строк в памяти: {model.cached_row_count()}, пик памяти: {peak / 1024 / 1024:.1f} МБ")
+    return model.rowCount(), first_page, peak
+
+
+def test_scroll_memory_is_bounded(tmp_path):
+    """Память при прокрутке ограничена кэшем страниц, а не числом строк"""
+    small_rows, _, small_peak = benchmark(tmp_path, rows=20_000)
+    large_rows, first_page, large_peak = benchmark(tmp_path, rows=200_000)
+    assert (small_rows, large_rows) == (20_000, 200_000)
+    assert first_page < 0.5
+    # В 10 раз больше строк - память растет только на якоря страниц
+    assert large_peak < small_peak * 3, (small_peak, large_peak)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        test_pages_match_full_query(directory)
+        test_pages_load_through_query_service(directory)
+    with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+        test_refresh_keeps_model(pool)
+    with tempfile.TemporaryDirectory() as directory:
+        benchmark(directory, rows=int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,90 @@
+"""
+Тестирование полей выбора с поиском (LookupSource): поиск по началу
+нормализованного ключа, лимит, кэш и его сброс, время на большой таблице
+"""
+
+import tempfile
+import time
+
+from conftest import open_pool
+from database.lookup import AVAILABLE_ASSET_QUERY, EMPLOYEE_QUERY, USER_QUERY, LookupSource
+
+
+def seed_data(pool, employee_count=100):
+    """Сотрудники «Фамилия0001 Имя», три актива"""
+    with pool.transaction():
+        pool.writer.executemany(
+            "INSERT INTO Employees (last_name, first_name, patronymic, email) VALUES (?, ?, ?, ?)",
+            [('Ёлкин', 'Пётр', 'Сергеевич', 'elkin@example.com'), ('Елизаров', 'Иван', None, None)]
+            + [(f"Фамилия{i:06d}", "Имя", None, None) for i in range(employee_count)])
+        pool.writer.execute("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+        pool.writer.execute("INSERT INTO Locations (location_name) VALUES ('Склад №1')")
+        pool.writer.executemany(
+            "INSERT INTO Assets (name, type_id, model, location_id, quantity, current_status) VALUES (?, 1, ?, 1, ?, ?)",
+            [('Дрель Bosch', 'GSR 12', 3, 'Доступен'), ('дрель Makita', 'DF 33', 1, 'Выдан'),
+             ('Перфоратор', 'PR-1', 2, 'Доступен')])
+
+
+def employees(pool):
+    return LookupSource(pool, EMPLOYEE_QUERY, 'e.name_key', 'e.employee_id', ['Employees'])
+
+
+def test_prefix_search(pool):
+    """Начало ФИО без учета регистра и «ё», лимит, только доступные активы"""
+    seed_data(pool)
+    source = employees(pool)
+
+    assert source.find("ел", 10) == [(2, "Елизаров Иван"), (1, "Ёлкин Пётр Сергеевич (elkin@example.com)")]
+    assert source.find("ЁЛКИН  петр", 10) == [(1, "Ёлкин Пётр Сергеевич (elkin@example.com)")]
+    assert source.find("нет такого", 10) == []
+    assert len(source.find("фамилия", 25)) == 25
+    assert source.find("", 1) == [(2, "Елизаров Иван")]
+    assert source.get(1) == (1, "Ёлкин Пётр Сергеевич (elkin@example.com)")
+    assert source.get(999) is None
+
+    assets = LookupSource(pool, AVAILABLE_ASSET_QUERY, 'a.name_key', 'a.asset_id', ['Assets'])
+    assert assets.find("дрель", 10) == [(1, "Дрель Bosch (GSR 12) - 3 шт.")]
+
+    pool.execute_update("INSERT INTO Users (username, password) VALUES ('Ivan.Petrov', 'x'), ('admin', 'x')")
+    users = LookupSource(pool, USER_QUERY, 'u.username_key', 'u.user_id', ['Users'])
+    assert users.find("ivan p", 10) == [(1, "Ivan.Petrov")]
+    assert users.find("", 10) == [(2, "admin"), (1, "Ivan.Petrov")]
+
+    plan = pool.execute_query(
+        "EXPLAIN QUERY PLAN " + source._search_query, {'low': 'ел', 'high': 'ел\U0010ffff', 'limit': 10})
+    assert any("idx_employees_name_key" in row[-1] for row in plan)
+
+
+def test_cache_is_invalidated_by_changes(pool):
+    """Ответы кэшируются; изменение таблицы источника сбрасывает кэш, другой - нет"""
+    seed_data(pool)
+    source = employees(pool)
+    assert source.find("иван", 10) == []
+
+    pool.execute_update("INSERT INTO Employees (last_name, first_name) VALUES ('Иванов', 'Иван')")
+    assert source.find("иван", 10) == []  # из кэша
+
+    source.invalidate({'Assets': {1}})
+    assert source.find("иван", 10) == []
+    source.invalidate({'Employees': {103}})
+    assert [text for _, text in source.find("иван", 10)] == ["Иванов Иван"]
+
+
+def test_lookup_speed(pool):
+    """Поиск среди 200 000 сотрудников - миллисекунды, как и на маленькой таблице"""
+    seed_data(pool, 200000)
+    source = employees(pool)
+    timings = []
+    for text in ("", "ф", "фамилия1", "фамилия199999", "ел"):
+        started = time.perf_counter()
+        source.find(text, 50)
+        timings.append(time.perf_counter() - started)
+    print(f"  поиск среди 200 000 сотрудников: худший {max(timings) * 1000:.2f} мс")
+    assert max(timings) < 0.05
+
+
+if __name__ == "__main__":
+    for test in (test_prefix_search, test_cache_is_invalidated_by_changes, test_lookup_speed):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Поля выбора с поиском работают")
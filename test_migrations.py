@@ -0,0 +1,151 @@
+"""
+Тестирование миграций схемы и индексов Usage_History / Asset_Requests
+(EXPLAIN QUERY PLAN должен показывать поиск по индексу, а не SCAN таблицы)
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from database.migrations import LATEST_VERSION, apply_migrations, get_schema_version
+
+# Запросы приложения и индекс, который они обязаны использовать
+INDEXED_QUERIES = [
+    ("Статус актива (открытые выдачи)", """
+        SELECT COUNT(*) FROM Usage_History
+        WHERE asset_id = ? AND operation_type = 'выдача' AND actual_return_date IS NULL
+    """, (1,), "idx_usage_open_asset"),
+    ("Диалог возврата (выдачи сотрудника)", """
+        SELECT history_id, asset_id FROM Usage_History
+        WHERE employee_id = ? AND operation_type = 'выдача' AND actual_return_date IS NULL
+    """, (1,), "idx_usage_open_employee"),
+    ("Просроченные выдачи", """
+        SELECT COUNT(*) FROM Usage_History uh
+        WHERE uh.operation_type = 'выдача'
+          AND uh.actual_return_date IS NULL
+          AND uh.planned_return_date < DATE('now')
+    """, (), "idx_usage_open_due"),
+    ("История за период", """
+        SELECT history_id FROM Usage_History uh
+        WHERE uh.operation_date >= ? AND uh.operation_date < DATE(?, '+1 day')
+        ORDER BY uh.operation_date DESC
+    """, ("2024-01-01", "2024-01-31"), "idx_usage_operation_date"),
+    ("История сотрудника за период", """
+        SELECT history_id FROM Usage_History uh
+        WHERE uh.employee_id = ?
+          AND uh.operation_date >= ? AND uh.operation_date < DATE(?, '+1 day')
+    """, (1, "2024-01-01", "2024-01-31"), "idx_usage_employee_date"),
+    ("Запросы на рассмотрении", """
+        SELECT request_id FROM Asset_Requests
+        WHERE status = 'pending' ORDER BY request_date
+    """, (), "idx_requests_status"),
+]
+
+
+def create_database(directory):
+    """Новая БД во временном каталоге со всеми миграциями"""
+    connection = sqlite3.connect(os.path.join(directory, 'migrations.db'))
+    apply_migrations(connection)
+
+    # Типичное распределение: большинство выдач уже возвращено
+    rows = []
+    for i in range(5000):
+        day = f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+        returned = None if i % 20 == 0 else day
+        rows.append((i % 300 + 1, i % 50 + 1, 'выдача', day, day, returned))
+    connection.executemany(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+        "planned_return_date, actual_return_date) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    connection.executemany(
+        "INSERT INTO Asset_Requests (asset_id, employee_id, request_date, status) VALUES (?, ?, ?, ?)",
+        [(i % 300 + 1, i % 50 + 1, "2024-01-01", 'pending' if i % 10 == 0 else 'approved')
+         for i in range(1000)])
+    connection.commit()
+
+    # Статистика как у заполненной БД, чтобы планировщик выбирал индексы честно
+    connection.execute("ANALYZE")
+    return connection
+
+
+def query_plan(connection, query, params):
+    """Строки EXPLAIN QUERY PLAN одной строкой"""
+    rows = connection.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_migrations_are_applied_once(tmp_path):
+    """Миграции применяются один раз и повышают user_version"""
+    connection = create_database(tmp_path)
+    assert get_schema_version(connection) == LATEST_VERSION
+
+    connection.execute("INSERT INTO Positions (position_name) VALUES ('Инженер')")
+    connection.commit()
+
+    # Повторный запуск ничего не пересоздает и не теряет данные
+    assert apply_migrations(connection) == LATEST_VERSION
+    assert connection.execute("SELECT COUNT(*) FROM Positions").fetchone()[0] == 1
+    connection.close()
+
+
+def test_existing_database_is_upgraded(tmp_path):
+    """БД, созданная до миграций (user_version = 0), получает индексы и столбцы"""
+    connection = sqlite3.connect(os.path.join(tmp_path, 'legacy.db'))
+    connection.execute('''
+        CREATE TABLE Usage_History (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            operation_type VARCHAR(20) NOT NULL,
+            operation_date DATETIME NOT NULL,
+            planned_return_date DATE,
+            actual_return_date DATE,
+            notes TEXT
+        )
+    ''')
+    connection.execute(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date) "
+        "VALUES (1, 1, 'выдача', '2024-01-01')"
+    )
+    # Старые отметки о просрочке в примечаниях: открытая выдача и возвращенная с опозданием
+    connection.executemany(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+        "planned_return_date, actual_return_date, notes) VALUES (?, 1, 'выдача', '2024-01-01', ?, ?, ?)",
+        [(2, '2024-02-01', None, "Кол-во выданных: 2 шт.\n[Просрочено: 2024-02-05]"),
+         (3, '2024-02-01', '2024-02-10 12:00', "[Просрочено: 2024-02-02]"),
+         (4, '2024-02-01', '2024-02-01 18:00', None)])
+    connection.commit()
+
+    apply_migrations(connection)
+
+    indexes = {row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Usage_History'")}
+    assert "idx_usage_open_asset" in indexes
+    assert connection.execute("SELECT COUNT(*) FROM Usage_History").fetchone()[0] == 4
+    # Просрочка перенесена в overdue_since, примечания очищены от отметок
+    assert connection.execute(
+        "SELECT asset_id, overdue_since, notes, quantity FROM Usage_History ORDER BY asset_id").fetchall() == [
+        (1, None, None, 1),
+        (2, '2024-02-02', "Кол-во выданных: 2 шт.", 2),
+        (3, '2024-02-02', None, 1),
+        (4, None, None, 1),
+    ]
+    connection.close()
+
+
+def test_queries_use_indexes(tmp_path):
+    """Основные запросы используют индексы вместо полного сканирования"""
+    connection = create_database(tmp_path)
+    for title, query, params, index_name in INDEXED_QUERIES:
+        plan = query_plan(connection, query, params)
+        print(f"  {title}: {plan}")
+        assert index_name in plan, f"{title}: ожидался {index_name}, план: {plan}"
+        assert "SCAN" not in plan, f"{title}: полное сканирование, план: {plan}"
+    connection.close()
+
+
+if __name__ == "__main__":
+    for test in (test_migrations_are_applied_once, test_existing_database_is_upgraded,
+                 test_queries_use_indexes):
+        with tempfile.TemporaryDirectory() as directory:
+            test(directory)
+    print("✅ Миграции и индексы в порядке")
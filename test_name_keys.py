@@ -0,0 +1,165 @@
+"""
+Тестирование нормализованных ключей названий (миграция 10): кириллица без
+учета регистра, слияние существующих дубликатов, запрет новых, поиск по индексу
+"""
+
+import os
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+
+import database.migrations as migrations
+from database.connection_pool import ConnectionPool
+from conftest import open_pool
+from database.db_core import Database
+from database.db_manager import DatabaseManager
+from database.migrations import apply_migrations
+from database.normalize import connect, name_key
+from views.login_dialog import LoginDialog
+
+
+def test_name_key():
+    """casefold, «ё» -> «е», пробелы и знаки препинания схлопнуты"""
+    assert name_key("Склад №1") == name_key("склад № 1") == name_key(" СКЛАД-1 ") == "склад 1"
+    assert name_key("Ёлкин  Пётр") == "елкин петр"
+    assert name_key("Склад №1 *") == "склад 1"
+    assert name_key("Цех №5") != name_key("Цех №15")
+    assert name_key(None) is None
+
+
+def test_existing_duplicates_are_merged(tmp_path):
+    """Дубликаты местоположений сливаются (активы переводятся), тезки-сотрудники сохраняются"""
+    connection = sqlite3.connect(os.path.join(tmp_path, 'legacy.db'))
+    # БД предыдущей версии схемы (до миграции 10)
+    all_migrations, latest_version = migrations.MIGRATIONS, migrations.LATEST_VERSION
+    migrations.MIGRATIONS, migrations.LATEST_VERSION = all_migrations[:9], 9
+    try:
+        apply_migrations(connection)
+    finally:
+        migrations.MIGRATIONS, migrations.LATEST_VERSION = all_migrations, latest_version
+    connection.execute("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+    connection.executemany("INSERT INTO Locations (location_name) VALUES (?)",
+                           [('Склад №1',), ('склад № 1',), ('Склад №1 *',), ('Цех',)])
+    connection.executemany("INSERT INTO Assets (name, type_id, model, location_id) VALUES ('Молоток', 1, 'М', ?)",
+                           [(1,), (2,), (3,), (4,)])
+    connection.executemany("INSERT INTO Employees (last_name, first_name) VALUES (?, ?)",
+                           [('Ёлкин', 'Пётр'), ('елкин', 'петр')])
+    connection.commit()
+
+    apply_migrations(connection)
+
+    assert connection.execute("SELECT location_id, location_name, location_key FROM Locations").fetchall() == [
+        (1, 'Склад №1', 'склад 1'), (4, 'Цех', 'цех')]
+    assert connection.execute("SELECT location_id FROM Assets ORDER BY asset_id").fetchall() == [(1,), (1,), (1,), (4,)]
+    assert connection.execute("SELECT employee_id, name_key FROM Employees").fetchall() == [
+        (1, 'елкин петр'), (2, 'елкин петр #2')]
+    connection.close()
+
+
+def test_namesakes_log_in_with_exact_username(tmp_path):
+    """Учетная запись, ключ которой миграция дополнила « #id», входит по своему имени"""
+    pool = ConnectionPool(os.path.join(tmp_path, 'users.db'))
+    all_migrations, latest_version = migrations.MIGRATIONS, migrations.LATEST_VERSION
+    migrations.MIGRATIONS, migrations.LATEST_VERSION = all_migrations[:9], 9
+    try:
+        apply_migrations(pool.writer)
+    finally:
+        migrations.MIGRATIONS, migrations.LATEST_VERSION = all_migrations, latest_version
+    password = LoginDialog._hash_password('secret')
+    pool.writer.executemany("INSERT INTO Users (username, password, role) VALUES (?, ?, 'user')",
+                            [('Ivan.Petrov', password), ('ivan.petrov', password)])
+    pool.writer.commit()
+    apply_migrations(pool.writer)
+    assert pool.execute_query("SELECT username_key FROM Users WHERE user_id = 2") == [('ivan petrov #2',)]
+
+    dialog = SimpleNamespace(db=pool, _hash_password=LoginDialog._hash_password)
+    for user_id, username in ((1, 'Ivan.Petrov'), (2, 'ivan.petrov')):
+        user = LoginDialog._verify_credentials(dialog, username, 'secret')
+        assert (user['user_id'], user['username']) == (user_id, username)
+    assert LoginDialog._verify_credentials(dialog, 'ivan petrov', 'secret') is None
+    pool.close()
+
+
+def test_test_data_is_not_duplicated(tmp_path):
+    """Повторное заполнение db_core не дублирует записи и не оставляет ключей NULL"""
+    path = os.path.join(tmp_path, 'core.db')
+    Database(path)
+    connection = connect(path)
+    connection.execute("UPDATE Locations SET location_name = 'склад № 1' WHERE location_name = 'Склад №1'")
+    connection.execute("UPDATE Employees SET last_name = 'ИВАНОВ' WHERE last_name = 'Иванов'")
+    connection.commit()
+    counts = [connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+              for table in ('Asset_Types', 'Locations', 'Employees', 'Assets')]
+
+    Database(path)
+    assert [connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            for table in ('Asset_Types', 'Locations', 'Employees', 'Assets')] == counts
+    assert connection.execute("""
+        SELECT (SELECT COUNT(*) FROM Asset_Types WHERE type_key IS NULL)
+             + (SELECT COUNT(*) FROM Locations WHERE location_key IS NULL)
+             + (SELECT COUNT(*) FROM Employees WHERE name_key IS NULL)
+             + (SELECT COUNT(*) FROM Assets WHERE name_key IS NULL)
+    """).fetchone() == (0,)
+    connection.close()
+
+    # Соединение без функций ключей не может записать строку без ключа
+    plain = sqlite3.connect(path)
+    try:
+        plain.execute("INSERT INTO Locations (location_name) VALUES ('Склад №2')")
+        raise AssertionError("строка вставлена без ключа")
+    except sqlite3.OperationalError as e:
+        assert "name_key" in str(e)
+    plain.close()
+
+
+def test_app_test_data_keeps_keys(pool):
+    """Заполнение DatabaseManager не дублирует типы и местоположения и не оставляет ключей NULL"""
+    pool.execute_update("INSERT INTO Asset_Types (type_name) VALUES ('ИНСТРУМЕНТ')")
+    pool.execute_update("INSERT INTO Locations (location_name) VALUES ('склад № 1')")
+
+    DatabaseManager._populate_test_data(SimpleNamespace(connection=pool.writer))
+
+    assert pool.execute_query("""
+        SELECT (SELECT COUNT(*) FROM Asset_Types), (SELECT COUNT(*) FROM Locations),
+               (SELECT COUNT(*) FROM Asset_Types WHERE type_key IS NULL)
+             + (SELECT COUNT(*) FROM Locations WHERE location_key IS NULL)
+    """) == [(4, 4, 0)]
+
+
+def test_keys_are_maintained_on_write(tmp_path):
+    """Ключи пишут триггеры; дубликат в другом написании отклоняется, поиск - по индексу"""
+    connection = sqlite3.connect(os.path.join(tmp_path, 'keys.db'))
+    apply_migrations(connection)
+    connection.execute("INSERT INTO Locations (location_name) VALUES ('Склад №1')")
+    connection.execute("INSERT INTO Users (username, password) VALUES ('Ivan.Petrov', 'x')")
+    connection.execute("INSERT INTO Employees (last_name, first_name, patronymic) VALUES ('Иванов', 'Иван', NULL)")
+
+    for duplicate in ("INSERT INTO Locations (location_name) VALUES ('СКЛАД № 1')",
+                      "INSERT INTO Users (username, password) VALUES ('ivan_petrov', 'x')",
+                      "INSERT INTO Employees (last_name, first_name) VALUES ('ИВАНОВ', 'иван')"):
+        try:
+            connection.execute(duplicate)
+            raise AssertionError(f"дубликат вставлен: {duplicate}")
+        except sqlite3.IntegrityError:
+            pass
+
+    connection.execute("UPDATE Employees SET patronymic = 'Иванович'")
+    assert connection.execute("SELECT name_key FROM Employees").fetchone() == ('иванов иван иванович',)
+
+    plan = connection.execute("EXPLAIN QUERY PLAN SELECT user_id FROM Users WHERE username_key = ?",
+                              (name_key("IVAN PETROV"),)).fetchall()
+    assert "idx_users_username_key" in plan[0][-1]
+    assert connection.execute("SELECT user_id FROM Users WHERE username_key = ?",
+                              (name_key("IVAN PETROV"),)).fetchall() == [(1,)]
+    connection.close()
+
+
+if __name__ == "__main__":
+    test_name_key()
+    for test in (test_existing_duplicates_are_merged, test_namesakes_log_in_with_exact_username,
+                 test_test_data_is_not_duplicated, test_keys_are_maintained_on_write):
+        with tempfile.TemporaryDirectory() as directory:
+            test(directory)
+    with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+        test_app_test_data_keeps_keys(pool)
+    print("✅ Нормализованные ключи работают")
@@ -87,7 +87,7 @@ def test_notification_manager():
     print("✓ NotificationManager инициализирован")
     
     # Запускаем проверку сроков
-    notification_manager.start_checking(interval_ms=5000)  # Проверка каждые 5 секунд
+    notification_manager.start_checking()  # Уведомления при наступлении сроков
     print("✓ Проверка сроков запущена")
     
     # Показываем окно
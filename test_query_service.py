@@ -0,0 +1,104 @@
+"""
+Тестирование фонового выполнения запросов (QueryService):
+результат приходит в поток GUI, вытесненные загрузки прерываются
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtCore import QCoreApplication
+from conftest import open_pool
+from database.query_service import QueryService
+
+# Заведомо долгий запрос (~секунды), который можно прервать только через progress handler
+SLOW_QUERY = """
+    WITH RECURSIVE counter(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM counter WHERE n < 50000000)
+    SELECT COUNT(*) FROM counter
+"""
+
+
+_app = None
+
+
+def get_app():
+    """Экземпляр приложения (создается лениво - другие тесты создают свой QApplication)"""
+    global _app
+    # Ссылка держит приложение живым: иначе оно удаляется сразу после вызова
+    if QCoreApplication.instance() is None:
+        _app = QCoreApplication([])
+    return QCoreApplication.instance()
+
+
+def create_service(pool):
+    pool.execute_update("CREATE TABLE Items (item_id INTEGER PRIMARY KEY, name TEXT)")
+    pool.execute_update("INSERT INTO Items (name) VALUES ('Молоток'), ('Ключ')")
+    return QueryService(pool)
+
+
+def wait_idle(service, timeout=10):
+    app = get_app()
+    deadline = time.time() + timeout
+    while service.is_busy() and time.time() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    app.processEvents()
+    assert not service.is_busy(), "загрузка не завершилась"
+
+
+def test_result_delivered_in_gui_thread(pool):
+    """Колбэк получает колонки и строки в потоке, где создан сервис"""
+    get_app()
+    service = create_service(pool)
+    results = []
+    busy_states = []
+    service.busy_changed.connect(busy_states.append)
+
+    service.submit_query('items', "SELECT item_id, name FROM Items ORDER BY item_id", (),
+                         lambda columns, rows: results.append((columns, rows, threading.current_thread())))
+    wait_idle(service)
+
+    assert results == [(['item_id', 'name'], [(1, 'Молоток'), (2, 'Ключ')], threading.main_thread())]
+    assert busy_states == [True, False]
+    service.shutdown()
+
+
+def test_superseded_load_is_interrupted(pool):
+    """Новая загрузка с тем же ключом прерывает долгую и отбрасывает ее результат"""
+    get_app()
+    service = create_service(pool)
+    results = []
+
+    started = time.perf_counter()
+    service.submit_query('history', SLOW_QUERY, (), lambda columns, rows: results.append('slow'))
+    time.sleep(0.1)  # долгий запрос уже выполняется в рабочем потоке
+    service.submit_query('history', "SELECT COUNT(*) FROM Items", (),
+                         lambda columns, rows: results.append(rows[0][0]))
+    wait_idle(service)
+    elapsed = time.perf_counter() - started
+
+    assert results == [2]
+    assert elapsed < 2, f"долгий запрос не был прерван: {elapsed:.2f} с"
+    service.shutdown()
+
+
+def test_errors_reported(pool):
+    """Ошибка SQL приходит в on_error, а не роняет рабочий поток"""
+    get_app()
+    service = create_service(pool)
+    errors = []
+    service.submit_query('broken', "SELECT * FROM Missing", (), lambda columns, rows: None, errors.append)
+    wait_idle(service)
+    assert errors and "Missing" in errors[0]
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    for test in (test_result_delivered_in_gui_thread, test_superseded_load_is_interrupted,
+                 test_errors_reported):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    print("✅ Фоновые запросы работают")
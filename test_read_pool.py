@@ -0,0 +1,195 @@
+"""
+Тестирование пула соединений: read-only соединение на поток, закрытие
+соединений завершившихся потоков
+
+Бенчмарк пропускной способности чтения на большой Usage_History
+запускается только вручную: python test_read_pool.py [строк]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from PyQt6.QtCore import QMutex, QMutexLocker, QThreadPool
+from conftest import open_pool
+from database.connection_pool import ConnectionPool
+
+READERS = 4
+QUERIES_PER_READER = 40
+
+# Типичные запросы на чтение: счетчики дашборда и просрочки по сотруднику
+READ_QUERIES = [
+    ("""
+        SELECT COUNT(*)
+        FROM Usage_History
+        WHERE operation_type = 'выдача'
+          AND actual_return_date IS NULL
+          AND employee_id = ?
+    """, lambda: (random.randint(1, 200),)),
+    ("""
+        SELECT COUNT(*)
+        FROM Usage_History
+        WHERE operation_type = 'выдача'
+          AND actual_return_date IS NULL
+          AND DATE(planned_return_date) < DATE('now')
+    """, lambda: ()),
+    ("SELECT COUNT(*) FROM Usage_History WHERE employee_id = ?", lambda: (random.randint(1, 200),)),
+]
+
+
+def create_history_db(path, rows):
+    """Создать БД с большой таблицей Usage_History"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
+        CREATE TABLE Usage_History (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            operation_type VARCHAR(20) NOT NULL,
+            operation_date DATETIME NOT NULL,
+            planned_return_date DATE,
+            actual_return_date DATE,
+            notes TEXT
+        )
+    ''')
+
+    start = datetime(2020, 1, 1)
+    batch = []
+    for i in range(rows):
+        issued = start + timedelta(minutes=7 * i)
+        planned = (issued + timedelta(days=7)).strftime('%Y-%m-%d')
+        returned = None if i % 20 == 0 else (issued + timedelta(days=5)).strftime('%Y-%m-%d')
+        batch.append((
+            random.randint(1, 5000), random.randint(1, 200), 'выдача',
+            issued.strftime('%Y-%m-%d %H:%M:%S'), planned, returned, 'Кол-во выданных: 1 шт.'
+        ))
+        if len(batch) == 10000:
+            conn.executemany(
+                "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+                "planned_return_date, actual_return_date, notes) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany(
+            "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+            "planned_return_date, actual_return_date, notes) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def run_readers(execute):
+    """Запустить READERS потоков и вернуть число запросов в секунду"""
+    errors = []
+
+    def worker():
+        try:
+            for n in range(QUERIES_PER_READER):
+                query, make_params = READ_QUERIES[n % len(READ_QUERIES)]
+                execute(query, make_params())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(READERS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    assert not errors, errors
+    return READERS * QUERIES_PER_READER / elapsed
+
+
+def benchmark(directory, rows):
+    """Сравнение: одно соединение под мьютексом против пула читателей"""
+    db_path = os.path.join(directory, 'bench.db')
+    create_history_db(db_path, rows)
+
+    # Старая схема: одно соединение, каждый запрос под общим мьютексом
+    single = sqlite3.connect(db_path, check_same_thread=False)
+    mutex = QMutex()
+
+    def serialized_query(query, params=()):
+        with QMutexLocker(mutex):
+            cursor = single.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    serialized_qps = run_readers(serialized_query)
+    single.close()
+
+    pool = ConnectionPool(db_path)
+    pooled_qps = run_readers(pool.execute_query)
+    pool.close()
+
+    print(f"Usage_History: {rows} строк, читателей: {READERS}, ядер CPU: {os.cpu_count()}")
+    print(f"  Одно соединение + мьютекс: {serialized_qps:8.1f} запросов/с")
+    print(f"  Пул соединений (WAL):      {pooled_qps:8.1f} запросов/с")
+    print(f"  Ускорение: x{pooled_qps / serialized_qps:.2f}")
+
+
+def wait_for_readers(pool, count, timeout=5):
+    """Соединение закрывается при завершении потока - уже после join()"""
+    deadline = time.time() + timeout
+    while pool.reader_count() != count and time.time() < deadline:
+        time.sleep(0.01)
+    return pool.reader_count()
+
+
+def test_pool_reads_and_writes(pool):
+    """Пул: чтение видит закоммиченные записи писателя, читатели read-only"""
+    pool.execute_update("CREATE TABLE Items (item_id INTEGER PRIMARY KEY, name TEXT)")
+    new_id = pool.execute_update("INSERT INTO Items (name) VALUES (?)", ("Молоток",))
+
+    assert pool.execute_query("SELECT name FROM Items WHERE item_id = ?", (new_id,)) == [("Молоток",)]
+
+    try:
+        pool.reader().execute("INSERT INTO Items (name) VALUES ('Ключ')")
+        assert False, "read-only соединение не должно принимать запись"
+    except sqlite3.OperationalError:
+        pass
+
+    # Каждый поток получает собственное соединение и закрывает его при завершении
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append((pool.reader(), pool.reader_count())))
+    thread.start()
+    thread.join()
+    assert seen[0][0] is not pool.reader() and seen[0][1] == 2
+    assert wait_for_readers(pool, 1) == 1
+
+
+def test_thread_pool_tasks_reuse_reader(pool):
+    """Задачи QThreadPool переиспользуют соединение потока, простаивающий поток его закрывает"""
+    thread_pool = QThreadPool()
+    thread_pool.setMaxThreadCount(2)
+    thread_pool.setExpiryTimeout(100)
+    readers = []
+    lock = threading.Lock()
+
+    def task():
+        connection = pool.reader()
+        connection.execute("SELECT 1").fetchall()
+        with lock:
+            readers.append(connection)
+
+    for _ in range(50):
+        thread_pool.start(task)
+    thread_pool.waitForDone()
+
+    assert len(readers) == 50 and len(set(map(id, readers))) <= 2
+    # Рабочие потоки завершились после простоя - их соединения закрыты
+    assert wait_for_readers(pool, 0) == 0
+
+
+if __name__ == "__main__":
+    for test in (test_pool_reads_and_writes, test_thread_pool_tasks_reuse_reader):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    with tempfile.TemporaryDirectory() as directory:
+        benchmark(directory, rows=int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,109 @@
+"""
+Тестирование полнотекстового поиска (Search_Index, FTS5): регистр кириллицы,
+«ё», поиск по началу слова, синхронизация триггерами и время запроса
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+from database.migrations import SEARCH_ASSET, SEARCH_EMPLOYEE, SEARCH_HISTORY, apply_migrations
+from database.search_index import match_expression, search
+
+NAMES = ['Дрель', 'Перфоратор', 'Шуруповерт', 'Болгарка', 'Уровень', 'Рулетка', 'Мультиметр', 'Пила']
+BRANDS = ['Bosch', 'Makita', 'DeWALT', 'Интерскол']
+
+
+def create_database(directory, asset_count=1000):
+    """БД во временном каталоге: активы, два сотрудника и операции с примечаниями"""
+    connection = sqlite3.connect(os.path.join(directory, 'search.db'))
+    apply_migrations(connection)
+    connection.execute("INSERT INTO Asset_Types (type_name) VALUES ('Инструмент')")
+    connection.execute("INSERT INTO Locations (location_name) VALUES ('Склад №1')")
+    connection.executemany(
+        "INSERT INTO Assets (name, type_id, model, serial_number, location_id) VALUES (?, 1, ?, ?, 1)",
+        [(f"{NAMES[i % len(NAMES)]} {BRANDS[i % len(BRANDS)]}", f"GSR {i % 180}", f"SN-{i:07d}")
+         for i in range(1, asset_count + 1)])
+    connection.executemany(
+        "INSERT INTO Employees (last_name, first_name, patronymic) VALUES (?, ?, ?)",
+        [('Ёлкин', 'Пётр', 'Сергеевич'), ('Иванов', 'Иван', None)])
+    connection.executemany(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, notes) "
+        "VALUES (?, ?, 'выдача', '2024-03-01 10:00', ?)",
+        [(1, 1, "Сломан патрон, нужна замена"), (2, 2, "Выдан на объект Северный"), (3, 2, None)])
+    connection.commit()
+    return connection
+
+
+def test_match_expression():
+    """Слова ищутся по началу, операторы FTS5 во вводе экранируются"""
+    assert match_expression("Bosch GSR") == '"Bosch"* "GSR"*'
+    assert match_expression('ёлка "OR" NEAR(*)') == '"елка"* "OR"* "NEAR"*'
+    assert match_expression("  -- ") == ''
+
+
+def test_search_entities(tmp_path):
+    """Кириллица без учета регистра, «ё» как «е», части серийного номера, примечания"""
+    connection = create_database(tmp_path)
+
+    hits = search(connection, "дрель bosch")
+    assert hits and all(hit.kind == SEARCH_ASSET for hit in hits)
+    assert all(hit.title == "Дрель Bosch" for hit in hits)
+
+    assert [hit.entity_id for hit in search(connection, "sn 0000042")] == [42]
+
+    [employee] = search(connection, "елкин петр")
+    assert (employee.kind, employee.entity_id, employee.title) == (SEARCH_EMPLOYEE, 1, "Ёлкин Пётр Сергеевич")
+
+    [note] = search(connection, "ПАТРОН")
+    assert (note.kind, note.entity_id, note.employee_id, note.title) == (SEARCH_HISTORY, 1, 1, "Перфоратор Makita")
+    assert "«патрон»" in note.details.casefold()
+
+    # Сотрудник видит каталог и только свои операции
+    assert search(connection, "северный", employee_id=1) == []
+    assert [hit.entity_id for hit in search(connection, "северный", employee_id=2)] == [2]
+    assert search(connection, "иванов", employee_id=2) == []
+    connection.close()
+
+
+def test_triggers_keep_index_in_sync(tmp_path):
+    """Изменения и удаления видны в поиске сразу, без перестроения индекса"""
+    connection = create_database(tmp_path)
+
+    connection.execute("UPDATE Assets SET name = 'Лазерный дальномер', serial_number = 'LD-77' WHERE asset_id = 5")
+    connection.execute("UPDATE Employees SET last_name = 'Петров' WHERE employee_id = 2")
+    connection.execute("UPDATE Usage_History SET notes = 'Возврат с объекта Южный' WHERE history_id = 3")
+    connection.execute("UPDATE Usage_History SET notes = NULL WHERE history_id = 1")
+    connection.execute("DELETE FROM Assets WHERE asset_id = 6")
+    connection.commit()
+
+    assert [hit.entity_id for hit in search(connection, "дальномер ld 77")] == [5]
+    assert [hit.entity_id for hit in search(connection, "петров")] == [2]
+    assert search(connection, "иванов") == []
+    assert [hit.entity_id for hit in search(connection, "южн")] == [3]
+    assert search(connection, "патрон") == []
+    assert search(connection, "SN-0000006") == []
+    connection.close()
+
+
+def test_search_speed(tmp_path):
+    """Поиск по 100 000 активов - миллисекунды"""
+    connection = create_database(tmp_path, 100000)
+    timings = []
+    for text in ("болг", "bosch gsr 17", "sn-00424", "интерскол пила"):
+        started = time.perf_counter()
+        hits = search(connection, text, limit=30)
+        timings.append(time.perf_counter() - started)
+        assert hits
+    print(f"  поиск по 100 000 активов: худший запрос {max(timings) * 1000:.1f} мс")
+    assert max(timings) < 0.2
+    connection.close()
+
+
+if __name__ == "__main__":
+    test_match_expression()
+    for test in (test_search_entities, test_triggers_keep_index_in_sync, test_search_speed):
+        with tempfile.TemporaryDirectory() as directory:
+            test(directory)
+    print("✅ Полнотекстовый поиск работает")
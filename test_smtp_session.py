@@ -0,0 +1,215 @@
+"""
+Тестирование пакетной отправки писем (EmailNotifier.send_batch / SMTPSession)
+на локальном SMTP-сервере-заглушке: одно соединение и один вход на серию,
+переподключение при разрыве, ограничение писем в минуту
+"""
+
+import base64
+import socketserver
+import threading
+import time
+
+import email_notifier
+from email_notifier import EmailNotifier, SMTPSession
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Минимальный SMTP-сервер: принимает AUTH PLAIN и письма, считает соединения
+
+    handshake_delay имитирует стоимость TLS-рукопожатия и входа у настоящего
+    сервиса, drop_after - разрыв соединения после N писем,
+    reject - адреса, отклоняемые с кодом 550.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0, drop_after=None, reject=()):
+        super().__init__(('127.0.0.1', 0), StubSMTPHandler)
+        self.handshake_delay = handshake_delay
+        self.drop_after = drop_after
+        self.reject = set(reject)
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake_delay)
+        self.reply("220 stub ESMTP")
+        received = 0
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN")
+            elif command == "AUTH":
+                _, user, password = base64.b64decode(line.split()[2]).split(b"\0")
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 ok" if password == b"secret" else "535 bad credentials")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 ok")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                if address in server.reject:
+                    self.reply("550 no such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 ok")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with server.lock:
+                    server.messages.extend(recipients)
+                self.reply("250 queued")
+                received += 1
+                if server.drop_after and received >= server.drop_after:
+                    return
+            elif command == "RSET" or command == "NOOP":
+                self.reply("250 ok")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 unknown command")
+
+
+def create_notifier(server, password="secret"):
+    notifier = EmailNotifier()
+    notifier.smtp_server = '127.0.0.1'
+    notifier.smtp_port = server.port
+    notifier.sender_email = 'tracker@example.com'
+    notifier.sender_password = password
+    notifier.security = 'none'
+    notifier.max_per_minute = None
+    notifier.enabled = True
+    return notifier
+
+
+def deadline_messages(notifier, count):
+    return [notifier.deadline_warning(f"user{i}@example.com", f"Сотрудник {i}", f"Дрель {i}", "2025-01-01", -i)
+            for i in range(count)]
+
+
+def test_batch_uses_one_connection():
+    """Серия писем - одно соединение и один вход; бенчмарк против соединения на письмо"""
+    server = StubSMTPServer(handshake_delay=0.01)
+    notifier = create_notifier(server)
+    messages = deadline_messages(notifier, 100)
+
+    started = time.perf_counter()
+    for message in messages:
+        assert notifier.send_email(*message)
+    per_message = time.perf_counter() - started
+    assert server.connections == 100 and server.logins == 100
+
+    server.connections = server.logins = 0
+    started = time.perf_counter()
+    results = notifier.send_batch(messages)
+    batched = time.perf_counter() - started
+
+    print(f"  100 писем: по соединению на письмо {per_message:.2f} с, одной сессией {batched:.2f} с "
+          f"({100 / batched:.0f} писем/с)")
+    assert results == [True] * 100
+    assert server.connections == 1 and server.logins == 1
+    assert len(server.messages) == 200
+    assert batched * 5 < per_message
+
+    # После max_per_connection писем соединение обновляется
+    notifier.max_per_connection = 40
+    server.connections = 0
+    assert notifier.send_batch(messages) == [True] * 100
+    assert server.connections == 3
+    server.stop()
+
+
+def test_reconnect_and_rejected_recipient():
+    """Разрыв соединения - переподключение и повтор письма; отклоненный адрес не мешает остальным"""
+    server = StubSMTPServer(drop_after=30, reject={'user5@example.com'})
+    notifier = create_notifier(server)
+
+    results = notifier.send_batch(deadline_messages(notifier, 100))
+
+    assert results == [i != 5 for i in range(100)]
+    assert sorted(server.messages) == sorted(f"user{i}@example.com" for i in range(100) if i != 5)
+    # 99 писем по 30 на соединение
+    assert server.connections == 4
+    server.stop()
+
+
+def test_authentication_error_stops_batch():
+    """Неверный пароль - один вход, серия прекращается"""
+    server = StubSMTPServer()
+    notifier = create_notifier(server, password="wrong")
+
+    assert notifier.send_batch(deadline_messages(notifier, 10)) == [False] * 10
+    assert server.logins == 1 and server.messages == []
+    server.stop()
+
+
+def test_rate_limit():
+    """Не больше max_per_minute писем за скользящую минуту"""
+    server = StubSMTPServer()
+    clock = [0.0]
+    sleeps = []
+
+    class FakeTime:
+        @staticmethod
+        def monotonic():
+            return clock[0]
+
+        @staticmethod
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+    real_time = email_notifier.time
+    email_notifier.time = FakeTime
+    try:
+        with SMTPSession('127.0.0.1', server.port, 'tracker@example.com', 'secret',
+                         security='none', max_per_minute=10, max_per_connection=4) as session:
+            notifier = create_notifier(server)
+            for message in deadline_messages(notifier, 25):
+                session.send(notifier.build_message(*message))
+                clock[0] += 1
+    finally:
+        email_notifier.time = real_time
+
+    assert len(server.messages) == 25
+    # 10 писем за 10 с, пауза до конца минуты, еще 10, пауза, 5
+    assert [round(seconds) for seconds in sleeps] == [50, 50]
+    assert server.connections == 7
+    server.stop()
+
+
+if __name__ == "__main__":
+    test_batch_uses_one_connection()
+    test_reconnect_and_rejected_recipient()
+    test_authentication_error_stops_batch()
+    test_rate_limit()
+    print("✅ Пакетная отправка писем работает")
@@ -0,0 +1,138 @@
+"""
+Тестирование единицы работы ConnectionPool.transaction() на операциях
+выдачи и возврата (database/loans.py - общий код IssueDialog/ReturnDialog):
+атомарность и задержка записи (один COMMIT вместо четырех)
+
+Бенчмарк задержки (synchronous=FULL, fsync на каждый коммит) запускается
+только вручную: python test_transactions.py [операций]
+"""
+
+import sys
+import tempfile
+import threading
+import time
+
+from conftest import open_pool, seed_reference_data
+from database.loans import issue_asset, return_asset
+
+OPERATION_DATE = '2025-01-01 10:00:00'
+
+
+def seed_asset(pool, quantity=10):
+    """Актив 'Молоток' (ID 1) на складе в количестве quantity"""
+    seed_reference_data(pool)
+    pool.execute_update(
+        "INSERT INTO Assets (name, type_id, model, location_id, quantity) VALUES ('Молоток', 1, 'М1', 1, ?)",
+        (quantity,))
+
+
+def asset_state(pool):
+    return pool.execute_query("SELECT quantity, current_status FROM Assets WHERE asset_id = 1")[0]
+
+
+def test_issue_and_return(pool):
+    """Выдача списывает остаток и открывает выдачу, возврат закрывает все открытые выдачи"""
+    seed_asset(pool)
+
+    assert issue_asset(pool, 1, 1, 3, OPERATION_DATE, '2025-01-10') == 7
+    assert issue_asset(pool, 1, 1, 2, OPERATION_DATE, '2025-01-10') == 5
+    assert asset_state(pool) == (5, 'Выдан')
+    assert pool.execute_query("SELECT COUNT(*), SUM(quantity) FROM Active_Loans") == [(2, 5)]
+
+    assert return_asset(pool, 1, 1, '2025-01-02 10:00:00', '2025-01-02', 'цел') == (5, 10)
+    assert asset_state(pool) == (10, 'Доступен')
+    assert pool.execute_query("SELECT COUNT(*) FROM Active_Loans") == [(0,)]
+    assert pool.execute_query(
+        "SELECT quantity, notes FROM Usage_History WHERE operation_type = 'возврат'"
+    ) == [(5, 'Возврат актива (Кол-во: 5 шт.). цел')]
+
+
+def test_transaction_commits_once(pool):
+    """Изменения выдачи видны другим потокам только после выхода из блока"""
+    seed_asset(pool)
+    seen_inside = []
+
+    with pool.transaction():
+        issue_asset(pool, 1, 1, 3, OPERATION_DATE, '2025-01-10')
+        # Свои изменения видны внутри транзакции
+        assert asset_state(pool) == (7, 'Выдан')
+        # Читатель другого потока видит последнее закоммиченное состояние
+        thread = threading.Thread(target=lambda: seen_inside.append(asset_state(pool)))
+        thread.start()
+        thread.join()
+
+    assert seen_inside == [(10, 'Доступен')]
+    assert asset_state(pool) == (7, 'Выдан')
+
+
+def test_issue_rolls_back_when_stock_is_short(pool):
+    """Нехватка остатка не оставляет ни списания, ни записи в истории"""
+    seed_asset(pool, quantity=2)
+    try:
+        issue_asset(pool, 1, 1, 3, OPERATION_DATE, '2025-01-10')
+        assert False, "ожидалась ошибка нехватки остатка"
+    except ValueError:
+        pass
+
+    assert asset_state(pool) == (2, 'Доступен')
+    assert pool.execute_query("SELECT COUNT(*) FROM Usage_History") == [(0,)]
+    assert not pool.writer.in_transaction
+
+
+def test_transaction_rolls_back_on_error(pool):
+    """Ошибка после вложенной операции откатывает всю внешнюю транзакцию"""
+    seed_asset(pool)
+    try:
+        with pool.transaction():
+            # Операция присоединяется к внешней транзакции
+            issue_asset(pool, 1, 1, 2, OPERATION_DATE, '2025-01-10')
+            raise RuntimeError("сбой между операциями")
+    except RuntimeError:
+        pass
+
+    assert asset_state(pool) == (10, 'Доступен')
+    assert pool.execute_query("SELECT COUNT(*) FROM Usage_History") == [(0,)]
+    assert not pool.writer.in_transaction
+
+
+def issue_without_transaction(pool, quantity):
+    """Те же запросы, что в issue_asset, но каждый со своим COMMIT (до transaction())"""
+    pool.execute_query("SELECT quantity FROM Assets WHERE asset_id = 1")
+    pool.execute_update("UPDATE Assets SET quantity = quantity - ? WHERE asset_id = 1", (quantity,))
+    pool.execute_update(
+        "INSERT INTO Usage_History (asset_id, employee_id, operation_type, operation_date, "
+        "planned_return_date, quantity, notes) VALUES (1, 1, 'выдача', ?, '2025-01-10', ?, ?)",
+        (OPERATION_DATE, quantity, f"Кол-во выданных: {quantity} шт."))
+    pool.execute_update("UPDATE Assets SET current_status = 'Выдан' WHERE asset_id = 1")
+
+
+def benchmark(pool, operations=200):
+    """Средняя задержка выдачи: отдельные коммиты против одной транзакции"""
+    seed_asset(pool, quantity=1000000)
+    # FULL - каждый коммит гарантированно доходит до диска (fsync WAL)
+    pool.writer.execute("PRAGMA synchronous=FULL")
+
+    started = time.perf_counter()
+    for _ in range(operations):
+        issue_without_transaction(pool, 1)
+    separate = (time.perf_counter() - started) / operations
+
+    started = time.perf_counter()
+    for _ in range(operations):
+        issue_asset(pool, 1, 1, 1, OPERATION_DATE, '2025-01-10')
+    batched = (time.perf_counter() - started) / operations
+
+    print(f"Выдача, {operations} операций (synchronous=FULL):")
+    print(f"  Отдельные коммиты: {separate * 1000:7.3f} мс/операция")
+    print(f"  Одна транзакция:   {batched * 1000:7.3f} мс/операция")
+    print(f"  Ускорение: x{separate / batched:.2f}")
+    return separate, batched
+
+
+if __name__ == "__main__":
+    for test in (test_issue_and_return, test_transaction_commits_once,
+                 test_issue_rolls_back_when_stock_is_short, test_transaction_rolls_back_on_error):
+        with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+            test(pool)
+    with tempfile.TemporaryDirectory() as directory, open_pool(directory) as pool:
+        benchmark(pool, operations=int(sys.argv[1]) if len(sys.argv) > 1 else 200)
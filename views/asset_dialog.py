@@ -110,15 +110,12 @@ class AssetDialog(QDialog):
             return
 
         try:
-            # Проверяем, нет ли уже такого местоположения
-            existing = self.db.execute_query(
-                "SELECT location_id FROM Locations WHERE location_name = ?",
-                (current_text,)
-            )
+            # Проверяем, нет ли уже такого местоположения (без учета регистра, пробелов и знаков)
+            existing = self.db.find_location(current_text)
 
             if existing:
-                QMessageBox.information(self, "Информация", "Такое местоположение уже существует!")
-                self.location_combo.setCurrentText(current_text)
+                QMessageBox.information(self, "Информация", f"Такое местоположение уже существует: '{existing[1]}'")
+                self.location_combo.setCurrentText(existing[1])
                 return
 
             # Добавляем новое местоположение с отметкой *
@@ -163,44 +160,46 @@ class AssetDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Поле 'Местоположение' обязательно для заполнения!")
             return
 
-        try:
-            # Если местоположение новое (не выбрано из списка), добавляем его
-            location_id = self.location_combo.currentData()
-            if location_id is None:
-                # Это новое местоположение, которого нет в базе
-                new_location_name = f"{location_text} *"
-                location_id = self.db.execute_update(
-                    "INSERT INTO Locations (location_name) VALUES (?)",
-                    (new_location_name,)
-                )
-            else:
-                # Проверяем, не изменился ли текст существующего местоположения
-                current_location_name = self.location_combo.currentText()
-                db_location = self.db.execute_query(
-                    "SELECT location_name FROM Locations WHERE location_id = ?",
-                    (location_id,)
-                )
+        # Серийный номер уникален (idx_assets_serial_key) - сообщаем понятнее, чем ошибка БД
+        serial_number = self.serial_input.text().strip()
+        duplicate = self.db.find_asset_by_serial(serial_number) if serial_number else None
+        if duplicate:
+            QMessageBox.warning(self, "Ошибка",
+                                f"Серийный номер уже присвоен активу «{duplicate[1]}» (ID {duplicate[0]})!")
+            return
 
-                if db_location and current_location_name != db_location[0][0]:
-                    # Пользователь изменил текст существующей записи - создаем новую
-                    new_location_name = f"{current_location_name} *"
-                    location_id = self.db.execute_update(
-                        "INSERT INTO Locations (location_name) VALUES (?)",
-                        (new_location_name,)
+        try:
+            # Новое местоположение и актив - одна транзакция
+            with self.db.transaction():
+                # Если местоположение новое (не выбрано из списка), добавляем его
+                location_id = self.location_combo.currentData()
+                if location_id is None:
+                    # Не выбрано из списка: то же местоположение в другом написании или новое
+                    location_id = self.db.get_or_create_location(location_text)
+                else:
+                    # Проверяем, не изменился ли текст существующего местоположения
+                    current_location_name = self.location_combo.currentText()
+                    db_location = self.db.execute_query(
+                        "SELECT location_name FROM Locations WHERE location_id = ?",
+                        (location_id,)
                     )
 
-            # Вставляем новый актив
-            asset_id = self.db.execute_update('''
-                INSERT INTO Assets (name, type_id, model, serial_number, current_status, location_id, quantity)
-                VALUES (?, ?, ?, ?, 'Доступен', ?, ?)
-            ''', (
-                self.name_input.text().strip(),
-                self.type_combo.currentData(),
-                self.model_input.text().strip(),
-                self.serial_input.text().strip() or None,
-                location_id,
-                self.quantity_spin.value()
-            ))
+                    if db_location and current_location_name != db_location[0][0]:
+                        # Пользователь изменил текст существующей записи - находим или создаем
+                        location_id = self.db.get_or_create_location(current_location_name)
+
+                # Вставляем новый актив
+                asset_id = self.db.execute_update('''
+                    INSERT INTO Assets (name, type_id, model, serial_number, current_status, location_id, quantity)
+                    VALUES (?, ?, ?, ?, 'Доступен', ?, ?)
+                ''', (
+                    self.name_input.text().strip(),
+                    self.type_combo.currentData(),
+                    self.model_input.text().strip(),
+                    self.serial_input.text().strip() or None,
+                    location_id,
+                    self.quantity_spin.value()
+                ))
 
             # Логирование добавления актива
             if AUDIT_ENABLED and hasattr(self.parent(), 'current_user'):
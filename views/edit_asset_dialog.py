@@ -3,6 +3,7 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                              QMessageBox, QCheckBox, QGroupBox, QTextEdit)
 from PyQt6.QtCore import Qt, QDate
 from database.db_manager import DatabaseManager
+from views.entity_picker import EntityPicker
 import sys
 import os
 
@@ -86,7 +87,7 @@ class EditAssetDialog(QDialog):
         self.issue_group = QGroupBox("Информация о выдаче")
         self.issue_layout = QFormLayout(self.issue_group)
 
-        self.employee_combo = QComboBox()
+        self.employee_combo = EntityPicker(self.db.employee_lookup, "Начните вводить фамилию...")
 
         # Заменяем QLineEdit на QDateEdit для выбора дат
         from PyQt6.QtWidgets import QDateEdit
@@ -191,11 +192,10 @@ class EditAssetDialog(QDialog):
                     e.last_name || ' ' || e.first_name || ' ' || COALESCE(e.patronymic, '') as employee_name,
                     uh.operation_date,
                     uh.planned_return_date
-                FROM Usage_History uh
-                JOIN Employees e ON uh.employee_id = e.employee_id
-                WHERE uh.asset_id = ? 
-                    AND uh.operation_type = 'выдача' 
-                    AND uh.actual_return_date IS NULL
+                FROM Active_Loans al
+                JOIN Usage_History uh ON uh.history_id = al.history_id
+                JOIN Employees e ON al.employee_id = e.employee_id
+                WHERE al.asset_id = ?
                 ORDER BY uh.operation_date DESC
                 LIMIT 1
             """, (self.asset_id,))
@@ -229,29 +229,9 @@ class EditAssetDialog(QDialog):
                 if hasattr(self, 'current_location_id') and location_id == self.current_location_id:
                     self.location_combo.setCurrentText(location_name)
 
-            # Загружаем сотрудников для информации о выдаче
-            employees = self.db.execute_query("""
-                SELECT 
-                    employee_id,
-                    last_name || ' ' || first_name || ' ' || COALESCE(patronymic, '') as full_name,
-                    email
-                FROM Employees 
-                ORDER BY last_name, first_name
-            """)
-
-            for employee_id, full_name, email in employees:
-                if email:
-                    display_text = f"{full_name} ({email})"
-                else:
-                    display_text = full_name
-                self.employee_combo.addItem(display_text, employee_id)
-
-            # Устанавливаем текущего сотрудника, если актив выдан
+            # Сотрудник ищется вводом (EntityPicker); если актив выдан - предвыбираем текущего
             if self.current_issue_info:
-                for i in range(self.employee_combo.count()):
-                    if self.employee_combo.itemData(i) == self.current_issue_info['employee_id']:
-                        self.employee_combo.setCurrentIndex(i)
-                        break
+                self.employee_combo.set_current(self.current_issue_info['employee_id'])
 
                 # Устанавливаем даты из базы данных
                 if self.current_issue_info['operation_date']:
@@ -298,15 +278,12 @@ class EditAssetDialog(QDialog):
             return
 
         try:
-            # Проверяем, нет ли уже такого местоположения
-            existing = self.db.execute_query(
-                "SELECT location_id FROM Locations WHERE location_name = ?",
-                (current_text,)
-            )
+            # Проверяем, нет ли уже такого местоположения (без учета регистра, пробелов и знаков)
+            existing = self.db.find_location(current_text)
 
             if existing:
-                QMessageBox.information(self, "Информация", "Такое местоположение уже существует!")
-                self.location_combo.setCurrentText(current_text)
+                QMessageBox.information(self, "Информация", f"Такое местоположение уже существует: '{existing[1]}'")
+                self.location_combo.setCurrentText(existing[1])
                 return
 
             # Добавляем новое местоположение с отметкой *
@@ -365,119 +342,124 @@ class EditAssetDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Укажите причину списания!")
             return
 
+        # Серийный номер уникален (idx_assets_serial_key) - сообщаем понятнее, чем ошибка БД
+        serial_number = self.serial_input.text().strip()
+        duplicate = self.db.find_asset_by_serial(serial_number, self.asset_id) if serial_number else None
+        if duplicate:
+            QMessageBox.warning(self, "Ошибка",
+                                f"Серийный номер уже присвоен активу «{duplicate[1]}» (ID {duplicate[0]})!")
+            return
+
         try:
-            # Если местоположение новое, добавляем его
-            location_id = self.location_combo.currentData()
-            if location_id is None:
-                new_location_name = f"{location_text} *"
-                location_id = self.db.execute_update(
-                    "INSERT INTO Locations (location_name) VALUES (?)",
-                    (new_location_name,)
+            # Изменения актива, выдача и списание - одна транзакция
+            with self.db.transaction():
+                # Если местоположение новое, добавляем его
+                location_id = self.location_combo.currentData()
+                if location_id is None:
+                    location_id = self.db.get_or_create_location(location_text)
+
+                # Получаем старые данные для логирования изменений
+                old_data = self.db.execute_query(
+                    "SELECT name, type_id, model, serial_number, location_id, quantity, current_status FROM Assets WHERE asset_id = ?",
+                    (self.asset_id,)
                 )
-
-            # Получаем старые данные для логирования изменений
-            old_data = self.db.execute_query(
-                "SELECT name, type_id, model, serial_number, location_id, quantity, current_status FROM Assets WHERE asset_id = ?",
-                (self.asset_id,)
-            )
             
-            old_name, old_type_id, old_model, old_serial, old_location_id, old_quantity, old_status = old_data[0]
+                old_name, old_type_id, old_model, old_serial, old_location_id, old_quantity, old_status = old_data[0]
             
-            # Получаем названия типов и местоположений для логирования
-            old_type_name = self.db.execute_query(
-                "SELECT type_name FROM Asset_Types WHERE type_id = ?",
-                (old_type_id,)
-            )[0][0] if old_type_id else "Неизвестно"
+                # Получаем названия типов и местоположений для логирования
+                old_type_name = self.db.execute_query(
+                    "SELECT type_name FROM Asset_Types WHERE type_id = ?",
+                    (old_type_id,)
+                )[0][0] if old_type_id else "Неизвестно"
             
-            old_location_name = self.db.execute_query(
-                "SELECT location_name FROM Locations WHERE location_id = ?",
-                (old_location_id,)
-            )[0][0] if old_location_id else "Неизвестно"
-
-            # Обновляем данные актива
-            self.db.execute_update('''
-                UPDATE Assets 
-                SET name = ?, type_id = ?, model = ?, serial_number = ?, 
-                    location_id = ?, quantity = ?, current_status = ?
-                WHERE asset_id = ?
-            ''', (
-                self.name_input.text().strip(),
-                self.type_combo.currentData(),
-                self.model_input.text().strip(),
-                self.serial_input.text().strip() or None,
-                location_id,
-                self.quantity_spin.value(),
-                self.status_combo.currentText(),
-                self.asset_id
-            ))
-
-            # Обрабатываем операцию выдачи, если актив выдан
-            if self.status_combo.currentText() == "Выдан":
-                employee_id = self.employee_combo.currentData()
-                issue_date = self.issue_date_edit.date().toString('yyyy-MM-dd')
-                planned_return_date = self.planned_return_edit.date().toString('yyyy-MM-dd')
-
-                # Получаем имя сотрудника для логирования
-                employee_name = self.employee_combo.currentText().split(' (')[0]
-
-                # Проверяем, есть ли уже открытая выдача
-                existing_issue = self.db.execute_query('''
-                    SELECT history_id FROM Usage_History 
-                    WHERE asset_id = ? AND operation_type = 'выдача' AND actual_return_date IS NULL
-                ''', (self.asset_id,))
-
-                if existing_issue:
-                    # Обновляем существующую выдачу
-                    self.db.execute_update('''
-                        UPDATE Usage_History 
-                        SET employee_id = ?, operation_date = ?, planned_return_date = ?
-                        WHERE asset_id = ? AND operation_type = 'выдача' AND actual_return_date IS NULL
-                    ''', (employee_id, issue_date, planned_return_date, self.asset_id))
-                else:
-                    # Создаем новую выдачу
-                    self.db.execute_update('''
-                        INSERT INTO Usage_History 
-                        (asset_id, employee_id, operation_type, operation_date, planned_return_date) 
-                        VALUES (?, ?, 'выдача', ?, ?)
-                    ''', (self.asset_id, employee_id, issue_date, planned_return_date))
-                
-                # Обновляем статус актива на основе активных выдач
-                self.db.update_asset_status(self.asset_id)
-
-            # Если актив списан, добавляем запись в историю
-            if self.write_off_checkbox.isChecked():
-                # Для списания используем первого доступного сотрудника (системный учёт)
-                employee_for_writeoff = self.db.execute_query(
-                    "SELECT employee_id FROM Employees LIMIT 1"
-                )
-                employee_id = employee_for_writeoff[0][0] if employee_for_writeoff else 1
-                
-                quantity_to_writeoff = self.write_off_quantity_spin.value()
-                current_qty = self.quantity_spin.value()
-                new_quantity = current_qty - quantity_to_writeoff
-                
-                # Обновляем количество при списании
-                if new_quantity > 0:
-                    # Если остаток остается, обновляем количество
-                    self.db.execute_update(
-                        "UPDATE Assets SET quantity = ? WHERE asset_id = ?",
-                        (new_quantity, self.asset_id)
+                old_location_name = self.db.execute_query(
+                    "SELECT location_name FROM Locations WHERE location_id = ?",
+                    (old_location_id,)
+                )[0][0] if old_location_id else "Неизвестно"
+
+                # Обновляем данные актива
+                self.db.execute_update('''
+                    UPDATE Assets 
+                    SET name = ?, type_id = ?, model = ?, serial_number = ?, 
+                        location_id = ?, quantity = ?, current_status = ?
+                    WHERE asset_id = ?
+                ''', (
+                    self.name_input.text().strip(),
+                    self.type_combo.currentData(),
+                    self.model_input.text().strip(),
+                    self.serial_input.text().strip() or None,
+                    location_id,
+                    self.quantity_spin.value(),
+                    self.status_combo.currentText(),
+                    self.asset_id
+                ))
+
+                # Обрабатываем операцию выдачи, если актив выдан
+                if self.status_combo.currentText() == "Выдан":
+                    employee_id = self.employee_combo.currentData()
+                    issue_date = self.issue_date_edit.date().toString('yyyy-MM-dd')
+                    planned_return_date = self.planned_return_edit.date().toString('yyyy-MM-dd')
+
+                    # Получаем имя сотрудника для логирования
+                    employee_name = self.employee_combo.currentText().split(' (')[0]
+
+                    # Проверяем, есть ли уже открытая выдача
+                    existing_issue = self.db.execute_query(
+                        "SELECT history_id FROM Active_Loans WHERE asset_id = ?", (self.asset_id,)
                     )
-                    # Статус обновится на основе активных выдач
+
+                    if existing_issue:
+                        # Обновляем существующую выдачу
+                        self.db.execute_update('''
+                            UPDATE Usage_History 
+                            SET employee_id = ?, operation_date = ?, planned_return_date = ?
+                            WHERE asset_id = ? AND operation_type = 'выдача' AND actual_return_date IS NULL
+                        ''', (employee_id, issue_date, planned_return_date, self.asset_id))
+                    else:
+                        # Создаем новую выдачу
+                        self.db.execute_update('''
+                            INSERT INTO Usage_History 
+                            (asset_id, employee_id, operation_type, operation_date, planned_return_date) 
+                            VALUES (?, ?, 'выдача', ?, ?)
+                        ''', (self.asset_id, employee_id, issue_date, planned_return_date))
+                
+                    # Обновляем статус актива на основе активных выдач
                     self.db.update_asset_status(self.asset_id)
-                else:
-                    # Если это последнее количество, устанавливаем 'Списан'
-                    self.db.execute_update(
-                        "UPDATE Assets SET quantity = 0, current_status = 'Списан' WHERE asset_id = ?",
-                        (self.asset_id,)
+
+                # Если актив списан, добавляем запись в историю
+                if self.write_off_checkbox.isChecked():
+                    # Для списания используем первого доступного сотрудника (системный учёт)
+                    employee_for_writeoff = self.db.execute_query(
+                        "SELECT employee_id FROM Employees LIMIT 1"
                     )
+                    employee_id = employee_for_writeoff[0][0] if employee_for_writeoff else 1
                 
-                writeoff_notes = f"Списано: {quantity_to_writeoff} шт. Причина: {self.write_off_reason.toPlainText().strip()}"
-                self.db.execute_update('''
-                    INSERT INTO Usage_History 
-                    (asset_id, employee_id, operation_type, operation_date, notes) 
-                    VALUES (?, ?, 'списание', datetime('now'), ?)
-                ''', (self.asset_id, employee_id, writeoff_notes))
+                    quantity_to_writeoff = self.write_off_quantity_spin.value()
+                    current_qty = self.quantity_spin.value()
+                    new_quantity = current_qty - quantity_to_writeoff
+                
+                    # Обновляем количество при списании
+                    if new_quantity > 0:
+                        # Если остаток остается, обновляем количество
+                        self.db.execute_update(
+                            "UPDATE Assets SET quantity = ? WHERE asset_id = ?",
+                            (new_quantity, self.asset_id)
+                        )
+                        # Статус обновится на основе активных выдач
+                        self.db.update_asset_status(self.asset_id)
+                    else:
+                        # Если это последнее количество, устанавливаем 'Списан'
+                        self.db.execute_update(
+                            "UPDATE Assets SET quantity = 0, current_status = 'Списан' WHERE asset_id = ?",
+                            (self.asset_id,)
+                        )
+                
+                    writeoff_notes = f"Списано: {quantity_to_writeoff} шт. Причина: {self.write_off_reason.toPlainText().strip()}"
+                    self.db.execute_update('''
+                        INSERT INTO Usage_History 
+                        (asset_id, employee_id, operation_type, operation_date, quantity, notes) 
+                        VALUES (?, ?, 'списание', datetime('now'), ?, ?)
+                    ''', (self.asset_id, employee_id, quantity_to_writeoff, writeoff_notes))
 
             # Логирование редактирования актива
             if AUDIT_ENABLED and hasattr(self.parent(), 'current_user'):
@@ -559,11 +541,13 @@ class EditAssetDialog(QDialog):
                 )
                 return
 
-            # Удаляем актив
-            self.db.execute_update("DELETE FROM Assets WHERE asset_id = ?", (self.asset_id,))
+            # Актив и его история удаляются вместе
+            with self.db.transaction():
+                # Удаляем актив
+                self.db.execute_update("DELETE FROM Assets WHERE asset_id = ?", (self.asset_id,))
 
-            # Также удаляем связанные записи в истории
-            self.db.execute_update("DELETE FROM Usage_History WHERE asset_id = ?", (self.asset_id,))
+                # Также удаляем связанные записи в истории
+                self.db.execute_update("DELETE FROM Usage_History WHERE asset_id = ?", (self.asset_id,))
 
             # Логирование удаления актива
             if AUDIT_ENABLED and hasattr(self.parent(), 'current_user'):
@@ -0,0 +1,103 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+                             QPushButton, QTableView, QMessageBox)
+
+from views.table_models import KeysetTableModel
+
+
+class EmailOutboxDialog(QDialog):
+    """Журнал исходящих писем: очередь, отправленные и ошибки (только для админа)"""
+
+    QUERY = """
+        SELECT
+            outbox_id as 'ID',
+            created_at as 'Создано',
+            recipient as 'Получатель',
+            subject as 'Тема',
+            CASE status
+                WHEN 'sent' THEN '✅ Отправлено'
+                WHEN 'failed' THEN '❌ Ошибка'
+                ELSE '⏳ В очереди'
+            END as 'Статус',
+            attempts as 'Попыток',
+            sent_at as 'Отправлено',
+            next_attempt_at as 'Следующая попытка',
+            last_error as 'Ошибка'
+        FROM Email_Outbox
+        WHERE 1=1
+    """
+
+    def __init__(self, outbox, parent=None):
+        super().__init__(parent)
+        self.outbox = outbox
+
+        self.setWindowTitle("📧 Журнал писем")
+        self.resize(1000, 600)
+
+        self.init_ui()
+        self.load_data()
+
+    def init_ui(self):
+        """Инициализация интерфейса"""
+        layout = QVBoxLayout(self)
+
+        filter_layout = QHBoxLayout()
+        self.status_filter = QComboBox()
+        self.status_filter.addItem("Все письма", None)
+        self.status_filter.addItem("⏳ В очереди", 'pending')
+        self.status_filter.addItem("✅ Отправлено", 'sent')
+        self.status_filter.addItem("❌ Ошибка", 'failed')
+        self.status_filter.currentIndexChanged.connect(self.load_data)
+
+        self.counts_label = QLabel()
+
+        refresh_btn = QPushButton("🔄 Обновить")
+        refresh_btn.clicked.connect(self.load_data)
+        retry_btn = QPushButton("🔁 Повторить неотправленные")
+        retry_btn.clicked.connect(self.retry_failed)
+
+        filter_layout.addWidget(QLabel("Статус:"))
+        filter_layout.addWidget(self.status_filter)
+        filter_layout.addWidget(self.counts_label)
+        filter_layout.addStretch()
+        filter_layout.addWidget(refresh_btn)
+        filter_layout.addWidget(retry_btn)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableView()
+        layout.addWidget(self.table)
+
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+    def load_data(self):
+        """Загрузка писем (постранично, от новых к старым)"""
+        query = self.QUERY
+        params = []
+        status = self.status_filter.currentData()
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+
+        try:
+            model = KeysetTableModel(self.outbox.pool, query, params, key_sql=('outbox_id',), key_columns=(0,))
+            model.set_first_page(model.fetch_first_page(self.outbox.pool.reader()))
+            self.table.setModel(model)
+            self.table.resizeColumnsToContents()
+
+            counts = self.outbox.counts()
+            self.counts_label.setText(
+                f"В очереди: {counts.get('pending', 0)}   Отправлено: {counts.get('sent', 0)}   "
+                f"Ошибок: {counts.get('failed', 0)}")
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки журнала писем:\n{e}")
+
+    def retry_failed(self):
+        """Вернуть письма с ошибкой в очередь"""
+        try:
+            count = self.outbox.retry_failed()
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось вернуть письма в очередь:\n{e}")
+            return
+        QMessageBox.information(self, "Журнал писем", f"Возвращено в очередь писем: {count}")
+        self.load_data()
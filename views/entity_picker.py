@@ -0,0 +1,125 @@
+from PyQt6.QtCore import QModelIndex, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QAction, QStandardItem, QStandardItemModel
+from PyQt6.QtWidgets import QCompleter, QLineEdit
+
+
+class EntityPicker(QLineEdit):
+    """
+    Поле выбора сотрудника или актива с поиском по мере ввода
+
+    Замена QComboBox, в который заранее грузилась вся таблица: варианты
+    запрашиваются у LookupSource (database/lookup.py) после паузы во вводе -
+    не больше LIMIT строк по индексу ключа, поэтому диалог открывается
+    одинаково быстро при любом размере таблиц. Выбор из списка испускает
+    selection_changed(id); правка текста после выбора сбрасывает выбор
+    (selection_changed(None)). Интерфейс чтения как у QComboBox:
+    currentData() и currentText().
+    """
+
+    selection_changed = pyqtSignal(object)
+
+    DELAY_MS = 150
+    LIMIT = 50
+
+    def __init__(self, source, placeholder="", parent=None):
+        """
+        Args:
+            source: LookupSource - поиск вариантов и текст записи по ID
+            placeholder: подсказка в пустом поле
+        """
+        super().__init__(parent)
+        self.source = source
+        self._selected_id = None
+        self._selected_text = None
+
+        self.setPlaceholderText(placeholder)
+        self.setClearButtonEnabled(True)
+
+        self._results = QStandardItemModel(self)
+        # Без setCompleter: текст подставляется только при выборе варианта
+        self._completer = QCompleter(self._results, self)
+        self._completer.setWidget(self)
+        self._completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self._completer.setMaxVisibleItems(15)
+        self._completer.activated[QModelIndex].connect(self._on_activated)
+
+        # Кнопка «▾» - первые варианты по алфавиту, как у раскрывающегося списка
+        show_all = QAction("▾", self)
+        show_all.setToolTip("Показать варианты")
+        show_all.triggered.connect(self.run_search)
+        self.addAction(show_all, QLineEdit.ActionPosition.TrailingPosition)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DELAY_MS)
+        self._timer.timeout.connect(self.run_search)
+        self.textEdited.connect(self._on_text_edited)
+
+    def currentData(self):
+        """ID выбранной записи или None - ничего не выбрано"""
+        return self._selected_id
+
+    def currentText(self):
+        """Текст поля (выбранный вариант или введенный вручную)"""
+        return self.text()
+
+    def set_current(self, entity_id):
+        """Выбрать запись по ID без поиска (None - очистить)"""
+        row = self.source.get(entity_id) if entity_id is not None else None
+        if row is None:
+            self._select(None, "")
+        else:
+            self._select(*row)
+
+    def run_search(self):
+        """Показать варианты для текущего текста"""
+        self._timer.stop()
+        # Синхронно, без QueryService: диапазон по индексу с LIMIT (или кэш) -
+        # доли миллисекунды, а диалоги открываются и до главного окна
+        try:
+            rows = self.source.find(self.text(), self.LIMIT)
+        except Exception as e:
+            print(f" Ошибка поиска вариантов: {e}")
+            return
+
+        self._results.clear()
+        for entity_id, text in rows:
+            item = QStandardItem(text)
+            item.setData(entity_id, Qt.ItemDataRole.UserRole)
+            self._results.appendRow(item)
+        if len(rows) >= self.LIMIT:
+            item = QStandardItem("… показаны первые варианты, уточните запрос")
+            item.setEnabled(False)
+            self._results.appendRow(item)
+        if not rows:
+            item = QStandardItem("Ничего не найдено")
+            item.setEnabled(False)
+            self._results.appendRow(item)
+        self.setFocus()
+        self._completer.complete()
+
+    def keyPressEvent(self, event):
+        # Стрелка вниз открывает список, как у QComboBox
+        if event.key() == Qt.Key.Key_Down and not self._completer.popup().isVisible():
+            self.run_search()
+            return
+        super().keyPressEvent(event)
+
+    def _on_text_edited(self, text):
+        if self._selected_id is not None and text != self._selected_text:
+            self._selected_id = None
+            self._selected_text = None
+            self.selection_changed.emit(None)
+        self._timer.start()
+
+    def _on_activated(self, index):
+        entity_id = index.data(Qt.ItemDataRole.UserRole)
+        if entity_id is not None:
+            self._select(entity_id, index.data())
+
+    def _select(self, entity_id, text):
+        self._timer.stop()
+        self._selected_id = entity_id
+        self._selected_text = text if entity_id is not None else None
+        self.setText(text)
+        self.selection_changed.emit(entity_id)
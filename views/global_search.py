@@ -0,0 +1,86 @@
+from PyQt6.QtCore import QModelIndex, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QStandardItem, QStandardItemModel
+from PyQt6.QtWidgets import QCompleter, QLineEdit
+
+from database.migrations import SEARCH_ASSET, SEARCH_EMPLOYEE
+from database.search_index import search
+
+ICONS = {SEARCH_ASSET: "🔧", SEARCH_EMPLOYEE: "👤"}
+
+
+class GlobalSearchBar(QLineEdit):
+    """
+    Строка поиска по активам, сотрудникам и примечаниям операций
+
+    Запрос к Search_Index (FTS5) уходит в QueryService после паузы во вводе;
+    более новый запрос отменяет незавершенный. Совпадения показываются
+    списком под строкой, выбор испускает hit_activated(SearchHit).
+    """
+
+    hit_activated = pyqtSignal(object)
+
+    DELAY_MS = 150
+    MIN_LENGTH = 2
+    LIMIT = 30
+
+    def __init__(self, query_service, employee_id=None, parent=None):
+        """
+        Args:
+            query_service: QueryService для фоновых запросов
+            employee_id: для сотрудника - искать только каталог и его операции; None - все
+        """
+        super().__init__(parent)
+        self.query_service = query_service
+        self.employee_id = employee_id
+
+        self.setPlaceholderText("🔎 Поиск: активы, серийные номера, сотрудники, примечания (Ctrl+F)")
+        self.setClearButtonEnabled(True)
+        self.setMinimumWidth(380)
+
+        self._results = QStandardItemModel(self)
+        # Без setCompleter: выбор не должен подставлять текст в строку
+        self._completer = QCompleter(self._results, self)
+        self._completer.setWidget(self)
+        self._completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self._completer.setMaxVisibleItems(12)
+        self._completer.activated[QModelIndex].connect(self._on_activated)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DELAY_MS)
+        self._timer.timeout.connect(self.run_search)
+        self.textChanged.connect(lambda text: self._timer.start())
+
+    def run_search(self):
+        """Запустить поиск по текущему тексту"""
+        text = self.text().strip()
+        if len(text) < self.MIN_LENGTH:
+            self.query_service.cancel('global_search')
+            self._results.clear()
+            self._completer.popup().hide()
+            return
+
+        employee_id = self.employee_id
+        self.query_service.submit(
+            'global_search',
+            lambda connection: search(connection, text, employee_id, self.LIMIT),
+            self._show_hits,
+            lambda error: print(f" Ошибка поиска: {error}"))
+
+    def _show_hits(self, hits):
+        self._results.clear()
+        for hit in hits:
+            item = QStandardItem(f"{ICONS.get(hit.kind, '📝')} {hit.title} — {hit.details}")
+            item.setData(hit, Qt.ItemDataRole.UserRole)
+            self._results.appendRow(item)
+        if not hits:
+            item = QStandardItem("Ничего не найдено")
+            item.setEnabled(False)
+            self._results.appendRow(item)
+        if self.hasFocus():
+            self._completer.complete()
+
+    def _on_activated(self, index):
+        hit = index.data(Qt.ItemDataRole.UserRole)
+        if hit is not None:
+            self.hit_activated.emit(hit)
@@ -1,7 +1,8 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
-                             QComboBox, QDateEdit, QPushButton, QMessageBox, QSpinBox, QLabel)
+                             QDateEdit, QPushButton, QMessageBox, QSpinBox, QLabel)
 from PyQt6.QtCore import QDate, QDateTime, QTime
 from database.db_manager import DatabaseManager
+from views.entity_picker import EntityPicker
 import sys
 import os
 
@@ -22,7 +23,6 @@ class IssueDialog(QDialog):
         self.setWindowTitle("Выдать актив сотруднику")
         self.setFixedSize(450, 350)
         self.setup_ui()
-        self.load_dropdown_data()
 
     def setup_ui(self):
         """Настройка интерфейса диалога"""
@@ -31,12 +31,10 @@ class IssueDialog(QDialog):
         # Форма для ввода данных
         form_layout = QFormLayout()
 
-        # Выбор сотрудника
-        self.employee_combo = QComboBox()
-
-        # Выбор актива (только доступные)
-        self.asset_combo = QComboBox()
-        self.asset_combo.currentIndexChanged.connect(self.on_asset_changed)
+        # Выбор сотрудника и актива (только доступные) - поиск по мере ввода
+        self.employee_combo = EntityPicker(self.db.employee_lookup, "Начните вводить фамилию...")
+        self.asset_combo = EntityPicker(self.db.available_asset_lookup, "Начните вводить название...")
+        self.asset_combo.selection_changed.connect(self.on_asset_changed)
 
         # Информация о доступном количестве
         self.available_quantity_label = QLabel("Доступно: 0")
@@ -79,44 +77,6 @@ class IssueDialog(QDialog):
         self.issue_btn.clicked.connect(self.issue_asset)
         self.cancel_btn.clicked.connect(self.reject)
 
-    def load_dropdown_data(self):
-        """Загрузка данных для выпадающих списков"""
-        try:
-            # Загружаем сотрудников - гарантированно уникальные
-            employees = self.db.execute_query("""
-                SELECT 
-                    employee_id,
-                    last_name || ' ' || first_name || ' ' || COALESCE(patronymic, '') as full_name,
-                    email
-                FROM Employees 
-                ORDER BY last_name, first_name
-            """)
-
-            for employee_id, full_name, email in employees:
-                if email:
-                    display_text = f"{full_name} ({email})"
-                else:
-                    display_text = full_name
-                self.employee_combo.addItem(display_text, employee_id)
-
-            # Загружаем только доступные активы с количеством
-            assets = self.db.execute_query("""
-                SELECT a.asset_id, a.name || ' (' || a.model || ')', a.quantity
-                FROM Assets a 
-                WHERE a.current_status = 'Доступен'
-                ORDER BY a.name
-            """)
-
-            for asset_id, asset_description, quantity in assets:
-                display_text = f"{asset_description} - {quantity} шт."
-                self.asset_combo.addItem(display_text, asset_id)
-
-            # Обновляем информацию о доступном количестве для первого актива
-            self.on_asset_changed()
-
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки данных: {e}")
-
     def on_asset_changed(self):
         """Обновление информации о доступном количестве при смене актива"""
         asset_id = self.asset_combo.currentData()
@@ -179,31 +139,9 @@ class IssueDialog(QDialog):
             if confirm != QMessageBox.StandardButton.Yes:
                 return
 
-            # Получаем текущее количество
-            current_qty = self.db.execute_query(
-                "SELECT quantity FROM Assets WHERE asset_id = ?",
-                (asset_id,)
-            )[0][0]
-
-            # Вычисляем новое количество
-            new_quantity = current_qty - quantity_issued
-
-            # Обновляем количество актива
-            self.db.execute_update(
-                "UPDATE Assets SET quantity = ? WHERE asset_id = ?",
-                (new_quantity, asset_id)
-            )
-
-            # Добавляем запись в историю с информацией о количестве
-            notes = f"Кол-во выданных: {quantity_issued} шт."
-            self.db.execute_update('''
-                INSERT INTO Usage_History 
-                (asset_id, employee_id, operation_type, operation_date, planned_return_date, notes) 
-                VALUES (?, ?, 'выдача', ?, ?, ?)
-            ''', (asset_id, employee_id, current_datetime, planned_return, notes))
-            
-            # Обновляем статус актива на основе активных выдач
-            self.db.update_asset_status(asset_id)
+            # Списание со склада, запись в историю и статус - одна транзакция
+            new_quantity = self.db.issue_asset(
+                asset_id, employee_id, quantity_issued, current_datetime, planned_return)
 
             # Логирование выдачи актива
             if AUDIT_ENABLED and hasattr(self.parent(), 'current_user'):
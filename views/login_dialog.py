@@ -1,9 +1,11 @@
 import hashlib
 from datetime import datetime
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
-                             QPushButton, QComboBox, QMessageBox, QTabWidget, QWidget, QSpinBox, QCheckBox)
+                             QPushButton, QMessageBox, QTabWidget, QWidget, QSpinBox, QCheckBox)
 from PyQt6.QtCore import Qt, pyqtSignal
 from database.db_manager import DatabaseManager
+from database.normalize import name_key
+from views.entity_picker import EntityPicker
 
 
 class LoginDialog(QDialog):
@@ -112,14 +114,11 @@ class LoginDialog(QDialog):
         employee_label.setStyleSheet("font-size: 12px;")
         layout.addWidget(employee_label)
         
-        self.register_employee_combo = QComboBox()
-        self.register_employee_combo.setEditable(True)
+        # Сотрудник ищется по мере ввода; не найден - введенное ФИО станет новым сотрудником
+        self.register_employee_combo = EntityPicker(self.db.account_lookup, "Фамилия Имя Отчество")
         self.register_employee_combo.setFixedHeight(30)
-        self.register_employee_combo.currentIndexChanged.connect(self.on_employee_selected)
-        self.register_employee_combo.editTextChanged.connect(self.on_employee_text_changed)
-        
-        # Загружаем сотрудников
-        self.load_employees_to_combo()
+        self.register_employee_combo.selection_changed.connect(self.on_employee_selected)
+        self.register_employee_combo.textChanged.connect(self.on_employee_text_changed)
         layout.addWidget(self.register_employee_combo)
         
         # Автозаполняемое имя пользователя
@@ -173,40 +172,7 @@ class LoginDialog(QDialog):
         
         layout.addStretch()
     
-    def load_employees_to_combo(self):
-        """Загрузка списка сотрудников"""
-        try:
-            # Получаем сотрудников
-            query = """
-            SELECT 
-                e.employee_id, 
-                e.last_name || ' ' || e.first_name || ' ' || COALESCE(e.patronymic, '') as full_name,
-                u.username
-            FROM Employees e
-            LEFT JOIN Users u ON e.employee_id = u.employee_id
-            ORDER BY e.last_name, e.first_name
-            """
-            employees = self.db.execute_query(query)
-            
-            self.register_employee_combo.clear()
-            # Добавляем первый элемент для выбора
-            self.register_employee_combo.addItem("--Выберите сотрудника--", None)
-            
-            # Добавляем сотрудников, если есть аккаунт - показываем username
-            for emp_id, full_name, username in employees:
-                full_name = full_name.strip()
-                if username:
-                    # Есть аккаунт - показываем username
-                    display_name = f"{full_name} ({username})"
-                else:
-                    # Нет аккаунта - только ФИО
-                    display_name = full_name
-                self.register_employee_combo.addItem(display_name, emp_id)
-        
-        except Exception as e:
-            print(f"Ошибка загрузки сотрудников: {e}")
-    
-    def on_employee_selected(self, index):
+    def on_employee_selected(self, employee_id):
         """Обработчик выбора сотрудника из списка"""
         # Проверяем, инициализированы ли поля
         if self.register_username_input is None or self.register_password_input is None:
@@ -215,8 +181,6 @@ class LoginDialog(QDialog):
         if self.register_employee_combo is None:
             return
         
-        employee_id = self.register_employee_combo.currentData()
-        
         if employee_id:
             # Получаем следующий номер пользователя
             next_user_num = self._get_next_user_number()
@@ -225,18 +189,17 @@ class LoginDialog(QDialog):
             self.register_username_input.setText(username)
             self.register_password_input.setText(username)
         else:
-            self.register_username_input.clear()
-            self.register_password_input.clear()
+            # Выбор сброшен - введенный текст может быть ФИО нового сотрудника
+            self.on_employee_text_changed(self.register_employee_combo.currentText())
     
     def on_employee_text_changed(self, text):
-        """Обработчик изменения текста в editable combobox"""
+        """Обработчик изменения текста в поле сотрудника"""
         # Проверяем, инициализированы ли поля
         if self.register_username_input is None or self.register_password_input is None:
             return
         
         text = text.strip()
-        # Игнорируем первый элемент списка
-        if text and text != "--Выберите сотрудника--":
+        if text:
             # Есть текст - генерируем username
             next_user_num = self._get_next_user_number()
             username = f"user{next_user_num}"
@@ -321,10 +284,17 @@ class LoginDialog(QDialog):
                 first_name = parts[1]
                 patronymic = parts[2]
                 
-                # Вставляем нового сотрудника
-                query = "INSERT INTO Employees (last_name, first_name, patronymic) VALUES (?, ?, ?)"
-                employee_id = self.db.execute_update(query, (last_name, first_name, patronymic))
-                print(f" Создан новый сотрудник: {employee_text} (ID: {employee_id})")
+                # Тот же сотрудник в другом написании (регистр, «ё», пробелы) - не дублируем
+                existing = self.db.execute_query(
+                    "SELECT employee_id FROM Employees WHERE name_key = ?", (name_key(employee_text),))
+                if existing:
+                    employee_id = existing[0][0]
+                    print(f" Найден существующий сотрудник: {employee_text} (ID: {employee_id})")
+                else:
+                    # Вставляем нового сотрудника
+                    query = "INSERT INTO Employees (last_name, first_name, patronymic) VALUES (?, ?, ?)"
+                    employee_id = self.db.execute_update(query, (last_name, first_name, patronymic))
+                    print(f" Создан новый сотрудник: {employee_text} (ID: {employee_id})")
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Ошибка при создании сотрудника:\n{str(e)}")
                 return
@@ -342,9 +312,9 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Имя пользователя и пароль не могут быть пустыми!")
             return
         
-        # Проверяем, существует ли уже такой username (на случай, если кто-то вручную меняет)
-        query = "SELECT user_id FROM Users WHERE username = ?"
-        existing = self.db.execute_query(query, (username,))
+        # Проверяем, существует ли уже такой username (без учета регистра, пробелов и знаков)
+        query = "SELECT user_id FROM Users WHERE username_key = ?"
+        existing = self.db.execute_query(query, (name_key(username),))
         
         if existing:
             QMessageBox.warning(self, "Ошибка", f"Пользователь {username} уже существует!")
@@ -406,6 +376,8 @@ class LoginDialog(QDialog):
             LEFT JOIN Employees e ON u.employee_id = e.employee_id
             WHERE u.username = ? AND u.is_active = 1
             """
+            # Точное имя: username_key - только для запрета похожих имен при
+            # регистрации, у тезок из старой базы он дополнен « #id»
             result = self.db.execute_query(query, (username,))
             
             if not result:
@@ -2,6 +2,7 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                              QComboBox, QDateEdit, QPushButton, QMessageBox, QTextEdit)
 from PyQt6.QtCore import QDate, QDateTime
 from database.db_manager import DatabaseManager
+from views.entity_picker import EntityPicker
 import sys
 import os
 
@@ -33,8 +34,8 @@ class ReturnDialog(QDialog):
         # Форма для ввода данных
         form_layout = QFormLayout()
 
-        # Выбор сотрудника (только для админа)
-        self.employee_combo = QComboBox()
+        # Выбор сотрудника (только для админа) - поиск по мере ввода
+        self.employee_combo = EntityPicker(self.db.employee_lookup, "Начните вводить фамилию...")
         self.employee_label = None  # Будет создана, если нужна
 
         # Выбор актива (только выданные этому сотруднику)
@@ -78,37 +79,19 @@ class ReturnDialog(QDialog):
         self.return_btn.clicked.connect(self.return_asset)
         self.cancel_btn.clicked.connect(self.reject)
         if self.is_admin:
-            self.employee_combo.currentIndexChanged.connect(self.update_assets_list)
+            self.employee_combo.selection_changed.connect(self.update_assets_list)
 
     def load_dropdown_data(self):
         """Загрузка данных для выпадающих списков"""
+        # Админ ищет сотрудника вводом (EntityPicker), активы грузятся после выбора
+        if self.is_admin:
+            return
         try:
-            if self.is_admin:
-                # Для админа: загружаем всех сотрудников
-                employees = self.db.execute_query("""
-                    SELECT 
-                        employee_id,
-                        last_name || ' ' || first_name || ' ' || COALESCE(patronymic, '') as full_name,
-                        email
-                    FROM Employees 
-                    ORDER BY last_name, first_name
-                """)
-
-                for employee_id, full_name, email in employees:
-                    if email:
-                        display_text = f"{full_name} ({email})"
-                    else:
-                        display_text = full_name
-                    self.employee_combo.addItem(display_text, employee_id)
-                
-                # Инициируем загрузку активов для первого сотрудника
+            # Для обычного пользователя: берем его employee_id
+            if self.current_user and self.current_user.get('employee_id'):
                 self.update_assets_list()
             else:
-                # Для обычного пользователя: берем его employee_id
-                if self.current_user and self.current_user.get('employee_id'):
-                    self.update_assets_list()
-                else:
-                    QMessageBox.critical(self, "Ошибка", "Не удается определить сотрудника!")
+                QMessageBox.critical(self, "Ошибка", "Не удается определить сотрудника!")
 
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки данных: {e}")
@@ -130,22 +113,16 @@ class ReturnDialog(QDialog):
         try:
             # Загружаем активы, выданные этому сотруднику с информацией о количестве
             assets = self.db.execute_query("""
-                SELECT a.asset_id, a.name || ' (' || a.model || ') - до ' || uh.planned_return_date, uh.notes
-                FROM Assets a
-                JOIN Usage_History uh ON a.asset_id = uh.asset_id
-                WHERE uh.employee_id = ? 
-                  AND uh.operation_type = 'выдача'
-                  AND uh.actual_return_date IS NULL
+                SELECT a.asset_id, a.name || ' (' || a.model || ') - до ' || al.planned_return_date, al.quantity
+                FROM Active_Loans al
+                JOIN Assets a ON a.asset_id = al.asset_id
+                WHERE al.employee_id = ?
                   AND a.current_status IN ('Выдан', 'Доступен')
-                ORDER BY uh.planned_return_date
+                ORDER BY al.planned_return_date
             """, (employee_id,))
 
-            for asset_id, asset_description, notes in assets:
-                # Извлекаем количество из примечаний
-                quantity_str = ""
-                if notes and "Кол-во выданных:" in notes:
-                    quantity_str = " - " + notes
-                self.asset_combo.addItem(asset_description + quantity_str, asset_id)
+            for asset_id, asset_description, quantity in assets:
+                self.asset_combo.addItem(f"{asset_description} - Кол-во выданных: {quantity} шт.", asset_id)
 
             if not assets:
                 self.asset_combo.addItem("⚠️ Нет активов для возврата", None)
@@ -212,62 +189,9 @@ class ReturnDialog(QDialog):
             if confirm != QMessageBox.StandardButton.Yes:
                 return
 
-            # Получаем текущее количество и информацию о выданном количестве
-            asset_data = self.db.execute_query(
-                "SELECT quantity FROM Assets WHERE asset_id = ?",
-                (asset_id,)
-            )
-            current_quantity = asset_data[0][0] if asset_data else 0
-
-            # Получаем записи о выдаче, чтобы узнать сколько было выдано
-            issue_records = self.db.execute_query('''
-                SELECT notes FROM Usage_History
-                WHERE asset_id = ? 
-                  AND employee_id = ? 
-                  AND operation_type = 'выдача'
-                  AND actual_return_date IS NULL
-            ''', (asset_id, employee_id))
-
-            quantity_issued = 0
-            if issue_records:
-                issue_notes = issue_records[0][0] or ""
-                # Извлекаем количество из примечаний: "Кол-во выданных: X шт."
-                if "Кол-во выданных:" in issue_notes:
-                    try:
-                        qty_text = issue_notes.split("Кол-во выданных:")[1].split("шт.")[0].strip()
-                        quantity_issued = int(qty_text)
-                    except (IndexError, ValueError):
-                        quantity_issued = 1
-                else:
-                    quantity_issued = 1
-
-            # Увеличиваем количество при возврате
-            new_quantity = current_quantity + quantity_issued
-            self.db.execute_update(
-                "UPDATE Assets SET quantity = ? WHERE asset_id = ?",
-                (new_quantity, asset_id)
-            )
-
-            # Обновляем запись в истории (отмечаем дату фактического возврата)
-            self.db.execute_update('''
-                UPDATE Usage_History 
-                SET actual_return_date = ?, notes = ?
-                WHERE asset_id = ? 
-                  AND employee_id = ? 
-                  AND operation_type = 'выдача'
-                  AND actual_return_date IS NULL
-            ''', (return_date, notes, asset_id, employee_id))
-            
-            # Обновляем статус актива на основе активных выдач
-            self.db.update_asset_status(asset_id)
-
-            # Создаем НОВУЮ запись операции возврата в историю с временем
-            return_notes = f"Возврат актива (Кол-во: {quantity_issued} шт.){'. ' + notes if notes else ''}"
-            self.db.execute_update('''
-                INSERT INTO Usage_History 
-                (asset_id, employee_id, operation_type, operation_date, notes)
-                VALUES (?, ?, 'возврат', ?, ?)
-            ''', (asset_id, employee_id, current_datetime, return_notes))
+            # Возврат на склад, закрытие выдачи и запись о возврате - одна транзакция
+            quantity_issued, new_quantity = self.db.return_asset(
+                asset_id, employee_id, current_datetime, return_date, notes)
 
             # Логирование возврата актива
             if AUDIT_ENABLED and self.current_user:
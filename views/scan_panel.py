@@ -0,0 +1,220 @@
+import time
+
+from PyQt6.QtCore import QDate
+from PyQt6.QtWidgets import (QApplication, QGroupBox, QVBoxLayout, QHBoxLayout, QLabel, QDateEdit,
+                             QLineEdit, QPushButton, QTableView, QMessageBox)
+
+from database.asset_scanner import ScanError
+from views.entity_picker import EntityPicker
+from views.table_models import RowsTableModel
+
+try:
+    from audit_logger import AuditLogger
+    AUDIT_ENABLED = True
+except ImportError:
+    AUDIT_ENABLED = False
+
+
+class ScanPanel(QGroupBox):
+    """
+    Режим сканирования на вкладке «Операции»
+
+    USB-сканер штрихкодов работает как клавиатура: набирает код и Enter.
+    Каждый скан сразу разрешается через AssetScanner (выдача со склада или
+    возврат того, что выдано выбранному сотруднику) и попадает в очередь;
+    повторный скан того же актива убирает его из очереди. Очередь проводится
+    одной транзакцией.
+    """
+
+    COLUMNS = ['Операция', 'ID', 'Актив', 'Модель', 'Серийный номер', 'Кол-во']
+
+    def __init__(self, scanner, employee_lookup, current_user, parent=None):
+        super().__init__("📷 Сканирование", parent)
+        self.scanner = scanner
+        self.employee_lookup = employee_lookup
+        self.current_user = current_user
+        self._queue = []
+
+        self.init_ui()
+
+    def init_ui(self):
+        """Инициализация интерфейса"""
+        layout = QVBoxLayout(self)
+
+        settings_layout = QHBoxLayout()
+        self.employee_combo = EntityPicker(self.employee_lookup, "Начните вводить фамилию...")
+        self.employee_combo.setMinimumWidth(280)
+        self.employee_combo.selection_changed.connect(self.on_employee_changed)
+        self.planned_return_date = QDateEdit()
+        self.planned_return_date.setDate(QDate.currentDate().addDays(7))
+        self.planned_return_date.setCalendarPopup(True)
+        settings_layout.addWidget(QLabel("Сотрудник:"))
+        settings_layout.addWidget(self.employee_combo)
+        settings_layout.addWidget(QLabel("Возврат до:"))
+        settings_layout.addWidget(self.planned_return_date)
+        settings_layout.addStretch()
+        layout.addLayout(settings_layout)
+
+        self.code_input = QLineEdit()
+        self.code_input.setPlaceholderText("Отсканируйте штрихкод или введите серийный / инвентарный номер и Enter")
+        self.code_input.returnPressed.connect(self.on_code_entered)
+        self.status_label = QLabel()
+        layout.addWidget(self.code_input)
+        layout.addWidget(self.status_label)
+
+        self.queue_model = RowsTableModel(self)
+        self.queue_model.set_rows(self.COLUMNS, [])
+        self.queue_table = QTableView()
+        self.queue_table.setModel(self.queue_model)
+        self.queue_table.setMaximumHeight(180)
+        layout.addWidget(self.queue_table)
+
+        buttons_layout = QHBoxLayout()
+        self.btn_commit = QPushButton("✅ Провести (0)")
+        self.btn_commit.setEnabled(False)
+        self.btn_remove = QPushButton("➖ Убрать строку")
+        self.btn_clear = QPushButton("❌ Очистить")
+        buttons_layout.addWidget(self.btn_commit)
+        buttons_layout.addWidget(self.btn_remove)
+        buttons_layout.addWidget(self.btn_clear)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+
+        self.btn_commit.clicked.connect(self.commit_queue)
+        self.btn_remove.clicked.connect(self.remove_selected)
+        self.btn_clear.clicked.connect(self.clear_queue)
+
+    def activate(self):
+        """Поставить курсор в поле кода - сканер печатает туда"""
+        self.code_input.setFocus()
+        self.code_input.selectAll()
+
+    def on_employee_changed(self):
+        """Действия в очереди зависят от сотрудника - при смене очередь сбрасывается"""
+        if self._queue:
+            # Без clear_queue(): фокус остается в поле сотрудника, пока его ищут
+            self._queue = []
+            self._show_queue()
+            self.status_label.setText("Сотрудник изменен - очередь очищена")
+        if self.employee_combo.currentData() is not None:
+            self.activate()
+
+    def on_code_entered(self):
+        """Обработка одного скана"""
+        code = self.code_input.text()
+        self.code_input.clear()
+        if not code.strip():
+            return
+
+        employee_id = self.employee_combo.currentData()
+        if employee_id is None:
+            self.status_label.setText("⚠️ Сначала выберите сотрудника")
+            return
+
+        # Синхронно, без QueryService: два точечных чтения по индексу - доли
+        # миллисекунды, а порядок сканов должен совпадать с порядком ввода
+        started = time.perf_counter()
+        try:
+            item = self.scanner.scan(code, employee_id)
+        except ScanError as e:
+            self.status_label.setText(f"❌ {e}")
+            QApplication.beep()
+            return
+        except Exception as e:
+            self.status_label.setText(f"❌ Ошибка поиска: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        # Повторный скан - отмена
+        for i, queued in enumerate(self._queue):
+            if queued.asset_id == item.asset_id:
+                del self._queue[i]
+                self.status_label.setText(f"↩️ «{item.name}» убран из очереди")
+                self._show_queue()
+                return
+
+        self._queue.append(item)
+        action = "📤 Выдача" if item.operation_type == 'выдача' else "📥 Возврат"
+        self.status_label.setText(f"{action}: {item.name} ({item.quantity} шт.) - {elapsed_ms:.0f} мс")
+        self._show_queue()
+
+    def _show_queue(self):
+        rows = [("📤 Выдача" if item.operation_type == 'выдача' else "📥 Возврат",
+                 item.asset_id, item.name, item.model, item.serial_number, item.quantity)
+                for item in self._queue]
+        self.queue_model.set_rows(self.COLUMNS, rows)
+        self.queue_table.resizeColumnsToContents()
+        self.btn_commit.setText(f"✅ Провести ({len(self._queue)})")
+        self.btn_commit.setEnabled(bool(self._queue))
+
+    def remove_selected(self):
+        """Убрать выделенную строку очереди"""
+        index = self.queue_table.currentIndex()
+        if index.isValid() and index.row() < len(self._queue):
+            del self._queue[index.row()]
+            self._show_queue()
+        self.activate()
+
+    def clear_queue(self):
+        """Очистить очередь"""
+        self._queue = []
+        self._show_queue()
+        self.status_label.clear()
+        self.activate()
+
+    def commit_queue(self):
+        """Провести очередь одной транзакцией"""
+        if not self._queue:
+            return
+        employee_id = self.employee_combo.currentData()
+        employee_name = self.employee_combo.currentText()
+        planned_return = self.planned_return_date.date()
+        issues = sum(item.operation_type == 'выдача' for item in self._queue)
+        returns = len(self._queue) - issues
+
+        if issues and planned_return <= QDate.currentDate():
+            QMessageBox.warning(self, "Ошибка", "Дата возврата должна быть позже сегодняшней!")
+            return
+
+        confirm = QMessageBox.question(
+            self,
+            "Подтверждение",
+            f"Сотрудник: {employee_name}\n\nВыдача: {issues}\nВозврат: {returns}",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm != QMessageBox.StandardButton.Yes:
+            return
+
+        planned_return_text = planned_return.toString("yyyy-MM-dd")
+        try:
+            self.scanner.commit(self._queue, employee_id, planned_return_text)
+        except ScanError as e:
+            QMessageBox.warning(self, "Очередь не проведена",
+                                f"{e}\n\nДанные не изменены - отсканируйте актив заново.")
+            return
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка проведения очереди:\n{e}\n\nДанные не изменены.")
+            return
+
+        if AUDIT_ENABLED:
+            for item in self._queue:
+                details = {
+                    'asset_id': item.asset_id,
+                    'asset_name': item.name,
+                    'employee_id': employee_id,
+                    'employee_name': employee_name,
+                    'quantity': item.quantity,
+                    'source': 'scan',
+                }
+                if item.operation_type == 'выдача':
+                    details['planned_return'] = planned_return_text
+                    action = 'asset_issued'
+                else:
+                    action = 'asset_returned'
+                AuditLogger.log_action(self.current_user.get('user_id'), self.current_user.get('username'),
+                                       action, details)
+
+        self._queue = []
+        self._show_queue()
+        self.status_label.setText(f"✅ Проведено: выдача {issues}, возврат {returns}")
+        self.activate()
@@ -0,0 +1,630 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# Ключ сортировки пустого числового значения - пустые идут первыми
+_NO_NUMBER = float('-inf')
+
+
+class RowsTableModel(QAbstractTableModel):
+    """
+    Табличная модель над готовым списком строк
+
+    Заполняется результатом фоновой загрузки (QueryService) и не обращается
+    к БД сама. data() возвращает значения как есть (int, str, None), поэтому
+    код, читающий model.data(model.index(row, 0)), работает как с QSqlQueryModel.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = []
+        self._rows = []
+
+    def set_rows(self, columns, rows):
+        """Заменить содержимое модели"""
+        self.beginResetModel()
+        self._columns = list(columns)
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def rows(self):
+        """Строки модели (кортежи значений)"""
+        return self._rows
+
+    def update_rows(self, key_column, changed_rows, removed_keys=()):
+        """
+        Точечно применить изменения строк по ключевому столбцу
+
+        Строки с уже известным ключом заменяются на месте, новые добавляются
+        в конец, строки с ключами из removed_keys удаляются. Остальные строки
+        и выделение в представлении не трогаются.
+        """
+        positions = {row[key_column]: i for i, row in enumerate(self._rows)}
+        last_column = max(len(self._columns) - 1, 0)
+
+        new_rows = []
+        for row in changed_rows:
+            i = positions.get(row[key_column])
+            if i is None:
+                new_rows.append(row)
+            else:
+                self._rows[i] = row
+                self.dataChanged.emit(self.index(i, 0), self.index(i, last_column))
+
+        if new_rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self.endInsertRows()
+
+        # С конца, чтобы позиции оставшихся не сдвигались
+        for i in sorted((positions[key] for key in removed_keys if key in positions), reverse=True):
+            self.beginRemoveRows(QModelIndex(), i, i)
+            del self._rows[i]
+            self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        return self._rows[index.row()][index.column()]
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._columns[section] if section < len(self._columns) else None
+        return section + 1
+
+
+class KeysetTableModel(QAbstractTableModel):
+    """
+    Ленивая табличная модель с keyset-пагинацией
+
+    Строки запрашиваются страницами по ключу сортировки (например,
+    (operation_date, history_id)): следующая страница - это "строки после
+    последнего ключа", поэтому каждая страница - короткий поиск по индексу,
+    без OFFSET. Представление догружает страницы через canFetchMore/fetchMore.
+
+    В памяти держится только LRU-кэш из CACHED_PAGES страниц и по одному
+    ключу-якорю на страницу; вытесненная страница при обращении
+    перечитывается по диапазону ключей между своим якорем и якорем следующей.
+    С query_service все чтения после первой страницы идут в фоне: пока
+    страница читается, ее ячейки пустые.
+
+    refresh() перечитывает страницы из кэша на месте - модель, прокрутка и
+    выделение сохраняются; страница, в диапазон которой попали новые строки
+    (или из которой строки удалены), меняет размер.
+    """
+
+    PAGE_SIZE = 200
+    CACHED_PAGES = 10
+
+    def __init__(self, pool, query, params, key_sql, key_columns, descending=True,
+                 query_service=None, load_key='keyset', parent=None):
+        """
+        Args:
+            pool: ConnectionPool (страницы читаются read-only соединением потока)
+            query: SELECT ... FROM ... WHERE ... без ORDER BY и LIMIT
+            params: параметры query
+            key_sql: выражения ключа сортировки, например ('uh.operation_date', 'uh.history_id')
+            key_columns: индексы этих же значений в строке результата
+            descending: направление сортировки
+            query_service: QueryService для фонового чтения страниц (None - чтение в потоке вызова)
+            load_key: префикс ключей загрузок в query_service
+        """
+        super().__init__(parent)
+        self.pool = pool
+        self.query_service = query_service
+        self._load_key = load_key
+        self._key_sql = key_sql
+        self._key_columns = key_columns
+        direction = "DESC" if descending else "ASC"
+        self._order_by = ", ".join(f"{expr} {direction}" for expr in key_sql)
+        self._compare = "<" if descending else ">"
+        self._compare_last = ">=" if descending else "<="
+        self.set_query(query, params)
+
+        self._columns = []
+        self._pages = OrderedDict()  # номер страницы -> строки (LRU)
+        self._anchors = [None]       # ключ, после которого начинается страница i
+        self._sizes = []             # число строк страницы i
+        self._offsets = []           # номер первой строки страницы i
+        self._row_count = 0
+        self._exhausted = False
+        self._loading = set()        # страницы, которые читаются в фоне
+        self._fetching_more = False
+
+    def set_query(self, query, params):
+        """Сменить запрос (фильтры); загрузки по прежнему запросу больше не применяются"""
+        self._query = query
+        self._params = tuple(params)
+        self._generation = getattr(self, '_generation', 0) + 1
+
+    def fetch_page(self, connection, anchor, last=None):
+        """
+        Прочитать страницу после ключа anchor (можно вызывать из любого потока)
+
+        last - ключ последней строки уже известной страницы: читается весь
+        диапазон до него включительно, без LIMIT (страница могла вырасти).
+        """
+        query = self._query
+        params = self._params
+        keys = ", ".join(self._key_sql)
+        placeholders = ", ".join("?" for _ in self._key_sql)
+        if anchor is not None:
+            query += f" AND ({keys}) {self._compare} ({placeholders})"
+            params += tuple(anchor)
+        if last is not None:
+            query += f" AND ({keys}) {self._compare_last} ({placeholders})"
+            params += tuple(last)
+        query += f" ORDER BY {self._order_by}"
+        if last is None:
+            query += f" LIMIT {self.PAGE_SIZE}"
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, params)
+            columns = [description[0] for description in cursor.description]
+            return columns, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def fetch_first_page(self, connection):
+        """Первая страница - для фоновой загрузки через QueryService.submit"""
+        return self.fetch_page(connection, None)
+
+    def set_first_page(self, result):
+        """Заполнить модель первой страницей (в потоке GUI)"""
+        columns, rows = result
+        self.beginResetModel()
+        self._generation += 1
+        self._columns = columns
+        self._pages.clear()
+        self._anchors = [None]
+        self._sizes = []
+        self._offsets = []
+        self._row_count = 0
+        self._exhausted = False
+        self._loading.clear()
+        self._fetching_more = False
+        self._add_page(rows)
+        self.endResetModel()
+
+    def _add_page(self, rows):
+        page = len(self._sizes)
+        self._offsets.append(self._row_count)
+        self._sizes.append(len(rows))
+        self._store_page(page, rows)
+        self._row_count += len(rows)
+        if len(rows) < self.PAGE_SIZE:
+            self._exhausted = True
+        else:
+            self._anchors.append(self._row_key(rows[-1]))
+
+    def _row_key(self, row):
+        return tuple(row[column] for column in self._key_columns)
+
+    def _store_page(self, page, rows):
+        self._pages[page] = rows
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.CACHED_PAGES:
+            self._pages.popitem(last=False)
+
+    def _page_bounds(self, page):
+        """(якорь, ключ последней строки или None) - диапазон страницы"""
+        last = self._anchors[page + 1] if page + 1 < len(self._anchors) else None
+        return self._anchors[page], last
+
+    def _page_of_row(self, row):
+        # Пустые страницы делят номер первой строки со следующей - берется последняя из них
+        return bisect_right(self._offsets, row) - 1
+
+    def _set_page_rows(self, page, rows):
+        """Подставить перечитанную страницу; разница в размере - вставка/удаление строк в ее конце"""
+        old_size = self._sizes[page]
+        new_size = len(rows)
+        first = self._offsets[page]
+        if new_size > old_size:
+            self.beginInsertRows(QModelIndex(), first + old_size, first + new_size - 1)
+        elif new_size < old_size:
+            self.beginRemoveRows(QModelIndex(), first + new_size, first + old_size - 1)
+        self._store_page(page, rows)
+        if new_size != old_size:
+            self._sizes[page] = new_size
+            self._row_count += new_size - old_size
+            for later in range(page + 1, len(self._offsets)):
+                self._offsets[later] += new_size - old_size
+            if new_size > old_size:
+                self.endInsertRows()
+            else:
+                self.endRemoveRows()
+        if min(old_size, new_size) > 0:
+            self.dataChanged.emit(self.index(first, 0),
+                                  self.index(first + min(old_size, new_size) - 1, len(self._columns) - 1))
+        # Последняя страница без якоря-границы читается с LIMIT: заполнилась - дальше могут быть строки
+        if page + 1 == len(self._anchors) and new_size >= self.PAGE_SIZE:
+            self._anchors.append(self._row_key(rows[-1]))
+            self._exhausted = False
+
+    def _read(self, key, fetch, apply, finished=None):
+        """
+        fetch(connection) в фоне через query_service (или сразу), затем apply(result) -
+        если запрос за это время не сменился; finished() - после чтения, даже неудачного
+        """
+        generation = self._generation
+
+        def apply_current(result):
+            if finished is not None:
+                finished()
+            if generation == self._generation:
+                apply(result)
+
+        def failed(message):
+            # Ошибку уже вывел QueryService
+            if finished is not None:
+                finished()
+
+        if self.query_service is None:
+            try:
+                result = fetch(self.pool.reader())
+            finally:
+                if finished is not None:
+                    finished()
+            if generation == self._generation:
+                apply(result)
+            return
+        self.query_service.submit(f"{self._load_key}:{key}", fetch, apply_current, failed)
+
+    def _load_page(self, page):
+        """Перечитать вытесненную страницу по ее диапазону ключей"""
+        if page in self._loading:
+            return
+        anchor, last = self._page_bounds(page)
+        self._loading.add(page)
+
+        def fetch(connection):
+            return self.fetch_page(connection, anchor, last)[1]
+
+        self._read(f"page:{page}", fetch, lambda rows: self._set_page_rows(page, rows),
+                   lambda: self._loading.discard(page))
+
+    def refresh(self):
+        """Перечитать страницы из кэша (данные изменились); вытесненные перечитаются при показе"""
+        if not self._columns:
+            return
+        # Страницы, которые сейчас читаются, могли прочитаться до изменения - их тоже
+        bounds = [(page, *self._page_bounds(page)) for page in sorted(set(self._pages) | self._loading)]
+
+        def fetch(connection):
+            return [(page, self.fetch_page(connection, anchor, last)[1]) for page, anchor, last in bounds]
+
+        def apply(pages):
+            for page, rows in pages:
+                self._set_page_rows(page, rows)
+
+        self._read("refresh", fetch, apply)
+
+    def cached_row_count(self):
+        """Сколько строк сейчас в памяти"""
+        return sum(len(rows) for rows in self._pages.values())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and bool(self._columns) and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._fetching_more:
+            return
+        anchor = self._anchors[-1]
+        self._fetching_more = True
+
+        def fetch(connection):
+            return self.fetch_page(connection, anchor)[1]
+
+        def finished():
+            self._fetching_more = False
+
+        def apply(rows):
+            if not rows:
+                self._exhausted = True
+                return
+            self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(rows) - 1)
+            self._add_page(rows)
+            self.endInsertRows()
+
+        def apply_new(rows):
+            # Пока страница читалась, ее уже могли добавить (refresh заполнил последнюю страницу)
+            if self._anchors[-1] == anchor and len(self._anchors) > len(self._sizes):
+                apply(rows)
+
+        self._read("more", fetch, apply_new, finished)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        page = self._page_of_row(index.row())
+        rows = self._pages.get(page)
+        if rows is None:
+            self._load_page(page)
+            if self.query_service is not None or page not in self._pages:
+                # Страница читается в фоне - ячейка заполнится по dataChanged
+                return None
+            return self.data(index, role)
+        self._pages.move_to_end(page)
+        offset = index.row() - self._offsets[page]
+        if offset >= len(rows):
+            return None
+        return rows[offset][index.column()]
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._columns[section] if section < len(self._columns) else None
+        return section + 1
+
+
+class CatalogData:
+    """
+    Подготовленные данные каталога: значения по столбцам и ключи поиска/сортировки
+
+    Строится в рабочем потоке (AssetCatalogModel.prepare) - в потоке GUI
+    остается только подменить данные модели.
+    """
+
+    def __init__(self, columns, rows, search_columns=None):
+        self.columns = list(columns)
+        values = list(zip(*rows)) if rows else [() for _ in self.columns]
+        # Целочисленные столбцы без пустых значений - компактным array('q')
+        self.data = [array('q', column) if _is_int_column(column) else list(column) for column in values]
+        self.numeric = [all(value is None or _is_number(value) for value in column) for column in values]
+        self.sort_keys = [[_NO_NUMBER if value is None else value for value in column] if numeric
+                          else ['' if value is None else str(value).casefold() for value in column]
+                          for column, numeric in zip(values, self.numeric)]
+        search_columns = range(len(self.columns)) if search_columns is None else search_columns
+        texts = [self.sort_keys[column] if not self.numeric[column] else
+                 ['' if value is None else str(value) for value in values[column]]
+                 for column in search_columns]
+        self.search = ["\n".join(row) for row in zip(*texts)] if rows else []
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_int_column(column):
+    return bool(column) and all(isinstance(value, int) and not isinstance(value, bool) for value in column)
+
+
+def _sort_key(value, numeric):
+    if numeric:
+        return value if _is_number(value) else _NO_NUMBER
+    return '' if value is None else str(value).casefold()
+
+
+def _search_key(row, search_columns):
+    return "\n".join('' if row[column] is None else str(row[column]).casefold() for column in search_columns)
+
+
+class AssetCatalogModel(QAbstractTableModel):
+    """
+    Модель каталога с поиском по мере ввода и сортировкой без запросов к БД
+
+    Значения хранятся по столбцам, для каждой строки заранее посчитаны ключ
+    поиска (значения в casefold через перевод строки) и ключи сортировки.
+    Видимые строки - список номеров строк хранилища в порядке сортировки:
+    фильтр проходит по нему и сохраняет порядок, а уточнение запроса
+    (набрана еще буква) фильтрует уже найденное, а не весь каталог.
+    Строки представления - это видимые строки, поэтому код, читающий
+    model.data(model.index(row, 0)), получает ID выбранной строки.
+    """
+
+    def __init__(self, search_columns=None, parent=None):
+        """
+        Args:
+            search_columns: номера столбцов, по которым ищет set_filter (None - все)
+        """
+        super().__init__(parent)
+        self.search_columns = search_columns
+        self._set_data(CatalogData([], [], search_columns))
+        self._filter_tokens = []
+        self._sort_column = None
+        self._sort_order = Qt.SortOrder.AscendingOrder
+
+    def prepare(self, columns, rows):
+        """Подготовить данные для set_prepared (можно вызывать из любого потока)"""
+        return CatalogData(columns, rows, self.search_columns)
+
+    def set_rows(self, columns, rows):
+        """Заменить содержимое модели (фильтр и сортировка сохраняются)"""
+        self.set_prepared(self.prepare(columns, rows))
+
+    def set_prepared(self, catalog):
+        """Заменить содержимое модели подготовленными данными (в потоке GUI)"""
+        self.beginResetModel()
+        self._set_data(catalog)
+        self._order = self._sorted_order()
+        self._visible = self._match(self._order, self._filter_tokens)
+        self.endResetModel()
+
+    def _set_data(self, catalog):
+        self._columns = catalog.columns
+        self._data = catalog.data
+        self._numeric = catalog.numeric
+        self._sort_keys = catalog.sort_keys
+        self._search = catalog.search
+        self._positions = {key: i for i, key in enumerate(self._data[0])} if self._data else {}
+        # Номера живых строк хранилища в порядке сортировки (удаленные строки - только вне его)
+        self._order = list(range(len(self._search)))
+        self._visible = self._order
+
+    def total_count(self):
+        """Сколько строк в каталоге (без учета фильтра)"""
+        return len(self._order)
+
+    def row_of(self, key):
+        """Номер видимой строки с ключом key (первый столбец) или None"""
+        index = self._positions.get(key)
+        if index is None:
+            return None
+        try:
+            return self._visible.index(index)
+        except ValueError:
+            return None
+
+    def set_filter(self, text):
+        """
+        Показать строки, содержащие все слова text (без учета регистра)
+
+        Если новый запрос уточняет предыдущий, проверяются только уже найденные строки.
+        """
+        tokens = text.casefold().split()
+        if tokens == self._filter_tokens:
+            return
+        if all(any(old in new for new in tokens) for old in self._filter_tokens):
+            # Найденные строки уже содержат прежние слова - проверяем только новые
+            visible = self._match(self._visible, [token for token in tokens if token not in self._filter_tokens])
+        else:
+            visible = self._match(self._order, tokens)
+        self.beginResetModel()
+        self._filter_tokens = tokens
+        self._visible = visible
+        self.endResetModel()
+
+    def _match(self, candidates, tokens):
+        search = self._search
+        matched = candidates
+        for token in tokens:
+            matched = [i for i in matched if token in search[i]]
+        return matched if tokens else list(candidates)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Сортировка по столбцу по заранее посчитанным ключам (вызывается представлением)"""
+        if not 0 <= column < len(self._columns):
+            return
+        self.layoutAboutToBeChanged.emit()
+        self._sort_column = column
+        self._sort_order = order
+        self._order = self._sorted_order()
+        visible = set(self._visible)
+        self._visible = [i for i in self._order if i in visible]
+        self.layoutChanged.emit()
+
+    def _sorted_order(self):
+        live = self._order
+        if self._sort_column is None or self._sort_column >= len(self._columns):
+            return sorted(live)
+        keys = self._sort_keys[self._sort_column]
+        return sorted(live, key=keys.__getitem__,
+                      reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+
+    def update_rows(self, key_column, changed_rows, removed_keys=()):
+        """
+        Точечно применить изменения строк по ключевому столбцу
+
+        Измененная строка остается на своем месте (до следующей сортировки) и
+        скрывается, если перестала подходить под фильтр; новые строки, подходящие
+        под фильтр, добавляются в конец, строки removed_keys удаляются.
+        """
+        last_column = max(len(self._columns) - 1, 0)
+        positions = {index: row for row, index in enumerate(self._visible)}
+        hidden = set()
+        added = []
+        for row in changed_rows:
+            index = self._positions.get(row[key_column])
+            if index is None:
+                index = self._append(row)
+                self._order.append(index)
+                if self._matches(index):
+                    added.append(index)
+                continue
+            self._store(index, row)
+            if index in positions:
+                if self._matches(index):
+                    view_row = positions[index]
+                    self.dataChanged.emit(self.index(view_row, 0), self.index(view_row, last_column))
+                else:
+                    hidden.add(index)
+            elif self._matches(index):
+                added.append(index)
+
+        removed = {self._positions.pop(key) for key in removed_keys if key in self._positions}
+        if removed:
+            self._order = [i for i in self._order if i not in removed]
+
+        # С конца, чтобы позиции оставшихся не сдвигались
+        for view_row in sorted((positions[i] for i in hidden | removed if i in positions), reverse=True):
+            self.beginRemoveRows(QModelIndex(), view_row, view_row)
+            del self._visible[view_row]
+            self.endRemoveRows()
+
+        if added:
+            first = len(self._visible)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            self._visible.extend(added)
+            self.endInsertRows()
+
+    def _matches(self, index):
+        search = self._search[index]
+        return all(token in search for token in self._filter_tokens)
+
+    def _append(self, row):
+        index = len(self._search)
+        for column, value in enumerate(row):
+            self._sort_keys[column].append(None)
+            self._append_value(column, value)
+        self._search.append(None)
+        self._store(index, row)
+        self._positions[row[0]] = index
+        return index
+
+    def _append_value(self, column, value):
+        try:
+            self._data[column].append(value)
+        except TypeError:
+            # Пустое или нецелое значение в столбце array('q')
+            self._data[column] = list(self._data[column])
+            self._data[column].append(value)
+
+    def _store(self, index, row):
+        for column, value in enumerate(row):
+            try:
+                self._data[column][index] = value
+            except TypeError:
+                self._data[column] = list(self._data[column])
+                self._data[column][index] = value
+            self._sort_keys[column][index] = _sort_key(value, self._numeric[column])
+        self._search[index] = _search_key(row, self._search_columns())
+
+    def _search_columns(self):
+        return list(range(len(self._columns))) if self.search_columns is None else self.search_columns
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        return self._data[index.column()][self._visible[index.row()]]
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._columns[section] if section < len(self._columns) else None
+        return section + 1